@@ -4,7 +4,7 @@ from watchdog.events import FileSystemEventHandler
 import time
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict
+from typing import Callable, List, Dict
 
 
 class AllEventsHandler(FileSystemEventHandler):
@@ -14,6 +14,8 @@ class AllEventsHandler(FileSystemEventHandler):
         self.events = []  # 内存存储事件列表
         self.observer = None  # Observer 实例
         self.is_running = False  # 监控状态
+        self.watch_path = None  # 监控的路径（绝对路径）
+        self.listeners = []  # 事件回调，每个事件记录后在 Observer 线程中调用
     
     def start_monitoring(self, watch_path: str, recursive: bool = True):
         """启动监控
@@ -36,6 +38,7 @@ class AllEventsHandler(FileSystemEventHandler):
         self.observer.schedule(self, watch_path, recursive=recursive)
         self.observer.start()
         self.is_running = True
+        self.watch_path = str(path.resolve())
         print(f"✓ 开始监控: {watch_path}")
     
     def stop_monitoring(self):
@@ -63,6 +66,21 @@ class AllEventsHandler(FileSystemEventHandler):
             event_record["dest_path"] = dest_path
         
         self.events.append(event_record)
+        for listener in list(self.listeners):
+            try:
+                listener(event_record)
+            except Exception as e:
+                print(f" 事件回调出错: {e}")
+
+    def add_listener(self, callback: Callable[[Dict], None]):
+        """注册事件回调（例如让缓存失效），不影响 get_events 的内存队列"""
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[Dict], None]):
+        """移除事件回调"""
+        if callback in self.listeners:
+            self.listeners.remove(callback)
     
     def get_events(self) -> List[Dict]:
         """获取所有事件并清空"""
@@ -5,49 +5,143 @@ AI工厂模块
 
 主要功能：
     - 支持多种AI模型供应商（DeepSeek、Qwen、Kimi、Doubao等）
-    - 单AI实例架构
-    - 统一的模型切换接口
-    - 配置文件管理（secret_key.json + config.json）
+    - 多会话架构：模型实例、tokenizer、HTTP连接在会话间共享，每个会话只持有自己的历史和参数
+    - 统一的模型切换接口（模型实例池复用已加载的tokenizer和HTTP连接）
+    - 多供应商并发请求（先到先得 / 打分择优），统计各模型胜出率
+    - 延迟 / 成本感知路由：按滑动窗口统计和价格表选择模型，失败时自动降级到备选模型
+    - 启动预热：后台加载tokenizer、建立HTTP连接，并提供就绪状态
+    - 请求调度：配置了速率限制的账户按优先级 / 租户公平排队，交互式请求可抢占批处理请求
+    - 配置文件管理（secret_key.json + config.json，由 ConfigStore 缓存，startup 后热更新）
 
 典型用法：
     >>> factory = AIFactory()
     >>> factory.connect(vendor="deepseek", model_name="deepseek-chat")
-    >>> # 使用 factory.callback
+    >>> async for chunk in factory.callback("user-1", "你好"):
+    ...     print(chunk)
 """
 
-import os
-import json
-from typing import Optional, Dict, Any, Generator
+import time
+import asyncio
+from typing import Optional, Dict, Any, AsyncGenerator, Callable, List, Tuple
 
-from .Client import OPEN_AI
+from openai import APIStatusError
+
+from .Client.OPEN_AI import OPEN_AI
 from .Model import DeepSeek
 from .Model import Doubao
 from .Model import Kimi
 from .Model import Qwen
+from .Tool.ConfigStore import ConfigStore, config_store as default_config_store
+from .Tool.ModelPool import ModelPool, PooledModel
+from .Tool.ModelRouter import ModelRouter, RoutePolicy
+from .Tool.MemoryUsage import deep_sizeof
+from .Tool.RequestScheduler import request_schedulers
 from logger import logger
+
+# 默认系统提示词
+DEFAULT_SYSTEM_PROMPT = "你是一个乐于助人的AI助手。"
+
+# 默认会话ID（connect / switch_model / ai_client 等单会话接口使用）
+DEFAULT_SESSION = "default"
+
+
+class AISession:
+    """
+    单个会话的状态
+
+    属性:
+        session_id: 会话ID
+        vendor: 当前供应商
+        model_name: 当前模型名
+        client: 会话独占的 OPEN_AI 客户端（历史记录、统计、参数）
+        resources: 会话使用的共享资源（模型实例池中的条目）
+        created_at: 创建时间戳
+        last_active: 最近一次使用的时间戳
+    """
+
+    __slots__ = ("session_id", "vendor", "model_name", "client", "resources", "created_at", "last_active", "_lock")
+
+    def __init__(self, session_id: str, vendor: str, model_name: str, client: OPEN_AI, resources: PooledModel):
+        self.session_id = session_id
+        self.vendor = vendor
+        self.model_name = model_name
+        self.client = client
+        self.resources = resources
+        self.created_at = time.time()
+        self.last_active = self.created_at
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        """会话锁：同一会话的请求串行执行，避免历史记录交错"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+
 class AIFactory:
     """
-    AI工厂类 - 管理单AI实例
+    AI工厂类 - 管理多个会话
 
-    该类负责创建和管理一个AI客户端。
+    共享资源（模型实例、tokenizer、HTTP连接）由模型实例池统一管理，
+    每个会话只持有轻量的 OPEN_AI 客户端（历史记录和参数副本）。
 
     属性:
-        ai: AI模型实例（DeepSeek/Qwen/Kimi/Doubao等）
-        ai_client: AI模型的OPEN_AI客户端
+        ai: 默认会话的AI模型实例（DeepSeek/Qwen/Kimi/Doubao等）
+        ai_client: 默认会话的OPEN_AI客户端
+        config_store: 配置存储（切换模型时从内存快照读取配置）
+        model_pool: 模型实例池（按 供应商/模型名 缓存已初始化的模型和客户端）
+        router: 模型路由器（各模型的滑动窗口统计，route 按策略选择模型）
 
     配置文件:
         - role/secret_key.json: 存储各供应商的API密钥
         - role/config.json: 存储各模型的配置参数
-        - role/role/: 角色目录（包含assistant.json和history.json）
     """
 
-    def __init__(self) -> None:
+    # call_model 已实现的供应商
+    SUPPORTED_VENDORS = ("deepseek", "doubao", "kimi", "qwen")
+
+    def __init__(
+        self,
+        system_prompt: str = DEFAULT_SYSTEM_PROMPT,
+        config_store: Optional[ConfigStore] = None,
+        pool_size: int = 4
+    ) -> None:
         """
         初始化AI工厂
+
+        参数:
+            system_prompt: 默认系统提示词
+            config_store: 配置存储，默认使用全局 config_store
+            pool_size: 模型实例池容量（最多保持多少个已初始化的模型）
         """
-        self.ai = None  # AI模型实例
-        self.ai_client = None  # AI模型客户端
-    
+        self.system_prompt = system_prompt
+        self.config_store = config_store if config_store is not None else default_config_store
+        self.model_pool = ModelPool(capacity=pool_size)
+        self.router = ModelRouter(self.config_store)
+
+        self._sessions: Dict[str, AISession] = {}
+        self._default_model: Optional[tuple] = None  # connect 设置的默认 (供应商, 模型名)
+        self._tools: Optional[list] = None  # add_tools 设置的全局工具列表（新会话自动继承）
+        self._fan_out_stats: Dict[str, Dict[str, int]] = {}  # "供应商/模型名" -> 参与/胜出/失败次数
+
+        # 启动预热状态（见 warm_up / readiness）
+        self._readiness: Dict[str, Any] = {"state": "cold", "started_at": None, "finished_at": None, "models": {}}
+        self._warm_up_task: Optional[asyncio.Task] = None
+
+    # ================ 默认会话（单会话接口） ================
+    @property
+    def ai(self):
+        """默认会话的AI模型实例，未连接时为 None"""
+        session = self._sessions.get(DEFAULT_SESSION)
+        return session.client._model if session else None
+
+    @property
+    def ai_client(self) -> Optional[OPEN_AI]:
+        """默认会话的OPEN_AI客户端，未连接时为 None"""
+        session = self._sessions.get(DEFAULT_SESSION)
+        return session.client if session else None
+
     def connect(
         self,
         vendor: str,
@@ -56,6 +150,8 @@ class AIFactory:
         """
         连接AI模型
 
+        设置新会话使用的默认模型，并打开默认会话。
+
         参数:
             vendor: 模型供应商（如 "deepseek", "qwen", "kimi", "doubao"）
             model_name: 模型名称（如 "deepseek-chat", "qwen-turbo"）
@@ -69,26 +165,38 @@ class AIFactory:
             >>> factory.connect(vendor="deepseek", model_name="deepseek-chat")
         """
         self.switch_model(vendor, model_name)
+        self._default_model = (vendor, model_name)
 
     def disconnect(self) -> None:
         """
         断开AI模型连接
 
-        释放AI模型的资源，将所有客户端设置为None。
+        关闭所有会话并清空模型实例池。
         """
-        self.ai = None
-        self.ai_client = None
+        sessions, self._sessions = list(self._sessions.values()), {}
+        self._default_model = None
+        self.model_pool.clear()
+        for session in sessions:
+            self.model_pool.release(session.resources)
+
     def switch_model(
         self,
         vendor: Optional[str] = None,
-        model_name: Optional[str] = None
+        model_name: Optional[str] = None,
+        keep_history: bool = False,
+        session_id: str = DEFAULT_SESSION
     ) -> None:
         """
         切换AI模型
 
+        模型实例从实例池中获取，切换到已加载过的模型时不会重新加载tokenizer或新建HTTP客户端。
+        会话不存在时新建。
+
         参数:
             vendor: 模型供应商（如 "deepseek", "qwen", "kimi", "doubao"）
             model_name: 模型具体型号（如 "deepseek-chat", "qwen-turbo"）
+            keep_history: 是否把当前对话历史带到新模型（按新模型的tokenizer重新计数）
+            session_id: 会话ID，默认为默认会话
 
         异常:
             FileNotFoundError: 配置文件不存在
@@ -96,35 +204,684 @@ class AIFactory:
 
         示例:
             >>> factory.switch_model(vendor="kimi", model_name="moonshot-v1-8k")
+            >>> factory.switch_model(vendor="deepseek", model_name="deepseek-reasoner", keep_history=True)
+        """
+        if not (vendor and model_name):
+            return
+
+        session = self._sessions.get(session_id)
+        if session is None:
+            self.open_session(session_id, vendor, model_name)
+            return
+
+        entry = self._acquire(vendor, model_name, hold=True)
+        try:
+            session.client.rebind_model(self._session_model(entry), entry.client, entry.async_client, keep_history=keep_history)
+        except BaseException:
+            self.model_pool.release(entry)
+            raise
+        previous = session.resources
+        session.vendor, session.model_name, session.resources = vendor, model_name, entry
+        self.model_pool.release(previous)
+
+    # ================ 会话管理 ================
+    def open_session(
+        self,
+        session_id: str,
+        vendor: Optional[str] = None,
+        model_name: Optional[str] = None,
+        system_prompt: Optional[str] = None,
+        priority: str = "interactive"
+    ) -> OPEN_AI:
+        """
+        打开新会话
+
+        参数:
+            session_id: 会话ID（如用户ID、连接ID）
+            vendor: 模型供应商，默认使用 connect 设置的模型
+            model_name: 模型名称，默认使用 connect 设置的模型
+            system_prompt: 会话的系统提示词，默认使用工厂的系统提示词
+            priority: 请求优先级（interactive / default / batch），会话ID作为调度租户
+
+        返回:
+            OPEN_AI: 会话的客户端
+
+        异常:
+            ValueError: 会话已存在
+            RuntimeError: 未指定模型且未调用 connect
+        """
+        if not isinstance(session_id, str) or not session_id:
+            raise ValueError("session_id 必须是非空字符串")
+        if session_id in self._sessions:
+            raise ValueError(f"会话已存在: {session_id}")
+
+        if not (vendor and model_name):
+            if self._default_model is None:
+                raise RuntimeError("AI模型客户端未连接")
+            vendor, model_name = self._default_model
+
+        entry = self._acquire(vendor, model_name, hold=True)
+        try:
+            client = OPEN_AI(
+                model=self._session_model(entry),
+                system_prompt=system_prompt or self.system_prompt,
+                client=entry.client,
+                async_client=entry.async_client
+            )
+            client.set_schedule(priority=priority, tenant=session_id)
+        except BaseException:
+            self.model_pool.release(entry)
+            raise
+        self._sessions[session_id] = AISession(session_id, vendor, model_name, client, entry)
+        return client
+
+    def close_session(self, session_id: str) -> bool:
+        """
+        关闭会话并释放其历史记录
+
+        返回:
+            bool: 会话是否存在
+        """
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        self.model_pool.release(session.resources)
+        return True
+
+    def close_idle_sessions(self, idle_seconds: float) -> int:
+        """
+        关闭超过指定时间未使用的会话（正在处理请求的会话不会被关闭）
+
+        参数:
+            idle_seconds: 空闲时间阈值（秒）
+
+        返回:
+            int: 关闭的会话数
+        """
+        deadline = time.time() - idle_seconds
+        idle = [
+            session_id for session_id, session in self._sessions.items()
+            if session.last_active < deadline and not (session._lock and session._lock.locked())
+        ]
+        for session_id in idle:
+            self.model_pool.release(self._sessions.pop(session_id).resources)
+        return len(idle)
+
+    def get_session(self, session_id: str) -> OPEN_AI:
+        """
+        获取会话的客户端
+
+        异常:
+            ValueError: 会话不存在
+        """
+        session = self._sessions.get(session_id)
+        if session is None:
+            raise ValueError(f"会话不存在: {session_id}")
+        return session.client
+
+    def has_session(self, session_id: str) -> bool:
+        """会话是否存在"""
+        return session_id in self._sessions
+
+    @property
+    def session_count(self) -> int:
+        """当前会话数"""
+        return len(self._sessions)
+
+    # ================ 统计 ================
+    def session_stats(self, session_id: str) -> Dict[str, Any]:
+        """
+        查询单个会话的状态和独占内存
+
+        返回:
+            dict: 包含 vendor / model / messages / total_tokens / memory_bytes / idle_seconds
+
+        异常:
+            ValueError: 会话不存在
+        """
+        session = self._sessions.get(session_id)
+        if session is None:
+            raise ValueError(f"会话不存在: {session_id}")
+
+        history = session.client._history
+        return {
+            "vendor": session.vendor,
+            "model": session.model_name,
+            "messages": len(history.messages),
+            "total_tokens": history.total_tokens,
+            "memory_bytes": self._session_memory(session),
+            "idle_seconds": time.time() - session.last_active,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        工厂整体统计
+
+        返回:
+            dict: 会话数、会话独占内存（合计 / 平均 / 最大）、模型实例池统计和各账户的请求调度统计
+        """
+        memory = [self._session_memory(session) for session in self._sessions.values()]
+        return {
+            "sessions": len(memory),
+            "session_memory_total": sum(memory),
+            "session_memory_avg": sum(memory) / len(memory) if memory else 0,
+            "session_memory_max": max(memory) if memory else 0,
+            "pool": self.model_pool.snapshot(),
+            "schedulers": request_schedulers.snapshot(),
+        }
+
+    def _session_memory(self, session: AISession) -> int:
+        """估算会话独占的内存（排除模型实例池中的共享资源）"""
+        entry = session.resources
+        shared = [entry, entry.model, entry.client, entry.async_client]
+        shared.extend(vars(entry.model).values())
+        return deep_sizeof(session, shared=shared)
+
+    # ================ 多模型并发 ================
+    # 并发模式：first 取最先完整返回的回答，best 等待全部完成后按 scorer 打分取最高
+    FAN_OUT_MODES = ("first", "best")
+
+    async def fan_out(
+        self,
+        session_id: str,
+        problem: str,
+        targets: List[Tuple[str, str]],
+        mode: str = "first",
+        scorer: Optional[Callable[[Dict[str, Any]], float]] = None,
+        role: str = "user",
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        同时向多个模型发送同一个问题，只把选中的回答写入会话历史
+
+        每个候选模型使用会话历史的副本，共享模型实例池中的连接；
+        first 模式下选出胜者后立即取消其余请求。
+
+        参数:
+            session_id: 会话ID（不存在时使用默认模型新建）
+            problem: 消息内容
+            targets: 候选模型列表，如 [("deepseek", "deepseek-chat"), ("qwen", "qwen-plus")]
+            mode: 并发模式，可选值见 FAN_OUT_MODES
+            scorer: best 模式的打分函数，参数为候选结果字典（vendor / model / content / thinking / tool_calls / elapsed），
+                    返回分数（越大越好）
+            role: 消息角色
+            timeout: 最长等待秒数，超时后取消未完成的请求（best 模式在已完成的回答中选择）
+
+        返回:
+            dict: 选中的回答
+                - vendor / model / content / thinking / tool_calls / elapsed / score
+                - usage: 所有候选请求的 usage 合计
+                - candidates: 每个候选的状态（won / lost / cancelled / error）、耗时、usage、分数和错误信息
+
+        异常:
+            ValueError: 参数无效
+            RuntimeError: 没有任何候选模型在限定时间内成功返回
+
+        示例:
+            >>> result = await factory.fan_out("user-1", "你好", [("deepseek", "deepseek-chat"), ("qwen", "qwen-plus")])
+            >>> result["vendor"], result["content"]
+        """
+        if mode not in self.FAN_OUT_MODES:
+            raise ValueError(f"mode 必须是 {self.FAN_OUT_MODES} 之一，当前值为: {mode}")
+        if mode == "best" and not callable(scorer):
+            raise ValueError("best 模式必须提供 scorer")
+        targets = [tuple(target) for target in targets or []]
+        if not targets:
+            raise ValueError("targets 不能为空")
+        if len(set(targets)) != len(targets):
+            raise ValueError("targets 中存在重复的模型")
+
+        session = self._sessions.get(session_id)
+        if session is None:
+            self.open_session(session_id)
+            session = self._sessions[session_id]
+
+        async with session.lock:
+            session.last_active = time.time()
+
+            # 为每个候选模型生成带历史副本的临时客户端（请求期间持有实例）
+            candidates, held, tasks = [], [], {}
+            try:
+                for vendor, model_name in targets:
+                    entry = self._acquire(vendor, model_name, hold=True)
+                    held.append(entry)
+                    model = self._session_model(entry)
+                    if session.client._model.tools is not None:
+                        model.set_tools(session.client._model.tools)
+                    candidates.append({
+                        "vendor": vendor,
+                        "model": model_name,
+                        "client": session.client.fork(model, entry.client, entry.async_client),
+                        "status": "cancelled",
+                    })
+
+                tasks = {asyncio.create_task(self._run_candidate(candidate, problem, role)): candidate for candidate in candidates}
+                finished = await self._wait_candidates(tasks, mode, timeout)
+            finally:
+                pending = [task for task in tasks if not task.done()]
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                for entry in held:
+                    self.model_pool.release(entry)
+
+            # 选出胜者
+            winner = None
+            if mode == "first":
+                winner = finished[0] if finished else None
+            else:
+                for candidate in finished:
+                    try:
+                        candidate["score"] = float(scorer(self._candidate_view(candidate)))
+                    except Exception as e:
+                        candidate["status"], candidate["error"] = "error", f"打分失败: {e}"
+                        continue
+                    if winner is None or candidate["score"] > winner["score"]:
+                        winner = candidate
+            for candidate in finished:
+                if candidate["status"] != "error":
+                    candidate["status"] = "won" if candidate is winner else "lost"
+
+            usage = self._merge_usage(candidates)
+            self._record_fan_out(candidates)
+
+            if winner is None:
+                errors = [f"{c['vendor']}/{c['model']}: {c['error']}" for c in candidates if c.get("error")]
+                raise RuntimeError(f"所有候选模型均未返回结果: {errors or '超时'}")
+
+            # 只把胜者的回答写入会话历史
+            await session.client.record_turn(problem, role, winner["content"], winner["thinking"], winner["tool_calls"])
+            session.client.last_usage = usage
+            session.last_active = time.time()
+
+        result = self._candidate_view(winner)
+        result["score"] = winner.get("score")
+        result["usage"] = usage
+        result["candidates"] = [
+            {
+                "vendor": c["vendor"],
+                "model": c["model"],
+                "status": c["status"],
+                "elapsed": c.get("elapsed"),
+                "usage": c["client"].last_usage,
+                "score": c.get("score"),
+                "error": c.get("error"),
+            }
+            for c in candidates
+        ]
+        return result
+
+    def fan_out_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        各模型在并发请求中的胜出统计
+
+        返回:
+            dict: "供应商/模型名" -> {"runs": 参与次数, "wins": 胜出次数, "errors": 失败次数, "win_rate": 胜出率}
         """
-        if vendor and model_name:
-            # 提取模型参数
-            ai_message = self._compose_params(self._extract_key(vendor), self._extract_params(vendor, model_name))
-            # 调用模型(相对应的模型工厂函数)
-            self.ai = self.call_model(vendor, ai_message)
-
-            # 获取角色目录路径
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            role_path = os.path.join(script_dir, "role", "role")
-
-            # 创建模型客户端
-            self.ai_client = OPEN_AI(
-                request_params=self.ai.gen_params(),
-                max_tokens=self.ai.max_tokens,
-                get_params_callback=self.ai.gen_request,
-                get_params_callback_stream=self.ai.gen_params_stream,
-                token_callback=self.ai.token_callback,
-                is_stream_end_callback=self.ai.is_stream_end,
-                extract_stream_callback=self.ai.extract_stream_info,
-                role_path=role_path
+        return {
+            key: dict(stats, win_rate=stats["wins"] / stats["runs"] if stats["runs"] else 0.0)
+            for key, stats in self._fan_out_stats.items()
+        }
+
+    async def _run_candidate(self, candidate: Dict[str, Any], problem: str, role: str) -> None:
+        """在候选模型上完整执行一次流式请求并累积结果"""
+        content, thinking, tool_calls = [], [], []
+        start = time.perf_counter()
+        try:
+            async for frame in candidate["client"].send_stream(problem, role):
+                if "content" in frame:
+                    content.append(frame["content"])
+                elif "thinking" in frame:
+                    thinking.append(frame["thinking"])
+                elif "tool_calls" in frame:
+                    tool_calls.extend(frame["tool_calls"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            candidate["status"], candidate["error"] = "error", str(e)
+            raise
+        finally:
+            candidate["elapsed"] = time.perf_counter() - start
+        candidate.update(content="".join(content), thinking="".join(thinking), tool_calls=tool_calls)
+
+    async def _wait_candidates(self, tasks: Dict[asyncio.Task, Dict[str, Any]], mode: str, timeout: Optional[float]) -> List[Dict[str, Any]]:
+        """等待候选请求完成，返回成功完成的候选（first 模式下最多一个）"""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        pending = set(tasks)
+        finished = []
+        while pending:
+            remaining = None if deadline is None else max(0.0, deadline - loop.time())
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=remaining,
+                return_when=asyncio.FIRST_COMPLETED if mode == "first" else asyncio.ALL_COMPLETED
             )
-            # 注：HistoryManager初始化时已自动加载assistant.json作为第一条消息
- 
+            if not done:
+                break  # 超时
+            for task in done:
+                if not task.cancelled() and task.exception() is None:
+                    finished.append(tasks[task])
+            if mode == "first" and finished:
+                return finished[:1]
+        return finished
+
+    @staticmethod
+    def _candidate_view(candidate: Dict[str, Any]) -> Dict[str, Any]:
+        """候选结果中对外公开的字段"""
+        return {key: candidate.get(key) for key in ("vendor", "model", "content", "thinking", "tool_calls", "elapsed")}
+
+    @staticmethod
+    def _merge_usage(candidates: List[Dict[str, Any]]) -> Dict[str, int]:
+        """合计所有候选请求的 usage（被取消的请求没有 usage 时不计入）"""
+        merged = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        for candidate in candidates:
+            usage = candidate["client"].last_usage or {}
+            for key in merged:
+                merged[key] += usage.get(key) or 0
+        return merged
+
+    def _record_fan_out(self, candidates: List[Dict[str, Any]]) -> None:
+        """累计各模型的参与、胜出和失败次数（完成或失败的请求同时计入路由统计）"""
+        for candidate in candidates:
+            stats = self._fan_out_stats.setdefault(
+                f"{candidate['vendor']}/{candidate['model']}", {"runs": 0, "wins": 0, "errors": 0}
+            )
+            stats["runs"] += 1
+            if candidate["status"] == "won":
+                stats["wins"] += 1
+            elif candidate["status"] == "error":
+                stats["errors"] += 1
+
+            client = candidate["client"]
+            if candidate["status"] in ("won", "lost"):
+                self.router.record_success(candidate["vendor"], candidate["model"], client.last_stream_stats, client.last_usage)
+            elif candidate["status"] == "error":
+                self.router.record_failure(candidate["vendor"], candidate["model"], candidate.get("error"))
+
+    # ================ 模型路由 ================
+    async def route(
+        self,
+        session_id: str,
+        problem: str,
+        policy: Optional[RoutePolicy] = None,
+        role: str = "user",
+        candidates: Optional[List[Tuple[str, str]]] = None,
+        output_tokens: Optional[int] = None
+    ) -> AsyncGenerator[dict, None]:
+        """
+        按路由策略选择模型并流式输出，首选模型失败时自动降级到下一个候选
+
+        请求在使用会话历史副本的临时客户端上执行，只有成功的回答写入会话历史，
+        降级重试不会在历史中留下重复的问题。已经输出内容后失败时不再降级，直接抛出异常。
+
+        参数:
+            session_id: 会话ID（不存在时使用默认模型新建）
+            problem: 消息内容
+            policy: 路由策略，默认 RoutePolicy.cheapest()（p95 首token延迟 < 2 秒中最便宜的模型）
+            role: 消息角色
+            candidates: 候选模型列表，默认为 config.json 中所有已支持供应商的模型
+            output_tokens: 预计输出token数（估算成本），None 时按各模型的历史输出估算
+
+        返回:
+            异步生成器，逐块yield输出的内容和类型（与 callback 相同）
+
+        异常:
+            RuntimeError: 所有候选模型均失败
+
+        示例:
+            >>> async for chunk in factory.route("user-1", "你好", RoutePolicy.fastest(max_cost=0.01)):
+            ...     print(chunk)
+            >>> factory.router.decisions(limit=1)
+        """
+        session = self._sessions.get(session_id)
+        if session is None:
+            self.open_session(session_id)
+            session = self._sessions[session_id]
+
+        if candidates is None:
+            candidates = [(vendor, model_name) for vendor, model_name, _ in self._configured_models()]
+
+        async with session.lock:
+            session.last_active = time.time()
+            prompt_tokens = session.client._history.total_tokens + session.client._model.token_callback(problem)
+            decision = self.router.decide(candidates, policy, prompt_tokens=prompt_tokens, output_tokens=output_tokens)
+
+            try:
+                for vendor, model_name in decision["ranking"]:
+                    started = False
+                    content, thinking, tool_calls = [], [], []
+                    entry = None
+                    try:
+                        entry = self._acquire(vendor, model_name, hold=True)
+                        model = self._session_model(entry)
+                        if session.client._model.tools is not None:
+                            model.set_tools(session.client._model.tools)
+                        client = session.client.fork(model, entry.client, entry.async_client)
+
+                        async for frame in client.send_stream(problem, role):
+                            started = True
+                            if "content" in frame:
+                                content.append(frame["content"])
+                            elif "thinking" in frame:
+                                thinking.append(frame["thinking"])
+                            elif "tool_calls" in frame:
+                                tool_calls.extend(frame["tool_calls"])
+                            yield frame
+                    except Exception as e:
+                        self.router.record_failure(vendor, model_name, e)
+                        decision["attempts"].append({"model": f"{vendor}/{model_name}", "status": "error", "error": str(e)})
+                        if started:
+                            raise
+                        logger.warning(f"模型 {vendor}/{model_name} 请求失败，降级到下一个候选: {e}")
+                        continue
+                    finally:
+                        if entry is not None:
+                            self.model_pool.release(entry)
+
+                    self.router.record_success(vendor, model_name, client.last_stream_stats, client.last_usage)
+                    decision["attempts"].append({"model": f"{vendor}/{model_name}", "status": "ok", "error": None})
+
+                    # 只把成功的回答写入会话历史
+                    await session.client.record_turn(problem, role, "".join(content), "".join(thinking), tool_calls)
+                    session.client.last_usage = client.last_usage
+                    session.client.last_stream_stats = client.last_stream_stats
+                    return
+            finally:
+                session.last_active = time.time()
+
+        errors = [f"{attempt['model']}: {attempt['error']}" for attempt in decision["attempts"]]
+        raise RuntimeError(f"所有候选模型均失败: {errors}")
+
+    def _configured_models(self) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """config.json 中所有已支持供应商的 (供应商, 模型名, 参数)"""
+        return [
+            (vendor, model_name, params)
+            for vendor, models in self.config_store.snapshot.config.items() if vendor in self.SUPPORTED_VENDORS
+            for model_name, params in models.items()
+        ]
+
+    # ================ 服务生命周期 ================
+    async def startup(self, warm_up: bool = True) -> None:
+        """
+        服务启动：开始监控配置文件（修改后自动换上新快照），并在后台预热模型
+
+        作为 HTTPServer 的启动回调使用（预热需要在服务的事件循环中开始）。
+
+        参数:
+            warm_up: 是否在后台预热模型（见 start_warm_up）；不预热时立即就绪，模型在第一次使用时加载
+        """
+        self.config_store.start_watching()
+        if warm_up:
+            self.start_warm_up()
+        elif self._readiness["state"] == "cold":
+            self._readiness["state"] = "skipped"
+
+    async def shutdown(self) -> None:
+        """服务关闭：取消未完成的预热，停止配置监控（作为 HTTPServer 的关闭回调使用）"""
+        if self._warm_up_task is not None and not self._warm_up_task.done():
+            self._warm_up_task.cancel()
+            await asyncio.gather(self._warm_up_task, return_exceptions=True)
+        # 等待监控线程退出，不阻塞事件循环
+        await asyncio.to_thread(self.config_store.stop_watching)
+
+    # ================ 启动预热 ================
+    def start_warm_up(
+        self,
+        targets: Optional[List[Tuple[str, str]]] = None,
+        connect: bool = True,
+        timeout: float = 30.0
+    ) -> asyncio.Task:
+        """
+        在当前事件循环中后台执行 warm_up（已在执行时返回正在运行的任务）
+
+        HTTP连接池与事件循环绑定，需要在服务所用的事件循环中调用（如 HTTPServer 的启动回调）。
+
+        返回:
+            asyncio.Task: 预热任务
+        """
+        if self._warm_up_task is None or self._warm_up_task.done():
+            self._warm_up_task = asyncio.get_running_loop().create_task(self.warm_up(targets, connect, timeout))
+        return self._warm_up_task
+
+    async def warm_up(
+        self,
+        targets: Optional[List[Tuple[str, str]]] = None,
+        connect: bool = True,
+        timeout: float = 30.0
+    ) -> Dict[str, Any]:
+        """
+        预热模型：并行加载tokenizer（线程池中执行）并建立HTTP连接（DNS + TLS）
+
+        预热后的模型留在模型实例池中，第一个用户请求直接复用。
+
+        参数:
+            targets: 要预热的 (供应商, 模型名) 列表；为 None 时从 config.json 中选择：
+                     有模型配置了 "warm_up": true 时只预热这些模型，否则预热所有已支持供应商的模型，
+                     数量超过实例池容量时只预热前面的模型
+            connect: 是否建立HTTP连接（请求一次模型列表接口）
+            timeout: 每个模型的超时时间（秒）
+
+        返回:
+            dict: 就绪状态（见 readiness）
+        """
+        if targets is None:
+            targets = self._warm_up_targets()
+        targets = list(dict.fromkeys(tuple(target) for target in targets))
+        if len(targets) > self.model_pool.capacity:
+            logger.warning(f"预热模型数({len(targets)})超过实例池容量({self.model_pool.capacity})，只预热前 {self.model_pool.capacity} 个")
+            targets = targets[:self.model_pool.capacity]
+
+        self._readiness = {
+            "state": "warming",
+            "started_at": time.time(),
+            "finished_at": None,
+            "models": {
+                f"{vendor}/{model_name}": {"tokenizer": False, "connection": False, "elapsed": None, "error": None}
+                for vendor, model_name in targets
+            },
+        }
+        await asyncio.gather(*(self._warm_up_one(vendor, model_name, connect, timeout) for vendor, model_name in targets))
+
+        warmed = [status for status in self._readiness["models"].values() if status["error"] is None]
+        if len(warmed) == len(targets):
+            state = "ready"
+        else:
+            state = "degraded" if warmed else "failed"
+        self._readiness["state"] = state
+        self._readiness["finished_at"] = time.time()
+
+        elapsed = self._readiness["finished_at"] - self._readiness["started_at"]
+        logger.info(f"模型预热完成，状态: {state}，成功 {len(warmed)}/{len(targets)}，耗时 {elapsed:.2f} 秒")
+        return self.readiness()
+
+    def readiness(self) -> Dict[str, Any]:
+        """
+        就绪状态（供 HTTPServer 的就绪探针使用）
+
+        返回:
+            dict:
+                - ready: 是否可以接收流量（预热完成且至少一个模型可用，或启动时不预热）
+                - state: cold（未预热）/ skipped（启动时不预热）/ warming / ready / degraded（部分模型失败）/ failed
+                - started_at / finished_at: 预热开始和结束时间戳
+                - models: 每个模型的 tokenizer / connection 是否就绪、耗时和错误信息
+        """
+        return {
+            "ready": self._readiness["state"] in ("ready", "degraded", "skipped"),
+            "state": self._readiness["state"],
+            "started_at": self._readiness["started_at"],
+            "finished_at": self._readiness["finished_at"],
+            "models": {key: dict(status) for key, status in self._readiness["models"].items()},
+        }
+
+    def _warm_up_targets(self) -> List[Tuple[str, str]]:
+        """从 config.json 中选择默认的预热模型"""
+        configured = self._configured_models()
+        marked = [(vendor, model_name) for vendor, model_name, params in configured if params.get("warm_up") is True]
+        if marked:
+            return marked
+        return [(vendor, model_name) for vendor, model_name, params in configured if params.get("warm_up") is not False]
+
+    async def _warm_up_one(self, vendor: str, model_name: str, connect: bool, timeout: float) -> None:
+        """预热单个模型并记录状态"""
+        status = self._readiness["models"][f"{vendor}/{model_name}"]
+        start = time.perf_counter()
+        try:
+            # tokenizer 加载是阻塞操作，放到线程池中执行（超时后加载仍会在后台完成并进入实例池）
+            entry = await asyncio.wait_for(asyncio.to_thread(self._acquire, vendor, model_name), timeout)
+            entry.bind_loop(asyncio.get_running_loop())  # 在线程中创建，连接将在服务的事件循环中建立
+            status["tokenizer"] = True
+            if connect:
+                await asyncio.wait_for(self._open_connection(entry), timeout)
+                status["connection"] = True
+        except asyncio.TimeoutError:
+            status["error"] = f"预热超时（{timeout} 秒）"
+        except Exception as e:
+            status["error"] = str(e)
+        finally:
+            status["elapsed"] = time.perf_counter() - start
+        if status["error"]:
+            logger.warning(f"模型 {vendor}/{model_name} 预热失败: {status['error']}")
+
+    @staticmethod
+    async def _open_connection(entry: PooledModel) -> None:
+        """请求一次模型列表接口，使连接留在连接池中（服务端返回错误状态码也说明连接已建立）"""
+        try:
+            await entry.async_client.models.list()
+        except APIStatusError:
+            pass
+
+    # ================ 私有方法 ================
+    def _acquire(self, vendor: str, model_name: str, hold: bool = False) -> PooledModel:
+        """
+        从实例池获取模型（不存在或配置已更新时才提取参数并调用模型工厂函数）
+
+        hold=True 时持有实例（会话、请求期间），用完后调用 model_pool.release
+        """
+        return self.model_pool.acquire(
+            vendor,
+            model_name,
+            create=lambda: self.call_model(
+                vendor,
+                self._compose_params(self._extract_key(vendor), self._extract_params(vendor, model_name))
+            ),
+            version=self.config_store.version,
+            hold=hold
+        )
+
+    def _session_model(self, entry: PooledModel):
+        """为会话生成模型副本（共享tokenizer，参数独立），并应用全局工具列表"""
+        model = entry.model.fork()
+        if self._tools is not None:
+            model.set_tools(self._tools)
+        return model
+
     def _extract_params(self, vendor: str, model_name: str) -> Dict[str, Any]:
         """
         从配置文件中提取模型参数
 
-        从 role/config.json 中读取指定供应商和模型的配置参数。
+        从 config_store 的当前快照中查询 role/config.json 里指定供应商和模型的配置参数，
+        不读取磁盘。
 
         参数:
             vendor: 供应商名称（如 "deepseek", "qwen"）
@@ -148,30 +905,14 @@ class AIFactory:
                 }
             }
         """
-        # 获取当前文件所在目录，确保路径正确
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        config_path = os.path.join(script_dir, "role", "config.json")
-        
-        if not os.path.isfile(config_path):
-            raise FileNotFoundError(f"配置文件未找到: {config_path}")
-
-        with open(config_path, "r", encoding="utf-8") as f:
-            config = json.load(f)
-
-        vendor_dict = config.get(vendor)
-        if vendor_dict is None or not isinstance(vendor_dict, dict):
-            raise ValueError(f"在配置文件中未找到供应商 '{vendor}' 的配置")
-
-        params = vendor_dict.get(model_name)
-        if params is None:
-            raise ValueError(f"在供应商 '{vendor}' 的配置下未找到模型 '{model_name}' 的参数")
-        return params
+        return self.config_store.get_model_params(vendor, model_name)
 
     def _extract_key(self, vendor: str) -> str:
         """
         从配置文件中提取API密钥
 
-        从 role/secret_key.json 中读取指定供应商的API密钥。
+        从 config_store 的当前快照中查询 role/secret_key.json 里指定供应商的API密钥，
+        不读取磁盘。
 
         参数:
             vendor: 供应商名称（如 "deepseek", "qwen"）
@@ -183,20 +924,7 @@ class AIFactory:
             FileNotFoundError: 配置文件不存在
             ValueError: 供应商配置无效
         """
-        # 获取当前文件所在目录，确保路径正确
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        config_path = os.path.join(script_dir, "role", "secret_key.json")
-        
-        if not os.path.isfile(config_path):
-            raise FileNotFoundError(f"配置文件未找到: {config_path}")
-
-        with open(config_path, "r", encoding="utf-8") as f:
-            config = json.load(f)
-
-        api_key = config.get(vendor)
-        if api_key is None:
-            raise ValueError(f"在配置文件中未找到供应商 '{vendor}' 的密钥")
-        return api_key
+        return self.config_store.get_key(vendor)
 
     def _compose_params(self, key: str, params: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -252,40 +980,69 @@ class AIFactory:
         else:
             raise ValueError(f"不支持的供应商: {vendor}")
 
-    def callback(self, problem: str, role: str = "user") -> Generator[dict, None, None]:
+    async def callback(
+        self,
+        session_id: str,
+        problem: str,
+        role: str = "user"
+    ) -> AsyncGenerator[dict, None]:
         """
         AI模型流式输出回调函数
 
-        封装 ai_client.send_stream，以生成器方式逐块输出内容。
+        按会话ID路由到对应的客户端（不存在时使用默认模型新建会话），
+        封装 send_stream，以异步生成器方式逐块输出内容。
+        同一会话的请求串行执行，不同会话之间并发。
 
         参数:
+            session_id: 会话ID
             problem: 用户输入的消息
             role: 消息角色，可选值为 "user" 或 "system"，默认为 "user"
 
         返回:
-            生成器，逐块yield输出的内容和类型
+            异步生成器，逐块yield输出的内容和类型
 
         异常:
             RuntimeError: AI模型客户端未连接
 
         示例:
-            >>> for chunk in factory.callback("你好"):
-            ...     print(chunk, end="", flush=True)
+            >>> async for chunk in factory.callback("user-1", "你好"):
+            ...     print(chunk)
         """
-        if not self.ai_client:
-            raise RuntimeError("AI模型客户端未连接")
-        for chunk in self.ai_client.send_stream(problem, role):
-            yield chunk
+        session = self._sessions.get(session_id)
+        if session is None:
+            self.open_session(session_id)
+            session = self._sessions[session_id]
+
+        async with session.lock:
+            session.last_active = time.time()
+            try:
+                async for chunk in session.client.send_stream(problem, role):
+                    yield chunk
+            except Exception as e:
+                self.router.record_failure(session.vendor, session.model_name, e)
+                raise
+            else:
+                self.router.record_success(session.vendor, session.model_name, session.client.last_stream_stats, session.client.last_usage)
+            finally:
+                session.last_active = time.time()
 
-    def add_tools(self, tools: list) -> None:
+    def add_tools(self, tools: list, session_id: Optional[str] = None) -> None:
         """
         为AI模型添加工具列表
 
         参数:
             tools: 工具列表，符合OpenAI Function Calling格式
+            session_id: 只设置指定会话；为 None 时设置所有会话，之后新建的会话也会使用该列表
         异常:
             RuntimeError: AI模型未连接
+            ValueError: 会话不存在
         """
-        if not self.ai:
+        if session_id is not None:
+            self.get_session(session_id).set_tools(tools)
+            return
+
+        if not self._sessions:
             raise RuntimeError("AI模型未连接")
-        self.ai.set_tools(tools)
\ No newline at end of file
+        for session in self._sessions.values():
+            session.client.set_tools(tools)
+        self._tools = tools
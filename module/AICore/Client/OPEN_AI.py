@@ -1,10 +1,21 @@
 # -*- coding: utf-8 -*-
 # from openai import OpenAI
 import os
+import asyncio
 from ..Historyfile.HistoryManager import HistHistoryManager
 from ..Model.base_model import BaseModel
+from ..Tool.StreamMetrics import StreamTimer
+from ..Tool.StreamBuffer import StreamBuffer
+from ..Tool.PromptCache import PromptCacheStats
+from ..Tool.RequestScheduler import PRIORITY_CLASSES, RequestPreempted
 from logger import logger
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI, RateLimitError
+
+# 前缀缓存模式下历史裁剪的水位线（一次裁剪到 maxtoken 的75%）
+PROMPT_CACHE_TRIM_WATERMARK = 0.75
+
+# 配置了速率限制时，429 后由限速器按 Retry-After 等待并重试的次数
+RATE_LIMIT_RETRIES = 3
 
 # OPEN_AI 类
 class OPEN_AI:
@@ -18,7 +29,11 @@ class OPEN_AI:
             model: BaseModel,  # BaseModel子类实例，提供所有模型特定的方法
             system_prompt: str,  # 系统提示词
             user_name: str = None,  # 预留：用户名（用户历史管理）
-            user_level: int = 0  # 预留：用户等级（VIP/MCP服务/工具权限）
+            user_level: int = 0,  # 预留：用户等级（VIP/MCP服务/工具权限）
+            stream_policy: str = "block",  # 流式背压策略（block / coalesce / drop）
+            stream_buffer_size: int = 64,  # 每个流最多缓存的帧数
+            client: OpenAI = None,  # 共享的同步客户端（来自模型实例池），None 时新建
+            async_client: AsyncOpenAI = None  # 共享的异步客户端（来自模型实例池），None 时新建
         ):
         # 数据验证
         if not isinstance(model, BaseModel):
@@ -36,7 +51,14 @@ class OPEN_AI:
         self._user_level = user_level
 
         # 创建客户端（使用模型的gen_params方法获取连接参数）
-        self._client = OpenAI(**self._model.gen_params())
+        # 同步客户端用于文件上传，异步客户端用于流式请求（不阻塞事件循环）
+        # 传入共享客户端时复用其连接池
+        self._client = client if client is not None else OpenAI(**self._model.gen_params())
+        self._async_client = async_client if async_client is not None else AsyncOpenAI(**self._model.gen_params())
+
+        # 流式背压策略（见 set_stream_policy）
+        self._stream_policy = {}
+        self.set_stream_policy(stream_policy, stream_buffer_size)
 
         # 创建历史记录管理器
         self._history = HistHistoryManager(
@@ -46,6 +68,87 @@ class OPEN_AI:
             maxtoken=self._model.max_tokens
         )
 
+        # 最近一次流式请求的延迟摘要（见 StreamTimer.finish）
+        self.last_stream_stats = None
+
+        # 最近一次流式请求的 usage 字段
+        self.last_usage = None
+
+        # 本会话的前缀缓存统计
+        self.prompt_cache_stats = PromptCacheStats()
+
+        # 请求调度参数（见 set_schedule）
+        self._schedule = {"priority": "default", "tenant": user_name or "default", "deadline": None, "preemptible": None}
+
+    #  ================ 切换模型 ================
+    def rebind_model(
+            self,
+            model: BaseModel,
+            client: OpenAI = None,
+            async_client: AsyncOpenAI = None,
+            keep_history: bool = False
+        ):
+        """
+        切换到另一个模型实例（复用已初始化的模型和客户端）
+
+        参数:
+            model: 新的模型实例
+            client: 新模型的同步客户端，None 时新建
+            async_client: 新模型的异步客户端，None 时新建
+            keep_history: True 时保留当前对话历史（按新模型的tokenizer重新计数，超出上限时从头裁剪），
+                          False 时清空历史
+
+        异常:
+            ValueError: model 不是 BaseModel 实例，或 system_prompt 超过新模型的token上限
+        """
+        if not isinstance(model, BaseModel):
+            raise ValueError("model 必须是 BaseModel 的子类实例")
+
+        if keep_history:
+            self._history.rebind(model.token_callback, model.max_tokens)
+        else:
+            self._history = HistHistoryManager(
+                messages=[],
+                system_prompt=self._history.system_prompt,
+                token_callback=model.token_callback,
+                maxtoken=model.max_tokens
+            )
+
+        self._model = model
+        self._client = client if client is not None else OpenAI(**model.gen_params())
+        self._async_client = async_client if async_client is not None else AsyncOpenAI(**model.gen_params())
+
+        # 换模型后请求前缀必然变化，重新开始统计
+        self.prompt_cache_stats = PromptCacheStats()
+
+    def fork(self, model: BaseModel, client: OpenAI = None, async_client: AsyncOpenAI = None) -> "OPEN_AI":
+        """
+        生成使用另一个模型、带有当前历史副本的临时客户端（如多模型并发请求）
+
+        副本上的对话不会写回本客户端的历史。
+
+        参数:
+            model: 临时客户端使用的模型实例
+            client: 同步客户端，None 时新建
+            async_client: 异步客户端，None 时新建
+
+        返回:
+            OPEN_AI: 临时客户端
+        """
+        other = OPEN_AI(
+            model=model,
+            system_prompt=self._history.system_prompt,
+            user_name=self._user_name,
+            user_level=self._user_level,
+            client=client,
+            async_client=async_client
+        )
+        other._stream_policy = dict(self._stream_policy)
+        other._schedule = dict(self._schedule)
+        other._history = self._history.clone()
+        other._history.rebind(model.token_callback, model.max_tokens)
+        return other
+
     #  ================ 上传文件 ================
     def upload_file(self, file_path: str, purpose: str = "assistants"):
         """
@@ -195,20 +298,32 @@ class OPEN_AI:
 
         return problem, role
 
-    def _process_stream_chunk(self, chunk) -> dict:
+    def _chunk_to_dict(self, chunk) -> dict:
         """
-        处理单个流式chunk
+        将OpenAI返回的chunk对象转换为dict
 
         参数:
             chunk: OpenAI返回的chunk对象
 
         返回:
-            dict: 处理后的结果字典，如 {"content": "..."} 或 {"thinking": "..."} 或 {"None": None}
+            dict: chunk对应的字典，转换失败时返回 None
         """
-        # 将chunk转换为dict
         try:
-            chunk_dict = chunk.model_dump() if hasattr(chunk, 'model_dump') else chunk.dict()
+            return chunk.model_dump() if hasattr(chunk, 'model_dump') else chunk.dict()
         except:
+            return None
+
+    def _process_stream_chunk(self, chunk_dict: dict) -> dict:
+        """
+        处理单个流式chunk
+
+        参数:
+            chunk_dict: chunk转换后的字典（见 _chunk_to_dict）
+
+        返回:
+            dict: 处理后的结果字典，如 {"content": "..."} 或 {"thinking": "..."} 或 {"None": None}
+        """
+        if chunk_dict is None:
             return {"None": None}
 
         # 使用模型方法判断是否结束
@@ -228,6 +343,25 @@ class OPEN_AI:
             logger.warning(f"提取流式内容时发生错误: {e}")
             return {"None": None}
 
+    def _finish_stream_timer(self, timer: StreamTimer, usage: dict, content: str, thinking: str) -> None:
+        """
+        结束计时并保存本次请求的延迟摘要
+
+        参数:
+            timer: 本次请求的计时器
+            usage: 流中返回的 usage 字段（可能为 None）
+            content: 累积的回复内容
+            thinking: 累积的思考内容
+        """
+        try:
+            # 优先使用供应商返回的 completion_tokens，否则用本地tokenizer估算
+            output_tokens = (usage or {}).get("completion_tokens") or 0
+            if not output_tokens:
+                output_tokens = self._model.token_callback(content) + self._model.token_callback(thinking)
+            self.last_stream_stats = timer.finish(output_tokens)
+        except Exception as e:
+            logger.warning(f"记录流式延迟统计失败: {e}")
+
     async def _save_response_to_history(self, content: str, thinking: str = None):
         """
         保存响应到历史记录
@@ -242,11 +376,173 @@ class OPEN_AI:
             logger.warning(f"保存 AI 回答到历史记录失败: {e}")
 
 
+    async def _read_stream(self, request_params: dict, buffer: StreamBuffer, timer: StreamTimer, state: dict):
+        """
+        读取流式响应并写入缓冲区（在独立任务中运行）
+
+        读取与消费解耦：消费者过慢时由缓冲区的背压策略决定暂停读取、合并帧或丢弃消费者。
+        配置了速率限制时先在账户的调度器中排队（见 set_schedule），还没有输出时被抢占会重新排队。
+
+        参数:
+            request_params: 流式请求参数
+            buffer: 本次流的缓冲区
+            timer: 本次请求的计时器
+            state: 累积结果，包含 content / thinking / tool_calls / usage / prompt_tokens
+        """
+        scheduler = self._model.get_scheduler()
+        try:
+            while True:
+                ticket = None
+                if scheduler is not None:
+                    ticket = await scheduler.acquire(cost=max(1, state["prompt_tokens"]), **self._schedule)
+                try:
+                    await self._stream_once(request_params, buffer, timer, state, ticket)
+                    break
+                except RequestPreempted:
+                    if state["content"] or state["thinking"] or state["tool_calls"]:
+                        raise
+                    logger.info(f"{self._schedule['priority']} 请求在发出前被抢占，重新排队")
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await buffer.close(e)
+            return
+
+        await buffer.close()
+
+    async def _stream_once(self, request_params: dict, buffer: StreamBuffer, timer: StreamTimer, state: dict, ticket):
+        """
+        发送一次流式请求并读取到结束（ticket 为调度凭证，None 表示不经过调度器）
+
+        异常:
+            RequestPreempted: 被更高优先级的请求抢占
+        """
+        stream = None
+        permit = None
+        try:
+            # 等待速率限制额度（只挂起当前协程），按输入token估算值预扣 TPM
+            limiter = self._model.get_rate_limiter()
+            attempt = 0
+            while True:
+                if limiter is not None:
+                    permit = await limiter.acquire(state["prompt_tokens"])
+                if ticket is not None:
+                    ticket.mark_started()
+                try:
+                    stream = await self._create_stream(limiter, request_params)
+                    break
+                except RateLimitError as e:
+                    # 429：通知限速器降低速率并暂停，重新排队后重试
+                    if limiter is None or attempt >= RATE_LIMIT_RETRIES:
+                        raise
+                    attempt += 1
+                    limiter.on_throttled(e.response.headers if e.response is not None else None)
+                    permit.release(0)
+                    permit = None
+
+            # 遍历流式响应
+            async for chunk in stream:
+                chunk_dict = self._chunk_to_dict(chunk)
+                if chunk_dict is not None and chunk_dict.get("usage"):
+                    state["usage"] = chunk_dict["usage"]
+
+                # 使用私有方法处理chunk
+                result_dict = self._process_stream_chunk(chunk_dict)
+
+                # 检查是否结束
+                if result_dict.get("end"):
+                    timer.on_chunk()
+                    break
+
+                # 提取类型和数据
+                data_type = list(result_dict.keys())[0] if result_dict else "None"
+                content = result_dict.get(data_type)
+
+                # 如果提取的内容为空或None，跳过
+                if content is None or content == "" or data_type == "None":
+                    timer.on_chunk()
+                    continue
+
+                timer.on_chunk(data_type)
+
+                # 分别累积 content 和 thinking
+                if data_type == "content":
+                    if not isinstance(content, str):
+                        content = str(content)
+                    state["content"] += content
+                elif data_type == "thinking":
+                    if not isinstance(content, str):
+                        content = str(content)
+                    state["thinking"] += content
+                elif data_type == "tool_calls":
+                    state["tool_calls"].extend(content)
+
+                # 写入缓冲区，消费者已被丢弃时停止读取
+                if not await buffer.put(result_dict):
+                    logger.warning(f"流式消费者过慢，已丢弃（策略: {buffer.policy}）")
+                    break
+
+        except asyncio.CancelledError:
+            if ticket is not None and ticket.absorb_preemption():
+                raise RequestPreempted(f"{ticket.priority} 请求被更高优先级的请求抢占") from None
+            raise
+        finally:
+            if stream is not None:
+                try:
+                    await stream.close()
+                except Exception:
+                    pass
+            # 归还并发名额，按 usage 校正 TPM 预扣值
+            if permit is not None:
+                permit.release((state["usage"] or {}).get("total_tokens"))
+            if ticket is not None:
+                ticket.release()
+
+    async def _create_stream(self, limiter, request_params: dict):
+        """
+        发起流式请求
+
+        配置了速率限制时关闭 SDK 自带的重试（429 交给限速器处理），
+        并读取原始响应头，把其中的限速信息交给限速器。
+        """
+        if limiter is None:
+            return await self._async_client.chat.completions.create(**request_params)
+
+        client = self._async_client
+        if hasattr(client, "with_options"):
+            client = client.with_options(max_retries=0)
+        raw_api = getattr(client.chat.completions, "with_raw_response", None)
+        if raw_api is None:
+            return await client.chat.completions.create(**request_params)
+        raw = await raw_api.create(**request_params)
+        limiter.on_response(raw.headers)
+        return raw.parse()
+
+    def _record_usage(self, usage: dict) -> None:
+        """
+        保存 usage 并统计前缀缓存命中
+
+        参数:
+            usage: 流中返回的 usage 字段（可能为 None）
+        """
+        self.last_usage = usage
+        if not usage:
+            return
+        try:
+            cache_usage = self._model.extract_cache_usage(usage)
+            self.prompt_cache_stats.record_usage(cache_usage["prompt_tokens"], cache_usage["cached_tokens"])
+        except Exception as e:
+            logger.warning(f"统计前缀缓存用量失败: {e}")
+
     #  ================ 发送请求 （流式）================
     async def send_stream(self, problem: str, role: str = "user"):
         """
         发送消息到 OpenAI API 并获取流式回答
 
+        网络读取在独立任务中进行，通过有界缓冲区（StreamBuffer）交给消费者，
+        背压策略见 set_stream_policy。
+
         参数:
             problem: 消息内容（字符串）
             role: 消息角色，可选值：
@@ -255,15 +551,21 @@ class OPEN_AI:
                 - "assistant": 助手消息（特殊场景）
 
         返回:
-            生成器（Generator），每次 yield 返回一个 content 片段（字符串） 和 类型（content或tool_calls）
+            异步生成器，每次 yield 一个结果字典，如 {"content": "..."}、{"thinking": "..."} 或 {"tool_calls": [...]}
+
+        异常:
+            RuntimeError: 请求失败，或消费者过慢被丢弃（drop 策略）
 
         示例用法:
-            for chunk in client.send_stream("你好"):
+            async for chunk in client.send_stream("你好"):
                 print(chunk, end="", flush=True)
         """
         # 验证输入参数
         problem, role = self._validate_message_params(problem, role)
 
+        # 前缀缓存模式下一次裁剪较多历史，避免每轮都改动开头的消息
+        self._history.set_trim_watermark(PROMPT_CACHE_TRIM_WATERMARK if self._model.prompt_cache else None)
+
         # 先保存消息到历史（使用指定的角色）
         try:
             # 如果是工具结果且已有思考记录，插入空占位
@@ -284,61 +586,82 @@ class OPEN_AI:
         except Exception as e:
             raise RuntimeError(f"获取流式请求参数时发生错误: {e}")
 
+        # 检查请求前缀是否与上一轮一致
+        if self._model.prompt_cache and not self.prompt_cache_stats.observe_request(request_params):
+            logger.debug("请求前缀与上一轮不一致，本轮无法完整命中前缀缓存")
+
         # 累积完整响应内容，用于最后保存到历史
         # 分离 content 和 thinking 的累积
-        full_response = ""  # 普通回复内容
-        full_thinking = ""  # 思考过程内容
-        full_tool_calls = []  # 工具调用累积
+        state = {
+            "content": "",  # 普通回复内容
+            "thinking": "",  # 思考过程内容
+            "tool_calls": [],  # 工具调用累积
+            "usage": None,  # 流中返回的 usage 字段
+            "prompt_tokens": self._history.total_tokens,  # 输入token估算值（速率限制预扣）
+        }
 
-        try:
-            # 调用 chat.completions.create 获取流式响应
-            stream = self._client.chat.completions.create(**request_params)
+        # 延迟计时（按供应商 + 模型记录）
+        timer = StreamTimer(self._model.vendor, self._model.model)
 
-            # 遍历流式响应
-            for chunk in stream:
-                # 使用私有方法处理chunk
-                result_dict = self._process_stream_chunk(chunk)
+        # 每个流独立的有界缓冲区
+        buffer = StreamBuffer(**self._stream_policy)
+        reader = asyncio.create_task(self._read_stream(request_params, buffer, timer, state))
 
-                # 检查是否结束
-                if result_dict.get("end"):
+        try:
+            while True:
+                frame = await buffer.get()
+                if frame is None:
                     break
-
-                # 提取类型和数据
-                data_type = list(result_dict.keys())[0] if result_dict else "None"
-                content = result_dict.get(data_type)
-
-                # 如果提取的内容为空或None，跳过
-                if content is None or content == "" or data_type == "None":
-                    continue
-
-                # 分别累积 content 和 thinking
-                if data_type == "content":
-                    if not isinstance(content, str):
-                        content = str(content)
-                    full_response += content
-                elif data_type == "thinking":
-                    if not isinstance(content, str):
-                        content = str(content)
-                    full_thinking += content
-                elif data_type == "tool_calls":
-                    full_tool_calls.extend(content)
-
                 # yield 当前片段（字典格式）
-                yield result_dict
+                yield frame
 
         except Exception as e:
-            # 如果出现错误，尝试保存已经获取的部分响应
-            await self._save_response_to_history(full_response, full_thinking)
             raise RuntimeError(f"调用 OpenAI API 流式接口时发生错误: {e}")
 
         finally:
-            # 保存完整的 AI 回答到历史
-            await self._save_response_to_history(full_response, full_thinking)
+            # 消费者提前退出时停止读取
+            if not reader.done():
+                reader.cancel()
+                try:
+                    await reader
+                except asyncio.CancelledError:
+                    pass
+
+            # 记录延迟统计和 usage
+            self._finish_stream_timer(timer, state["usage"], state["content"], state["thinking"])
+            self._record_usage(state["usage"])
+
+            # 保存完整的 AI 回答到历史（出错时保存已经获取的部分响应）
+            await self._save_response_to_history(state["content"], state["thinking"])
 
             # 如果没有工具调用，清除思考内容（释放token）
-            if not full_tool_calls:
+            if not state["tool_calls"]:
                 self._history.clear_think()
 
+    async def record_turn(self, problem: str, role: str, content: str, thinking: str = "", tool_calls: list = None):
+        """
+        把一轮在其他客户端上完成的问答写入本客户端的历史（如多模型并发时选中的回答）
+
+        参数:
+            problem: 消息内容
+            role: 消息角色
+            content: 回复内容
+            thinking: 思考过程内容
+            tool_calls: 工具调用（为空时清除思考内容，与 send_stream 一致）
+        """
+        problem, role = self._validate_message_params(problem, role)
+        try:
+            if role == "system" and len(self._history.think_token_counts) > 0:
+                await self._history.write(role, problem, think_content="")
+            else:
+                await self._history.write(role, problem)
+        except Exception as e:
+            logger.warning(f"保存消息到历史记录失败: {e}")
+
+        await self._save_response_to_history(content, thinking)
+        if not tool_calls:
+            self._history.clear_think()
+
     #  ================ 预留接口 ================
     def _on_token_usage(self, tokens: int):
         """
@@ -366,6 +689,7 @@ class OPEN_AI:
             "tools": self._model.tools,
             "tool_choice": self._model.tool_choice,
             "logprobs": self._model.logprobs,
+            "prompt_cache": self._model.prompt_cache,
         }
 
     def set_params(self, params: dict):
@@ -382,6 +706,7 @@ class OPEN_AI:
                 - stop: 停止词
                 - response_format: 响应格式
                 - logprobs: 是否返回log概率
+                - prompt_cache: 是否生成字节稳定的请求前缀（配合供应商的前缀缓存）
 
         异常:
             TypeError: params 不是字典类型
@@ -400,6 +725,7 @@ class OPEN_AI:
             "stop": self._model.set_stop,
             "response_format": self._model.set_response_format,
             "logprobs": self._model.set_logprobs,
+            "prompt_cache": self._model.set_prompt_cache,
         }
 
         # 遍历参数并调用对应的 setter
@@ -409,6 +735,80 @@ class OPEN_AI:
             else:
                 logger.warning(f"未知参数: {key}，已忽略")
 
+    def set_stream_policy(
+            self,
+            policy: str,
+            buffer_size: int = 64,
+            max_frame_chars: int = 8192,
+            drop_timeout: float = 5.0
+        ):
+        """
+        设置流式背压策略
+
+        参数:
+            policy: 消费者过慢时的处理方式
+                - "block": 暂停读取上游，直到消费者跟上（默认）
+                - "coalesce": 把连续的文本增量合并成更大的帧，合并帧达到上限后暂停读取
+                - "drop": 等待 drop_timeout 秒后丢弃该消费者，send_stream 抛出 RuntimeError
+            buffer_size: 每个流最多缓存的帧数
+            max_frame_chars: coalesce 策略下单个合并帧的最大字符数
+            drop_timeout: drop 策略下队列满时最多等待的秒数
+
+        异常:
+            ValueError: 参数值无效
+        """
+        if policy not in StreamBuffer.POLICIES:
+            raise ValueError(f"policy 必须是 {StreamBuffer.POLICIES} 之一，当前值为: {policy}")
+        if not isinstance(buffer_size, int) or buffer_size <= 0:
+            raise ValueError("buffer_size 必须是大于0的整数")
+        if max_frame_chars <= 0:
+            raise ValueError("max_frame_chars 必须大于0")
+        if drop_timeout < 0:
+            raise ValueError("drop_timeout 不能为负数")
+
+        self._stream_policy = {
+            "max_frames": buffer_size,
+            "policy": policy,
+            "max_frame_chars": max_frame_chars,
+            "drop_timeout": drop_timeout,
+        }
+
+    def set_schedule(
+            self,
+            priority: str = None,
+            tenant: str = None,
+            deadline: float = None,
+            preemptible: bool = None
+        ):
+        """
+        设置请求调度参数（只在模型配置了速率限制时生效，见 RequestScheduler）
+
+        参数:
+            priority: 优先级，interactive / default / batch，None 表示不修改
+            tenant: 租户（同一优先级内按租户公平分配额度），None 表示不修改
+            deadline: 最多排队的秒数，超过后请求被丢弃（send_stream 抛出 RuntimeError），0 表示不限
+            preemptible: 是否可被抢占，None 表示不修改（默认 batch 可被抢占，见 reset_preemptible）
+
+        异常:
+            ValueError: 参数值无效
+        """
+        if priority is not None:
+            if priority not in PRIORITY_CLASSES:
+                raise ValueError(f"priority 必须是 {PRIORITY_CLASSES} 之一，当前值为: {priority}")
+            self._schedule["priority"] = priority
+        if tenant is not None:
+            self._schedule["tenant"] = tenant
+        if deadline is not None:
+            if deadline < 0:
+                raise ValueError("deadline 不能为负数")
+            self._schedule["deadline"] = deadline or None
+        if preemptible is not None:
+            self._schedule["preemptible"] = preemptible
+
+    def reset_preemptible(self):
+        """恢复按优先级决定是否可被抢占（batch 可被抢占），撤销 set_schedule 中设置的 preemptible"""
+        self._schedule["preemptible"] = None
+
     #  ================ 工具设置接口 ================
     def set_tools(self, tools: list):
         """
@@ -83,6 +83,10 @@ class HistHistoryManager:
         # 从后往前与消息数组对齐
         self.think_token_counts: list[int] = []
 
+        # 裁剪水位线：为None时只裁剪到刚好放得下新消息；
+        # 设置后（0-1之间）一次裁剪到 maxtoken * 水位线，之后多轮对话不再改动开头的消息（利于前缀缓存）
+        self.trim_watermark: float = None
+
     @property
     def maxtoken(self) -> int:
         """最大token限制（只读）"""
@@ -90,7 +94,104 @@ class HistHistoryManager:
 
     def read(self):
         return self.messages
-    
+
+    def set_trim_watermark(self, watermark: float = None) -> None:
+        """
+        设置裁剪水位线
+
+        参数:
+            watermark: 0-1之间的比例，None 表示关闭（只裁剪到刚好放得下新消息）
+        """
+        if watermark is not None and not 0 < watermark <= 1:
+            raise ValueError("watermark 必须在 0-1 之间")
+        self.trim_watermark = watermark
+
+    def clone(self) -> "HistHistoryManager":
+        """
+        复制当前历史（消息字典逐条复制，修改副本不影响原历史）
+
+        返回:
+            HistHistoryManager: 新的历史管理器
+        """
+        other = HistHistoryManager(
+            messages=[dict(msg) for msg in self.messages],
+            system_prompt=self.system_prompt,
+            token_callback=self.token_callback,
+            maxtoken=self._maxtoken
+        )
+        other.token_counts = list(self.token_counts)
+        other.total_tokens = self.total_tokens
+        other.think_token_counts = list(self.think_token_counts)
+        other.trim_watermark = self.trim_watermark
+        return other
+
+    def rebind(self, token_callback: Callable[[str], int], maxtoken: int) -> None:
+        """
+        切换到另一个模型的tokenizer和token上限（保留历史消息）
+
+        用新的token_callback重新计算所有消息的token数，超过新上限时从头裁剪。
+
+        参数:
+            token_callback: 新模型的token计算回调
+            maxtoken: 新模型的最大token限制
+
+        异常:
+            ValueError: system_prompt 超过新的token上限
+        """
+        if not callable(token_callback):
+            raise TypeError("token_callback 必须是可调用对象")
+        if not isinstance(maxtoken, int) or maxtoken <= 0:
+            raise ValueError("maxtoken 必须是大于 0 的整数")
+
+        prompt_tokens = token_callback(self.system_prompt)
+        if prompt_tokens > maxtoken:
+            raise ValueError(f"system_prompt 的 token 数({prompt_tokens})超过最大限制({maxtoken})")
+
+        # 思考token与消息从后往前对齐
+        think_start = len(self.messages) - len(self.think_token_counts)
+        token_counts = [prompt_tokens]
+        think_token_counts = []
+        for index, msg in enumerate(self.messages):
+            tokens = token_callback(msg.get("content") or "")
+            if index >= think_start:
+                think_tokens = token_callback(msg.get("reasoning_content") or "")
+                think_token_counts.append(think_tokens)
+                tokens += think_tokens
+            token_counts.append(tokens)
+
+        self.token_callback = token_callback
+        self._maxtoken = maxtoken
+        self.token_counts = token_counts
+        self.think_token_counts = think_token_counts
+        self.total_tokens = sum(token_counts)
+
+        # 新上限更小时从头裁剪（裁剪掉的消息里如果有思考内容，同步去掉对应的思考计数）
+        if self.total_tokens > maxtoken:
+            before = len(self.messages)
+            if not self._trim_to(maxtoken):
+                self.clear()
+                return
+            removed = before - len(self.messages)
+            overlap = removed - think_start
+            if overlap > 0:
+                self.think_token_counts = self.think_token_counts[overlap:]
+
+    def _trim_to(self, limit: int) -> bool:
+        """同步版本的裁剪：从头删除消息直到 total_tokens <= limit"""
+        trim_index = 0
+        excess = self.total_tokens - limit
+        for i in range(1, len(self.token_counts)):
+            excess -= self.token_counts[i]
+            trim_index = i
+            if excess <= 0:
+                break
+        if excess > 0:
+            return False
+        self.total_tokens -= sum(self.token_counts[1:trim_index + 1])
+        self.token_counts = [self.token_counts[0]] + self.token_counts[trim_index + 1:]
+        self.messages = self.messages[trim_index:]
+        return True
+
     async def write(self, role: str, message: str, think_content: str = None) -> bool:
         """
         异步写入新消息到历史记录
@@ -127,10 +228,15 @@ class HistHistoryManager:
         # ========== 裁剪判断 ==========
         # 第二步：加上总token，第三步：检查是否超过最大token
         if self.total_tokens + new_token > self.maxtoken:
-            # 第四步：超过则裁剪
-            deficit = self.maxtoken - (self.total_tokens + new_token)
-            if not await self.trim(deficit):
-                return False
+            # 第四步：超过则裁剪（设置了水位线时优先裁剪到水位线，做不到再裁剪到刚好放得下）
+            trimmed = False
+            if self.trim_watermark is not None:
+                watermark_deficit = int(self.maxtoken * self.trim_watermark) - (self.total_tokens + new_token)
+                trimmed = await self.trim(watermark_deficit)
+            if not trimmed:
+                deficit = self.maxtoken - (self.total_tokens + new_token)
+                if not await self.trim(deficit):
+                    return False
 
         # ========== 写入 ==========
         # 第五步：累加token_counts和messages
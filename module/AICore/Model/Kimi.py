@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 # Kimi大模型API封装类（月之暗面 Moonshot AI）
 import os
-import time
 from transformers import AutoTokenizer
 from .base_model import BaseModel
 
@@ -28,11 +27,14 @@ class Kimi(BaseModel):
     - TPM (token per minute)：一分钟内您最多和我们交互的token数
     - TPD (token per day)：一天内您最多和我们交互的token数
 
-    注意：本类默认按Free账户（RPM=3）设置速率限制
-    使用方法：在初始化时传入tier参数，如 Kimi(..., tier="Tier1") 来设置对应的速率限制
+    注意：本类默认按Free账户（并发=1，RPM=3，TPM=32,000）设置速率限制
+    使用方法：在配置中设置tier参数，如 "tier": "Tier1" 来设置对应的速率限制；
+    rate_limit 参数（如 {"rpm": 100}）可以覆盖等级表中的单项额度。
+    限速由异步限速器（Tool/RateLimiter.py）在发送请求前执行，等待时不阻塞事件循环；TPD 暂不限制。
     """
 
     # ================ 配置属性 ================
+    vendor = "kimi"
     _thinking_field = "reasoning_content"
     _tokenizer_type = "transformers"
 
@@ -43,15 +45,17 @@ class Kimi(BaseModel):
         "moonshot-v1-128k": "Qwen/Qwen-7B-Chat",
     }
 
-    # 各等级对应的RPM（每分钟请求数）限制
-    TIER_RPM_LIMITS = {
-        "Free": 3,
-        "Tier1": 200,
-        "Tier2": 500,
-        "Tier3": 5000,
-        "Tier4": 5000,
-        "Tier5": 10000,
+    # 各等级对应的 并发 / RPM（每分钟请求数）/ TPM（每分钟token数）限制
+    TIER_LIMITS = {
+        "Free": {"concurrency": 1, "rpm": 3, "tpm": 32000},
+        "Tier1": {"concurrency": 50, "rpm": 200, "tpm": 128000},
+        "Tier2": {"concurrency": 100, "rpm": 500, "tpm": 128000},
+        "Tier3": {"concurrency": 200, "rpm": 5000, "tpm": 384000},
+        "Tier4": {"concurrency": 400, "rpm": 5000, "tpm": 768000},
+        "Tier5": {"concurrency": 1000, "rpm": 10000, "tpm": 2000000},
     }
+    # 兼容旧名称：各等级的 RPM 限制
+    TIER_RPM_LIMITS = {tier: limits["rpm"] for tier, limits in TIER_LIMITS.items()}
 
     def __init__(self, message: dict):
         """
@@ -70,16 +74,11 @@ class Kimi(BaseModel):
         self.tier = message.get("params").get("tier", "Free")
 
         # 验证tier有效性
-        if self.tier not in self.TIER_RPM_LIMITS:
-            raise ValueError(f"无效的账户等级：{self.tier}，可选值：{list(self.TIER_RPM_LIMITS.keys())}")
+        if self.tier not in self.TIER_LIMITS:
+            raise ValueError(f"无效的账户等级：{self.tier}，可选值：{list(self.TIER_LIMITS.keys())}")
 
-        # 速率限制控制：根据账户等级自动设置RPM限制
-        self.last_request_time = 0
-        rpm_limit = self.TIER_RPM_LIMITS[self.tier]
-        # 计算最小请求间隔（留一点余量，乘以1.05确保不超限）
-        self.min_request_interval = (60.0 / rpm_limit) * 1.05
-
-        print(f"[Kimi初始化] 账户等级：{self.tier}，RPM限制：{rpm_limit}，请求间隔：{self.min_request_interval:.2f}秒")
+        limits = self.TIER_LIMITS[self.tier]
+        print(f"[Kimi初始化] 账户等级：{self.tier}，并发：{limits['concurrency']}，RPM：{limits['rpm']}，TPM：{limits['tpm']}")
 
         # API模型名称到HuggingFace tokenizer路径的映射
         # Kimi使用通用的tokenizer进行近似计算
@@ -116,45 +115,17 @@ class Kimi(BaseModel):
         参数：
             tier: 账户等级，可选值：Free, Tier1, Tier2, Tier3, Tier4, Tier5
         """
-        if tier not in self.TIER_RPM_LIMITS:
-            raise ValueError(f"无效的账户等级：{tier}，可选值：{list(self.TIER_RPM_LIMITS.keys())}")
+        if tier not in self.TIER_LIMITS:
+            raise ValueError(f"无效的账户等级：{tier}，可选值：{list(self.TIER_LIMITS.keys())}")
 
         self.tier = tier
-        rpm_limit = self.TIER_RPM_LIMITS[tier]
-        self.min_request_interval = (60.0 / rpm_limit) * 1.05
-        print(f"[Kimi] 已更新账户等级为：{tier}，RPM限制：{rpm_limit}，请求间隔：{self.min_request_interval:.2f}秒")
-
-    def _wait_for_rate_limit(self):
-        """速率限制等待"""
-        current_time = time.time()
-        time_since_last_request = current_time - self.last_request_time
-
-        if time_since_last_request < self.min_request_interval:
-            wait_time = self.min_request_interval - time_since_last_request
-            print(f"[Kimi速率限制] 等待 {wait_time:.1f} 秒以避免超过API限制...")
-            time.sleep(wait_time)
+        self._rate_limiter = None  # 下次请求时按新等级获取限速器
+        limits = self.TIER_LIMITS[tier]
+        print(f"[Kimi] 已更新账户等级为：{tier}，并发：{limits['concurrency']}，RPM：{limits['rpm']}，TPM：{limits['tpm']}")
 
-        self.last_request_time = time.time()
-
-    #  ============ 生成请求参数 ============
-    def gen_request(self, messages: list):
-        """
-        生成请求参数
-        Kimi API使用标准的OpenAI兼容格式
-        自动处理速率限制：确保请求间隔不少于设定时间
-        """
-        self._wait_for_rate_limit()
-        return super().gen_request(messages)
-
-    #  ============ 生成请求参数(流式) ============
-    def gen_params_stream(self, messages: list):
-        """
-        生成流式请求参数
-        Kimi支持流式输出
-        自动处理速率限制：确保请求间隔不少于设定时间
-        """
-        self._wait_for_rate_limit()
-        return super().gen_params_stream(messages)
+    def default_rate_limit(self) -> dict:
+        """按账户等级返回默认额度"""
+        return dict(self.TIER_LIMITS[self.tier])
 
     #  ============ 提取流式信息数据 ============
     def extract_stream_info(self, stream_options: dict) -> dict:
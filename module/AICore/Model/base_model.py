@@ -9,10 +9,18 @@ BaseModel - AI模型基类
 """
 
 import os
+import copy
 from abc import ABC, abstractmethod
 
+from ..Tool.PromptCache import canonicalize_tools, canonicalize_messages
+from ..Tool.RateLimiter import RATE_LIMIT_FIELDS, rate_limiters
+from ..Tool.RequestScheduler import DEFAULT_SLOTS, request_schedulers
+
 
 class BaseModel(ABC):
+    # ================ 配置属性 ================
+    vendor = "openai"  # 供应商名称（用于统计标签），子类覆盖
+
     def __init__(self, message: dict):
         self.api_key = message.get("key")
         self.base_url = message.get("params").get("base_url")
@@ -38,7 +46,15 @@ class BaseModel(ABC):
         self.tool_choice = message.get("params").get("tool_choice", None)  # 工具选择策略
         self.logprobs = message.get("params").get("logprobs", False)  # 是否返回log概率
         self.top_logprobs = message.get("params").get("top_logprobs", None)  # 返回概率最高的N个token
-        
+
+        # ================ 前缀缓存参数 ================
+        self.prompt_cache = message.get("params").get("prompt_cache", False)  # 是否生成字节稳定的请求前缀
+        self._canonical_tools = None  # 规范化后的工具列表（set_tools时失效）
+
+        # ================ 速率限制参数 ================
+        self.rate_limit = message.get("params").get("rate_limit", None)  # {"rpm", "tpm", "concurrency"}，覆盖 default_rate_limit
+        self._rate_limiter = None  # 按需创建，同一账户的模型共享
+
     def set_api_key(self, api_key: str):
         self.api_key = api_key
 
@@ -106,6 +122,7 @@ class BaseModel(ABC):
 
 
         self.tools = converted_tools
+        self._canonical_tools = None
     
     def set_tool_choice(self, tool_choice):
         """设置工具选择策略"""
@@ -121,6 +138,61 @@ class BaseModel(ABC):
             raise ValueError("top_logprobs 必须在 0-20 之间")
         self.top_logprobs = top_logprobs
 
+    def set_prompt_cache(self, prompt_cache: bool):
+        """设置是否生成字节稳定的请求前缀（配合供应商的前缀缓存）"""
+        if not isinstance(prompt_cache, bool):
+            raise ValueError("prompt_cache 必须是布尔类型")
+        self.prompt_cache = prompt_cache
+
+    #  ============ 速率限制 ============
+    def default_rate_limit(self) -> dict:
+        """默认额度（子类按账户等级覆盖，如 Kimi），返回 {"rpm", "tpm", "concurrency"} 中的若干项"""
+        return {}
+
+    def set_rate_limit(self, rate_limit: dict):
+        """设置额度，如 {"rpm": 3, "tpm": 32000, "concurrency": 1}，None 表示只使用默认额度"""
+        if rate_limit is not None:
+            if not isinstance(rate_limit, dict):
+                raise ValueError("rate_limit 必须是字典类型")
+            unknown = set(rate_limit) - set(RATE_LIMIT_FIELDS)
+            if unknown:
+                raise ValueError(f"rate_limit 包含未知字段: {sorted(unknown)}，可选值: {list(RATE_LIMIT_FIELDS)}")
+        self.rate_limit = rate_limit
+        self._rate_limiter = None
+
+    def get_rate_limiter(self):
+        """
+        获取当前账户的异步限速器（供应商 + 等级 + API密钥 相同的模型共享），没有任何额度时返回 None
+        """
+        if self._rate_limiter is None:
+            limits = dict(self.default_rate_limit())
+            limits.update(self.rate_limit or {})
+            limits = {field: limits.get(field) for field in RATE_LIMIT_FIELDS}
+            if not any(limits.values()):
+                return None
+            scope = rate_limiters.scope(self.vendor, self.api_key, getattr(self, "tier", None))
+            self._rate_limiter = rate_limiters.get(scope, **limits)
+        return self._rate_limiter
+
+    def get_scheduler(self):
+        """
+        获取当前账户的请求调度器（与限速器一一对应，名额数等于并发上限，未设置时为 DEFAULT_SLOTS），没有限速器时返回 None
+        """
+        limiter = self.get_rate_limiter()
+        if limiter is None:
+            return None
+        return request_schedulers.get(limiter.name, slots=limiter.concurrency or DEFAULT_SLOTS)
+
+    #  ============ 会话视图 ============
+    def fork(self):
+        """
+        生成共享重资源的轻量副本
+
+        tokenizer 等属性按引用共享，采样参数、工具列表等通过 set_* 修改时只影响副本，
+        用于多个会话共用同一个已加载的模型实例。
+        """
+        return copy.copy(self)
+
     #  ============ 生成链接参数 ============
     def gen_params(self):
         return {
@@ -132,7 +204,12 @@ class BaseModel(ABC):
         """
         生成请求参数，包含完整的DeepSeek API参数
         会读取和保存对话历史，并生成请求体
+
+        开启 prompt_cache 时改用 _gen_cached_request，保证请求前缀字节稳定
         """
+        if self.prompt_cache:
+            return self._gen_cached_request(messages)
+
         # 基础请求参数
         request_params = {
             "model": self.model,
@@ -171,6 +248,56 @@ class BaseModel(ABC):
 
         return request_params
         
+    #  ============ 生成请求参数(前缀缓存) ============
+    def _gen_cached_request(self, messages: list):
+        """
+        生成前缀稳定的请求参数
+
+        与 gen_request 的区别：
+            - 键的顺序固定：model、tools、tool_choice、采样参数、messages
+            - 工具按名称排序、schema 键排序，只在 set_tools 后重新计算
+            - 消息字段顺序固定，且为副本，之后修改历史记录不会影响已生成的请求
+        """
+        if self._canonical_tools is None and self.tools is not None:
+            self._canonical_tools = canonicalize_tools(self.tools)
+
+        request_params = {"model": self.model}
+
+        if self._canonical_tools is not None:
+            request_params["tools"] = self._canonical_tools
+
+        if self.tool_choice is not None:
+            request_params["tool_choice"] = self.tool_choice
+
+        if self.response_format is not None and self.response_format.get("type") != "text":
+            request_params["response_format"] = self.response_format
+
+        if self.temperature != 1.0:
+            request_params["temperature"] = self.temperature
+
+        if self.top_p != 1.0:
+            request_params["top_p"] = self.top_p
+
+        if self.frequency_penalty != 0.0:
+            request_params["frequency_penalty"] = self.frequency_penalty
+
+        if self.presence_penalty != 0.0:
+            request_params["presence_penalty"] = self.presence_penalty
+
+        if self.stop is not None:
+            request_params["stop"] = self.stop
+
+        if self.logprobs:
+            request_params["logprobs"] = self.logprobs
+
+        if self.top_logprobs is not None:
+            request_params["top_logprobs"] = self.top_logprobs
+
+        # messages 放在最后：变化的部分总在末尾
+        request_params["messages"] = canonicalize_messages(messages)
+
+        return request_params
+
     #  ============ 生成请求参数(流式) ============
     def gen_params_stream(self, messages: list):
         """
@@ -232,4 +359,23 @@ class BaseModel(ABC):
 
         return {"None": None}
 
+    #  ============ 提取前缀缓存用量 ============
+    def extract_cache_usage(self, usage: dict) -> dict:
+        """
+        从 usage 中提取前缀缓存命中情况
+
+        OpenAI 标准格式为 usage.prompt_tokens_details.cached_tokens，
+        部分供应商（如 Kimi）直接放在 usage.cached_tokens。
 
+        返回:
+            dict: {"prompt_tokens": 输入token数, "cached_tokens": 命中缓存的token数}
+        """
+        usage = usage or {}
+        details = usage.get("prompt_tokens_details") or {}
+        cached_tokens = details.get("cached_tokens") if isinstance(details, dict) else None
+        if cached_tokens is None:
+            cached_tokens = usage.get("cached_tokens")
+        return {
+            "prompt_tokens": usage.get("prompt_tokens") or 0,
+            "cached_tokens": cached_tokens or 0,
+        }
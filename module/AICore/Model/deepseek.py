@@ -14,6 +14,9 @@ from .base_model import BaseModel
 
 
 class DeepSeek(BaseModel):
+    # ================ 配置属性 ================
+    vendor = "deepseek"
+
     def __init__(self, message: dict):
         # 调用基类初始化
         super().__init__(message)
@@ -72,3 +75,18 @@ class DeepSeek(BaseModel):
         if not content:
             return 0
         return len(self.tokenizer.encode(content, add_special_tokens=False))
+
+    # ================ 提取前缀缓存用量 ================
+    def extract_cache_usage(self, usage: dict) -> dict:
+        """
+        DeepSeek 在 usage 中单独返回 prompt_cache_hit_tokens / prompt_cache_miss_tokens
+        """
+        usage = usage or {}
+        if "prompt_cache_hit_tokens" not in usage:
+            return super().extract_cache_usage(usage)
+        hit = usage.get("prompt_cache_hit_tokens") or 0
+        miss = usage.get("prompt_cache_miss_tokens") or 0
+        return {
+            "prompt_tokens": usage.get("prompt_tokens") or hit + miss,
+            "cached_tokens": hit,
+        }
@@ -14,6 +14,7 @@ class Doubao(BaseModel):
     """
 
     # 配置属性
+    vendor = "doubao"
     _thinking_field = "reasoning_content"
     _tokenizer_type = "tiktoken"
     _tokenizer_encoding = "cl100k_base"
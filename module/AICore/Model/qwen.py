@@ -6,6 +6,9 @@ from .base_model import BaseModel
 
 
 class Qwen(BaseModel):
+    # ================ 配置属性 ================
+    vendor = "qwen"
+
     def __init__(self, message: dict):
         # 调用基类初始化
         super().__init__(message)
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+自适应限速（AIMD）
+
+根据供应商的反馈调整 AsyncRateLimiter 的实际发送速率，使其贴近账户真实的额度上限：
+
+    - 响应头：x-ratelimit-limit-* 给出真实上限（覆盖配置中的等级表），
+      x-ratelimit-remaining-* 为 0 时暂停到 x-ratelimit-reset-*
+    - 429：按 Retry-After 暂停，发送速率乘以 decrease（乘性减小）
+    - 成功：发送速率每次增加上限的 increase（加性增长），直到恢复到上限
+
+学到的上限和速率系数保存在 JSON 文件中（默认 Data/ratelimit/adaptive_state.json），重启后继续使用。
+
+支持的响应头（OpenAI 兼容格式，上限按每分钟计算）：
+    x-ratelimit-limit-requests / x-ratelimit-remaining-requests / x-ratelimit-reset-requests
+    x-ratelimit-limit-tokens / x-ratelimit-remaining-tokens / x-ratelimit-reset-tokens
+    retry-after（秒或 HTTP 日期）/ retry-after-ms
+"""
+
+import os
+import re
+import json
+import time
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+from logger import logger
+
+
+# 默认的自适应状态文件
+DEFAULT_STATE_PATH = os.path.join(
+    os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..")),
+    "Data", "ratelimit", "adaptive_state.json"
+)
+
+# 429 没有给出 Retry-After 时的暂停时间（秒）
+DEFAULT_RETRY_AFTER = 1.0
+
+_DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: Any) -> Optional[float]:
+    """
+    解析时长（秒），支持纯数字和 "1s"、"6m0s"、"20ms"、"1h2m" 等格式，无法解析时返回 None
+    """
+    if value is None:
+        return None
+    text = str(value).strip()
+    try:
+        return max(0.0, float(text))
+    except ValueError:
+        pass
+    parts = _DURATION_PATTERN.findall(text)
+    if not parts or "".join(number + unit for number, unit in parts) != text:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def parse_retry_after(value: Any) -> Optional[float]:
+    """解析 Retry-After（秒数或 HTTP 日期），返回还需等待的秒数"""
+    seconds = parse_duration(value)
+    if seconds is not None or value is None:
+        return seconds
+    try:
+        return max(0.0, parsedate_to_datetime(str(value)).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_rate_limit_headers(headers: Any) -> Dict[str, float]:
+    """
+    提取限速相关的响应头
+
+    参数:
+        headers: 响应头（dict 或 httpx.Headers）
+
+    返回:
+        dict: limit_requests / remaining_requests / reset_requests / limit_tokens /
+              remaining_tokens / reset_tokens / retry_after 中出现的项（时间单位为秒）
+    """
+    if not headers:
+        return {}
+    lowered = {str(key).lower(): value for key, value in headers.items()}
+    result: Dict[str, float] = {}
+    for kind in ("requests", "tokens"):
+        for field in ("limit", "remaining"):
+            value = lowered.get(f"x-ratelimit-{field}-{kind}")
+            try:
+                if value is not None:
+                    result[f"{field}_{kind}"] = int(float(value))
+            except ValueError:
+                pass
+        reset = parse_duration(lowered.get(f"x-ratelimit-reset-{kind}"))
+        if reset is not None:
+            result[f"reset_{kind}"] = reset
+
+    retry_after_ms = lowered.get("retry-after-ms")
+    if retry_after_ms is not None and parse_duration(retry_after_ms) is not None:
+        result["retry_after"] = parse_duration(retry_after_ms) / 1000.0
+    else:
+        retry_after = parse_retry_after(lowered.get("retry-after"))
+        if retry_after is not None:
+            result["retry_after"] = retry_after
+    return result
+
+
+class AIMDController:
+    """
+    AIMD 速率系数
+
+    实际速率 = 上限 × factor，上限优先使用从响应头（或 429 时的实际速率）学到的值，其次是配置值。
+
+    属性:
+        factor: 速率系数，范围 [min_factor, 1]
+        increase: 每次成功增加的系数
+        decrease: 每次被限流时乘以的系数
+        min_factor: 系数下限
+        learned: 学到的上限，{"rpm": ..., "tpm": ...}
+        throttles: 被限流次数
+    """
+
+    __slots__ = ("factor", "increase", "decrease", "min_factor", "learned", "throttles")
+
+    def __init__(self, increase: float = 0.02, decrease: float = 0.5, min_factor: float = 0.05):
+        if not 0 < increase <= 1:
+            raise ValueError("increase 必须在 (0, 1] 之间")
+        if not 0 < decrease < 1:
+            raise ValueError("decrease 必须在 (0, 1) 之间")
+        if not 0 < min_factor <= 1:
+            raise ValueError("min_factor 必须在 (0, 1] 之间")
+        self.factor = 1.0
+        self.increase = increase
+        self.decrease = decrease
+        self.min_factor = min_factor
+        self.learned: Dict[str, int] = {}
+        self.throttles = 0
+
+    def learn(self, info: Dict[str, float]) -> bool:
+        """
+        从响应头学习真实上限
+
+        返回:
+            bool: 上限是否变化
+        """
+        changed = False
+        for kind, header in (("rpm", "limit_requests"), ("tpm", "limit_tokens")):
+            limit = info.get(header)
+            if limit and limit > 0 and self.learned.get(kind) != limit:
+                self.learned[kind] = int(limit)
+                changed = True
+        return changed
+
+    def on_success(self) -> bool:
+        """
+        加性增长
+
+        返回:
+            bool: 系数是否变化
+        """
+        if self.factor >= 1.0:
+            return False
+        self.factor = min(1.0, self.factor + self.increase)
+        return True
+
+    def on_throttle(self) -> None:
+        """乘性减小"""
+        self.throttles += 1
+        self.factor = max(self.min_factor, self.factor * self.decrease)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"factor": self.factor, "learned": dict(self.learned), "throttles": self.throttles, "updated": time.time()}
+
+    def restore(self, data: Dict[str, Any]) -> None:
+        """恢复保存的状态（忽略无效的值）"""
+        try:
+            self.factor = min(1.0, max(self.min_factor, float(data.get("factor", 1.0))))
+            self.learned = {kind: int(limit) for kind, limit in (data.get("learned") or {}).items()
+                            if kind in ("rpm", "tpm") and int(limit) > 0}
+            self.throttles = int(data.get("throttles", 0))
+        except (TypeError, ValueError) as e:
+            logger.warning(f"自适应限速状态无效，已忽略: {e}")
+
+
+class AdaptiveStateFile:
+    """
+    自适应限速状态文件（JSON，按限速器名称保存），写入时先写临时文件再替换，避免写坏
+
+    属性:
+        path: 文件路径
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or DEFAULT_STATE_PATH
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取自适应限速状态失败: {e}")
+            return {}
+
+    def load(self, name: str) -> Optional[Dict[str, Any]]:
+        """读取指定限速器的状态，不存在时返回 None"""
+        with self._lock:
+            return self._read().get(name)
+
+    def save(self, name: str, state: Dict[str, Any]) -> None:
+        """保存指定限速器的状态（与文件中其他限速器的状态合并）"""
+        with self._lock:
+            data = self._read()
+            data[name] = state
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                temp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+                os.replace(temp_path, self.path)
+            except OSError as e:
+                logger.warning(f"保存自适应限速状态失败: {e}")
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+配置存储模块
+
+一次性加载并验证 role/config.json 与 role/secret_key.json，构建只读快照供
+AIFactory 在切换模型时直接查询（不再读取磁盘）。
+
+主要功能：
+    - 加载时使用 ConfigValidator 校验已解析的数据
+    - 快照不可变，重新加载成功后整体替换（读取方拿到的永远是完整的一版配置）
+    - 后台线程轮询文件 mtime，检测到变化后自动重新加载
+    - 修改出错（JSON 语法错误、校验失败）时保留旧快照并记录日志，不影响运行中的服务
+
+典型用法：
+    >>> from module.AICore.Tool.ConfigStore import config_store
+    >>> config_store.start_watching()
+    >>> params = config_store.get_model_params("deepseek", "deepseek-chat")
+    >>> key = config_store.get_key("deepseek")
+"""
+
+import os
+import copy
+import json
+import time
+import threading
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from logger import logger
+
+from .ConfigValidator import ConfigValidator
+
+
+class ConfigSnapshot:
+    """
+    某一时刻的配置快照（只读）
+
+    属性:
+        version: 快照版本号，每次成功加载加1
+        loaded_at: 加载时间戳
+        config: 供应商 -> 模型名 -> 参数 的只读映射
+        secret_keys: 供应商 -> 密钥 的只读映射
+    """
+
+    __slots__ = ("version", "loaded_at", "config", "secret_keys", "_mtimes")
+
+    def __init__(self, version: int, config: dict, secret_keys: dict, mtimes: Tuple[float, float]):
+        self.version = version
+        self.loaded_at = time.time()
+        self.config = MappingProxyType({
+            vendor: MappingProxyType(dict(models)) for vendor, models in config.items()
+        })
+        self.secret_keys = MappingProxyType(dict(secret_keys))
+        self._mtimes = mtimes
+
+    def get_model_params(self, vendor: str, model_name: str) -> Dict[str, Any]:
+        """
+        查询模型参数
+
+        返回:
+            参数字典的副本（调用方可以随意修改）
+
+        异常:
+            ValueError: 供应商或模型不存在
+        """
+        vendor_dict = self.config.get(vendor)
+        if vendor_dict is None:
+            raise ValueError(f"在配置文件中未找到供应商 '{vendor}' 的配置")
+
+        params = vendor_dict.get(model_name)
+        if params is None:
+            raise ValueError(f"在供应商 '{vendor}' 的配置下未找到模型 '{model_name}' 的参数")
+        return copy.deepcopy(params)
+
+    def get_key(self, vendor: str) -> Any:
+        """
+        查询API密钥
+
+        异常:
+            ValueError: 供应商不存在
+        """
+        api_key = self.secret_keys.get(vendor)
+        if api_key is None:
+            raise ValueError(f"在配置文件中未找到供应商 '{vendor}' 的密钥")
+        return copy.deepcopy(api_key)
+
+    def list_models(self) -> List[Tuple[str, str]]:
+        """列出所有 (供应商, 模型名)"""
+        return [(vendor, model_name) for vendor, models in self.config.items() for model_name in models]
+
+
+class ConfigStore:
+    """
+    可热更新的配置存储
+
+    属性:
+        role_dir: 配置文件目录
+        poll_interval: 后台轮询间隔（秒）
+        last_error: 最近一次加载失败的原因（成功加载后清空）
+    """
+
+    CONFIG_FILE = "config.json"
+    SECRET_KEY_FILE = "secret_key.json"
+
+    def __init__(self, role_dir: Optional[str] = None, poll_interval: float = 1.0):
+        """
+        初始化配置存储（不会立即读取文件，第一次查询时加载）
+
+        参数:
+            role_dir: 配置文件目录，默认为 AICore/role
+            poll_interval: 后台轮询 mtime 的间隔（秒）
+        """
+        if role_dir is None:
+            role_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "role")
+        if poll_interval <= 0:
+            raise ValueError("poll_interval 必须大于0")
+
+        self.role_dir = role_dir
+        self.poll_interval = poll_interval
+        self.last_error: Optional[str] = None
+
+        self._validator = ConfigValidator(os.path.dirname(role_dir))
+        self._snapshot: Optional[ConfigSnapshot] = None
+        self._version = 0
+        self._lock = threading.Lock()  # 串行化加载过程，读取快照不需要加锁
+        self._listeners: List[Callable[[ConfigSnapshot], None]] = []
+
+        self._watch_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    # ================ 查询接口 ================
+    @property
+    def snapshot(self) -> ConfigSnapshot:
+        """
+        当前快照（首次访问时加载）
+
+        异常:
+            FileNotFoundError: 配置文件不存在
+            ValueError: 首次加载时配置无效
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = self._load()
+                snapshot = self._snapshot
+        return snapshot
+
+    @property
+    def version(self) -> int:
+        """当前快照版本号"""
+        return self.snapshot.version
+
+    def get_model_params(self, vendor: str, model_name: str) -> Dict[str, Any]:
+        """查询模型参数（见 ConfigSnapshot.get_model_params）"""
+        return self.snapshot.get_model_params(vendor, model_name)
+
+    def get_key(self, vendor: str) -> Any:
+        """查询API密钥（见 ConfigSnapshot.get_key）"""
+        return self.snapshot.get_key(vendor)
+
+    def add_listener(self, callback: Callable[[ConfigSnapshot], None]) -> None:
+        """
+        注册配置变化回调
+
+        参数:
+            callback: 新快照生效后调用，参数为新快照
+        """
+        self._listeners.append(callback)
+
+    # ================ 重新加载 ================
+    def reload(self, force: bool = False) -> bool:
+        """
+        重新加载配置
+
+        参数:
+            force: True 时忽略 mtime 强制重新加载
+
+        返回:
+            bool: 是否换上了新快照（文件未变化或新配置无效时返回 False）
+        """
+        with self._lock:
+            current = self._snapshot
+            if current is not None and not force and self._read_mtimes() == current._mtimes:
+                return False
+            try:
+                snapshot = self._load()
+            except (OSError, ValueError) as e:
+                self.last_error = str(e)
+                if current is None:
+                    raise
+                logger.error(f"配置重新加载失败，继续使用版本 {current.version}: {e}")
+                return False
+            self._snapshot = snapshot
+            self.last_error = None
+
+        logger.info(f"配置已重新加载，版本 {snapshot.version}")
+        for callback in list(self._listeners):
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logger.error(f"配置变化回调执行失败: {e}")
+        return True
+
+    # ================ 文件监控 ================
+    def start_watching(self) -> None:
+        """启动后台轮询线程（守护线程，重复调用无效）"""
+        if self._watch_thread is not None and self._watch_thread.is_alive():
+            return
+        self.snapshot  # 先完成首次加载，配置无效时在调用方抛出
+        self._stop_event.clear()
+        self._watch_thread = threading.Thread(target=self._watch_loop, name="ConfigStoreWatcher", daemon=True)
+        self._watch_thread.start()
+
+    def stop_watching(self) -> None:
+        """停止后台轮询线程"""
+        self._stop_event.set()
+        if self._watch_thread is not None:
+            self._watch_thread.join()
+            self._watch_thread = None
+
+    def _watch_loop(self) -> None:
+        """轮询 mtime，只有 stat 调用，文件未变化时不读取内容"""
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"配置监控线程异常: {e}")
+
+    # ================ 私有方法 ================
+    def _path(self, file_name: str) -> str:
+        return os.path.join(self.role_dir, file_name)
+
+    def _read_mtimes(self) -> Tuple[float, float]:
+        """读取两个配置文件的 mtime（文件不存在时为 -1）"""
+        mtimes = []
+        for file_name in (self.CONFIG_FILE, self.SECRET_KEY_FILE):
+            try:
+                mtimes.append(os.stat(self._path(file_name)).st_mtime_ns)
+            except OSError:
+                mtimes.append(-1)
+        return tuple(mtimes)
+
+    def _read_json(self, file_name: str) -> Any:
+        """读取并解析单个配置文件"""
+        file_path = self._path(file_name)
+        if not os.path.isfile(file_path):
+            raise FileNotFoundError(f"配置文件未找到: {file_path}")
+        with open(file_path, "r", encoding="utf-8") as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{file_name} 不是有效的JSON格式: {e}")
+
+    def _load(self) -> ConfigSnapshot:
+        """读取、验证并构建新快照（调用方持有 _lock）"""
+        # 先记录 mtime 再读取内容：读取期间文件又被修改时，下一轮轮询会再次加载
+        mtimes = self._read_mtimes()
+        config = self._read_json(self.CONFIG_FILE)
+        secret_keys = self._read_json(self.SECRET_KEY_FILE)
+
+        errors = self._validator.check_config_data(config) + self._validator.check_secret_key_data(secret_keys)
+        if errors:
+            raise ValueError("配置验证失败: " + "; ".join(errors))
+
+        self._version += 1
+        return ConfigSnapshot(self._version, config, secret_keys, mtimes)
+
+
+# 全局配置存储（首次查询时加载）
+config_store = ConfigStore()
@@ -126,15 +126,106 @@ class ConfigValidator:
             errors.append(f"读取 secret_key.json 失败: {e}")
             return False, errors
 
+        errors.extend(self.check_secret_key_data(data))
+        return len(errors) == 0, errors
+
+    def validate_config(self) -> Tuple[bool, List[str]]:
+        """
+        验证 config.json 文件
+
+        检查项：
+            1. 文件是否存在
+            2. 文件是否为有效的JSON格式
+            3. 是否包含至少一个供应商的配置
+            4. 每个模型配置是否包含必需字段
+            5. 字段值的类型是否正确
+
+        返回:
+            (is_valid, errors): 验证结果和错误信息列表
+        """
+        errors = []
+        file_path = os.path.join(self.role_dir, "config.json")
+
+        # 检查文件是否存在
+        if not os.path.exists(file_path):
+            errors.append(f"config.json 文件不存在: {file_path}")
+            return False, errors
+
+        # 检查是否为文件
+        if not os.path.isfile(file_path):
+            errors.append(f"config.json 不是文件: {file_path}")
+            return False, errors
+
+        # 读取并解析JSON
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except json.JSONDecodeError as e:
+            errors.append(f"config.json 不是有效的JSON格式: {e}")
+            return False, errors
+        except Exception as e:
+            errors.append(f"读取 config.json 失败: {e}")
+            return False, errors
+
+        errors.extend(self.check_config_data(data))
+        return len(errors) == 0, errors
+
+    def validate_roles(self) -> Tuple[bool, List[str]]:
+        """
+        验证角色配置目录
+
+        检查项：
+            1. role_A 和 role_B 目录是否存在
+            2. 每个角色目录下是否有 assistant.json
+            3. assistant.json 格式是否正确
+
+        返回:
+            (is_valid, errors): 验证结果和错误信息列表
+        """
+        errors = []
+
+        # 检查角色目录
+        for role_name in ["role_A", "role_B"]:
+            role_path = os.path.join(self.role_dir, role_name)
+
+            # 检查目录是否存在
+            if not os.path.exists(role_path):
+                errors.append(f"角色目录不存在: {role_path}")
+                continue
+
+            if not os.path.isdir(role_path):
+                errors.append(f"角色路径不是目录: {role_path}")
+                continue
+
+            # 检查 assistant.json
+            assistant_path = os.path.join(role_path, "assistant.json")
+            is_valid, error_list = self._validate_assistant_json(assistant_path, role_name)
+            if not is_valid:
+                errors.extend(error_list)
+
+        return len(errors) == 0, errors
+
+    def check_secret_key_data(self, data: Any) -> List[str]:
+        """
+        检查已解析的 secret_key.json 内容
+
+        参数:
+            data: json.load 得到的对象
+
+        返回:
+            错误信息列表（为空表示通过）
+        """
+        errors = []
+
         # 检查是否为字典
         if not isinstance(data, dict):
             errors.append("secret_key.json 必须是一个JSON对象（字典）")
-            return False, errors
+            return errors
 
         # 检查是否为空
         if not data:
             errors.append("secret_key.json 不能为空，至少需要配置一个供应商的密钥")
-            return False, errors
+            return errors
 
         # 检查每个供应商的密钥
         for vendor, api_key in data.items():
@@ -164,55 +255,29 @@ class ConfigValidator:
                         elif not isinstance(api_key[field], str) or not api_key[field].strip():
                             errors.append(f"供应商 '{vendor}' 的 {field} 不能为空")
 
-        return len(errors) == 0, errors
+        return errors
 
-    def validate_config(self) -> Tuple[bool, List[str]]:
+    def check_config_data(self, data: Any) -> List[str]:
         """
-        验证 config.json 文件
+        检查已解析的 config.json 内容
 
-        检查项：
-            1. 文件是否存在
-            2. 文件是否为有效的JSON格式
-            3. 是否包含至少一个供应商的配置
-            4. 每个模型配置是否包含必需字段
-            5. 字段值的类型是否正确
+        参数:
+            data: json.load 得到的对象
 
         返回:
-            (is_valid, errors): 验证结果和错误信息列表
+            错误信息列表（为空表示通过）
         """
         errors = []
-        file_path = os.path.join(self.role_dir, "config.json")
-
-        # 检查文件是否存在
-        if not os.path.exists(file_path):
-            errors.append(f"config.json 文件不存在: {file_path}")
-            return False, errors
-
-        # 检查是否为文件
-        if not os.path.isfile(file_path):
-            errors.append(f"config.json 不是文件: {file_path}")
-            return False, errors
-
-        # 读取并解析JSON
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        except json.JSONDecodeError as e:
-            errors.append(f"config.json 不是有效的JSON格式: {e}")
-            return False, errors
-        except Exception as e:
-            errors.append(f"读取 config.json 失败: {e}")
-            return False, errors
 
         # 检查是否为字典
         if not isinstance(data, dict):
             errors.append("config.json 必须是一个JSON对象（字典）")
-            return False, errors
+            return errors
 
         # 检查是否为空
         if not data:
             errors.append("config.json 不能为空，至少需要配置一个供应商的模型")
-            return False, errors
+            return errors
 
         # 检查每个供应商的配置
         for vendor, models in data.items():
@@ -278,42 +343,43 @@ class ConfigValidator:
                             f"供应商 '{vendor}' 的模型 '{model_name}' 的 max_tokens 必须大于0"
                         )
 
-        return len(errors) == 0, errors
-
-    def validate_roles(self) -> Tuple[bool, List[str]]:
-        """
-        验证角色配置目录
-
-        检查项：
-            1. role_A 和 role_B 目录是否存在
-            2. 每个角色目录下是否有 assistant.json
-            3. assistant.json 格式是否正确
-
-        返回:
-            (is_valid, errors): 验证结果和错误信息列表
-        """
-        errors = []
-
-        # 检查角色目录
-        for role_name in ["role_A", "role_B"]:
-            role_path = os.path.join(self.role_dir, role_name)
-
-            # 检查目录是否存在
-            if not os.path.exists(role_path):
-                errors.append(f"角色目录不存在: {role_path}")
-                continue
-
-            if not os.path.isdir(role_path):
-                errors.append(f"角色路径不是目录: {role_path}")
-                continue
-
-            # 检查 assistant.json
-            assistant_path = os.path.join(role_path, "assistant.json")
-            is_valid, error_list = self._validate_assistant_json(assistant_path, role_name)
-            if not is_valid:
-                errors.extend(error_list)
-
-        return len(errors) == 0, errors
+                # 价格表（可选，单位：元 / 百万token，供模型路由估算成本）
+                if "pricing" in model_config:
+                    pricing = model_config["pricing"]
+                    if not isinstance(pricing, dict):
+                        errors.append(
+                            f"供应商 '{vendor}' 的模型 '{model_name}' 的 pricing 必须是字典类型"
+                        )
+                    else:
+                        for key, price in pricing.items():
+                            if key not in ("input", "output"):
+                                errors.append(
+                                    f"供应商 '{vendor}' 的模型 '{model_name}' 的 pricing 包含未知字段: {key}（可选: input, output）"
+                                )
+                            elif isinstance(price, bool) or not isinstance(price, (int, float)) or price < 0:
+                                errors.append(
+                                    f"供应商 '{vendor}' 的模型 '{model_name}' 的 pricing.{key} 必须是非负数"
+                                )
+
+                # 速率限制（可选，覆盖模型按账户等级设置的默认额度）
+                if "rate_limit" in model_config:
+                    rate_limit = model_config["rate_limit"]
+                    if not isinstance(rate_limit, dict):
+                        errors.append(
+                            f"供应商 '{vendor}' 的模型 '{model_name}' 的 rate_limit 必须是字典类型"
+                        )
+                    else:
+                        for key, limit in rate_limit.items():
+                            if key not in ("rpm", "tpm", "concurrency"):
+                                errors.append(
+                                    f"供应商 '{vendor}' 的模型 '{model_name}' 的 rate_limit 包含未知字段: {key}（可选: rpm, tpm, concurrency）"
+                                )
+                            elif isinstance(limit, bool) or not isinstance(limit, int) or limit <= 0:
+                                errors.append(
+                                    f"供应商 '{vendor}' 的模型 '{model_name}' 的 rate_limit.{key} 必须是大于0的整数"
+                                )
+
+        return errors
 
     def _validate_assistant_json(self, file_path: str, role_name: str) -> Tuple[bool, List[str]]:
         """
@@ -406,7 +472,8 @@ class ConfigValidator:
                 "deepseek-chat": {
                     "base_url": "https://api.deepseek.com",
                     "model": "deepseek-chat",
-                    "max_tokens": 4096
+                    "max_tokens": 4096,
+                    "pricing": {"input": 2.0, "output": 8.0}
                 }
             },
             "qwen": {
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+内存占用估算
+
+递归累加对象及其引用的容器、实例属性的 sys.getsizeof，
+用于统计每个会话独占的内存（共享资源通过 shared 参数排除）。
+
+典型用法：
+    >>> deep_sizeof(session, shared=[pooled_model, http_client])
+"""
+
+import sys
+import types
+import asyncio
+from typing import Iterable
+
+
+# 不计入也不向下展开的类型（类、模块、函数、事件循环）
+_SKIP_TYPES = (
+    type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+    asyncio.AbstractEventLoop,
+)
+
+
+def deep_sizeof(obj, shared: Iterable = ()) -> int:
+    """
+    估算对象独占的内存（字节）
+
+    参数:
+        obj: 要统计的对象
+        shared: 共享对象列表，这些对象及其内部引用不计入
+
+    返回:
+        int: 字节数（近似值）
+    """
+    seen = {id(item) for item in shared}
+    total = 0
+    stack = [obj]
+
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+
+        if isinstance(current, _SKIP_TYPES):
+            continue
+
+        total += sys.getsizeof(current)
+
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        elif isinstance(current, (str, bytes, int, float, bool, type(None))):
+            continue
+        else:
+            if hasattr(current, "__dict__"):
+                stack.append(vars(current))
+            slots = getattr(type(current), "__slots__", ())
+            for slot in ((slots,) if isinstance(slots, str) else slots):
+                if hasattr(current, slot):
+                    stack.append(getattr(current, slot))
+
+    return total
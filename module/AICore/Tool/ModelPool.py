@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+模型实例池
+
+按 (供应商, 模型名) 缓存已经初始化好的模型实例（含tokenizer）以及对应的
+OpenAI / AsyncOpenAI 客户端（含HTTP连接池），切换模型时直接复用，不必重新加载。
+
+    - LRU 淘汰：超过容量时淘汰最久未使用的实例
+    - 配置版本：ConfigStore 重新加载后，旧版本配置创建的实例在下一次获取时重建
+    - 关闭客户端：被淘汰 / 替换 / 移除的实例在没有使用者后关闭其 OpenAI / AsyncOpenAI 客户端
+      （hold=True 获取的实例由调用方 release，正在使用它的会话和请求不受影响）；
+      异步客户端在使用它的事件循环中关闭，即使淘汰发生在其他线程
+
+典型用法：
+    >>> pool = ModelPool(capacity=4)
+    >>> entry = pool.acquire("deepseek", "deepseek-chat", create=lambda: DeepSeek(message), version=1, hold=True)
+    >>> entry.model, entry.client, entry.async_client
+    >>> pool.release(entry)
+"""
+
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from openai import OpenAI, AsyncOpenAI
+
+from logger import logger
+from ..Model.base_model import BaseModel
+
+
+class PooledModel:
+    """
+    池中的一个模型实例及其共享资源
+
+    属性:
+        vendor: 供应商名称
+        model_name: 配置中的模型名
+        model: 模型实例（BaseModel子类）
+        client: 同步客户端（文件上传）
+        async_client: 异步客户端（流式请求）
+        config_version: 创建时的配置版本
+        created_at: 创建时间戳
+        hits: 被复用的次数
+        users: 持有者数（hold=True 获取后尚未 release 的次数）
+        retired: 是否已离开实例池（被淘汰 / 替换 / 移除）
+        loop: 使用异步客户端的事件循环（连接池属于这个循环），未知时为 None
+    """
+
+    __slots__ = ("vendor", "model_name", "model", "client", "async_client", "config_version", "created_at", "hits",
+                 "users", "retired", "loop", "_closing")
+
+    def __init__(
+            self,
+            vendor: str,
+            model_name: str,
+            model: BaseModel,
+            config_version: Optional[int] = None,
+            loop: Optional[asyncio.AbstractEventLoop] = None
+        ):
+        self.vendor = vendor
+        self.model_name = model_name
+        self.model = model
+        self.client = OpenAI(**model.gen_params())
+        self.async_client = AsyncOpenAI(**model.gen_params())
+        self.config_version = config_version
+        self.created_at = time.time()
+        self.hits = 0
+        self.users = 0
+        self.retired = False
+        self.loop = loop
+        self._closing = None  # 在事件循环中关闭异步客户端的任务 / Future
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        """记录使用异步客户端的事件循环（在线程池中创建的实例由调用方绑定，已绑定时不变）"""
+        if self.loop is None:
+            self.loop = loop
+
+    def close(self) -> None:
+        """关闭同步 / 异步客户端，释放HTTP连接池"""
+        self.client.close()
+        running = _running_loop()
+        loop = self.loop or running
+        try:
+            if loop is None:
+                # 异步客户端没有在事件循环中使用过，没有属于其他循环的连接
+                asyncio.run(self.async_client.close())
+            elif loop is running:
+                self._closing = loop.create_task(self.async_client.close())
+            elif not loop.is_closed():
+                # 在其他线程中淘汰（如线程池中预热）：连接只能在所属的循环中关闭，循环暂停时在下次运行时关闭
+                self._closing = asyncio.run_coroutine_threadsafe(self.async_client.close(), loop)
+            # 所属的循环已关闭：连接已随循环一起失效
+        except Exception as e:
+            logger.warning(f"关闭模型 {self.vendor}/{self.model_name} 的异步客户端失败: {e}")
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    """当前线程中正在运行的事件循环（没有时为 None）"""
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class ModelPool:
+    """
+    LRU 模型实例池（线程安全）
+
+    属性:
+        capacity: 最多缓存的实例数
+        hits: 命中次数
+        misses: 未命中（新建）次数
+        evictions: 被淘汰的实例数
+    """
+
+    def __init__(self, capacity: int = 4):
+        """
+        初始化模型实例池
+
+        参数:
+            capacity: 最多缓存的实例数
+        """
+        if not isinstance(capacity, int) or capacity <= 0:
+            raise ValueError("capacity 必须是大于0的整数")
+
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries: "OrderedDict[Tuple[str, str], PooledModel]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._building: Dict[Tuple[str, str], threading.Lock] = {}  # 每个模型的加载锁
+
+    def acquire(
+            self,
+            vendor: str,
+            model_name: str,
+            create: Callable[[], BaseModel],
+            version: Optional[int] = None,
+            hold: bool = False
+        ) -> PooledModel:
+        """
+        获取模型实例，不存在或配置版本已变化时调用 create 新建
+
+        参数:
+            vendor: 供应商名称
+            model_name: 配置中的模型名
+            create: 新建模型实例的函数
+            version: 当前配置版本，与缓存实例的版本不同时重建
+            hold: 是否持有实例（持有期间实例被淘汰也不会关闭客户端，用完后调用 release）
+
+        返回:
+            PooledModel: 池中的实例
+        """
+        key = (vendor, model_name)
+        loop = _running_loop()
+        with self._lock:
+            entry = self._lookup(key, version, hold, loop)
+            if entry is not None:
+                return entry
+            build_lock = self._building.setdefault(key, threading.Lock())
+
+        # 新建：同一模型只加载一次，不同模型可以并行加载（如启动预热）
+        with build_lock:
+            with self._lock:
+                entry = self._lookup(key, version, hold, loop)
+                if entry is not None:
+                    return entry
+                self.misses += 1
+
+            model = create()
+            if not isinstance(model, BaseModel):
+                raise ValueError("create 必须返回 BaseModel 的子类实例")
+            entry = PooledModel(vendor, model_name, model, version, loop)
+
+            with self._lock:
+                if hold:
+                    entry.users += 1
+                retired = [self._entries.pop(key)] if key in self._entries else []  # 旧版本配置的实例
+                self._entries[key] = entry
+                while len(self._entries) > self.capacity:
+                    retired.append(self._entries.popitem(last=False)[1])
+                    self.evictions += 1
+                closable = self._retire(retired)
+            self._close(closable)
+            return entry
+
+    def release(self, entry: PooledModel) -> None:
+        """释放 hold=True 获取的实例，实例已离开实例池且没有其他持有者时关闭其客户端"""
+        with self._lock:
+            if entry.users <= 0:
+                raise ValueError(f"模型 {entry.vendor}/{entry.model_name} 没有被持有")
+            entry.users -= 1
+            closable = [entry] if entry.retired and entry.users == 0 else []
+        self._close(closable)
+
+    def _lookup(
+            self,
+            key: Tuple[str, str],
+            version: Optional[int],
+            hold: bool = False,
+            loop: Optional[asyncio.AbstractEventLoop] = None
+        ) -> Optional[PooledModel]:
+        """查找可用的实例并更新LRU顺序，记录调用方的事件循环（调用方持有 _lock）"""
+        entry = self._entries.get(key)
+        if entry is None or (version is not None and entry.config_version != version):
+            return None
+        if loop is not None:
+            entry.bind_loop(loop)
+        self._entries.move_to_end(key)
+        entry.hits += 1
+        self.hits += 1
+        if hold:
+            entry.users += 1
+        return entry
+
+    @staticmethod
+    def _retire(entries: list) -> list:
+        """标记离开实例池的实例，返回可以立即关闭的（没有持有者的）实例（调用方持有 _lock）"""
+        for entry in entries:
+            entry.retired = True
+        return [entry for entry in entries if entry.users == 0]
+
+    @staticmethod
+    def _close(entries: list) -> None:
+        """关闭实例的客户端（在 _lock 外调用）"""
+        for entry in entries:
+            entry.close()
+
+    def discard(self, vendor: str, model_name: str) -> bool:
+        """
+        移除指定实例
+
+        返回:
+            bool: 实例是否存在
+        """
+        with self._lock:
+            entry = self._entries.pop((vendor, model_name), None)
+            closable = self._retire([entry] if entry is not None else [])
+        self._close(closable)
+        return entry is not None
+
+    def clear(self) -> None:
+        """清空实例池"""
+        with self._lock:
+            closable = self._retire(list(self._entries.values()))
+            self._entries.clear()
+        self._close(closable)
+
+    def keys(self) -> list:
+        """按从旧到新的使用顺序列出缓存的 (供应商, 模型名)"""
+        with self._lock:
+            return list(self._entries.keys())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        return key in self._entries
+
+    def snapshot(self) -> dict:
+        """返回统计摘要"""
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "models": [f"{vendor}/{model_name}" for vendor, model_name in self._entries],
+            }
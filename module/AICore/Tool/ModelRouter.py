@@ -0,0 +1,442 @@
+# -*- coding: utf-8 -*-
+"""
+延迟 / 成本感知的模型路由
+
+按 供应商 + 模型 维护滑动窗口统计（首token延迟、输出速度、错误率、实际花费），
+结合 config.json 中的价格表，按路由策略为每个请求选择模型，并给出降级时的备选顺序。
+
+    - 滑动窗口：只保留最近 window 次请求，模型变慢或恢复后统计能及时反映
+    - 熔断：连续失败 failure_threshold 次后冷却 cooldown 秒，期间只作为最后的备选
+    - 探索：样本不足 min_samples 的模型视为满足延迟和错误率约束，以便积累统计
+    - 审计：每次决策连同当时的候选统计写入日志，并保留最近 max_decisions 条
+
+价格配置（config.json 中模型的 pricing 字段，单位：元 / 百万token）：
+    "deepseek-chat": {"base_url": "...", "model": "deepseek-chat", "pricing": {"input": 2.0, "output": 8.0}}
+
+典型用法：
+    >>> router = ModelRouter(config_store)
+    >>> decision = router.decide([("deepseek", "deepseek-chat"), ("qwen", "qwen-plus")], RoutePolicy.cheapest(max_p95_ttft=2.0))
+    >>> decision["chosen"], decision["ranking"]
+"""
+
+import json
+import math
+import time
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from logger import logger
+
+
+# 没有输出token统计时估算成本使用的输出token数
+DEFAULT_OUTPUT_TOKENS = 500
+
+
+def _percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """计算分位数（线性插值），没有样本时返回 None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100.0
+    lower = int(math.floor(position))
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class ModelStats:
+    """
+    单个模型的滑动窗口统计
+
+    属性:
+        ttft: 最近的首token延迟（秒）
+        tokens_per_second: 最近的输出速度（token/秒）
+        output_tokens: 最近的输出token数
+        outcomes: 最近的请求结果（True 成功 / False 失败）
+        consecutive_errors: 连续失败次数
+        cooldown_until: 熔断冷却结束时间戳（0 表示未熔断）
+        last_error: 最近一次失败的错误信息
+        requests: 累计请求数
+        cost_total: 累计花费（元，按 usage 和价格表计算）
+    """
+
+    __slots__ = ("ttft", "tokens_per_second", "output_tokens", "outcomes", "consecutive_errors",
+                 "cooldown_until", "last_error", "requests", "cost_total")
+
+    def __init__(self, window: int):
+        self.ttft = deque(maxlen=window)
+        self.tokens_per_second = deque(maxlen=window)
+        self.output_tokens = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_errors = 0
+        self.cooldown_until = 0.0
+        self.last_error = None
+        self.requests = 0
+        self.cost_total = 0.0
+
+    @property
+    def error_rate(self) -> Optional[float]:
+        """窗口内的错误率，没有样本时为 None"""
+        if not self.outcomes:
+            return None
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def summary(self) -> Dict[str, Any]:
+        """返回统计摘要"""
+        return {
+            "samples": len(self.outcomes),
+            "p50_ttft": _percentile(self.ttft, 50),
+            "p95_ttft": _percentile(self.ttft, 95),
+            "tokens_per_second": _percentile(self.tokens_per_second, 50),
+            "error_rate": self.error_rate,
+            "consecutive_errors": self.consecutive_errors,
+            "cooldown_remaining": max(0.0, self.cooldown_until - time.time()),
+            "last_error": self.last_error,
+            "requests": self.requests,
+            "cost_total": self.cost_total,
+        }
+
+
+class RoutePolicy:
+    """
+    路由策略
+
+    属性:
+        name: 策略名称（写入决策日志）
+        objective: 优化目标，cost 选最便宜，latency 选 p95 首token延迟最低
+        max_p95_ttft: p95 首token延迟上限（秒），None 表示不限制
+        max_cost: 单次请求的预估花费上限（元），None 表示不限制
+        max_error_rate: 窗口内错误率上限，超过视为降级
+    """
+
+    OBJECTIVES = ("cost", "latency")
+
+    __slots__ = ("name", "objective", "max_p95_ttft", "max_cost", "max_error_rate")
+
+    def __init__(
+        self,
+        objective: str = "cost",
+        max_p95_ttft: Optional[float] = None,
+        max_cost: Optional[float] = None,
+        max_error_rate: float = 0.5,
+        name: Optional[str] = None
+    ):
+        if objective not in self.OBJECTIVES:
+            raise ValueError(f"objective 必须是 {self.OBJECTIVES} 之一，当前值为: {objective}")
+        if max_p95_ttft is not None and max_p95_ttft <= 0:
+            raise ValueError("max_p95_ttft 必须大于0")
+        if max_cost is not None and max_cost < 0:
+            raise ValueError("max_cost 不能小于0")
+        if not 0 <= max_error_rate <= 1:
+            raise ValueError("max_error_rate 必须在 0-1 之间")
+
+        self.objective = objective
+        self.max_p95_ttft = max_p95_ttft
+        self.max_cost = max_cost
+        self.max_error_rate = max_error_rate
+        self.name = name or objective
+
+    @classmethod
+    def cheapest(cls, max_p95_ttft: Optional[float] = 2.0, **kwargs) -> "RoutePolicy":
+        """最便宜且 p95 首token延迟不超过 max_p95_ttft 秒"""
+        kwargs.setdefault("name", f"cheapest(p95_ttft<{max_p95_ttft}s)" if max_p95_ttft else "cheapest")
+        return cls("cost", max_p95_ttft=max_p95_ttft, **kwargs)
+
+    @classmethod
+    def fastest(cls, max_cost: Optional[float] = None, **kwargs) -> "RoutePolicy":
+        """p95 首token延迟最低且单次预估花费不超过 max_cost 元"""
+        kwargs.setdefault("name", f"fastest(cost<={max_cost})" if max_cost is not None else "fastest")
+        return cls("latency", max_cost=max_cost, **kwargs)
+
+    def describe(self) -> Dict[str, Any]:
+        """策略参数（写入决策日志）"""
+        return {
+            "name": self.name,
+            "objective": self.objective,
+            "max_p95_ttft": self.max_p95_ttft,
+            "max_cost": self.max_cost,
+            "max_error_rate": self.max_error_rate,
+        }
+
+
+class ModelRouter:
+    """
+    模型路由器（线程安全）
+
+    属性:
+        config_store: 配置存储（读取价格表），None 时不计算成本
+        window: 每个模型保留的最近请求数
+        min_samples: 延迟和错误率约束生效所需的最少样本数
+        failure_threshold: 触发熔断的连续失败次数
+        cooldown: 熔断冷却时间（秒）
+    """
+
+    def __init__(
+        self,
+        config_store=None,
+        window: int = 50,
+        min_samples: int = 3,
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+        max_decisions: int = 200
+    ):
+        if not isinstance(window, int) or window <= 0:
+            raise ValueError("window 必须是大于0的整数")
+        if failure_threshold <= 0:
+            raise ValueError("failure_threshold 必须大于0")
+
+        self.config_store = config_store
+        self.window = window
+        self.min_samples = min_samples
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+
+        self._stats: Dict[Tuple[str, str], ModelStats] = {}
+        self._decisions = deque(maxlen=max_decisions)
+        self._lock = threading.Lock()
+
+    # ================ 统计 ================
+    def _model_stats(self, vendor: str, model_name: str) -> ModelStats:
+        """获取（不存在则创建）模型的统计（调用方持有 _lock）"""
+        key = (vendor, model_name)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = ModelStats(self.window)
+        return stats
+
+    def record_success(
+        self,
+        vendor: str,
+        model_name: str,
+        stream_stats: Optional[Dict[str, Any]] = None,
+        usage: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        记录一次成功的请求
+
+        参数:
+            vendor: 供应商名称
+            model_name: 配置中的模型名
+            stream_stats: 本次请求的延迟摘要（OPEN_AI.last_stream_stats）
+            usage: 本次请求的 usage 字段（OPEN_AI.last_usage）
+        """
+        stream_stats = stream_stats or {}
+        first_tokens = [stream_stats.get(key) for key in ("ttft_content", "ttft_thinking")]
+        first_tokens = [value for value in first_tokens if value is not None]
+        ttft = min(first_tokens) if first_tokens else stream_stats.get("ttfb")
+        cost = self.estimate_cost(
+            vendor, model_name,
+            (usage or {}).get("prompt_tokens") or 0,
+            (usage or {}).get("completion_tokens") or 0
+        ) if usage else None
+
+        with self._lock:
+            stats = self._model_stats(vendor, model_name)
+            stats.requests += 1
+            stats.outcomes.append(True)
+            stats.consecutive_errors = 0
+            stats.cooldown_until = 0.0
+            if ttft is not None:
+                stats.ttft.append(ttft)
+            if stream_stats.get("tokens_per_second") is not None:
+                stats.tokens_per_second.append(stream_stats["tokens_per_second"])
+            if usage and usage.get("completion_tokens") is not None:
+                stats.output_tokens.append(usage["completion_tokens"])
+            if cost is not None:
+                stats.cost_total += cost
+
+    def record_failure(self, vendor: str, model_name: str, error: Any = None) -> None:
+        """
+        记录一次失败的请求，连续失败达到阈值时熔断
+
+        参数:
+            vendor: 供应商名称
+            model_name: 配置中的模型名
+            error: 异常或错误信息
+        """
+        with self._lock:
+            stats = self._model_stats(vendor, model_name)
+            stats.requests += 1
+            stats.outcomes.append(False)
+            stats.consecutive_errors += 1
+            stats.last_error = str(error) if error is not None else None
+            tripped = stats.consecutive_errors == self.failure_threshold
+            if stats.consecutive_errors >= self.failure_threshold:
+                stats.cooldown_until = time.time() + self.cooldown
+        if tripped:
+            logger.warning(f"模型 {vendor}/{model_name} 连续失败 {self.failure_threshold} 次，熔断 {self.cooldown} 秒: {error}")
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        各模型的统计
+
+        返回:
+            dict: "供应商/模型名" -> 统计摘要（见 ModelStats.summary）
+        """
+        with self._lock:
+            return {f"{vendor}/{model_name}": stats.summary() for (vendor, model_name), stats in self._stats.items()}
+
+    def decisions(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        最近的路由决策（从旧到新）
+
+        参数:
+            limit: 只返回最近的 limit 条
+        """
+        with self._lock:
+            records = list(self._decisions)
+        return records[-limit:] if limit else records
+
+    def reset(self) -> None:
+        """清空统计和决策记录"""
+        with self._lock:
+            self._stats.clear()
+            self._decisions.clear()
+
+    # ================ 成本 ================
+    def pricing(self, vendor: str, model_name: str) -> Optional[Dict[str, float]]:
+        """
+        查询模型价格（元 / 百万token）
+
+        返回:
+            dict: {"input": 输入价格, "output": 输出价格}，未配置时返回 None
+        """
+        if self.config_store is None:
+            return None
+        try:
+            pricing = self.config_store.snapshot.config[vendor][model_name].get("pricing")
+        except (KeyError, AttributeError):
+            return None
+        return dict(pricing) if pricing else None
+
+    def estimate_cost(self, vendor: str, model_name: str, prompt_tokens: int, output_tokens: int) -> Optional[float]:
+        """
+        按价格表估算花费（元），未配置价格时返回 None
+        """
+        pricing = self.pricing(vendor, model_name)
+        if pricing is None:
+            return None
+        return (prompt_tokens * pricing.get("input", 0.0) + output_tokens * pricing.get("output", 0.0)) / 1e6
+
+    # ================ 路由决策 ================
+    def decide(
+        self,
+        candidates: Sequence[Tuple[str, str]],
+        policy: Optional[RoutePolicy] = None,
+        prompt_tokens: int = 0,
+        output_tokens: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        按策略为一次请求排序候选模型
+
+        满足全部约束的模型按策略目标排序；其余模型作为备选排在后面：
+        先是只违反延迟 / 成本约束的模型，再是错误率过高或熔断中的模型（按冷却结束时间）。
+
+        参数:
+            candidates: 候选 (供应商, 模型名) 列表
+            policy: 路由策略，默认 RoutePolicy.cheapest()
+            prompt_tokens: 本次请求的输入token数（估算成本）
+            output_tokens: 预计输出token数，None 时使用该模型最近输出token数的中位数
+
+        返回:
+            dict: 决策记录（同时写入日志和决策历史）
+                - time / policy / prompt_tokens
+                - chosen: 首选模型 "供应商/模型名"
+                - relaxed: 首选模型是否违反了约束（没有完全满足约束的模型）
+                - ranking: 按尝试顺序排列的 (供应商, 模型名) 列表
+                - candidates: 每个候选的统计、预估成本和状态（ok / slow / over_budget / no_pricing / unhealthy / cooldown）
+                - attempts: 调用方记录的实际尝试结果
+
+        异常:
+            ValueError: 候选列表为空
+        """
+        candidates = list(dict.fromkeys(tuple(candidate) for candidate in candidates or []))
+        if not candidates:
+            raise ValueError("candidates 不能为空")
+        policy = policy or RoutePolicy.cheapest()
+
+        now = time.time()
+        views = []
+        with self._lock:
+            for vendor, model_name in candidates:
+                stats = self._stats.get((vendor, model_name)) or ModelStats(self.window)
+                summary = stats.summary()
+                expected_output = output_tokens
+                if expected_output is None:
+                    median = _percentile(stats.output_tokens, 50)
+                    expected_output = int(median) if median is not None else DEFAULT_OUTPUT_TOKENS
+                views.append({
+                    "model": f"{vendor}/{model_name}",
+                    "target": (vendor, model_name),
+                    "stats": summary,
+                    "ttft_samples": len(stats.ttft),
+                    "cooldown_until": stats.cooldown_until,
+                    "expected_output_tokens": expected_output,
+                })
+
+        for view in views:
+            vendor, model_name = view["target"]
+            view["cost"] = self.estimate_cost(vendor, model_name, prompt_tokens, view["expected_output_tokens"])
+            view["status"] = self._status(view, policy, now)
+
+        ranking = self._rank(views, policy)
+        record = {
+            "time": now,
+            "policy": policy.describe(),
+            "prompt_tokens": prompt_tokens,
+            "chosen": ranking[0]["model"],
+            "relaxed": ranking[0]["status"] != "ok",
+            "ranking": [view["target"] for view in ranking],
+            "candidates": [
+                {key: view[key] for key in ("model", "status", "cost", "expected_output_tokens", "stats")}
+                for view in ranking
+            ],
+            "attempts": [],
+        }
+        with self._lock:
+            self._decisions.append(record)
+
+        logger.info(f"路由决策: {json.dumps({k: v for k, v in record.items() if k != 'ranking'}, ensure_ascii=False, default=str)}")
+        if record["relaxed"]:
+            logger.warning(f"没有满足策略 {policy.name} 的模型，放宽约束选择 {record['chosen']}（状态: {ranking[0]['status']}）")
+        return record
+
+    def choose(self, candidates: Sequence[Tuple[str, str]], policy: Optional[RoutePolicy] = None, **kwargs) -> Tuple[str, str]:
+        """
+        返回首选模型 (供应商, 模型名)，参数见 decide
+        """
+        return self.decide(candidates, policy, **kwargs)["ranking"][0]
+
+    def _status(self, view: Dict[str, Any], policy: RoutePolicy, now: float) -> str:
+        """判断候选是否满足策略约束"""
+        stats = view["stats"]
+        if view["cooldown_until"] > now:
+            return "cooldown"
+        if stats["samples"] >= self.min_samples and stats["error_rate"] > policy.max_error_rate:
+            return "unhealthy"
+        if policy.max_p95_ttft is not None and view["ttft_samples"] >= self.min_samples \
+                and stats["p95_ttft"] > policy.max_p95_ttft:
+            return "slow"
+        if policy.max_cost is not None:
+            if view["cost"] is None:
+                return "no_pricing"
+            if view["cost"] > policy.max_cost:
+                return "over_budget"
+        return "ok"
+
+    @staticmethod
+    def _rank(views: List[Dict[str, Any]], policy: RoutePolicy) -> List[Dict[str, Any]]:
+        """按约束满足程度和策略目标排序"""
+        def objective_key(view):
+            cost = view["cost"]
+            p95 = view["stats"]["p95_ttft"]
+            if policy.objective == "cost":
+                return (cost is None, cost or 0.0, p95 if p95 is not None else math.inf)
+            # 没有延迟样本的模型排在有样本的模型之后
+            return (p95 is None, p95 or 0.0, cost if cost is not None else math.inf)
+
+        tiers = {"ok": 0, "slow": 1, "over_budget": 1, "no_pricing": 1, "unhealthy": 2, "cooldown": 3}
+        return sorted(
+            views,
+            key=lambda view: (tiers[view["status"]], view["cooldown_until"] if view["status"] == "cooldown" else 0.0, objective_key(view))
+        )
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+提示词前缀缓存辅助模块
+
+DeepSeek、Kimi、Qwen 等 OpenAI 兼容供应商会对重复的请求前缀（工具列表 + 靠前的消息）
+做缓存，命中部分按折扣计费且首token更快。前缀只要有一个字节不同就无法命中，因此：
+
+    - canonicalize_tools: 工具列表按名称排序，schema 的键排序，保证每轮字节一致
+    - canonicalize_messages: 消息字段按固定顺序输出，不受历史记录中字典插入顺序影响
+    - PromptCacheStats: 按会话统计供应商返回的缓存命中token，并检测前缀是否被改动
+
+典型用法：
+    >>> stats = PromptCacheStats()
+    >>> stats.observe_request(request_params)
+    >>> stats.record_usage(prompt_tokens=1200, cached_tokens=1024)
+    >>> stats.hit_rate
+    0.853...
+"""
+
+import hashlib
+import json
+from typing import List, Optional
+
+
+# 消息字段的固定输出顺序，未列出的字段按名称排序追加在后面
+MESSAGE_KEY_ORDER = ("role", "name", "content", "reasoning_content", "tool_calls", "tool_call_id")
+
+
+def _canonical_json(value) -> str:
+    """生成与字典插入顺序无关的JSON字符串"""
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def canonicalize_tools(tools: Optional[list]) -> Optional[list]:
+    """
+    生成字节稳定的工具列表
+
+    参数:
+        tools: OpenAI Function Calling 格式的工具列表
+
+    返回:
+        按函数名排序、所有嵌套字典键已排序的新列表；tools 为 None 时返回 None
+    """
+    if tools is None:
+        return None
+
+    def tool_name(tool: dict) -> str:
+        function = tool.get("function", {}) if isinstance(tool, dict) else {}
+        return function.get("name", "") if isinstance(function, dict) else ""
+
+    return [json.loads(_canonical_json(tool)) for tool in sorted(tools, key=tool_name)]
+
+
+def canonicalize_message(message: dict) -> dict:
+    """
+    生成字段顺序固定的消息副本
+
+    参数:
+        message: 历史记录中的消息字典
+
+    返回:
+        新的消息字典（不修改原消息）
+    """
+    result = {key: message[key] for key in MESSAGE_KEY_ORDER if key in message}
+    for key in sorted(message.keys()):
+        if key not in result:
+            result[key] = message[key]
+    return result
+
+
+def canonicalize_messages(messages: list) -> list:
+    """生成字段顺序固定的消息列表副本"""
+    return [canonicalize_message(message) for message in messages]
+
+
+class PromptCacheStats:
+    """
+    单个会话的前缀缓存统计
+
+    属性:
+        requests: 已统计的请求数（有 usage 返回的请求）
+        prompt_tokens: 累计输入token数
+        cached_tokens: 累计命中缓存的输入token数
+        prefix_breaks: 本轮请求改动了上一轮已发送前缀的次数（工具变化或早期消息被修改/裁剪）
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.prefix_breaks = 0
+
+        self._tools_digest: Optional[str] = None
+        self._message_digests: List[str] = []
+
+    @property
+    def hit_rate(self) -> float:
+        """缓存命中率（命中token / 输入token），没有数据时为0"""
+        if self.prompt_tokens == 0:
+            return 0.0
+        return self.cached_tokens / self.prompt_tokens
+
+    def observe_request(self, request_params: dict) -> bool:
+        """
+        检查本次请求是否保留了上一次请求的前缀
+
+        参数:
+            request_params: 即将发送的请求参数
+
+        返回:
+            bool: True 表示前缀保持不变（可以命中缓存）
+        """
+        tools_digest = hashlib.sha1(_canonical_json(request_params.get("tools")).encode("utf-8")).hexdigest()
+        message_digests = [
+            hashlib.sha1(_canonical_json(message).encode("utf-8")).hexdigest()
+            for message in request_params.get("messages", [])
+        ]
+
+        previous = self._message_digests
+        kept = (
+            self._tools_digest in (None, tools_digest)
+            and message_digests[:len(previous)] == previous
+        )
+        if not kept:
+            self.prefix_breaks += 1
+
+        self._tools_digest = tools_digest
+        self._message_digests = message_digests
+        return kept
+
+    def record_usage(self, prompt_tokens: int, cached_tokens: int) -> None:
+        """
+        记录一次请求的缓存用量
+
+        参数:
+            prompt_tokens: 输入token数
+            cached_tokens: 其中命中缓存的token数
+        """
+        self.requests += 1
+        self.prompt_tokens += prompt_tokens or 0
+        self.cached_tokens += cached_tokens or 0
+
+    def snapshot(self) -> dict:
+        """返回统计摘要"""
+        return {
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "hit_rate": self.hit_rate,
+            "prefix_breaks": self.prefix_breaks,
+        }
@@ -0,0 +1,723 @@
+# -*- coding: utf-8 -*-
+"""
+异步速率限制器
+
+按供应商账户同时限制三种额度，等待时只挂起当前协程，不阻塞事件循环：
+
+    - RPM：每分钟请求数（令牌桶，容量 rpm，每秒补充 rpm / 60）
+    - TPM：每分钟token数（令牌桶，请求前按输入token估算扣除，结束后按 usage 多退少补）
+    - 并发：同时进行中的请求数（整个流式响应结束前占用一个名额）
+
+等待者按到达顺序排队（先到先得），排在前面的请求额度不足时后面的请求不会插队，
+避免大请求被小请求持续饿死。
+
+多进程部署（多个 uvicorn worker / MCP 进程）时，通过 rate_limiters.use_shared_store()
+把 RPM / TPM 令牌桶放到同一台机器共享的 SQLite 文件中，整个节点按一个账户额度限速；
+并发上限仍按进程计算。
+
+注册表创建的限速器默认开启自适应限速（AIMD，见 AdaptiveRate）：客户端把响应头交给 on_response、
+把 429 交给 on_throttled，限速器按供应商返回的真实上限和 Retry-After 调整发送速率，
+学到的结果保存在状态文件中（默认 Data/ratelimit/adaptive_state.json，部署时用
+rate_limiters.use_state_file() 指定运行数据目录），重启后继续使用；事件循环中的保存在线程池中执行。
+
+配置（config.json 中模型的 rate_limit 字段，未配置的项不限制）：
+    "moonshot-v1-8k": {"base_url": "...", "model": "moonshot-v1-8k", "rate_limit": {"rpm": 3, "tpm": 32000, "concurrency": 1}}
+
+典型用法：
+    >>> limiter = rate_limiters.get("kimi:Free:3f2a...", rpm=3, tpm=32000, concurrency=1)
+    >>> permit = await limiter.acquire(tokens=1200)
+    >>> try:
+    ...     ...  # 发送请求
+    ... finally:
+    ...     permit.release(actual_tokens=usage["total_tokens"])
+"""
+
+import os
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+from logger import logger
+from .AdaptiveRate import DEFAULT_RETRY_AFTER, AIMDController, AdaptiveStateFile, parse_rate_limit_headers
+
+
+# rate_limit 配置支持的字段
+RATE_LIMIT_FIELDS = ("rpm", "tpm", "concurrency")
+
+# 默认的共享令牌桶文件
+DEFAULT_STORE_PATH = os.path.join(
+    os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..")),
+    "Data", "ratelimit", "buckets.sqlite3"
+)
+
+
+class TokenBucket:
+    """
+    令牌桶（非线程安全，由 AsyncRateLimiter 在事件循环中串行调用）
+
+    余量可以为负（实际用量超过估算时记为欠额），欠额补齐之前新的请求需要等待。
+
+    属性:
+        capacity: 桶容量（突发上限）
+        rate: 每秒补充的令牌数
+    """
+
+    __slots__ = ("capacity", "rate", "_tokens", "_updated")
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def tokens(self) -> float:
+        """当前余量"""
+        self._refill()
+        return self._tokens
+
+    def wait_time(self, amount: float) -> float:
+        """余量达到 amount 还需等待的秒数"""
+        self._refill()
+        if self._tokens >= amount:
+            return 0.0
+        return (amount - self._tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        """扣除令牌（允许扣成负数）"""
+        self._refill()
+        self._tokens -= amount
+
+    def refund(self, amount: float) -> None:
+        """退还令牌（不超过容量）"""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + amount)
+
+    def resize(self, capacity: float, rate: float) -> None:
+        """调整容量和补充速率，保留当前余量（不超过新容量）"""
+        self._refill()
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self._tokens = min(self.capacity, self._tokens)
+
+
+class SQLiteBucketStore:
+    """
+    跨进程共享的令牌桶（SQLite）
+
+    每次检查和扣除在一个 BEGIN IMMEDIATE 事务中完成（同一时间只有一个进程能写），
+    多个桶（RPM 和 TPM）要么同时扣除，要么都不扣除。补充按墙上时间计算，所有进程共用同一时钟。
+    每个线程使用独立的连接；调用方应在线程池中执行（见 AsyncRateLimiter）。
+
+    属性:
+        path: 数据库文件路径
+    """
+
+    def __init__(self, path: Optional[str] = None, timeout: float = 5.0):
+        """
+        参数:
+            path: 数据库文件路径，默认为 Data/ratelimit/buckets.sqlite3
+            timeout: 等待其他进程释放写锁的超时时间（秒）
+        """
+        self.path = path or DEFAULT_STORE_PATH
+        self.timeout = timeout
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._local = threading.local()
+
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "scope TEXT NOT NULL, kind TEXT NOT NULL, tokens REAL NOT NULL, updated REAL NOT NULL, "
+            "PRIMARY KEY (scope, kind))"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        """当前线程的连接（自动提交模式，事务由 BEGIN IMMEDIATE 显式控制）"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            self._local.connection = connection
+        return connection
+
+    def try_acquire(self, scope: str, demands: Dict[str, tuple]) -> float:
+        """
+        原子地检查并扣除多个桶的令牌
+
+        参数:
+            scope: 账户标识
+            demands: 桶名 -> (扣除数量, 容量, 每秒补充数量)
+
+        返回:
+            float: 0 表示已全部扣除；否则为还需等待的秒数（本次没有扣除任何桶）
+        """
+        connection = self._connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            levels, wait = {}, 0.0
+            for kind, (amount, capacity, rate) in demands.items():
+                row = connection.execute(
+                    "SELECT tokens, updated FROM buckets WHERE scope = ? AND kind = ?", (scope, kind)
+                ).fetchone()
+                tokens = capacity if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+                needed = min(amount, capacity)
+                if tokens < needed:
+                    wait = max(wait, (needed - tokens) / rate)
+                levels[kind] = tokens
+
+            for kind, (amount, _, _) in demands.items():
+                tokens = levels[kind] - amount if wait <= 0 else levels[kind]
+                connection.execute(
+                    "INSERT OR REPLACE INTO buckets (scope, kind, tokens, updated) VALUES (?, ?, ?, ?)",
+                    (scope, kind, tokens, now)
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return wait
+
+    def adjust(self, scope: str, kind: str, delta: float, capacity: float, rate: float) -> None:
+        """
+        调整桶的余量（正数退还，负数追加扣除），用于按实际用量校正 TPM
+        """
+        connection = self._connection()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT tokens, updated FROM buckets WHERE scope = ? AND kind = ?", (scope, kind)
+            ).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+            connection.execute(
+                "INSERT OR REPLACE INTO buckets (scope, kind, tokens, updated) VALUES (?, ?, ?, ?)",
+                (scope, kind, min(capacity, tokens + delta), now)
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def level(self, scope: str, kind: str, capacity: float, rate: float) -> float:
+        """查询桶的当前余量（只读）"""
+        row = self._connection().execute(
+            "SELECT tokens, updated FROM buckets WHERE scope = ? AND kind = ?", (scope, kind)
+        ).fetchone()
+        if row is None:
+            return capacity
+        return min(capacity, row[0] + max(0.0, time.time() - row[1]) * rate)
+
+
+class RateLimitPermit:
+    """
+    一次请求占用的额度，请求结束后调用 release 归还并发名额、按实际用量校正 TPM
+
+    也可以作为异步上下文管理器使用：
+        >>> async with await limiter.acquire(tokens=1200) as permit:
+        ...     permit.actual_tokens = usage["total_tokens"]
+    """
+
+    __slots__ = ("_limiter", "tokens", "actual_tokens", "waited", "_released")
+
+    def __init__(self, limiter: "AsyncRateLimiter", tokens: int, waited: float):
+        self._limiter = limiter
+        self.tokens = tokens
+        self.actual_tokens: Optional[int] = None
+        self.waited = waited
+        self._released = False
+
+    def release(self, actual_tokens: Optional[int] = None) -> None:
+        """
+        归还并发名额，按实际用量校正 TPM（重复调用无效）
+
+        参数:
+            actual_tokens: 实际消耗的token数（usage.total_tokens），None 表示沿用估算值
+        """
+        if self._released:
+            return
+        self._released = True
+        if actual_tokens is not None:
+            self.actual_tokens = actual_tokens
+        self._limiter._release(self)
+
+    async def __aenter__(self) -> "RateLimitPermit":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.release()
+
+
+class AsyncRateLimiter:
+    """
+    RPM / TPM / 并发 三合一异步限速器
+
+    同一个限速器只能在一个事件循环中使用；没有进行中的请求时切换事件循环会重建内部的锁。
+
+    设置共享存储（store）后，RPM / TPM 额度在所有使用同一存储和同一 name 的进程间共享：
+    进程内的令牌桶只记录本进程的用量，它已经需要等待时直接等待，不访问存储（快速路径）；
+    只有排在队首的请求访问存储，在线程池中执行，不阻塞事件循环。
+
+    属性:
+        name: 名称（日志和统计使用，共享存储中的账户标识）
+        rpm: 每分钟请求数上限，None 表示不限制
+        tpm: 每分钟token数上限，None 表示不限制
+        concurrency: 并发请求数上限，None 表示不限制
+        adaptive: AIMD 控制器，None 表示不自适应（rpm / tpm 为生效的上限，令牌桶按上限 × 系数限速）
+    """
+
+    # 429 时用于估算真实 RPM 的统计窗口（秒）
+    GRANT_WINDOW = 60.0
+    # 没有变化时保存自适应状态的最小间隔（秒）
+    SAVE_INTERVAL = 10.0
+
+    def __init__(
+        self,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        name: str = "",
+        store: Optional[SQLiteBucketStore] = None,
+        adaptive: Optional[AIMDController] = None,
+        state_file: Optional[AdaptiveStateFile] = None
+    ):
+        self.name = name
+        self.store = store
+        self.adaptive = adaptive
+        self.state_file = state_file if adaptive is not None else None
+        if self.state_file is not None:
+            saved = self.state_file.load(name)
+            if saved:
+                adaptive.restore(saved)
+                logger.info(f"[{name}] 恢复自适应限速状态: 系数 {adaptive.factor:.2f}，上限 {adaptive.learned}")
+        self.rpm = self.tpm = self.concurrency = None
+        self.configured = {"rpm": None, "tpm": None, "concurrency": None}
+        self._rpm_bucket: Optional[TokenBucket] = None
+        self._tpm_bucket: Optional[TokenBucket] = None
+        self._paused_until = 0.0  # 供应商要求暂停到的时间（monotonic）
+        self._grants = deque()  # 最近 GRANT_WINDOW 秒内放行的时间
+        self._saved_at = 0.0
+        self._saving: Optional[asyncio.Future] = None  # 线程池中正在执行的保存
+        self._unsaved: Optional[Dict[str, Any]] = None  # 保存期间产生的新状态（只保留最新的）
+        self.set_limits(rpm, tpm, concurrency)
+
+        self._in_flight = 0
+        self._waiting = 0
+        self._loop = None
+        self._queue: Optional[asyncio.Lock] = None  # 排队锁：队首持有，保证先到先得
+        self._slot_released: Optional[asyncio.Event] = None  # 有请求结束时置位，唤醒等待并发名额的队首
+
+        # 统计
+        self.requests = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.tokens_estimated = 0
+        self.tokens_actual = 0
+        self.store_calls = 0
+        self.throttle_events = 0
+        self.paused_total = 0.0
+
+    def set_limits(self, rpm: Optional[int] = None, tpm: Optional[int] = None, concurrency: Optional[int] = None) -> None:
+        """
+        设置额度（配置热更新或账户等级变化时调用，进行中的请求不受影响）
+
+        异常:
+            ValueError: 额度不是正整数
+        """
+        for field, value in (("rpm", rpm), ("tpm", tpm), ("concurrency", concurrency)):
+            if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value <= 0):
+                raise ValueError(f"{field} 必须是大于0的整数")
+
+        self.configured = {"rpm": rpm, "tpm": tpm, "concurrency": concurrency}
+        self.concurrency = concurrency
+        self._apply_limits()
+
+    @property
+    def factor(self) -> float:
+        """当前速率系数（不自适应时为 1）"""
+        return self.adaptive.factor if self.adaptive is not None else 1.0
+
+    def _apply_limits(self) -> None:
+        """按 上限 × 系数 调整令牌桶（上限优先使用学到的值），保留桶中余量"""
+        learned = self.adaptive.learned if self.adaptive is not None else {}
+        self.rpm = learned.get("rpm") or self.configured["rpm"]
+        self.tpm = learned.get("tpm") or self.configured["tpm"]
+        self._rpm_bucket = self._resize_bucket(self._rpm_bucket, self.rpm)
+        self._tpm_bucket = self._resize_bucket(self._tpm_bucket, self.tpm)
+
+    def _resize_bucket(self, bucket: Optional[TokenBucket], limit: Optional[int]) -> Optional[TokenBucket]:
+        if not limit:
+            return None
+        effective = max(1.0, limit * self.factor)
+        if bucket is None:
+            return TokenBucket(effective, effective / 60.0)
+        bucket.resize(effective, effective / 60.0)
+        return bucket
+
+    def _primitives(self) -> asyncio.Lock:
+        """获取当前事件循环的排队锁（事件循环变化时重建）"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            if self._in_flight or self._waiting:
+                raise RuntimeError(f"速率限制器 {self.name} 正在另一个事件循环中使用")
+            self._loop = loop
+            self._queue = asyncio.Lock()
+            self._slot_released = asyncio.Event()
+        return self._queue
+
+    async def acquire(self, tokens: int = 0) -> RateLimitPermit:
+        """
+        等待额度并占用（先到先得）
+
+        参数:
+            tokens: 本次请求预计消耗的token数（通常为输入token估算值）
+
+        返回:
+            RateLimitPermit: 请求结束后必须调用 release
+        """
+        tokens = max(0, int(tokens or 0))
+        if self._tpm_bucket is not None and tokens > self._tpm_bucket.capacity:
+            logger.warning(f"[{self.name}] 预计token数 {tokens} 超过 TPM 上限 {self.tpm}，按上限等待")
+        start = time.monotonic()
+        queue = self._primitives()
+
+        self._waiting += 1
+        try:
+            async with queue:
+                # 并发名额
+                while self.concurrency is not None and self._in_flight >= self.concurrency:
+                    self._slot_released.clear()
+                    await self._slot_released.wait()
+
+                # RPM / TPM 令牌，以及供应商要求的暂停
+                while True:
+                    wait = self._paused_until - time.monotonic()
+                    if self._rpm_bucket is not None:
+                        wait = max(wait, self._rpm_bucket.wait_time(1))
+                    if self._tpm_bucket is not None:
+                        wait = max(wait, self._tpm_bucket.wait_time(min(tokens, self._tpm_bucket.capacity)))
+                    if wait <= 0:
+                        break
+                    await asyncio.sleep(wait)
+
+                # 共享额度（其他进程的用量）
+                if self.store is not None:
+                    await self._acquire_shared(tokens)
+
+                if self._rpm_bucket is not None:
+                    self._rpm_bucket.consume(1)
+                if self._tpm_bucket is not None:
+                    self._tpm_bucket.consume(tokens)
+                self._in_flight += 1
+                if self.adaptive is not None:
+                    self._record_grant()
+        finally:
+            self._waiting -= 1
+
+        waited = time.monotonic() - start
+        self.requests += 1
+        self.tokens_estimated += tokens
+        self.total_wait += waited
+        if waited > 0.01:
+            self.throttled += 1
+            logger.debug(f"[{self.name}] 速率限制等待 {waited:.2f} 秒")
+        return RateLimitPermit(self, tokens, waited)
+
+    def _record_grant(self) -> None:
+        now = time.monotonic()
+        self._grants.append(now)
+        while self._grants and now - self._grants[0] > self.GRANT_WINDOW:
+            self._grants.popleft()
+
+    # ================ 供应商反馈 ================
+
+    def on_response(self, headers: Any) -> None:
+        """
+        请求成功：学习响应头中的真实上限，额度耗尽时暂停到重置时间，速率系数加性增长
+
+        参数:
+            headers: 响应头（dict 或 httpx.Headers）
+        """
+        info = parse_rate_limit_headers(headers)
+        for kind in ("requests", "tokens"):
+            if info.get(f"remaining_{kind}") == 0 and info.get(f"reset_{kind}"):
+                self._pause(info[f"reset_{kind}"])
+        if self.adaptive is None:
+            return
+        learned = self.adaptive.learn(info)
+        increased = self.adaptive.on_success()
+        if learned or increased:
+            self._apply_limits()
+        self._save(force=learned)
+
+    def on_throttled(self, headers: Any = None) -> float:
+        """
+        收到 429：按 Retry-After 暂停，速率系数乘性减小
+
+        没有配置也没有学到 RPM 上限时，把最近一分钟实际放行的请求数作为 RPM 上限。
+
+        参数:
+            headers: 429 响应的响应头
+
+        返回:
+            float: 暂停的秒数
+        """
+        info = parse_rate_limit_headers(headers)
+        pause = info.get("retry_after")
+        if pause is None:
+            pause = max([info.get("reset_requests", 0.0), info.get("reset_tokens", 0.0)]) or DEFAULT_RETRY_AFTER
+        self._pause(pause)
+        self.throttle_events += 1
+
+        if self.adaptive is not None:
+            self.adaptive.learn(info)
+            if not self.rpm and not self.adaptive.learned.get("rpm"):
+                now = time.monotonic()
+                observed = sum(1 for t in self._grants if now - t <= self.GRANT_WINDOW)
+                self.adaptive.learned["rpm"] = max(1, observed)
+            self.adaptive.on_throttle()
+            self._apply_limits()
+            self._save(force=True)
+        logger.warning(f"[{self.name}] 触发供应商限流，暂停 {pause:.2f} 秒，速率系数 {self.factor:.2f}")
+        return pause
+
+    def _pause(self, seconds: float) -> None:
+        until = time.monotonic() + seconds
+        if until > self._paused_until:
+            self.paused_total += until - max(self._paused_until, time.monotonic())
+            self._paused_until = until
+
+    def _save(self, force: bool = False) -> None:
+        """保存自适应状态（没有重要变化时按 SAVE_INTERVAL 限频）"""
+        if self.state_file is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._saved_at < self.SAVE_INTERVAL:
+            return
+        self._saved_at = now
+        state = self.adaptive.to_dict()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None:
+            self.state_file.save(self.name, state)
+            return
+        # 文件写入在线程池中执行，不阻塞事件循环；上一次保存未完成时等它完成后再写最新状态
+        if self._saving is not None and not self._saving.done():
+            self._unsaved = state
+            return
+        self._start_save(loop, state)
+
+    def _start_save(self, loop: asyncio.AbstractEventLoop, state: Dict[str, Any]) -> None:
+        self._saving = loop.run_in_executor(None, self.state_file.save, self.name, state)
+        self._saving.add_done_callback(self._on_saved)
+
+    def _on_saved(self, future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(f"[{self.name}] 保存自适应限速状态失败: {future.exception()}")
+        state, self._unsaved = self._unsaved, None
+        if state is not None and self.state_file is not None:
+            self._start_save(future.get_loop(), state)
+
+    def _demands(self, tokens: int) -> Dict[str, tuple]:
+        """本次请求在共享存储中需要扣除的桶"""
+        demands = {}
+        if self._rpm_bucket is not None:
+            demands["rpm"] = (1, self._rpm_bucket.capacity, self._rpm_bucket.rate)
+        if self._tpm_bucket is not None:
+            demands["tpm"] = (tokens, self._tpm_bucket.capacity, self._tpm_bucket.rate)
+        return demands
+
+    async def _acquire_shared(self, tokens: int) -> None:
+        """在共享存储中等待并扣除额度"""
+        demands = self._demands(tokens)
+        while demands:
+            self.store_calls += 1
+            wait = await asyncio.to_thread(self.store.try_acquire, self.name, demands)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def _release(self, permit: RateLimitPermit) -> None:
+        """归还并发名额并校正 TPM（由 RateLimitPermit.release 调用）"""
+        self._in_flight -= 1
+        actual = permit.actual_tokens
+        if actual is not None:
+            self.tokens_actual += actual
+            if self._tpm_bucket is not None:
+                difference = actual - permit.tokens
+                if difference > 0:
+                    self._tpm_bucket.consume(difference)
+                elif difference < 0:
+                    self._tpm_bucket.refund(-difference)
+                if difference and self.store is not None:
+                    self._adjust_shared(-difference)
+        else:
+            self.tokens_actual += permit.tokens
+
+        if self._slot_released is not None:
+            self._slot_released.set()
+
+    def _adjust_shared(self, delta: float) -> None:
+        """校正共享存储中的 TPM（在线程池中执行，不等待结果）"""
+        args = (self.name, "tpm", delta, self._tpm_bucket.capacity, self._tpm_bucket.rate)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None:
+            self.store.adjust(*args)
+            return
+        loop.run_in_executor(None, self.store.adjust, *args).add_done_callback(self._on_adjusted)
+
+    def _on_adjusted(self, future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(f"[{self.name}] 校正共享 TPM 失败: {future.exception()}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回额度和统计摘要"""
+        return {
+            "name": self.name,
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "concurrency": self.concurrency,
+            "configured": dict(self.configured),
+            "adaptive": self.adaptive is not None,
+            "factor": self.factor,
+            "effective_rpm": self._rpm_bucket.capacity if self._rpm_bucket else None,
+            "effective_tpm": self._tpm_bucket.capacity if self._tpm_bucket else None,
+            "paused": max(0.0, self._paused_until - time.monotonic()),
+            "throttle_events": self.throttle_events,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "rpm_available": self._rpm_bucket.tokens if self._rpm_bucket else None,
+            "tpm_available": self._tpm_bucket.tokens if self._tpm_bucket else None,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "total_wait": self.total_wait,
+            "tokens_estimated": self.tokens_estimated,
+            "tokens_actual": self.tokens_actual,
+            "shared": self.store is not None,
+            "store_calls": self.store_calls,
+        }
+
+
+class RateLimiterRegistry:
+    """
+    限速器注册表（线程安全）
+
+    同一账户（供应商 + 等级 + API密钥）的所有模型实例和会话共享一个限速器。
+
+    属性:
+        adaptive: 新建的限速器是否开启自适应限速
+        state_file: 自适应状态文件，None 表示不保存
+    """
+
+    def __init__(self, adaptive: bool = True, state_path: Optional[str] = None):
+        """
+        参数:
+            adaptive: 新建的限速器是否开启自适应限速
+            state_path: 自适应状态文件路径，默认为 Data/ratelimit/adaptive_state.json（运行数据，不纳入版本管理）
+        """
+        self._limiters: Dict[str, AsyncRateLimiter] = {}
+        self._store: Optional[SQLiteBucketStore] = None
+        self._lock = threading.Lock()
+        self.adaptive = adaptive
+        self.state_file: Optional[AdaptiveStateFile] = AdaptiveStateFile(state_path) if adaptive else None
+
+    def use_shared_store(self, path: Optional[str] = None) -> SQLiteBucketStore:
+        """
+        让所有限速器（包括之后创建的）在进程间共享 RPM / TPM 额度
+
+        同一节点的每个进程在启动时调用一次，传入相同的路径。
+
+        参数:
+            path: SQLite 文件路径，默认为 Data/ratelimit/buckets.sqlite3
+
+        返回:
+            SQLiteBucketStore: 共享存储
+        """
+        store = SQLiteBucketStore(path)
+        with self._lock:
+            self._store = store
+            for limiter in self._limiters.values():
+                limiter.store = store
+        return store
+
+    def use_state_file(self, path: Optional[str]) -> Optional[AdaptiveStateFile]:
+        """
+        设置自适应状态文件（如部署时的运行数据目录），已创建的限速器之后也保存到这里
+
+        在创建限速器（第一个请求）之前调用时，新限速器从这个文件恢复状态。
+
+        参数:
+            path: 文件路径，None 表示不保存
+
+        返回:
+            AdaptiveStateFile: 状态文件（不保存或未开启自适应限速时为 None）
+        """
+        with self._lock:
+            self.state_file = AdaptiveStateFile(path) if self.adaptive and path else None
+            for limiter in self._limiters.values():
+                if limiter.adaptive is not None:
+                    limiter.state_file = self.state_file
+            return self.state_file
+
+    def use_local_store(self) -> None:
+        """恢复为进程内限速"""
+        with self._lock:
+            self._store = None
+            for limiter in self._limiters.values():
+                limiter.store = None
+
+    @staticmethod
+    def scope(vendor: str, api_key: Optional[str], tier: Optional[str] = None) -> str:
+        """生成账户标识（API密钥只保留摘要）"""
+        digest = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:12]
+        return f"{vendor}:{tier or 'default'}:{digest}"
+
+    def get(
+        self,
+        scope: str,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None,
+        concurrency: Optional[int] = None
+    ) -> AsyncRateLimiter:
+        """
+        获取（不存在则创建）账户的限速器，额度与已有限速器不同时更新额度
+        """
+        with self._lock:
+            limiter = self._limiters.get(scope)
+            if limiter is None:
+                limiter = self._limiters[scope] = AsyncRateLimiter(
+                    rpm, tpm, concurrency, name=scope, store=self._store,
+                    adaptive=AIMDController() if self.adaptive else None, state_file=self.state_file
+                )
+            elif tuple(limiter.configured.values()) != (rpm, tpm, concurrency):
+                limiter.set_limits(rpm, tpm, concurrency)
+            return limiter
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """所有限速器的统计"""
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return {limiter.name: limiter.snapshot() for limiter in limiters}
+
+    def clear(self) -> None:
+        """清空注册表"""
+        with self._lock:
+            self._limiters.clear()
+
+
+# 全局限速器注册表
+rate_limiters = RateLimiterRegistry()
@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+"""
+优先级请求调度器
+
+交互式对话和后台批处理共用同一个供应商账户额度。调度器放在速率限制器前面，
+每个账户只放行 slots 个请求进入限速器，其余请求在调度器中按以下规则排队：
+
+    - 优先级：interactive > default > batch，高优先级的请求总是先放行
+    - 同一优先级内按租户做加权公平排队（WFQ）：每个请求按 cost / 租户权重 计算虚拟完成时间，
+      完成时间最小的先放行，一个租户提交再多请求也不会饿死其他租户
+    - 截止时间：排队超过 deadline 的请求直接丢弃（抛出 RequestDropped），不再占用额度
+    - 抢占：交互式请求到达时，可抢占（默认 batch）的请求让出名额 ——
+      已放行但还没发出的请求全部让出，名额已满时再中断一个正在进行的请求（抛出 RequestPreempted）
+
+每个优先级的排队数、进行数、等待时间分位数见 snapshot()。
+
+典型用法：
+    >>> scheduler = request_schedulers.get("kimi:Tier1:3f2a...", slots=4)
+    >>> async with await scheduler.acquire(priority="batch", tenant="report-job") as ticket:
+    ...     permit = await limiter.acquire(tokens)
+    ...     ticket.mark_started()
+    ...     ...  # 发送请求
+"""
+
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+from typing import Any, Dict, List, Optional
+
+from logger import logger
+from .StreamMetrics import LatencyHistogram
+
+
+# 优先级（越靠前越优先）
+PRIORITY_CLASSES = ("interactive", "default", "batch")
+
+# 默认可被抢占的优先级
+PREEMPTIBLE_CLASSES = ("batch",)
+
+# 限速器没有并发上限时，每个账户默认放行的请求数
+DEFAULT_SLOTS = 4
+
+
+class RequestDropped(RuntimeError):
+    """请求排队超过截止时间，已丢弃"""
+
+
+class RequestPreempted(RuntimeError):
+    """请求被更高优先级的请求抢占"""
+
+
+class ScheduleTicket:
+    """
+    调度凭证：放行后持有一个名额，请求结束后必须调用 release（或使用 async with）
+
+    属性:
+        priority: 优先级
+        tenant: 租户
+        deadline: 截止时间（monotonic），None 表示不限
+        preemptible: 是否可被抢占
+        started: 请求是否已经发出（mark_started）
+        preempted: 是否已被抢占
+        waited: 排队时间（秒）
+    """
+
+    __slots__ = (
+        "priority", "tenant", "cost", "deadline", "preemptible", "started", "preempted", "waited",
+        "_scheduler", "_rank", "_enqueued", "_future", "_task", "_cancelled", "_released", "_absorbed"
+    )
+
+    def __init__(self, scheduler: "RequestScheduler", priority: str, tenant: str, cost: float,
+                 deadline: Optional[float], preemptible: bool):
+        self.priority = priority
+        self.tenant = tenant
+        self.cost = cost
+        self.deadline = deadline
+        self.preemptible = preemptible
+        self.started = False
+        self.preempted = False
+        self.waited = 0.0
+        self._scheduler = scheduler
+        self._rank = PRIORITY_CLASSES.index(priority)
+        self._enqueued = time.monotonic()
+        self._future: Optional[asyncio.Future] = None
+        self._task: Optional[asyncio.Task] = None
+        self._cancelled = False  # 排队中放弃（超时 / 调用方取消），出队时跳过
+        self._released = False
+        self._absorbed = False
+
+    def mark_started(self) -> None:
+        """请求已经发出（之后被抢占会浪费已消耗的额度，只在名额已满时才会被中断）"""
+        self.started = True
+
+    def absorb_preemption(self) -> bool:
+        """
+        在捕获 CancelledError 时调用：取消由抢占引起时撤销取消
+
+        返回:
+            bool: True 表示取消完全由抢占引起（调用方应抛出 RequestPreempted），False 表示应继续传播取消
+        """
+        if not self.preempted or self._absorbed or self._task is None:
+            return False
+        self._absorbed = True
+        return self._task.uncancel() == 0
+
+    def release(self) -> None:
+        """归还名额（重复调用无效）"""
+        if self._released:
+            return
+        self._released = True
+        self._scheduler._release(self)
+
+    async def __aenter__(self) -> "ScheduleTicket":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.release()
+        if exc_type is asyncio.CancelledError and self.absorb_preemption():
+            raise RequestPreempted(f"{self.priority} 请求被更高优先级的请求抢占") from None
+
+
+class _ClassStats:
+    """单个优先级的统计"""
+
+    __slots__ = ("queued", "running", "dispatched", "dropped", "preempted", "wait")
+
+    def __init__(self):
+        self.queued = 0
+        self.running = 0
+        self.dispatched = 0
+        self.dropped = 0
+        self.preempted = 0
+        self.wait = LatencyHistogram()
+
+    def summary(self) -> Dict[str, Any]:
+        wait = self.wait.summary()
+        return {
+            "queued": self.queued,
+            "running": self.running,
+            "dispatched": self.dispatched,
+            "dropped": self.dropped,
+            "preempted": self.preempted,
+            "wait_p50": wait["p50"],
+            "wait_p95": wait["p95"],
+            "wait_max": wait["max"],
+        }
+
+
+class RequestScheduler:
+    """
+    单个账户的请求调度器（在一个事件循环中使用）
+
+    属性:
+        name: 名称（通常与限速器相同）
+        slots: 同时放行的请求数
+        preemption: 是否允许抢占
+    """
+
+    def __init__(self, slots: int = DEFAULT_SLOTS, name: str = "", preemption: bool = True):
+        if not isinstance(slots, int) or slots <= 0:
+            raise ValueError("slots 必须是大于0的整数")
+        self.name = name
+        self.slots = slots
+        self.preemption = preemption
+        self._running: List[ScheduleTicket] = []
+        # 每个优先级一个堆：(虚拟完成时间, 序号, 凭证)
+        self._queues: List[list] = [[] for _ in PRIORITY_CLASSES]
+        self._virtual_time = [0.0 for _ in PRIORITY_CLASSES]
+        self._tenant_finish: List[Dict[str, float]] = [{} for _ in PRIORITY_CLASSES]
+        self._weights: Dict[str, float] = {}
+        self._sequence = itertools.count()
+        self._stats = {priority: _ClassStats() for priority in PRIORITY_CLASSES}
+
+    def set_weight(self, tenant: str, weight: float) -> None:
+        """设置租户权重（默认 1，权重为 2 的租户获得两倍份额）"""
+        if weight <= 0:
+            raise ValueError("weight 必须大于0")
+        self._weights[tenant] = float(weight)
+
+    async def acquire(
+        self,
+        priority: str = "default",
+        tenant: str = "default",
+        deadline: Optional[float] = None,
+        preemptible: Optional[bool] = None,
+        cost: float = 1.0
+    ) -> ScheduleTicket:
+        """
+        排队等待名额
+
+        参数:
+            priority: 优先级，interactive / default / batch
+            tenant: 租户（同一优先级内按租户公平分配）
+            deadline: 最多排队的秒数，None 表示不限
+            preemptible: 是否可被抢占，None 时 batch 可被抢占
+            cost: 请求的相对成本（如预计token数），WFQ 按 cost / 权重 计算份额
+
+        返回:
+            ScheduleTicket: 放行凭证
+
+        异常:
+            ValueError: 参数无效
+            RequestDropped: 排队超过截止时间
+        """
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"priority 必须是 {PRIORITY_CLASSES} 之一，当前值为: {priority}")
+        if deadline is not None and deadline <= 0:
+            raise ValueError("deadline 必须大于0")
+        if cost <= 0:
+            raise ValueError("cost 必须大于0")
+        if preemptible is None:
+            preemptible = priority in PREEMPTIBLE_CLASSES
+
+        loop = asyncio.get_running_loop()
+        ticket = ScheduleTicket(self, priority, tenant or "default", cost,
+                                time.monotonic() + deadline if deadline else None, preemptible)
+        ticket._future = loop.create_future()
+        ticket._task = asyncio.current_task()
+        self._enqueue(ticket)
+        self._dispatch()
+        if not ticket._future.done() and not ticket.preemptible:
+            self._preempt_for(ticket)
+
+        try:
+            if deadline is None:
+                await asyncio.shield(ticket._future)
+            else:
+                await asyncio.wait_for(asyncio.shield(ticket._future), ticket.deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            if not ticket._future.done():
+                self._abandon(ticket, dropped=True)
+                raise RequestDropped(f"[{self.name}] {priority} 请求排队超过 {deadline:.2f} 秒，已丢弃") from None
+        except asyncio.CancelledError:
+            if ticket._future.done() and ticket._future.exception() is None:
+                ticket.release()
+            else:
+                self._abandon(ticket)
+            raise
+        # 放行时已经过期由 _dispatch 设置异常
+        return ticket._future.result()
+
+    # ================ 排队与放行 ================
+
+    def _enqueue(self, ticket: ScheduleTicket) -> None:
+        """按 WFQ 计算虚拟完成时间并入队"""
+        rank = ticket._rank
+        start = max(self._virtual_time[rank], self._tenant_finish[rank].get(ticket.tenant, 0.0))
+        finish = start + ticket.cost / self._weights.get(ticket.tenant, 1.0)
+        self._tenant_finish[rank][ticket.tenant] = finish
+        heapq.heappush(self._queues[rank], (finish, next(self._sequence), ticket))
+        self._stats[ticket.priority].queued += 1
+
+    def _abandon(self, ticket: ScheduleTicket, dropped: bool = False) -> None:
+        """排队中放弃（堆中的条目在出队时跳过）"""
+        if ticket._cancelled:
+            return
+        ticket._cancelled = True
+        stats = self._stats[ticket.priority]
+        stats.queued -= 1
+        if dropped:
+            stats.dropped += 1
+
+    def _next(self) -> Optional[ScheduleTicket]:
+        """取出下一个要放行的请求，跳过已放弃和已过期的请求"""
+        now = time.monotonic()
+        for rank, queue in enumerate(self._queues):
+            while queue:
+                finish, _, ticket = heapq.heappop(queue)
+                if ticket._cancelled:
+                    continue
+                if ticket.deadline is not None and ticket.deadline <= now:
+                    self._abandon(ticket, dropped=True)
+                    ticket._future.set_exception(RequestDropped(f"[{self.name}] {ticket.priority} 请求已过截止时间，已丢弃"))
+                    continue
+                self._virtual_time[rank] = max(self._virtual_time[rank], finish - ticket.cost / self._weights.get(ticket.tenant, 1.0))
+                return ticket
+        return None
+
+    def _dispatch(self) -> None:
+        """有空闲名额时按优先级和 WFQ 顺序放行"""
+        while len(self._running) < self.slots:
+            ticket = self._next()
+            if ticket is None:
+                return
+            stats = self._stats[ticket.priority]
+            stats.queued -= 1
+            stats.running += 1
+            stats.dispatched += 1
+            ticket.waited = time.monotonic() - ticket._enqueued
+            stats.wait.record(ticket.waited)
+            self._running.append(ticket)
+            ticket._future.set_result(ticket)
+            if not ticket.preemptible:
+                self._preempt_pending(ticket)
+
+    def _release(self, ticket: ScheduleTicket) -> None:
+        if ticket in self._running:
+            self._running.remove(ticket)
+            self._stats[ticket.priority].running -= 1
+        self._dispatch()
+
+    # ================ 抢占 ================
+
+    def _preempt(self, victim: ScheduleTicket) -> None:
+        victim.preempted = True
+        self._stats[victim.priority].preempted += 1
+        if victim._task is not None and not victim._task.done():
+            victim._task.cancel()
+        logger.info(f"[{self.name}] {victim.priority} 请求（租户 {victim.tenant}）被抢占")
+
+    def _preempt_pending(self, ticket: ScheduleTicket) -> None:
+        """放行高优先级请求时，已放行但还没发出的低优先级可抢占请求让出名额，避免在限速器中排在它前面"""
+        if not self.preemption:
+            return
+        for victim in list(self._running):
+            if victim.preemptible and not victim.started and not victim.preempted and victim._rank > ticket._rank:
+                self._preempt(victim)
+
+    def _preempt_for(self, ticket: ScheduleTicket) -> None:
+        """名额已满时中断一个低优先级可抢占请求（优先选还没发出的，其次选最近放行的）"""
+        if not self.preemption:
+            return
+        candidates = [victim for victim in self._running
+                      if victim.preemptible and not victim.preempted and victim._rank > ticket._rank]
+        if not candidates:
+            return
+        pending = [victim for victim in candidates if not victim.started]
+        if pending:
+            for victim in pending:
+                self._preempt(victim)
+        else:
+            self._preempt(max(candidates, key=lambda victim: (victim._rank, victim._enqueued)))
+
+    # ================ 统计 ================
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回名额占用和每个优先级的排队统计"""
+        return {
+            "name": self.name,
+            "slots": self.slots,
+            "running": len(self._running),
+            "classes": {priority: stats.summary() for priority, stats in self._stats.items()},
+        }
+
+
+class RequestSchedulerRegistry:
+    """
+    调度器注册表（线程安全），同一账户共享一个调度器
+    """
+
+    def __init__(self):
+        self._schedulers: Dict[str, RequestScheduler] = {}
+        self._lock = threading.Lock()
+
+    def get(self, scope: str, slots: int = DEFAULT_SLOTS) -> RequestScheduler:
+        """获取（不存在则创建）账户的调度器，名额数变化时更新"""
+        with self._lock:
+            scheduler = self._schedulers.get(scope)
+            if scheduler is None:
+                scheduler = self._schedulers[scope] = RequestScheduler(slots, name=scope)
+            elif scheduler.slots != slots:
+                scheduler.slots = slots
+            return scheduler
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """所有调度器的统计"""
+        with self._lock:
+            schedulers = list(self._schedulers.values())
+        return {scheduler.name: scheduler.snapshot() for scheduler in schedulers}
+
+    def clear(self) -> None:
+        """清空注册表"""
+        with self._lock:
+            self._schedulers.clear()
+
+
+# 全局调度器注册表
+request_schedulers = RequestSchedulerRegistry()
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+流式缓冲模块
+
+在网络读取协程和下游消费者之间放置一个有界异步队列，
+使读取速度与消费速度解耦，并在消费者过慢时按策略处理：
+
+    - block: 队列满时暂停读取上游（TCP层自然形成背压）
+    - coalesce: 队列满时把连续的文本增量合并成更大的帧，合并帧达到上限后再暂停读取
+    - drop: 队列满且超过等待时间后丢弃该消费者，结束本次流
+
+无论消费者如何表现，每个流占用的内存上限为
+max_frames 个帧 + 1 个不超过 max_frame_chars 字符的合并帧。
+
+典型用法：
+    >>> buffer = StreamBuffer(max_frames=64, policy="coalesce")
+    >>> # 读取协程: await buffer.put({"content": "..."}) ... await buffer.close()
+    >>> # 消费协程: frame = await buffer.get()  # None 表示流结束
+"""
+
+import asyncio
+from typing import Optional
+
+
+# 流结束标记
+_END = object()
+
+
+class StreamBuffer:
+    """
+    单个流的有界缓冲区
+
+    属性:
+        policy: 背压策略（block / coalesce / drop）
+        dropped: 消费者是否已被丢弃
+        coalesced: 被合并掉的帧数量（用于观察消费者是否过慢）
+    """
+
+    # 支持的背压策略
+    POLICIES = ("block", "coalesce", "drop")
+
+    # 可以合并的帧类型（值为字符串的增量）
+    MERGEABLE_TYPES = ("content", "thinking")
+
+    def __init__(
+            self,
+            max_frames: int = 64,
+            policy: str = "block",
+            max_frame_chars: int = 8192,
+            drop_timeout: float = 5.0
+        ):
+        """
+        初始化缓冲区
+
+        参数:
+            max_frames: 队列中最多缓存的帧数
+            policy: 背压策略，可选值见 POLICIES
+            max_frame_chars: coalesce 策略下单个合并帧的最大字符数
+            drop_timeout: drop 策略下队列满时最多等待的秒数
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"policy 必须是 {self.POLICIES} 之一，当前值为: {policy}")
+        if not isinstance(max_frames, int) or max_frames <= 0:
+            raise ValueError("max_frames 必须是大于0的整数")
+        if max_frame_chars <= 0:
+            raise ValueError("max_frame_chars 必须大于0")
+        if drop_timeout < 0:
+            raise ValueError("drop_timeout 不能为负数")
+
+        self.policy = policy
+        self.max_frame_chars = max_frame_chars
+        self.drop_timeout = drop_timeout
+
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_frames)
+        self._tail: Optional[dict] = None  # coalesce 策略下尚未入队的合并帧
+        self._error: Optional[BaseException] = None
+
+        self.dropped = False
+        self.coalesced = 0
+
+    # ================ 读取端 ================
+    async def put(self, frame: dict) -> bool:
+        """
+        写入一个帧（由读取协程调用）
+
+        参数:
+            frame: 结果字典，如 {"content": "..."}
+
+        返回:
+            bool: False 表示消费者已被丢弃，读取协程应停止读取
+        """
+        if self.dropped:
+            return False
+
+        if self.policy == "block":
+            await self._queue.put(frame)
+        elif self.policy == "coalesce":
+            await self._put_coalesce(frame)
+        else:
+            try:
+                await asyncio.wait_for(self._queue.put(frame), timeout=self.drop_timeout)
+            except asyncio.TimeoutError:
+                self._drop()
+                return False
+        return True
+
+    async def close(self, error: Optional[BaseException] = None) -> None:
+        """
+        结束写入（由读取协程调用）
+
+        参数:
+            error: 读取过程中发生的异常，消费者读到结尾时会重新抛出
+        """
+        self._error = error
+        if self.dropped:
+            return
+        if self._tail is not None:
+            await self._queue.put(self._tail)
+            self._tail = None
+        await self._queue.put(_END)
+
+    # ================ 消费端 ================
+    async def get(self) -> Optional[dict]:
+        """
+        读取一个帧（由消费者调用）
+
+        返回:
+            dict: 下一个帧，流结束时返回 None
+
+        异常:
+            RuntimeError: 消费者已因过慢被丢弃
+            Exception: 读取协程传入 close() 的异常
+        """
+        if self.dropped:
+            raise RuntimeError("消费者处理过慢，流已被丢弃")
+
+        # 队列已空但还有合并帧时直接取走，不必等读取协程下一次写入
+        if self._queue.empty() and self._tail is not None:
+            frame, self._tail = self._tail, None
+            return frame
+
+        frame = await self._queue.get()
+        if frame is _END:
+            if self._error is not None:
+                raise self._error
+            return None
+        return frame
+
+    def pending(self) -> int:
+        """当前缓存的帧数（包括合并帧）"""
+        return self._queue.qsize() + (1 if self._tail is not None else 0)
+
+    # ================ 私有方法 ================
+    def _mergeable(self, frame: dict) -> bool:
+        """判断帧是否可以合并（单一键、类型为文本增量、值为字符串）"""
+        if len(frame) != 1:
+            return False
+        data_type, value = next(iter(frame.items()))
+        return data_type in self.MERGEABLE_TYPES and isinstance(value, str)
+
+    async def _put_coalesce(self, frame: dict) -> None:
+        """coalesce 策略的写入逻辑"""
+        # 队列有空位时先把合并帧放回队列，保证帧的顺序
+        if self._tail is not None and not self._queue.full():
+            self._queue.put_nowait(self._tail)
+            self._tail = None
+
+        if self._tail is None:
+            if not self._queue.full():
+                self._queue.put_nowait(frame)
+            elif self._mergeable(frame):
+                self._tail = dict(frame)
+            else:
+                await self._queue.put(frame)
+            return
+
+        # 队列已满且存在合并帧：同类型且未超过上限则继续合并
+        tail_type, tail_value = next(iter(self._tail.items()))
+        if self._mergeable(frame) and tail_type in frame:
+            value = frame[tail_type]
+            if len(tail_value) + len(value) <= self.max_frame_chars:
+                self._tail[tail_type] = tail_value + value
+                self.coalesced += 1
+                return
+
+        # 无法合并：等待合并帧入队（暂停读取上游），再处理当前帧
+        await self._queue.put(self._tail)
+        self._tail = None
+        await self._put_coalesce(frame)
+
+    def _drop(self) -> None:
+        """丢弃消费者并释放缓存"""
+        self.dropped = True
+        self._tail = None
+        while not self._queue.empty():
+            self._queue.get_nowait()
@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+"""
+流式延迟统计模块
+
+记录每次流式请求的关键延迟指标，按 供应商 + 模型 分组存入对数分桶直方图，
+进程内可随时查询分位数，用于发现供应商性能退化和路由决策。
+
+记录的指标：
+    - ttfb: 发出请求到收到第一个chunk的时间（秒）
+    - ttft_content: 发出请求到收到第一个正文token的时间（秒）
+    - ttft_thinking: 发出请求到收到第一个思考token的时间（秒）
+    - chunk_gap: 相邻两个chunk之间的间隔（秒）
+    - tokens_per_second: 输出速度（token/秒，从第一个chunk开始计时）
+    - total_time: 整个流式请求的耗时（秒）
+
+典型用法：
+    >>> from module.AICore.Tool.StreamMetrics import stream_metrics
+    >>> stream_metrics.snapshot(vendor="deepseek")
+    {"deepseek": {"deepseek-chat": {"ttfb": {"count": 3, "p50": 0.41, ...}}}}
+"""
+
+import math
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+class LatencyHistogram:
+    """
+    对数分桶直方图
+
+    桶边界按固定倍率增长，记录为 O(1) 操作，内存占用固定，
+    分位数在桶内做线性插值，相对误差不超过一个桶的宽度（默认约 10%）。
+
+    属性:
+        count: 样本总数
+        total: 样本总和
+        min: 最小样本
+        max: 最大样本
+    """
+
+    def __init__(self, min_value: float = 1e-4, max_value: float = 600.0, growth: float = 1.1):
+        """
+        初始化直方图
+
+        参数:
+            min_value: 第一个桶的上界，小于该值的样本都落入第一个桶
+            max_value: 最后一个有界桶的上界，大于该值的样本落入溢出桶
+            growth: 相邻桶边界的倍率，必须大于1
+        """
+        if min_value <= 0 or max_value <= min_value:
+            raise ValueError("必须满足 0 < min_value < max_value")
+        if growth <= 1:
+            raise ValueError("growth 必须大于 1")
+
+        self._min_value = min_value
+        self._log_min = math.log(min_value)
+        self._log_growth = math.log(growth)
+
+        # 桶上界列表，最后额外一个溢出桶
+        bucket_count = int(math.ceil((math.log(max_value) - self._log_min) / self._log_growth)) + 1
+        self._bounds = [min_value * growth ** i for i in range(bucket_count)]
+        self._counts = [0] * (bucket_count + 1)
+
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+        self._lock = threading.Lock()
+
+    def _bucket_index(self, value: float) -> int:
+        """计算样本所在的桶序号"""
+        if value <= self._min_value:
+            return 0
+        index = int(math.ceil((math.log(value) - self._log_min) / self._log_growth))
+        return min(index, len(self._counts) - 1)
+
+    def record(self, value: float) -> None:
+        """
+        记录一个样本
+
+        参数:
+            value: 样本值，负数按0处理
+        """
+        if value < 0:
+            value = 0.0
+        index = self._bucket_index(value)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.total += value
+            if value < self.min:
+                self.min = value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        查询分位数
+
+        参数:
+            q: 分位，范围0-100（如 50、95、99）
+
+        返回:
+            分位数的估计值，没有样本时返回 None
+        """
+        if not 0 <= q <= 100:
+            raise ValueError("q 必须在 0-100 之间")
+
+        with self._lock:
+            if self.count == 0:
+                return None
+            target = q / 100.0 * self.count
+            seen = 0
+            for index, bucket_count in enumerate(self._counts):
+                if bucket_count == 0:
+                    continue
+                if seen + bucket_count >= target:
+                    # 在桶内线性插值，并用实际的最小/最大值收紧边界
+                    lower = self._bounds[index - 1] if index > 0 else 0.0
+                    upper = self._bounds[index] if index < len(self._bounds) else self.max
+                    lower = max(lower, self.min)
+                    upper = min(upper, self.max)
+                    fraction = (target - seen) / bucket_count
+                    return lower + (upper - lower) * fraction
+                seen += bucket_count
+            return self.max
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        """
+        返回统计摘要
+
+        返回:
+            dict: 包含 count、mean、min、max、p50、p90、p95、p99
+        """
+        if self.count == 0:
+            return {"count": 0, "mean": None, "min": None, "max": None,
+                    "p50": None, "p90": None, "p95": None, "p99": None}
+        return {
+            "count": self.count,
+            "mean": self.total / self.count,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class StreamMetrics:
+    """
+    流式指标注册表
+
+    以 (vendor, model, metric) 为键保存直方图，线程安全。
+    """
+
+    # 指标名称 -> 直方图范围 (min_value, max_value)
+    METRICS = {
+        "ttfb": (1e-3, 600.0),
+        "ttft_content": (1e-3, 600.0),
+        "ttft_thinking": (1e-3, 600.0),
+        "chunk_gap": (1e-5, 600.0),
+        "tokens_per_second": (0.01, 100000.0),
+        "total_time": (1e-3, 3600.0),
+    }
+
+    def __init__(self):
+        self._histograms: Dict[Tuple[str, str, str], LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, vendor: str, model: str, metric: str) -> LatencyHistogram:
+        """
+        获取（不存在则创建）指定的直方图
+
+        参数:
+            vendor: 供应商名称
+            model: 模型名称
+            metric: 指标名称，必须是 METRICS 中的一项
+
+        返回:
+            LatencyHistogram 实例
+        """
+        key = (vendor, model, metric)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            if metric not in self.METRICS:
+                raise ValueError(f"未知指标: {metric}，可选值: {list(self.METRICS.keys())}")
+            with self._lock:
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    min_value, max_value = self.METRICS[metric]
+                    histogram = LatencyHistogram(min_value, max_value)
+                    self._histograms[key] = histogram
+        return histogram
+
+    def record(self, vendor: str, model: str, metric: str, value: float) -> None:
+        """记录一个样本"""
+        self.histogram(vendor, model, metric).record(value)
+
+    def snapshot(self, vendor: Optional[str] = None, model: Optional[str] = None) -> Dict[str, Dict[str, Dict[str, dict]]]:
+        """
+        查询当前统计
+
+        参数:
+            vendor: 只返回该供应商（None 表示全部）
+            model: 只返回该模型（None 表示全部）
+
+        返回:
+            dict: {vendor: {model: {metric: summary}}}
+        """
+        with self._lock:
+            items = list(self._histograms.items())
+
+        result: Dict[str, Dict[str, Dict[str, dict]]] = {}
+        for (item_vendor, item_model, metric), histogram in items:
+            if vendor is not None and item_vendor != vendor:
+                continue
+            if model is not None and item_model != model:
+                continue
+            result.setdefault(item_vendor, {}).setdefault(item_model, {})[metric] = histogram.summary()
+        return result
+
+    def reset(self) -> None:
+        """清空所有统计"""
+        with self._lock:
+            self._histograms.clear()
+
+
+class StreamTimer:
+    """
+    单次流式请求计时器
+
+    在请求发出时创建，每收到一个chunk调用 on_chunk，结束时调用 finish，
+    finish 会把本次请求的指标写入注册表，并返回本次请求的摘要。
+    """
+
+    def __init__(self, vendor: str, model: str, metrics: Optional[StreamMetrics] = None):
+        """
+        参数:
+            vendor: 供应商名称
+            model: 模型名称
+            metrics: 指标注册表，默认使用全局 stream_metrics
+        """
+        self.vendor = vendor
+        self.model = model
+        self._metrics = metrics if metrics is not None else stream_metrics
+
+        self.start_time = time.perf_counter()
+        self.first_byte_time: Optional[float] = None
+        self.first_content_time: Optional[float] = None
+        self.first_thinking_time: Optional[float] = None
+        self._last_chunk_time: Optional[float] = None
+        self.chunk_count = 0
+
+    def on_chunk(self, data_type: Optional[str] = None) -> None:
+        """
+        收到一个chunk时调用
+
+        参数:
+            data_type: chunk的类型（"content"、"thinking"、"tool_calls"等），
+                       为空表示不携带内容的chunk（如 usage 块）
+        """
+        now = time.perf_counter()
+        if self.first_byte_time is None:
+            self.first_byte_time = now
+        else:
+            self._metrics.record(self.vendor, self.model, "chunk_gap", now - self._last_chunk_time)
+        self._last_chunk_time = now
+        self.chunk_count += 1
+
+        if data_type == "content" and self.first_content_time is None:
+            self.first_content_time = now
+        elif data_type == "thinking" and self.first_thinking_time is None:
+            self.first_thinking_time = now
+
+    def finish(self, output_tokens: int = 0) -> dict:
+        """
+        请求结束时调用，写入本次请求的指标
+
+        参数:
+            output_tokens: 本次请求输出的token数（优先使用usage中的completion_tokens）
+
+        返回:
+            dict: 本次请求的摘要，时间单位为秒，未出现的指标为 None
+        """
+        end_time = time.perf_counter()
+        summary = {
+            "vendor": self.vendor,
+            "model": self.model,
+            "ttfb": None,
+            "ttft_content": None,
+            "ttft_thinking": None,
+            "tokens_per_second": None,
+            "total_time": end_time - self.start_time,
+            "output_tokens": output_tokens,
+            "chunk_count": self.chunk_count,
+        }
+
+        if self.first_byte_time is not None:
+            summary["ttfb"] = self.first_byte_time - self.start_time
+        if self.first_content_time is not None:
+            summary["ttft_content"] = self.first_content_time - self.start_time
+        if self.first_thinking_time is not None:
+            summary["ttft_thinking"] = self.first_thinking_time - self.start_time
+
+        # 输出速度从第一个chunk开始计时，排除排队和首包等待
+        if self.first_byte_time is not None and output_tokens > 0:
+            generate_time = end_time - self.first_byte_time
+            if generate_time > 0:
+                summary["tokens_per_second"] = output_tokens / generate_time
+
+        for metric in ("ttfb", "ttft_content", "ttft_thinking", "tokens_per_second", "total_time"):
+            if summary[metric] is not None:
+                self._metrics.record(self.vendor, self.model, metric, summary[metric])
+
+        return summary
+
+
+# 全局指标注册表
+stream_metrics = StreamMetrics()
@@ -0,0 +1,648 @@
+# -*- coding: utf-8 -*-
+"""
+MCPManager - MCP 客户端池（设计见 docs/MCPManager架构设计.md）
+
+多个 MCPClient / MCPServer 进程对组成客户端池，对外提供统一的 submit / get_result：
+    - TX 队列：submit 只把任务放进队列并返回 UUID，调度线程按最小负载把任务分给客户端
+    - RX 字典：key 为 UUID，value 为任务（含结果 Future），结果取走即删除，没人取的结果过期丢弃
+    - 负载因子：每个工具一个因子（constants/load_factors/*.json），客户端负载 = 进行中任务的因子之和
+    - 活跃池 / 备用池 / VIP 池：负载高时激活备用客户端，空闲超时的客户端退回备用池，
+      多余的备用客户端关闭回收；priority=True 的任务走 VIP 池，不和普通任务排队
+    - 健康检查：客户端线程退出时从池中移除，未完成的任务中没有交给客户端的和幂等工具重新入队，
+      其余以 CLIENT_DEAD 结束（工具可能已经执行过）
+    - 错误码：get_result 超时 / 任务失败等情况返回 {"error": 错误码, "msg": 说明}（constants/error_codes.json）
+"""
+import os
+import json
+import time
+import uuid
+import queue
+import threading
+import concurrent.futures
+from typing import Any, Callable, Dict, List, Optional
+
+from logger import logger
+from .client.MCPClient import MCPClient
+from .client.ToolResultCache import ToolResultCache
+
+
+CONSTANTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "constants")
+DEFAULT_FACTOR = 3  # 没有登记的工具的负载因子
+
+
+# ================ 常量加载 ================
+
+def load_error_codes(path: str = None) -> Dict[str, dict]:
+    """读取错误码表：{名称: {"code": 错误码, "msg": 说明}}"""
+    path = path or os.path.join(CONSTANTS_DIR, "error_codes.json")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_factors(directory: str = None) -> Dict[str, int]:
+    """合并 load_factors 目录下所有 JSON 文件：{工具名: 负载因子}"""
+    directory = directory or os.path.join(CONSTANTS_DIR, "load_factors")
+    factors = {}
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".json"):
+            continue
+        with open(os.path.join(directory, filename), "r", encoding="utf-8") as f:
+            for name, factor in json.load(f).items():
+                if not isinstance(factor, int) or factor <= 0:
+                    raise ValueError(f"{filename} 中工具 {name} 的负载因子必须是大于0的整数")
+                factors[name] = factor
+    return factors
+
+
+ERROR_CODES = load_error_codes()
+
+
+class ErrorCode:
+    """错误码（取值来自 constants/error_codes.json）"""
+    SUCCESS = ERROR_CODES["SUCCESS"]["code"]
+    TIMEOUT = ERROR_CODES["TIMEOUT"]["code"]
+    CLIENT_DEAD = ERROR_CODES["CLIENT_DEAD"]["code"]
+    TASK_FAILED = ERROR_CODES["TASK_FAILED"]["code"]
+    NOT_FOUND = ERROR_CODES["NOT_FOUND"]["code"]
+    NOT_READY = ERROR_CODES["NOT_READY"]["code"]
+    MANAGER_STOPPED = ERROR_CODES["MANAGER_STOPPED"]["code"]
+
+
+def error_result(name: str, detail: str = None) -> dict:
+    """按错误码名称生成 {"error": 错误码, "msg": 说明}"""
+    entry = ERROR_CODES[name]
+    msg = f"{entry['msg']}: {detail}" if detail else entry["msg"]
+    return {"error": entry["code"], "msg": msg}
+
+
+def is_error(result: Any) -> bool:
+    """get_result 的返回值是否是错误码"""
+    return isinstance(result, dict) and set(result) == {"error", "msg"}
+
+
+# ================ 池配置 ================
+
+class PoolConfig:
+    """
+    客户端池配置
+
+    参数:
+        min_active: 最小活跃客户端数
+        max_active: 最大活跃客户端数
+        standby_count: 备用客户端数（预先启动并完成握手）
+        vip_count: VIP 客户端数（只处理 priority=True 的任务，0 表示不启用）
+        max_load: 单个客户端的最大负载
+        scale_up_threshold: 平均负载百分比高于该值时激活一个备用客户端
+        scale_down_threshold: 平均负载百分比低于该值时，空闲超过 idle_timeout 的客户端退回备用池
+        idle_timeout: 空闲超时（秒）
+        check_interval: 扩缩容 / 健康检查 / 结果过期检查的间隔（秒）
+        result_ttl: 已完成但没有被取走的结果保留的秒数
+        max_in_flight: 每个客户端同时进行的工具调用数上限
+        start_timeout: start 等待初始客户端完成握手的秒数
+    """
+
+    def __init__(
+        self,
+        min_active: int = 3,
+        max_active: int = 20,
+        standby_count: int = 2,
+        vip_count: int = 0,
+        max_load: int = 100,
+        scale_up_threshold: float = 80,
+        scale_down_threshold: float = 20,
+        idle_timeout: float = 300,
+        check_interval: float = 1.0,
+        result_ttl: float = 300.0,
+        max_in_flight: int = 8,
+        start_timeout: float = 60.0
+    ):
+        if min_active < 1 or max_active < min_active:
+            raise ValueError("必须满足 1 <= min_active <= max_active")
+        if standby_count < 0 or vip_count < 0:
+            raise ValueError("standby_count / vip_count 不能小于0")
+        if max_load <= 0:
+            raise ValueError("max_load 必须大于0")
+        if not 0 <= scale_down_threshold < scale_up_threshold <= 100:
+            raise ValueError("必须满足 0 <= scale_down_threshold < scale_up_threshold <= 100")
+        if idle_timeout < 0 or check_interval <= 0 or result_ttl <= 0:
+            raise ValueError("idle_timeout 不能小于0，check_interval / result_ttl 必须大于0")
+        self.min_active = min_active
+        self.max_active = max_active
+        self.standby_count = standby_count
+        self.vip_count = vip_count
+        self.max_load = max_load
+        self.scale_up_threshold = scale_up_threshold
+        self.scale_down_threshold = scale_down_threshold
+        self.idle_timeout = idle_timeout
+        self.check_interval = check_interval
+        self.result_ttl = result_ttl
+        self.max_in_flight = max_in_flight
+        self.start_timeout = start_timeout
+
+
+# ================ 客户端包装 ================
+
+class ClientWrapper:
+    """池中的一个客户端：负载、进行中的任务、最近活跃时间"""
+
+    def __init__(self, client: MCPClient, name: str, max_load: int = 100):
+        self.client = client
+        self.name = name
+        self.current_load = 0   # 当前负载（进行中任务的因子之和）
+        self.max_load = max_load
+        self.task_count = 0     # 当前任务数
+        self.completed = 0      # 完成的任务数
+        self.pending = {}       # 进行中的任务，key 为 Manager 的任务 UUID
+        self.dead = False       # 已判定失效（之后完成的任务重新入队）
+        self.last_active = time.monotonic()
+        self.lock = threading.Lock()
+
+    def add_load(self, factor: int):
+        with self.lock:
+            self.current_load += factor
+            self.task_count += 1
+            self.last_active = time.monotonic()
+
+    def remove_load(self, factor: int):
+        with self.lock:
+            self.current_load -= factor
+            self.task_count -= 1
+            self.completed += 1
+            self.last_active = time.monotonic()
+
+    def is_available(self, factor: int = 0) -> bool:
+        """能否再接一个因子为 factor 的任务（空闲客户端总能接，避免因子大于 max_load 的任务永远分不出去）"""
+        return not self.dead and self.client.running and (self.task_count == 0 or self.current_load + factor <= self.max_load)
+
+    def is_alive(self) -> bool:
+        return self.client.is_alive()
+
+    @property
+    def ready(self) -> bool:
+        """已完成握手"""
+        return self.client.get_initialized()
+
+    @property
+    def idle_time(self) -> float:
+        """空闲秒数（有进行中的任务时为0）"""
+        if self.task_count:
+            return 0.0
+        return time.monotonic() - self.last_active
+
+    def snapshot(self) -> dict:
+        return {
+            "name": self.name,
+            "load": self.current_load,
+            "tasks": self.task_count,
+            "completed": self.completed,
+            "ready": self.ready,
+        }
+
+
+# ================ 客户端池 ================
+
+class MCPManager:
+    """
+    MCP 客户端池
+
+    用法:
+        manager = MCPManager(min_active=3, max_active=10, standby_count=2)
+        manager.start()
+        task_id = manager.submit("add", {"a": 1, "b": 2})
+        result = manager.get_result(task_id, timeout=5)
+        manager.stop()
+    """
+
+    def __init__(
+        self,
+        config: PoolConfig = None,
+        client_factory: Callable[[], MCPClient] = None,
+        factors: Dict[str, int] = None,
+        cache: ToolResultCache = None,
+        **options
+    ):
+        """
+        参数:
+            config: 池配置，为 None 时用 options 创建 PoolConfig
+            client_factory: 创建客户端的函数，默认 MCPClient(max_in_flight=config.max_in_flight, cache=cache)
+            factors: 工具负载因子表，默认读取 constants/load_factors
+            cache: 所有客户端共享的工具结果缓存（只用于默认的 client_factory），None 表示不缓存
+            **options: PoolConfig 的参数
+        """
+        if config is not None and options:
+            raise ValueError("config 和 PoolConfig 参数不能同时指定")
+        self.config = config or PoolConfig(**options)
+        self.cache = cache
+        self.client_factory = client_factory or (
+            lambda: MCPClient(max_in_flight=self.config.max_in_flight, cache=self.cache)
+        )
+        self.factors = load_factors() if factors is None else dict(factors)
+
+        self.tx_queue = queue.Queue()  # 任务入口
+        self.vip_queue = queue.Queue()  # VIP 任务入口（单独调度，不被普通任务阻塞）
+        self.rx_dict = {}  # 任务（含结果 Future），key 为 UUID
+        self.rx_lock = threading.Lock()  # 保护 rx_dict
+        self.pool_lock = threading.Condition()  # 保护各个池和客户端负载，负载下降 / 池变化时通知调度线程
+
+        self.active_pool: List[ClientWrapper] = []
+        self.standby_pool: List[ClientWrapper] = []
+        self.vip_pool: List[ClientWrapper] = []
+
+        self.running = False
+        self._stop_event = threading.Event()
+        self._dispatchers = []
+        self._maintainer = None
+        self._created = 0
+        self._stats = {
+            "submitted": 0, "completed": 0, "failed": 0, "timeouts": 0, "expired": 0,
+            "requeued": 0, "scale_ups": 0, "scale_downs": 0, "reclaimed": 0, "dead_clients": 0,
+        }
+
+    # ==================== 启动 / 停止 ====================
+    def start(self) -> None:
+        """启动初始客户端（活跃 + 备用 + VIP），等待握手完成后开始调度"""
+        if self.running:
+            return
+        with self.pool_lock:
+            self.active_pool = [self._create_client("active") for _ in range(self.config.min_active)]
+            self.standby_pool = [self._create_client("standby") for _ in range(self.config.standby_count)]
+            self.vip_pool = [self._create_client("vip") for _ in range(self.config.vip_count)]
+            wrappers = self.active_pool + self.standby_pool + self.vip_pool
+
+        deadline = time.monotonic() + self.config.start_timeout
+        for wrapper in wrappers:
+            while not wrapper.ready:
+                if not wrapper.is_alive() or time.monotonic() > deadline:
+                    self._close_clients(wrappers)
+                    raise RuntimeError(f"MCP客户端 {wrapper.name} 启动失败或握手超时")
+                time.sleep(0.05)
+
+        self.running = True
+        self._stop_event.clear()
+        self._dispatchers = [
+            threading.Thread(target=self._dispatch_loop, args=(self.tx_queue,), name="MCPManager-dispatch", daemon=True),
+            threading.Thread(target=self._dispatch_loop, args=(self.vip_queue,), name="MCPManager-vip", daemon=True),
+        ]
+        self._maintainer = threading.Thread(target=self._maintain_loop, name="MCPManager-maintain", daemon=True)
+        for thread in self._dispatchers:
+            thread.start()
+        self._maintainer.start()
+        logger.info(f"[MCPManager] 已启动：活跃 {len(self.active_pool)}，备用 {len(self.standby_pool)}，"
+                    f"VIP {len(self.vip_pool)}")
+
+    def stop(self) -> None:
+        """停止调度和所有客户端，没有完成的任务以 MANAGER_STOPPED 结束"""
+        if not self.running:
+            return
+        self.running = False
+        self._stop_event.set()
+        self.tx_queue.put(None)
+        self.vip_queue.put(None)
+        with self.pool_lock:
+            self.pool_lock.notify_all()
+        for thread in self._dispatchers + [self._maintainer]:
+            thread.join()
+
+        with self.pool_lock:
+            wrappers = self.active_pool + self.standby_pool + self.vip_pool
+            self.active_pool, self.standby_pool, self.vip_pool = [], [], []
+        self._close_clients(wrappers)
+
+        with self.rx_lock:
+            tasks = list(self.rx_dict.values())
+        for task in tasks:
+            self._finish(task, error_result("MANAGER_STOPPED"))
+        logger.info("[MCPManager] 已停止")
+
+    # ==================== 提交任务 ====================
+    def get_factor(self, task_name: str) -> int:
+        """工具的负载因子（没有登记的工具取 DEFAULT_FACTOR）"""
+        return self.factors.get(task_name, DEFAULT_FACTOR)
+
+    def submit(self, task_name: str, arguments: dict = None, factor: int = None, priority: bool = False) -> str:
+        """
+        提交任务
+
+        参数:
+            task_name: 工具名称
+            arguments: 工具参数
+            factor: 自定义负载因子，默认按工具名查表
+            priority: True 时走 VIP 池（没有 VIP 池时和普通任务一样调度）
+
+        返回:
+            任务的 UUID
+        """
+        if not self.running:
+            raise ValueError("MCPManager未启动")
+        if not task_name:
+            raise ValueError("task_name 不能为空")
+        factor = self.get_factor(task_name) if factor is None else factor
+        if not isinstance(factor, int) or factor <= 0:
+            raise ValueError("factor 必须是大于0的整数")
+
+        task_id = str(uuid.uuid4())
+        task = {
+            "id": task_id,
+            "name": task_name,
+            "arguments": arguments or {},
+            "factor": factor,
+            "priority": priority,
+            "future": concurrent.futures.Future(),
+            "done_at": None,
+        }
+        with self.rx_lock:
+            self.rx_dict[task_id] = task
+            self._stats["submitted"] += 1
+        self._enqueue(task)
+        return task_id
+
+    # ==================== 获取结果 ====================
+    def get_result(self, task_id: str, block: bool = True, timeout: float = None) -> Any:
+        """
+        获取结果（取走后不能再次获取）
+
+        参数:
+            task_id: 任务 UUID
+            block: 是否阻塞等待
+            timeout: 超时时间（秒），None 表示无限等待
+
+        返回:
+            工具调用的结果（CallToolResult）；出错时返回 {"error": 错误码, "msg": 说明}：
+            TIMEOUT（任务保留，可以稍后再取）、NOT_READY（非阻塞且未完成）、NOT_FOUND、
+            TASK_FAILED、CLIENT_DEAD、MANAGER_STOPPED
+        """
+        with self.rx_lock:
+            task = self.rx_dict.get(task_id)
+        if task is None:
+            return error_result("NOT_FOUND", task_id)
+        future = task["future"]
+        if not block and not future.done():
+            return error_result("NOT_READY", task_id)
+        try:
+            result = future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            with self.rx_lock:
+                self._stats["timeouts"] += 1
+            return error_result("TIMEOUT", task_id)
+        with self.rx_lock:
+            self.rx_dict.pop(task_id, None)
+        return result
+
+    def get_future(self, task_id: str) -> concurrent.futures.Future:
+        """
+        获取任务的 Future（不会取走结果；异步代码可用 asyncio.wrap_future 等待）
+
+        异常:
+            KeyError: 任务不存在，或结果已过期被丢弃
+        """
+        with self.rx_lock:
+            task = self.rx_dict.get(task_id)
+        if task is None:
+            raise KeyError(f"任务 {task_id} 不存在或结果已过期")
+        return task["future"]
+
+    def _finish(self, task: dict, result: Any) -> None:
+        """交付任务结果（只交付一次）"""
+        if task["future"].done():
+            return
+        with self.rx_lock:
+            task["done_at"] = time.monotonic()
+            if is_error(result):
+                self._stats["failed"] += 1
+            else:
+                self._stats["completed"] += 1
+        try:
+            task["future"].set_result(result)
+        except concurrent.futures.InvalidStateError:
+            pass
+
+    # ==================== 调度 ====================
+    def _enqueue(self, task: dict):
+        """任务入队：有 VIP 池时 priority 任务进 VIP 队列"""
+        if task["priority"] and self.config.vip_count:
+            self.vip_queue.put(task)
+        else:
+            self.tx_queue.put(task)
+
+    def _dispatch_loop(self, tx_queue: queue.Queue):
+        """调度线程：从 TX 队列取任务，分给负载最小的可用客户端（队列内按先后顺序）"""
+        while True:
+            task = tx_queue.get()
+            if task is None or not self.running:
+                break
+            wrapper = self._wait_for_client(task)
+            if wrapper is None:
+                break
+            self._dispatch(wrapper, task)
+
+    def _wait_for_client(self, task: dict) -> Optional[ClientWrapper]:
+        """选出客户端并计入负载；所有客户端都满且不能再扩容时等待负载下降（停止时返回 None）"""
+        with self.pool_lock:
+            while self.running:
+                wrapper = self.select_client(task["factor"], task["priority"])
+                if wrapper is not None:
+                    wrapper.add_load(task["factor"])
+                    wrapper.pending[task["id"]] = task
+                    return wrapper
+                self.pool_lock.wait(self.config.check_interval)
+        return None
+
+    def select_client(self, factor: int, priority: bool = False) -> Optional[ClientWrapper]:
+        """
+        选择负载最小的可用客户端（持有 pool_lock 时调用）
+
+        普通池都满时激活一个备用客户端（活跃数未达上限时）；优先选择已完成握手的客户端。
+        """
+        pool = self.vip_pool if priority and self.config.vip_count else self.active_pool
+        available = [c for c in pool if c.is_available(factor)]
+        if not available and pool is self.active_pool and len(self.active_pool) < self.config.max_active:
+            wrapper = self.activate_standby()
+            available = [wrapper]
+        if not available:
+            return None
+        return min(available, key=lambda c: (not c.ready, c.current_load, c.task_count))
+
+    def _dispatch(self, wrapper: ClientWrapper, task: dict):
+        """把任务交给客户端，客户端的 Future 完成时回收负载并交付结果"""
+        try:
+            client_task_id = wrapper.client.add({"function": {"name": task["name"], "arguments": task["arguments"]}})
+            future = wrapper.client.get_future(client_task_id)
+        except Exception as e:
+            # 客户端已关闭：交给健康检查处理，任务重新入队
+            logger.warning(f"[MCPManager] 向客户端 {wrapper.name} 派发任务失败: {e}")
+            wrapper.dead = True
+            self._on_done(wrapper, task, None, None)
+            return
+        future.add_done_callback(lambda f: self._on_done(wrapper, task, client_task_id, f))
+
+    def _on_done(self, wrapper: ClientWrapper, task: dict, client_task_id: Optional[str], future):
+        """
+        客户端任务结束：回收负载并交付结果
+
+        任务因客户端失效而失败时，没有交给客户端的任务和幂等工具（idempotent_tools）重新入队，
+        其余任务以 CLIENT_DEAD 结束
+        """
+        with self.pool_lock:
+            wrapper.remove_load(task["factor"])
+            wrapper.pending.pop(task["id"], None)
+            self.pool_lock.notify_all()
+
+        failed = future is not None and (future.cancelled() or future.exception() is not None)
+        if future is None or (failed and (wrapper.dead or not wrapper.client.running)):
+            if not self.running:
+                self._finish(task, error_result("MANAGER_STOPPED"))
+            elif future is None or task["name"] in getattr(wrapper.client, "idempotent_tools", ()):
+                # 没有交给客户端的任务、幂等工具可以安全地重新执行
+                with self.rx_lock:
+                    self._stats["requeued"] += 1
+                self._enqueue(task)
+            else:
+                # 工具可能已经在服务器上执行（写文件等），重新执行会产生重复的副作用
+                self._finish(task, error_result("CLIENT_DEAD", f"工具 {task['name']} 执行期间客户端 {wrapper.name} 失效，未重新提交"))
+            return
+
+        try:
+            # 取走客户端侧的结果，不留在客户端的结果存储里
+            result = wrapper.client.get_result(client_task_id, block=False)
+            if getattr(result, "is_error", False):
+                # 工具返回的错误（工具不存在、参数错误、工具内部异常）
+                detail = " ".join(getattr(item, "text", "") for item in result.content)
+                result = error_result("TASK_FAILED", detail)
+        except Exception as e:
+            if wrapper.dead and not self.running:
+                result = error_result("MANAGER_STOPPED")
+            else:
+                result = error_result("TASK_FAILED", f"{type(e).__name__}: {e}")
+        self._finish(task, result)
+
+    # ==================== 扩缩容 ====================
+    def _create_client(self, role: str) -> ClientWrapper:
+        """创建并启动一个客户端（不等待握手完成）"""
+        self._created += 1
+        client = self.client_factory()
+        client.start()
+        return ClientWrapper(client, f"{role}-{self._created}", self.config.max_load)
+
+    def activate_standby(self) -> ClientWrapper:
+        """从备用池激活一个客户端到活跃池（优先已完成握手的），备用池空时直接创建（持有 pool_lock 时调用）"""
+        ready = [c for c in self.standby_pool if c.ready]
+        if ready:
+            wrapper = ready[0]
+            self.standby_pool.remove(wrapper)
+        else:
+            wrapper = self.standby_pool.pop(0) if self.standby_pool else self._create_client("active")
+        wrapper.last_active = time.monotonic()
+        self.active_pool.append(wrapper)
+        self._stats["scale_ups"] += 1
+        self.pool_lock.notify_all()
+        logger.info(f"[MCPManager] 激活客户端 {wrapper.name}，活跃 {len(self.active_pool)}")
+        return wrapper
+
+    def deactivate_to_standby(self, wrapper: ClientWrapper):
+        """把空闲的活跃客户端退回备用池（持有 pool_lock 时调用）"""
+        self.active_pool.remove(wrapper)
+        self.standby_pool.append(wrapper)
+        self._stats["scale_downs"] += 1
+        logger.info(f"[MCPManager] 客户端 {wrapper.name} 空闲 {wrapper.idle_time:.0f} 秒，退回备用池")
+
+    def get_average_load(self) -> float:
+        """活跃池的平均负载百分比"""
+        if not self.active_pool:
+            return 0.0
+        return sum(c.current_load for c in self.active_pool) / (len(self.active_pool) * self.config.max_load) * 100
+
+    def check_and_scale(self):
+        """扩容、缩容、回收多余的备用客户端、补充备用池"""
+        with self.pool_lock:
+            avg_load = self.get_average_load()
+            if avg_load > self.config.scale_up_threshold and len(self.active_pool) < self.config.max_active:
+                self.activate_standby()
+            elif avg_load < self.config.scale_down_threshold:
+                for wrapper in list(self.active_pool):
+                    if len(self.active_pool) <= self.config.min_active:
+                        break
+                    if wrapper.idle_time > self.config.idle_timeout:
+                        self.deactivate_to_standby(wrapper)
+
+            # 备用池超出 standby_count：关闭空闲最久的
+            surplus = []
+            while len(self.standby_pool) > self.config.standby_count:
+                wrapper = max(self.standby_pool, key=lambda c: c.idle_time)
+                self.standby_pool.remove(wrapper)
+                surplus.append(wrapper)
+            self._stats["reclaimed"] += len(surplus)
+            for _ in range(self.config.standby_count - len(self.standby_pool)):
+                self.standby_pool.append(self._create_client("standby"))
+        self._close_clients(surplus)
+
+    # ==================== 健康检查 ====================
+    def health_check(self):
+        """移除线程已退出的客户端并补位，其未完成的任务交给 _on_done 处理"""
+        dead = []
+        with self.pool_lock:
+            for pool in (self.active_pool, self.vip_pool, self.standby_pool):
+                for wrapper in list(pool):
+                    if wrapper.is_alive():
+                        continue
+                    wrapper.dead = True
+                    pool.remove(wrapper)
+                    dead.append(wrapper)
+                    self._stats["dead_clients"] += 1
+                    logger.warning(f"[MCPManager] 客户端 {wrapper.name} 已失效，从池中移除")
+                    if pool is self.vip_pool:
+                        pool.append(self._create_client("vip"))
+                    elif pool is self.active_pool and len(self.active_pool) < self.config.min_active:
+                        self.activate_standby()
+            self.pool_lock.notify_all()
+        # 关闭时未完成的客户端任务以异常结束，_on_done 看到 dead 后重新入队或以 CLIENT_DEAD 结束
+        self._close_clients(dead)
+
+    # ==================== 维护线程 ====================
+    def _maintain_loop(self):
+        while not self._stop_event.wait(self.config.check_interval):
+            try:
+                self.health_check()
+                self.check_and_scale()
+                self._expire_results()
+            except Exception as e:
+                logger.error(f"[MCPManager] 维护任务出错: {e}")
+
+    def _expire_results(self):
+        """丢弃完成超过 result_ttl 秒仍没有被取走的结果"""
+        expire_before = time.monotonic() - self.config.result_ttl
+        with self.rx_lock:
+            expired = [task_id for task_id, task in self.rx_dict.items()
+                       if task["done_at"] is not None and task["done_at"] < expire_before]
+            for task_id in expired:
+                del self.rx_dict[task_id]
+            self._stats["expired"] += len(expired)
+
+    def _close_clients(self, wrappers: List[ClientWrapper]):
+        """并行关闭客户端（每个客户端关闭时要等待服务器进程退出）"""
+        for wrapper in wrappers:
+            wrapper.dead = True
+        threads = [threading.Thread(target=wrapper.client.close) for wrapper in wrappers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    # ==================== 统计 ====================
+    def get_stats(self) -> dict:
+        """运行统计：各池客户端数与负载、队列长度、任务计数"""
+        with self.pool_lock:
+            stats = {
+                "active_count": len(self.active_pool),
+                "standby_count": len(self.standby_pool),
+                "vip_count": len(self.vip_pool),
+                "avg_load": round(self.get_average_load(), 2),
+                "clients": [c.snapshot() for c in self.active_pool],
+                "vip_clients": [c.snapshot() for c in self.vip_pool],
+            }
+        with self.rx_lock:
+            stats["queued"] = self.tx_queue.qsize() + self.vip_queue.qsize()
+            stats["results"] = len(self.rx_dict)
+            stats.update(self._stats)
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        return stats
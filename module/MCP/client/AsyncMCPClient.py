@@ -0,0 +1,499 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import contextlib
+from mcp import StdioServerParameters
+from mcp.types import CallToolResult, ListToolsResult
+from .ServerConnection import ServerConnection
+from .ToolResultCache import ToolResultCache, load_tool_registry, is_idempotent, tool_timeouts as registry_timeouts
+from .ToolCatalog import ToolCatalogCache, server_fingerprint, DEFAULT_CATALOG_PATH
+
+
+class AsyncMCPClient:
+    """
+    异步MCP客户端
+
+    运行在调用方的事件循环中（不创建线程）：await client.call(name, arguments) 直接等待工具结果，
+    多个调用可以并发进行，调用可以设置超时，取消等待中的调用会同时取消服务器上的请求。
+    所有方法都要在 start 所在的事件循环中调用；需要在线程中同步使用时见 MCPClient。
+
+    tool_registry 中声明了 timeout 的工具有默认期限：MCPServer 自己在期限到达时终止工具并返回错误，
+    客户端在期限后再等 DEADLINE_GRACE 秒仍没有结果时取消调用（服务器不支持期限时由取消通知停止工具）。
+
+    同一个会话上最多同时进行 max_in_flight 个工具调用。sequential_tools 中的工具按 tool_registry 声明的 paths
+    参数加锁：涉及同一个文件 / 数据库的调用（不论是哪个工具）依次执行，没有声明 paths 的共用一把锁；
+    等待锁的调用不占用并发名额，不会挡住其他工具。
+    cache 为 ToolResultCache 时，纯函数 / 只读工具的重复调用直接返回缓存的结果，不经过服务器。
+
+    发现的工具目录按服务器指纹保存在 catalog_path，指纹不变时 start 前即可 list_tools，握手后不再请求 list_tools。
+
+    standby_count > 0 时预先启动备用服务器进程（已握手、登记工具列表并预热）。服务器进程意外退出时
+    立即切换到备用服务器，进行中的幂等调用在新服务器上重放，其他进行中的调用以 RuntimeError 结束（结果未知），
+    之后在后台补充新的备用服务器。standby_count 为 0 时服务器退出后客户端停止。
+    """
+    MAX_REPLAYS = 2 # 同一个调用最多重放的次数（避免让服务器退出的调用拖垮所有备用服务器）
+    MAX_START_FAILURES = 3 # 连续启动失败的服务器数达到该值时不再补充（当前服务器再退出时客户端停止）
+    DEADLINE_GRACE = 1.0 # 工具期限之后客户端多等待的秒数（正常情况下先收到服务器的超时错误）
+
+    def __init__(
+        self,
+        max_in_flight: int = 8,
+        server_params: StdioServerParameters = None,
+        transport: str = "stdio",
+        server_factory=None,
+        cache: ToolResultCache = None,
+        sequential_tools: set = None,
+        catalog_path: str = DEFAULT_CATALOG_PATH,
+        standby_count: int = 0,
+        idempotent_tools: set = None,
+        call_timeout: float = None,
+        tool_timeouts: dict = None
+    ):
+        """
+        参数:
+            max_in_flight: 同时进行的工具调用数上限
+            server_params: 服务器启动参数，默认启动 server/MCPServer.py
+            transport: "stdio"（启动服务器子进程）或 "inprocess"（在本进程中直接调用工具）
+            server_factory: inprocess 传输时返回 FastMCP 服务器实例的函数，默认创建本地 MCPServer
+            cache: 工具结果缓存（可以在多个客户端之间共享），None 表示不缓存
+            sequential_tools: 需要依次执行的工具名，默认取 tool_registry 中声明 sequential 的工具
+            catalog_path: 工具目录缓存文件，None 表示不缓存（自定义 server_factory 时不缓存）
+            standby_count: 预先启动的备用服务器进程数（只用于 stdio 传输）
+            idempotent_tools: 服务器退出时可以重放的工具名，默认取 tool_registry 中的幂等工具
+            call_timeout: 没有声明期限的工具调用的默认超时秒数，None 表示不限时
+            tool_timeouts: {工具名: 期限秒数}，默认取 tool_registry 中声明的 timeout
+        """
+        if not isinstance(max_in_flight, int) or max_in_flight <= 0:
+            raise ValueError("max_in_flight 必须是大于0的整数")
+        if transport not in ("stdio", "inprocess"):
+            raise ValueError("transport 必须是 stdio 或 inprocess")
+        if server_factory is not None and transport != "inprocess":
+            raise ValueError("server_factory 只用于 inprocess 传输")
+        if not isinstance(standby_count, int) or standby_count < 0:
+            raise ValueError("standby_count 必须是非负整数")
+        if standby_count and transport != "stdio":
+            raise ValueError("standby_count 只用于 stdio 传输")
+        if call_timeout is not None and call_timeout <= 0:
+            raise ValueError("call_timeout 必须大于0")
+        self.max_in_flight = max_in_flight
+        self.transport = transport
+        self.server_factory = server_factory
+        self.cache = cache
+        if tool_timeouts is not None and any(t is None or t <= 0 for t in tool_timeouts.values()):
+            raise ValueError("tool_timeouts 中的期限必须大于0")
+        registry = load_tool_registry()
+        if sequential_tools is None:
+            sequential_tools = {name for name, entry in registry.items() if entry.get("sequential")}
+        if idempotent_tools is None:
+            idempotent_tools = {name for name, entry in registry.items() if is_idempotent(entry)}
+        self.sequential_tools = set(sequential_tools) # 需要依次执行的工具
+        self.sequential_paths = {
+            name: sorted(registry.get(name, {}).get("paths", {})) for name in self.sequential_tools
+        } # 需要依次执行的工具 -> 路径参数名（按路径加锁）
+        self.idempotent_tools = set(idempotent_tools) # 服务器退出时可以重放的工具
+        self.standby_count = standby_count # 备用服务器数
+        self.call_timeout = call_timeout
+        self.tool_timeouts = dict(tool_timeouts if tool_timeouts is not None else registry_timeouts(registry)) # 工具期限
+
+        current_dir = os.path.dirname(os.path.abspath(__file__))  # client目录
+        self.server_path = os.path.join(os.path.dirname(current_dir), "server", "MCPServer.py") # 本地 MCPServer 脚本
+        self.server_params = server_params or StdioServerParameters(command=sys.executable, args=[self.server_path])
+
+        self.running = False # 运行状态
+        self.initialized = False # 主服务器握手完成
+        self.on_stop = None # 服务器不可用导致客户端停止时的回调 on_stop(原因)
+        self.session = None # 当前服务器连接的会话
+        self._active = None # 当前服务器连接（ServerConnection）
+        self._standbys = [] # 备用服务器连接
+        self._connection_changed = None # 连接就绪 / 退出时置位（asyncio.Event）
+        self._slots = None # 进行中的调用数上限（asyncio.Semaphore）
+        self._sequential_locks = {} # 锁的 key（规范化的路径，或 None 表示没有声明路径）-> [asyncio.Lock, 使用中的调用数]
+        self._start_failures = 0 # 连续启动失败的服务器数
+        self._failover_started = None # 切换到尚未就绪的备用服务器时，原服务器退出的时间
+        self._stop_reason = None # 服务器不可用导致客户端停止的原因
+        self.failovers = 0 # 切换到备用服务器的次数
+        self.failover_times = [] # 每次切换从发现服务器退出到新服务器可用的秒数
+        self.replayed = 0 # 在新服务器上重放的调用数
+        self.abandoned = 0 # 服务器退出时结果未知、没有重放的调用数
+        self.timeouts = 0 # 超时被取消的调用数
+
+        self.tools = [] # 工具列表（MCP 定义）
+        self._openai_tools = None # 转换后的 OpenAI 工具列表（发现或从缓存读取时生成一次）
+        self.catalog = ToolCatalogCache(catalog_path) if catalog_path else None # 工具目录缓存
+        self.catalog_key = None # 服务器指纹
+        self.catalog_source = None # 工具目录来源："cache" 或 "server"
+        self._catalog_loaded = False
+
+    # ==================== 启动 / 关闭 ====================
+    async def start(self) -> "AsyncMCPClient":
+        """启动服务器并等待握手完成（之后备用服务器在后台启动）"""
+        if self.running:
+            return self
+        if not self._catalog_loaded:
+            self.load_catalog()
+        self.running = True
+        self.initialized = False
+        self._stop_reason = None
+        self._start_failures = 0
+        self._connection_changed = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._sequential_locks = {}
+        try:
+            self._active = self._open_connection("active")
+            await self._active.ready.wait()
+            if not self._active.usable:
+                raise RuntimeError(f"MCP服务器启动失败: {self._active.error}")
+        except BaseException:
+            await self.close()
+            raise
+        self.session = self._active.session
+        self.initialized = True
+        # 主服务器就绪后再启动备用服务器，不拖慢首次启动
+        for _ in range(self.standby_count):
+            self._standbys.append(self._open_connection("standby"))
+        return self
+
+    async def close(self):
+        """关闭所有服务器连接（等待中的调用以 RuntimeError 结束）"""
+        self.running = False
+        if self._connection_changed is not None:
+            self._connection_changed.set()
+        connections = [c for c in [self._active, *self._standbys] if c is not None]
+        self._active, self._standbys = None, []
+        await asyncio.gather(*(c.close() for c in connections), return_exceptions=True)
+        self.session = None
+        self._catalog_loaded = False
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def is_alive(self) -> bool:
+        return self.running and self.initialized
+
+    # ==================== 调用工具 ====================
+    async def call(self, name: str, arguments: dict = None, timeout: float = None) -> CallToolResult:
+        """
+        调用工具
+
+        参数:
+            name: 工具名
+            arguments: 工具参数
+            timeout: 超时秒数，默认为工具期限加 DEADLINE_GRACE，没有期限时为 call_timeout
+                     （包括等待并发名额和切换服务器的时间）
+
+        返回:
+            CallToolResult（工具不存在 / 参数错误 / 工具内部异常时 is_error 为 True）
+
+        异常:
+            ValueError: 客户端未启动
+            TimeoutError: 调用超时（服务器上的请求同时被取消）
+            RuntimeError: 客户端已关闭，或服务器退出且调用不能重放
+        """
+        if not self.running:
+            raise ValueError("MCP客户端未启动")
+        arguments = arguments or {}
+        token = None
+        if self.cache is not None:
+            # 命中缓存时直接返回，不经过服务器
+            hit, result = self.cache.get(name, arguments)
+            if hit:
+                return result
+            token = self.cache.prepare(name, arguments)
+        return await self.execute(name, arguments, token, timeout)
+
+    async def call_many(self, calls: list, timeout: float = None) -> list:
+        """
+        并发调用多个工具
+
+        参数:
+            calls: 工具调用列表，元素为 (工具名, 参数) 或 OpenAI 工具调用格式
+            timeout: 每个调用的超时秒数
+
+        返回:
+            与 calls 顺序一致的结果列表；某个调用失败时对应位置是异常对象，不影响其他调用
+        """
+        async def one(call):
+            if isinstance(call, dict):
+                data = self.OpenAI_to_MCP(call)
+                call = (data["name"], data.get("arguments", {}))
+            return await self.call(call[0], call[1], timeout)
+
+        return await asyncio.gather(*(one(call) for call in calls), return_exceptions=True)
+
+    def deadline(self, name: str, timeout: float = None):
+        """调用的超时秒数：显式的 timeout，否则为工具期限加 DEADLINE_GRACE，否则为 call_timeout（None 表示不限时）"""
+        if timeout is not None:
+            return timeout
+        if name in self.tool_timeouts:
+            return self.tool_timeouts[name] + self.DEADLINE_GRACE
+        return self.call_timeout
+
+    async def execute(self, name: str, arguments: dict, cache_token=None, timeout: float = None) -> CallToolResult:
+        """
+        调用工具（不查询缓存；cache_token 为调用前 ToolResultCache.prepare 的返回值，结果成功时写入缓存）
+
+        MCPClient 在调用方线程中查询缓存，未命中时把调用交给工作线程中的本方法。
+        超过 deadline 时取消调用（会话向服务器发送 notifications/cancelled）并抛出 TimeoutError
+        """
+        seconds = self.deadline(name, timeout)
+        if seconds is None:
+            return await self._execute(name, arguments, cache_token)
+        try:
+            return await asyncio.wait_for(self._execute(name, arguments, cache_token), seconds)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise TimeoutError(f"调用工具 {name} 超时（{seconds} 秒），已取消") from None
+
+    async def _execute(self, name: str, arguments: dict, cache_token) -> CallToolResult:
+        async with contextlib.AsyncExitStack() as stack:
+            if name in self.sequential_tools:
+                # 先取得路径锁再占用并发名额：排队等锁的调用不会挡住其他工具
+                for key in self._sequential_keys(name, arguments):
+                    await stack.enter_async_context(self._sequential_lock(key))
+            async with self._slots:
+                connection = await self._active_connection()
+                if connection is None:
+                    raise RuntimeError(self._stop_reason or "MCP客户端已关闭，工具调用被取消")
+                result = await self._call_with_failover(name, arguments, connection)
+        if self.cache is not None and not getattr(result, "is_error", False):
+            self.cache.put(cache_token, result)
+            self.cache.after_call(name, arguments)
+        return result
+
+    def _sequential_keys(self, name: str, arguments: dict) -> list:
+        """调用涉及的锁：路径参数规范化后排序（多把锁按固定顺序获取，避免死锁），没有路径时为 [None]"""
+        keys = {
+            os.path.normcase(os.path.abspath(str(arguments[arg])))
+            for arg in self.sequential_paths.get(name, []) if arguments.get(arg)
+        }
+        return sorted(keys) or [None]
+
+    @contextlib.asynccontextmanager
+    async def _sequential_lock(self, key):
+        """按 key 加锁（asyncio.Lock 按等待先后放行，保持提交顺序），没有调用使用时删除锁"""
+        entry = self._sequential_locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._sequential_locks[key]
+
+    async def _call_with_failover(self, name: str, arguments: dict, connection: ServerConnection):
+        """调用工具；服务器在调用期间退出时，幂等调用在切换后的服务器上重放"""
+        replays = 0
+        while True:
+            try:
+                return await connection.session.call_tool(name, arguments)
+            except Exception as e:
+                if not connection.lost or not self.standby_count:
+                    raise
+                if name not in self.idempotent_tools:
+                    self.abandoned += 1
+                    raise RuntimeError(f"MCP服务器进程意外退出，工具 {name} 的调用结果未知（非幂等，未重放）") from e
+                if replays >= self.MAX_REPLAYS:
+                    raise RuntimeError(f"工具 {name} 的调用连续 {replays + 1} 次遇到服务器退出，不再重放") from e
+            connection = await self._active_connection()
+            if connection is None:
+                raise RuntimeError(self._stop_reason or "MCP客户端已关闭，工具调用被取消")
+            replays += 1
+            self.replayed += 1
+
+    # ==================== 服务器连接 ====================
+    def _open_connection(self, role: str) -> ServerConnection:
+        """在当前事件循环中启动一个服务器连接"""
+        return ServerConnection(
+            role,
+            transport=self.transport,
+            server_params=self.server_params,
+            server_factory=self.server_factory,
+            workers=self.max_in_flight,
+            prepare=self._prepare_standby if role == "standby" else self._prepare_session,
+            on_ready=self._on_connection_ready,
+            on_lost=self._on_connection_lost
+        ).start()
+
+    async def _prepare_session(self, session):
+        """获取工具列表（工具已知时只登记到会话，不再请求服务器）"""
+        if self.catalog_source is None:
+            result = await session.list_tools()
+            self._set_tools(result.tools if hasattr(result, 'tools') else result)
+            self.catalog_source = "server"
+            if self.catalog is not None and self.catalog_key is not None:
+                self.catalog.save(self.catalog_key, self.tools, self._openai_tools)
+        else:
+            # ClientSession 校验结构化结果时需要工具的输出 schema，没有时会自己再请求一次 list_tools
+            absorb = getattr(session, "_absorb_tool_listing", None)
+            if absorb is not None:
+                absorb(ListToolsResult(tools=list(self.tools)), complete=True)
+
+    async def _prepare_standby(self, session):
+        """
+        备用服务器：登记工具列表后预热调用路径
+
+        服务器第一次执行工具调用时要加载参数校验、结果序列化等代码（约 150 ms）。用空参数调用一个有必填参数的工具，
+        参数校验失败、工具本身不会执行，但这部分代码已经加载，切换后的第一个调用不再承担这段延迟。
+        """
+        await self._prepare_session(session)
+        probe = next((tool for tool in self.tools if (tool.input_schema or {}).get("required")), None)
+        if probe is not None:
+            try:
+                await session.call_tool(probe.name, {})
+            except Exception:
+                pass
+
+    async def _active_connection(self):
+        """等待可用的服务器连接，客户端停止时返回 None"""
+        while self.running:
+            if self._active is not None and self._active.usable:
+                return self._active
+            self._connection_changed.clear()
+            await self._connection_changed.wait()
+        return None
+
+    def _on_connection_ready(self, connection: ServerConnection):
+        self._start_failures = 0
+        if connection is self._active:
+            self.session = connection.session
+            if self._failover_started is not None:
+                # 切换时备用服务器还没有就绪：就绪时才算切换完成
+                self.failover_times.append(connection.ready_at - self._failover_started)
+                self._failover_started = None
+        self._connection_changed.set()
+
+    def _on_connection_lost(self, connection: ServerConnection):
+        """服务器退出：备用服务器退出时补充；当前服务器退出时切换到备用服务器"""
+        self._connection_changed.set()
+        if not self.running or connection.closing or not self.initialized:
+            return
+        print(f"[MCPClient] 服务器 {connection.name} 已退出: {connection.error or '进程结束'}")
+        if connection.ready_at is None:
+            self._start_failures += 1
+        respawn = self._start_failures < self.MAX_START_FAILURES # 连续启动失败时不再补充
+        if connection in self._standbys:
+            self._standbys.remove(connection)
+            if respawn:
+                self._standbys.append(self._open_connection("standby"))
+            return
+        if connection is not self._active:
+            return
+        # 优先切换到已就绪的备用服务器，否则切换到最早启动的一个（等待其就绪）
+        standby = next((c for c in self._standbys if c.usable), None) or (self._standbys[0] if self._standbys else None)
+        if standby is not None:
+            self._standbys.remove(standby)
+        elif self.standby_count and respawn:
+            standby = self._open_connection("active")
+        else:
+            self._stop(f"MCP服务器进程已退出: {connection.error or '进程结束'}")
+            return
+        standby.name = "active"
+        self._active = standby
+        self.failovers += 1
+        if standby.usable:
+            self.session = standby.session
+            self.failover_times.append(time.monotonic() - connection.lost_at)
+        else:
+            self._failover_started = connection.lost_at
+        if respawn:
+            self._standbys.append(self._open_connection("standby"))
+
+    def _stop(self, reason: str):
+        """服务器不可用时停止客户端：等待连接的调用以 RuntimeError 结束"""
+        self._stop_reason = reason
+        self.running = False
+        self._connection_changed.set()
+        if self.on_stop is not None:
+            self.on_stop(reason)
+
+    def failover_stats(self) -> dict:
+        """服务器切换统计"""
+        return {
+            "failovers": self.failovers,
+            "replayed": self.replayed,
+            "abandoned": self.abandoned,
+            "failover_ms": [round(t * 1000, 2) for t in self.failover_times],
+            "standby_ready": sum(1 for c in list(self._standbys) if c.usable),
+        }
+
+    # ==================== 工具列表 ====================
+    def list_tools(self) -> list:
+        """OpenAI 格式的工具列表（工具目录命中缓存时 start 之前即可获取）"""
+        if not self._openai_tools:
+            raise ValueError("工具列表为空")
+        return list(self._openai_tools) # 转换结果只在发现工具时生成一次
+
+    def _set_tools(self, tools: list, openai_tools: list = None):
+        """设置工具列表，并生成（或使用缓存的）OpenAI 格式"""
+        self.tools = list(tools)
+        self._openai_tools = openai_tools or [self.MCP_to_OpenAI(tool) for tool in self.tools] # 将MCP工具转换为OpenAI工具
+
+    def load_catalog(self):
+        """按服务器指纹读取缓存的工具目录（start 时自动调用）"""
+        self._catalog_loaded = True
+        self.catalog_source = None
+        if self.catalog is None:
+            return
+        if self.transport == "inprocess":
+            # 自定义服务器无法计算指纹，不缓存
+            self.catalog_key = None if self.server_factory else server_fingerprint(
+                sys.executable, [self.server_path], "inprocess"
+            )
+        else:
+            self.catalog_key = server_fingerprint(self.server_params.command, list(self.server_params.args))
+        cached = self.catalog.load(self.catalog_key) if self.catalog_key else None
+        if cached is not None:
+            self._set_tools(*cached)
+            self.catalog_source = "cache"
+
+    @staticmethod
+    def MCP_to_OpenAI(tool) -> dict:
+        """将MCP工具转换为OpenAI工具"""
+        return {
+            "type": "function",
+            "function": {
+                "name": tool.name,
+                "description": tool.description,
+                "parameters": tool.input_schema
+            }
+        }
+
+    @staticmethod
+    def OpenAI_to_MCP(tool: dict) -> dict:
+        """将OpenAI格式转换为MCP格式
+
+        支持两种OpenAI格式：
+        1. 工具定义格式（tool definition）：包含 description 和 parameters
+        2. 工具调用格式（tool call）：包含 name 和 arguments
+        """
+        function = tool.get("function", {})
+
+        # 判断是工具调用格式还是工具定义格式
+        if "arguments" in function:
+            # 工具调用格式：只需要 name 和 arguments
+            arguments = function["arguments"]
+            # 如果 arguments 是字符串，需要解析为字典
+            if isinstance(arguments, str):
+                # 处理空字符串的情况
+                if arguments.strip() == "":
+                    arguments = {}
+                else:
+                    arguments = json.loads(arguments)
+
+            return {
+                "name": function["name"],
+                "arguments": arguments
+            }
+        else:
+            # 工具定义格式：需要 description 和 inputSchema
+            return {
+                "name": function["name"],
+                "description": function.get("description", ""),
+                "inputSchema": function.get("parameters", {})
+            }
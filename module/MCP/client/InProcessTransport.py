@@ -0,0 +1,109 @@
+import os
+import sys
+import asyncio
+import threading
+import concurrent.futures
+from mcp.types import CallToolResult, ListToolsResult, TextContent
+
+
+def default_server():
+    """创建本地 MCPServer 的 FastMCP 实例（MCPServer 用 from Tools.xxx 导入工具，需要把 server 目录加入路径）"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))  # client目录
+    server_dir = os.path.join(os.path.dirname(current_dir), "server")
+    if server_dir not in sys.path:
+        sys.path.insert(0, server_dir)
+    from MCPServer import MCPServer
+    return MCPServer().mcp
+
+
+class InProcessSession:
+    """
+    进程内MCP会话
+
+    与 mcp.ClientSession 提供相同的 initialize / list_tools / call_tool 接口，MCPClient 不用区分传输方式。
+    不启动服务器子进程、不经过 JSON-RPC：直接调用 FastMCP 服务器上注册的 Tool 对象，
+    在工作线程池中执行（同步工具会阻塞所在线程的事件循环，所以每个工作线程有自己的事件循环），
+    返回值和 stdio 传输一样是 CallToolResult，工具不存在 / 参数错误 / 工具抛出异常时 is_error=True。
+    """
+    def __init__(self, server_factory=None, workers: int = 8):
+        """
+        参数:
+            server_factory: 返回 FastMCP 服务器实例的函数，默认创建本地 MCPServer
+            workers: 执行工具的线程数
+        """
+        if not isinstance(workers, int) or workers <= 0:
+            raise ValueError("workers 必须是大于0的整数")
+        self.server_factory = server_factory or default_server
+        self.workers = workers
+        self.server = None # FastMCP 服务器实例
+        self.tools = {} # 工具名 -> fastmcp Tool 对象
+        self._executor = None # 执行工具的线程池
+        self._local = threading.local() # 每个工作线程的事件循环
+        self._loops = [] # 所有工作线程的事件循环（关闭时释放）
+        self._loops_lock = threading.Lock()
+
+    # ==================== 会话生命周期 ====================
+    async def __aenter__(self):
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="MCPInProcess"
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._executor is not None:
+            # 等待进行中的工具执行完（线程无法被取消），再关闭各线程的事件循环
+            await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown, True)
+            self._executor = None
+        with self._loops_lock:
+            for loop in self._loops:
+                loop.close()
+            self._loops = []
+
+    # ==================== 握手 ====================
+    async def initialize(self):
+        """创建服务器实例并读取已注册的工具（对应 stdio 传输的握手）"""
+        self.server = await self._run_in_worker(self.server_factory)
+        tools = await self.server.list_tools()
+        self.tools = {tool.name: tool for tool in tools}
+
+    # ==================== 获得工具 ====================
+    async def list_tools(self) -> ListToolsResult:
+        return ListToolsResult(tools=[tool.to_mcp_tool() for tool in self.tools.values()])
+
+    # ==================== 调用工具 ====================
+    async def call_tool(self, name: str, arguments: dict = None) -> CallToolResult:
+        tool = self.tools.get(name)
+        if tool is None:
+            return self._error_result(f"Unknown tool: '{name}'")
+        return await self._run_in_worker(self._run_tool, tool, arguments or {})
+
+    def _run_tool(self, tool, arguments: dict) -> CallToolResult:
+        """在工作线程中执行工具（使用该线程自己的事件循环）"""
+        try:
+            result = self._worker_loop().run_until_complete(tool.run(arguments))
+        except Exception as e:
+            return self._error_result(f"Error calling tool '{tool.name}': {e}")
+        return CallToolResult(
+            content=result.content,
+            structured_content=result.structured_content,
+            is_error=result.is_error,
+            meta=result.meta
+        )
+
+    def _worker_loop(self) -> asyncio.AbstractEventLoop:
+        loop = getattr(self._local, "loop", None)
+        if loop is None:
+            loop = asyncio.new_event_loop()
+            self._local.loop = loop
+            with self._loops_lock:
+                self._loops.append(loop)
+        return loop
+
+    async def _run_in_worker(self, func, *args):
+        if self._executor is None:
+            raise RuntimeError("进程内MCP会话未启动")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    @staticmethod
+    def _error_result(message: str) -> CallToolResult:
+        return CallToolResult(content=[TextContent(type="text", text=message)], is_error=True)
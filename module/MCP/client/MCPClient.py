@@ -1,9 +1,12 @@
 import threading
 import time
 import asyncio
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
-import queue
+import concurrent.futures
+from collections import OrderedDict
+from mcp import StdioServerParameters
+from .AsyncMCPClient import AsyncMCPClient
+from .ToolResultCache import ToolResultCache
+from .ToolCatalog import DEFAULT_CATALOG_PATH
 import uuid
 import os
 import sys
@@ -11,37 +14,156 @@ import ast
 import json
 import re
 class MCPClient:
-    """简单的线程类"""
-    def __init__(self):
+    """
+    MCP客户端线程（AsyncMCPClient 的同步包装）
+
+    工作线程运行独立的事件循环：add 通过 loop.call_soon_threadsafe 把任务放入 asyncio.Queue，
+    工作协程在队列为空时挂起等待（空闲不占用CPU）。
+    每个任务对应一个 concurrent.futures.Future，工具返回时立即完成，get_result 直接等待该 Future；
+    异步调用方可以用 asyncio.wrap_future(client.get_future(task_id)) 等待，
+    本身运行在事件循环中的代码应直接使用 AsyncMCPClient（不占用线程，支持超时和取消）。
+    没有被取走的结果在 result_ttl 秒后丢弃，已完成的结果最多保留 max_results 个。
+
+    同一个会话上最多同时进行 max_in_flight 个工具调用（JSON-RPC 按请求ID匹配响应），
+    慢工具不会阻塞排在后面的快工具；结果按任务ID分别交付。
+
+    transport="inprocess" 时不启动服务器子进程，直接在本进程的线程池中调用本地 MCPServer 注册的工具
+    （见 InProcessTransport.InProcessSession），结果形式与 stdio 传输相同。
+
+    cache 为 ToolResultCache 时，纯函数 / 只读工具的重复调用直接返回缓存的结果，不经过服务器。
+
+    add_many 一次投递一批调用并按顺序返回结果；tool_registry 中声明 "sequential": true 的工具
+    （读-改-写文件、数据库写入）在同一个客户端上按 paths 参数加锁：涉及同一个文件的调用依次执行，其他调用并发执行。
+
+    发现的工具目录（MCP 定义和转换后的 OpenAI 格式）按服务器指纹（服务器代码、mcp / fastmcp 版本）
+    保存在 catalog_path；指纹不变时 start 后立即可以 list_tools，不再等待服务器返回 list_tools。
+
+    standby_count > 0 时预先启动备用服务器进程（已握手并登记工具列表）。服务器进程意外退出时
+    立即切换到备用服务器，进行中的幂等调用（tool_registry 中的 pure / read_only 工具和声明
+    "idempotent": true 的写工具）在新服务器上重放，其他进行中的调用以 RuntimeError 结束（结果未知），
+    之后在后台补充新的备用服务器。standby_count 为 0 时服务器退出后客户端停止（is_alive 返回 False）。
+
+    tool_registry 中声明了 timeout 的工具超过期限时以 TimeoutError 结束，服务器上的调用同时被取消。
+    cancel 取消单个任务；get_result(cancel_on_timeout=True) 等待超时时取消任务，不再占用服务器。
+    """
+    def __init__(
+        self,
+        max_in_flight: int = 8,
+        server_params: StdioServerParameters = None,
+        result_ttl: float = 300.0,
+        max_results: int = 1024,
+        transport: str = "stdio",
+        server_factory=None,
+        cache: ToolResultCache = None,
+        sequential_tools: set = None,
+        catalog_path: str = DEFAULT_CATALOG_PATH,
+        standby_count: int = 0,
+        idempotent_tools: set = None,
+        tool_timeouts: dict = None
+    ):
+        """
+        参数:
+            max_in_flight: 同时进行的工具调用数上限
+            server_params: 服务器启动参数，默认启动 server/MCPServer.py
+            result_ttl: 已完成但没有被取走的结果保留的秒数
+            max_results: 已完成但没有被取走的结果最多保留的个数（超出时丢弃最早完成的）
+            transport: "stdio"（启动服务器子进程）或 "inprocess"（在本进程中直接调用工具）
+            server_factory: inprocess 传输时返回 FastMCP 服务器实例的函数，默认创建本地 MCPServer
+            cache: 工具结果缓存（可以在多个客户端之间共享），None 表示不缓存
+            sequential_tools: 需要依次执行的工具名，默认取 tool_registry 中声明 sequential 的工具
+            catalog_path: 工具目录缓存文件，None 表示不缓存（自定义 server_factory 时不缓存）
+            standby_count: 预先启动的备用服务器进程数（只用于 stdio 传输）
+            idempotent_tools: 服务器退出时可以重放的工具名，默认取 tool_registry 中的幂等工具
+            tool_timeouts: {工具名: 期限秒数}，默认取 tool_registry 中声明的 timeout
+        """
+        if result_ttl <= 0:
+            raise ValueError("result_ttl 必须大于0")
+        if not isinstance(max_results, int) or max_results <= 0:
+            raise ValueError("max_results 必须是大于0的整数")
+        # 服务器连接、故障切换、工具目录和缓存由异步客户端负责（在工作线程的事件循环中运行）
+        self._core = AsyncMCPClient(
+            max_in_flight=max_in_flight,
+            server_params=server_params,
+            transport=transport,
+            server_factory=server_factory,
+            cache=cache,
+            sequential_tools=sequential_tools,
+            catalog_path=catalog_path,
+            standby_count=standby_count,
+            idempotent_tools=idempotent_tools,
+            tool_timeouts=tool_timeouts
+        )
+        self._core.on_stop = self._stop
+        self.max_in_flight = max_in_flight#同时进行的工具调用数上限
+        self.result_ttl = result_ttl#结果保留时间
+        self.max_results = max_results#结果保留个数
+        self.transport = transport#传输方式
+        self.cache = cache#工具结果缓存
+        self.server_params = self._core.server_params#服务器参数
         self.thread = None#线程对象
         self.running = False#运行状态
         self.paused = False#暂停状态
-        self.pause_lock = threading.Lock()#暂停锁
-
-        # 获取当前文件所在目录
-        # 获取当前文件所在目录的父目录（MCP目录）
-        current_dir = os.path.dirname(os.path.abspath(__file__))  # client目录
-        parent_dir = os.path.dirname(current_dir)  # MCP目录
-        server_path = os.path.join(parent_dir, "server", "MCPServer.py")
-
-        self.server_params = StdioServerParameters(
-            command=sys.executable,
-            args=[server_path]
-        )#服务器参数
-
-        self.context = None # 上下文
-        self.session = None # 会话
-        self.tools = [] # 工具列表
-        self.initialized = False # 初始化状态
-
-        self.message_queue = queue.Queue() # 消息队列
-        self.results = {} # 结果字典，key 为 uuid，value 为结果
-    # ==================== 启动 ==================== 
+        self._stop_reason = None # 服务器不可用导致工作协程停止的原因
+
+        self.loop = None # 工作线程的事件循环
+        self.message_queue = None # 消息队列（asyncio.Queue，只在工作线程中访问）
+        self._resumed = None # 未暂停时置位（asyncio.Event）
+        self._pending = [] # 事件循环就绪前添加的任务
+        self._loop_lock = threading.Lock() # 保护 loop / _pending
+        self._in_flight = {} # 进行中的工具调用，key 为 uuid，value 为 asyncio.Task
+        self._futures = {} # 任务 Future，key 为 uuid
+        self._completed = OrderedDict() # 已完成未取走的任务，key 为 uuid，value 为完成时间（按完成顺序）
+        self._futures_lock = threading.Lock() # 保护 _futures / _completed
+        self.evicted = 0 # 因过期或超出上限被丢弃的结果数
+
+    # ==================== 异步客户端状态 ====================
+    @property
+    def initialized(self) -> bool:
+        return self._core.initialized
+
+    @property
+    def session(self):
+        """当前服务器连接的会话"""
+        return self._core.session
+
+    @property
+    def tools(self) -> list:
+        """工具列表（MCP 定义）"""
+        return self._core.tools
+
+    @property
+    def catalog_source(self):
+        """工具目录来源（"cache" 或 "server"）"""
+        return self._core.catalog_source
+
+    @property
+    def catalog_key(self):
+        """服务器指纹"""
+        return self._core.catalog_key
+
+    @property
+    def sequential_tools(self) -> set:
+        return self._core.sequential_tools
+
+    @property
+    def idempotent_tools(self) -> set:
+        return self._core.idempotent_tools
+
+    @property
+    def tool_timeouts(self) -> dict:
+        return self._core.tool_timeouts
+
+    def failover_stats(self) -> dict:
+        """服务器切换统计"""
+        return self._core.failover_stats()
+
+    # ==================== 启动 ====================
     def start(self):
         """启动MCP客户端"""
         if self.thread is None or not self.thread.is_alive():
             self.running = True#设置运行状态为True
             self.paused = False#设置暂停状态为False
+            self._core.load_catalog()#读取缓存的工具目录（服务器启动期间即可 list_tools）
             self.thread = threading.Thread(target=self._run_sync)#创建线程
             self.thread.start()#启动线程
 
@@ -50,18 +172,39 @@ class MCPClient:
         """关闭MCP客户端"""
         self.running = False#设置运行状态为False
         self.paused = False#设置暂停状态为False
+        self._call_in_loop(self._wake_worker)#唤醒等待中的工作协程，使其退出
         if self.thread is not None:
             self.thread.join()#等待线程结束
             self.thread = None#设置线程为None
-        
+        self._fail_pending(ValueError("MCP客户端已关闭"))#唤醒等待结果的线程
+
     # ==================== 暂停====================
     def pause(self):
-        """暂停MCP客户端"""
+        """暂停MCP客户端（已开始的工具调用会执行完，之后的任务等待恢复）"""
         self.paused = True
-    # ==================== 恢复====================  
+        self._call_in_loop(lambda: self._resumed.clear())
+    # ==================== 恢复====================
     def resume(self):
         """恢复MCP客户端"""
         self.paused = False
+        self._call_in_loop(lambda: self._resumed.set())
+
+    # ==================== 线程间调度 ====================
+    def _call_in_loop(self, callback, *args) -> bool:
+        """在工作线程的事件循环中执行 callback，事件循环未就绪或已关闭时返回 False"""
+        with self._loop_lock:
+            if self.loop is None:
+                return False
+            try:
+                self.loop.call_soon_threadsafe(callback, *args)
+            except RuntimeError:
+                return False
+            return True
+
+    def _wake_worker(self):
+        """让工作协程从等待中返回（关闭时使用）"""
+        self._resumed.set()
+        self.message_queue.put_nowait(None)
 
     # ==================== 同步运行包装 ====================
     def _run_sync(self):
@@ -73,59 +216,126 @@ class MCPClient:
             import traceback
             traceback.print_exc()
             self.running = False
+            self._fail_pending(RuntimeError(f"MCP客户端异常退出: {e}"))#唤醒等待结果的线程
+        finally:
+            with self._loop_lock:
+                self.loop = None
 
     # ==================== 异步运行====================
     async def _run_async(self):
+        # 创建队列和暂停事件，之后 add / pause / resume 通过 call_soon_threadsafe 投递到本事件循环
+        self.message_queue = asyncio.Queue()
+        self._resumed = asyncio.Event()
+        self._stop_reason = None
+        if not self.paused:
+            self._resumed.set()
+        with self._loop_lock:
+            self.loop = asyncio.get_running_loop()
+            for task in self._pending:
+                self.message_queue.put_nowait(task)
+            self._pending = []
+
         try:
-            # 创建客户端
-            # 参数：服务器参数
-            # 返回：一个上下文管理器
-            self.context = stdio_client(self.server_params)
-            # 创建通信管道
-            # read  管道：用来接收服务器发来的消息
-            # write 管道：用来发送消息给服务器
-            read, write = await self.context.__aenter__()
-
-            # 创建会话
-            self.session = ClientSession(read, write)
-            # 启动后台监听任务
-            await self.session.__aenter__()
-
-            # 初始化（握手）
-            await self.session.initialize()
-
-            # 获取工具列表
-            result = await self.session.list_tools()
-            self.tools = result.tools if hasattr(result, 'tools') else result
-            self.initialized = True
+            # 启动服务器并握手（stdio 启动子进程，inprocess 在本进程的线程池中执行工具）
+            await self._core.start()
 
             while self.running:
-                if self.paused:
-                    time.sleep(0.1)
+                # 队列为空时挂起，直到 add 投递新任务或 close 投递 None
+                task = await self.message_queue.get()
+                if task is None:
                     continue
 
-                #如果队列为空
-                if self.message_queue.empty():
+                # 暂停时挂起，直到 resume 或 close
+                if not self._resumed.is_set():
+                    await self._resumed.wait()
+                if not self.running:
+                    self.message_queue.put_nowait(task)
+                    break
+                if self._is_cancelled(task["id"]):
+                    # 排队期间已被取消，不再发给服务器
                     continue
-                # 取出顶部元素
-                task = self.message_queue.get()
-                # 移除顶部元素
-                self.message_queue.task_done()
-
-                task_id = task["id"]
-                result = await self.session.call_tool(
-                    task["name"],
-                    task.get("arguments", {})
-                )
-                # 将结果存入字典
-                self.results[task_id] = result
 
+                # 并发上限和 sequential 工具的路径锁由 AsyncMCPClient 负责（等锁的调用不占用并发名额）
+                call = asyncio.create_task(self._call_tool(task))
+                self._in_flight[task["id"]] = call
+                call.add_done_callback(lambda _, task_id=task["id"]: self._in_flight.pop(task_id, None))
+
+            if self._stop_reason is not None:
+                raise RuntimeError(self._stop_reason)
         finally:
-            # 在异步环境中正确关闭资源
-            if self.session:
-                await self.session.__aexit__(None, None, None)
-            if self.context:
-                await self.context.__aexit__(None, None, None)
+            # 异常退出时也不再接受任务（is_alive 随即返回 False）
+            self.running = False
+            # 关闭时取消仍在进行的调用
+            calls = list(self._in_flight.values())
+            for call in calls:
+                call.cancel()
+            if calls:
+                await asyncio.gather(*calls, return_exceptions=True)
+            # 关闭所有服务器连接（各连接在自己的任务中释放资源）
+            await self._core.close()
+
+    async def _call_tool(self, task: dict):
+        """执行一个工具调用并交付结果（与其他调用并发进行）"""
+        try:
+            result = await self._core.execute(task["name"], task["arguments"], task.get("cache"))
+        except asyncio.CancelledError:
+            result = RuntimeError(self._stop_reason or "MCP客户端已关闭，工具调用被取消")
+        except Exception as e:
+            # 单个工具调用失败不影响工作线程，get_result 时抛出
+            result = e
+        self._deliver(task["id"], result)
+
+    def _cancel_call(self, task_id: str):
+        """取消进行中的调用（在工作线程中调用；会话向服务器发送 notifications/cancelled）"""
+        call = self._in_flight.get(task_id)
+        if call is not None:
+            call.cancel()
+
+    def _is_cancelled(self, task_id: str) -> bool:
+        with self._futures_lock:
+            future = self._futures.get(task_id)
+        return future is None or future.cancelled()
+
+    def _stop(self, reason: str):
+        """服务器不可用时停止工作协程（在工作线程中调用），_run_sync 让等待中的任务以 RuntimeError 结束"""
+        self._stop_reason = reason
+        self.running = False
+        self.message_queue.put_nowait(None)
+
+    # ==================== 结果交付 ====================
+    def _deliver(self, task_id: str, result):
+        """完成任务的 Future（唤醒等待者），并丢弃过期或超出上限的结果"""
+        with self._futures_lock:
+            future = self._futures.get(task_id)
+            if future is None or future.done():
+                return
+            self._completed[task_id] = time.monotonic()
+            self._evict()
+        if isinstance(result, Exception):
+            future.set_exception(result)
+        else:
+            future.set_result(result)
+
+    def _evict(self):
+        """丢弃最早完成的结果，直到没有过期结果且数量不超过上限（持有 _futures_lock 时调用）"""
+        expire_before = time.monotonic() - self.result_ttl
+        while self._completed:
+            task_id, completed_at = next(iter(self._completed.items()))
+            if completed_at > expire_before and len(self._completed) <= self.max_results:
+                break
+            del self._completed[task_id]
+            self._futures.pop(task_id, None)
+            self.evicted += 1
+
+    def _fail_pending(self, error: Exception):
+        """让所有未完成的任务以 error 结束"""
+        with self._futures_lock:
+            pending = [future for future in self._futures.values() if not future.done()]
+        for future in pending:
+            try:
+                future.set_exception(error)
+            except concurrent.futures.InvalidStateError:
+                pass
 
     # ==================== 添加任务 ====================
     def add(self, _data: dict) -> str:
@@ -142,6 +352,74 @@ class MCPClient:
             raise ValueError("数据不能为空")
         if self.running is False:
             raise ValueError("MCP客户端未启动")
+        task_id, task = self._new_task(_data)
+        if task is not None:
+            self._post([task])
+        return task_id
+
+    def add_many(self, calls: list, timeout: float = None) -> list:
+        """
+        批量调用工具：一次投递整批调用，彼此独立的调用并发执行，等待全部完成
+
+        参数:
+            calls: 工具调用列表（格式同 add）
+            timeout: 整批的超时时间（秒），None 表示无限等待
+
+        返回:
+            与 calls 顺序一致的结果列表；某个调用失败时对应位置是异常对象（格式错误、工具调用异常、
+            整批超时时仍未完成的调用为 TimeoutError），不影响其他调用
+        """
+        if calls is None:
+            raise ValueError("数据不能为空")
+        if self.running is False:
+            raise ValueError("MCP客户端未启动")
+        entries = [] # (任务ID, None) 或 (None, 异常)
+        tasks = []
+        for data in calls:
+            try:
+                if data is None:
+                    raise ValueError("数据不能为空")
+                task_id, task = self._new_task(data)
+            except Exception as e:
+                entries.append((None, e))
+                continue
+            entries.append((task_id, None))
+            if task is not None:
+                tasks.append(task)
+        self._post(tasks) # 整批只跨线程投递一次
+
+        with self._futures_lock:
+            futures = {task_id: self._futures.get(task_id) for task_id, _ in entries if task_id is not None}
+        concurrent.futures.wait([f for f in futures.values() if f is not None], timeout=timeout)
+
+        results = []
+        for task_id, error in entries:
+            future = futures.get(task_id)
+            if error is not None:
+                results.append(error)
+            elif future is None:
+                results.append(KeyError(f"任务 {task_id} 不存在或结果已过期"))
+            elif not future.done():
+                # 调用方拿不到这些任务的ID，之后也不会再取结果：取消，不再占用服务器
+                self.cancel(task_id)
+                results.append(TimeoutError(f"等待任务 {task_id} 结果超时，已取消"))
+            elif future.exception() is not None:
+                results.append(future.exception())
+            else:
+                results.append(future.result())
+            if future is not None and future.done():
+                with self._futures_lock:
+                    self._futures.pop(task_id, None)
+                    self._completed.pop(task_id, None)
+        return results
+
+    def _new_task(self, _data: dict):
+        """
+        创建任务并登记 Future
+
+        返回:
+            (任务ID, 需要投递的任务)；命中缓存时任务已完成，第二项为 None
+        """
         data = self.OpenAI_to_MCP(_data) # 将OpenAI工具转换为MCP工具
         # 生成 UUID
         task_id = str(uuid.uuid4())
@@ -150,101 +428,116 @@ class MCPClient:
             "name": data["name"],
             "arguments": data.get("arguments", {})
         }
-        self.message_queue.put(task)
-        return task_id
+        with self._futures_lock:
+            self._futures[task_id] = concurrent.futures.Future()
+        if self.cache is not None:
+            # 命中缓存时在调用方线程中直接完成，不经过服务器
+            hit, result = self.cache.get(task["name"], task["arguments"])
+            if hit:
+                self._deliver(task_id, result)
+                return task_id, None
+            task["cache"] = self.cache.prepare(task["name"], task["arguments"])
+        return task_id, task
+
+    def _post(self, tasks: list):
+        """投递到工作线程的事件循环（线程安全，一批任务只调度一次），事件循环未就绪时先暂存"""
+        if not tasks:
+            return
+        with self._loop_lock:
+            if self.loop is None:
+                self._pending.extend(tasks)
+            else:
+                self.loop.call_soon_threadsafe(self._enqueue, tasks)
+
+    def _enqueue(self, tasks: list):
+        for task in tasks:
+            self.message_queue.put_nowait(task)
 
     # ==================== 获取结果 ====================
-    def get_result(self, task_id: str, block=True, timeout=None):
+    def get_result(self, task_id: str, block=True, timeout=None, cancel_on_timeout: bool = False):
         """
-        根据任务 ID 获取工具调用结果
+        根据任务 ID 获取工具调用结果（取走后不能再次获取）
 
         参数:
             task_id: 任务的 UUID
             block: 是否阻塞等待，默认 True
             timeout: 超时时间（秒），None 表示无限等待
+            cancel_on_timeout: 等待超时时取消任务（服务器停止执行，结果不再保留）；默认保留任务，可以稍后再取
 
         返回:
             工具调用的结果
+
+        异常:
+            TimeoutError: 等待超时
+            KeyError: 任务不存在（或结果已过期被丢弃），或非阻塞模式下结果尚未准备好
+            ValueError: 客户端未启动或等待期间被关闭
+            Exception: 工具调用本身抛出的异常
         """
         if self.running is False:
             raise ValueError("MCP客户端未启动")
 
-        if block:
-            # 阻塞等待结果
-            start_time = time.time()
-            while True:
-                if task_id in self.results:
-                    result = self.results.pop(task_id)
-                    return result
+        future = self.get_future(task_id)
+        if not block and not future.done():
+            # 非阻塞，直接返回
+            raise KeyError(f"任务 {task_id} 的结果尚未准备好")
+        try:
+            # 工具返回时 Future 立即完成，不轮询
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            if cancel_on_timeout and self.cancel(task_id):
+                raise TimeoutError(f"等待任务 {task_id} 结果超时，已取消") from None
+            raise TimeoutError(f"等待任务 {task_id} 结果超时")
+        finally:
+            if future.done():
+                with self._futures_lock:
+                    self._futures.pop(task_id, None)
+                    self._completed.pop(task_id, None)
 
-                # 检查超时
-                if timeout is not None:
-                    if time.time() - start_time > timeout:
-                        raise TimeoutError(f"等待任务 {task_id} 结果超时")
+    def cancel(self, task_id: str) -> bool:
+        """
+        取消任务：排队中的任务不再执行，进行中的调用被取消（服务器收到 notifications/cancelled），结果不再保留
 
-                time.sleep(0.01)
-        else:
-            # 非阻塞，直接返回
-            if task_id in self.results:
-                return self.results.pop(task_id)
-            else:
-                raise KeyError(f"任务 {task_id} 的结果尚未准备好")
+        返回:
+            是否取消了未完成的任务（任务不存在或已完成时返回 False）
+        """
+        with self._futures_lock:
+            future = self._futures.get(task_id)
+            if future is None or not future.cancel():
+                return False
+            self._futures.pop(task_id, None)
+        self._call_in_loop(self._cancel_call, task_id)
+        return True
+
+    def get_future(self, task_id: str) -> concurrent.futures.Future:
+        """
+        获取任务的 Future（不会取走结果；异步代码可用 asyncio.wrap_future 等待）
+
+        异常:
+            KeyError: 任务不存在，或结果已过期被丢弃
+        """
+        with self._futures_lock:
+            self._evict()
+            future = self._futures.get(task_id)
+        if future is None:
+            raise KeyError(f"任务 {task_id} 不存在或结果已过期")
+        return future
 
     # ==================== 获得工具 ====================
     def list_tools(self) -> list:
         if self.running is False:
             raise ValueError("MCP客户端未启动")
-        if self.tools is None:
-            raise ValueError("工具列表为空")
-        if len(self.tools) == 0:
-            raise ValueError("工具列表为空")
-        return [self.MCP_to_OpenAI(tool) for tool in self.tools] # 将MCP工具转换为OpenAI工具
+        return self._core.list_tools()
 
     def get_initialized(self) -> bool:
         return self.initialized
 
-    def MCP_to_OpenAI(self, tool) -> dict:
-        """将MCP工具转换为OpenAI工具"""
-        return {
-            "type": "function",
-            "function": {
-                "name": tool.name,
-                "description": tool.description,
-                "parameters": tool.inputSchema
-            }
-        }
-    def OpenAI_to_MCP(self, tool: dict) -> dict:
-        """将OpenAI格式转换为MCP格式
+    def is_alive(self) -> bool:
+        """工作线程是否在运行（启动后异常退出或已关闭时返回 False）"""
+        return self.running and self.thread is not None and self.thread.is_alive()
+
+    MCP_to_OpenAI = staticmethod(AsyncMCPClient.MCP_to_OpenAI)
+    OpenAI_to_MCP = staticmethod(AsyncMCPClient.OpenAI_to_MCP)
 
-        支持两种OpenAI格式：
-        1. 工具定义格式（tool definition）：包含 description 和 parameters
-        2. 工具调用格式（tool call）：包含 name 和 arguments
-        """
-        function = tool.get("function", {})
-
-        # 判断是工具调用格式还是工具定义格式
-        if "arguments" in function:
-            # 工具调用格式：只需要 name 和 arguments
-            arguments = function["arguments"]
-            # 如果 arguments 是字符串，需要解析为字典
-            if isinstance(arguments, str):
-                # 处理空字符串的情况
-                if arguments.strip() == "":
-                    arguments = {}
-                else:
-                    arguments = json.loads(arguments)
-
-            return {
-                "name": function["name"],
-                "arguments": arguments
-            }
-        else:
-            # 工具定义格式：需要 description 和 inputSchema
-            return {
-                "name": function["name"],
-                "description": function.get("description", ""),
-                "inputSchema": function.get("parameters", {})
-            }
 
 
 
@@ -0,0 +1,281 @@
+import re
+import time
+import asyncio
+from mcp import StdioServerParameters
+from mcp.types import CallToolResult
+from .ServerConnection import ServerConnection
+
+
+SEPARATOR = "__" # 命名空间与工具名之间的分隔符（OpenAI 工具名只允许字母、数字、_ 和 -）
+NAMESPACE_PATTERN = re.compile(r"[A-Za-z0-9-]+(_[A-Za-z0-9-]+)*")
+
+
+def server_params_from_config(config) -> StdioServerParameters:
+    """
+    服务器配置 -> StdioServerParameters
+
+    支持 StdioServerParameters、命令列表（["npx", "-y", "..."]），
+    以及常见的 mcpServers 配置项 {"command": ..., "args": [...], "env": {...}, "cwd": ...}
+    """
+    if isinstance(config, StdioServerParameters):
+        return config
+    if isinstance(config, (list, tuple)) and config:
+        return StdioServerParameters(command=config[0], args=list(config[1:]))
+    if isinstance(config, dict) and config.get("command"):
+        return StdioServerParameters(
+            command=config["command"],
+            args=list(config.get("args", [])),
+            env=config.get("env"),
+            cwd=config.get("cwd")
+        )
+    raise ValueError(f"无法识别的服务器配置: {config!r}")
+
+
+class FederatedServer:
+    """联邦中的一个服务器：连接、工具列表、并发上限和故障统计"""
+    def __init__(self, namespace: str, params: StdioServerParameters, max_in_flight: int):
+        self.namespace = namespace
+        self.params = params
+        self.connection = None # ServerConnection
+        self.tools = {} # 工具名 -> MCP Tool
+        self.slots = asyncio.Semaphore(max_in_flight) # 同时进行的调用数上限（慢服务器只占用自己的名额）
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.consecutive_failures = 0 # 连续失败（超时或调用异常）次数
+        self.open_until = 0.0 # 熔断到期时间（monotonic），之前的调用直接失败
+
+    @property
+    def state(self) -> str:
+        if self.connection is None:
+            return "stopped"
+        if self.connection.usable:
+            return "open" if time.monotonic() < self.open_until else "ready"
+        if self.connection.lost:
+            return "failed" if self.connection.ready_at is None else "lost"
+        return "starting"
+
+    def snapshot(self) -> dict:
+        connection = self.connection
+        startup = None
+        if connection is not None and connection.ready_at is not None:
+            startup = round((connection.ready_at - connection.started_at) * 1000, 1)
+        return {
+            "state": self.state,
+            "tools": len(self.tools),
+            "startup_ms": startup,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "error": f"{type(connection.error).__name__}: {connection.error}" if connection and connection.error else None,
+        }
+
+
+class MCPFederation:
+    """
+    MCP 服务器联邦（异步）
+
+    同时连接多个 MCP 服务器（每个服务器一个命名空间），并行握手和发现工具，
+    合并后的工具名为 "命名空间__工具名"，call_tool 按命名空间把调用路由到对应服务器。
+
+    服务器之间互不影响：
+        - 启动时并行发现，start 最多等待 start_timeout 秒；启动慢的服务器就绪后再加入工具列表，启动失败的不加入
+        - 每个服务器有自己的并发上限，调用有超时，慢服务器只会让发给它自己的调用超时
+        - 连续 failure_threshold 次失败的服务器熔断 cooldown 秒，期间发给它的调用立即失败、工具不出现在列表中
+        - 服务器进程退出后其工具从列表中移除，发给它的调用立即失败
+    所有方法都要在同一个事件循环中调用（start 所在的事件循环）。
+    """
+    def __init__(
+        self,
+        servers: dict,
+        start_timeout: float = 30.0,
+        call_timeout: float = 60.0,
+        max_in_flight: int = 8,
+        failure_threshold: int = 3,
+        cooldown: float = 30.0
+    ):
+        """
+        参数:
+            servers: {命名空间: 服务器配置}，配置格式见 server_params_from_config
+            start_timeout: start 等待服务器就绪的最长秒数
+            call_timeout: 单个工具调用的默认超时秒数（包括等待并发名额的时间）
+            max_in_flight: 每个服务器同时进行的调用数上限
+            failure_threshold: 连续失败多少次后熔断
+            cooldown: 熔断持续秒数
+        """
+        if not servers:
+            raise ValueError("servers 不能为空")
+        if start_timeout <= 0 or call_timeout <= 0 or cooldown <= 0:
+            raise ValueError("start_timeout / call_timeout / cooldown 必须大于0")
+        if not isinstance(max_in_flight, int) or max_in_flight <= 0:
+            raise ValueError("max_in_flight 必须是大于0的整数")
+        if not isinstance(failure_threshold, int) or failure_threshold <= 0:
+            raise ValueError("failure_threshold 必须是大于0的整数")
+        for namespace in servers:
+            if not isinstance(namespace, str) or not NAMESPACE_PATTERN.fullmatch(namespace):
+                raise ValueError(f"命名空间 {namespace!r} 只能包含字母、数字、- 和单个 _")
+        self.start_timeout = start_timeout
+        self.call_timeout = call_timeout
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.servers = {
+            namespace: FederatedServer(namespace, server_params_from_config(config), max_in_flight)
+            for namespace, config in servers.items()
+        }
+        self.started_at = None
+        self.startup_ms = None # start 返回时经过的毫秒数
+
+    # ==================== 启动 / 关闭 ====================
+    async def start(self) -> dict:
+        """
+        并行启动所有服务器并发现工具，所有服务器就绪或超过 start_timeout 时返回
+
+        返回:
+            各服务器的状态（同 status）
+        """
+        self.started_at = time.monotonic()
+        for server in self.servers.values():
+            server.tools = {}
+            server.connection = ServerConnection(
+                server.namespace,
+                transport="stdio",
+                server_params=server.params,
+                prepare=self._discovery(server)
+            ).start()
+        pending = [server.connection.ready.wait() for server in self.servers.values()]
+        try:
+            await asyncio.wait_for(asyncio.gather(*pending), self.start_timeout)
+        except asyncio.TimeoutError:
+            slow = [s.namespace for s in self.servers.values() if s.state == "starting"]
+            print(f"[MCPFederation] 服务器 {slow} 在 {self.start_timeout} 秒内没有就绪，就绪后再加入工具列表")
+        self.startup_ms = round((time.monotonic() - self.started_at) * 1000, 1)
+        return self.status()
+
+    def _discovery(self, server: FederatedServer):
+        async def prepare(session):
+            result = await session.list_tools()
+            tools = result.tools if hasattr(result, 'tools') else result
+            server.tools = {tool.name: tool for tool in tools}
+        return prepare
+
+    async def close(self):
+        """关闭所有服务器"""
+        connections = [s.connection for s in self.servers.values() if s.connection is not None]
+        await asyncio.gather(*(c.close() for c in connections), return_exceptions=True)
+        for server in self.servers.values():
+            server.connection = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    # ==================== 工具列表 ====================
+    def list_tools(self) -> list:
+        """可用服务器的工具（OpenAI 格式，工具名带命名空间）"""
+        tools = []
+        for server in self.servers.values():
+            if server.state != "ready":
+                continue
+            for tool in server.tools.values():
+                tools.append({
+                    "type": "function",
+                    "function": {
+                        "name": f"{server.namespace}{SEPARATOR}{tool.name}",
+                        "description": tool.description,
+                        "parameters": tool.input_schema
+                    }
+                })
+        return tools
+
+    def resolve(self, name: str):
+        """
+        "命名空间__工具名" -> (服务器, 工具名)
+
+        异常:
+            KeyError: 命名空间或工具不存在
+        """
+        namespace, separator, tool_name = name.partition(SEPARATOR)
+        server = self.servers.get(namespace)
+        if not separator or server is None:
+            raise KeyError(f"工具 {name} 不属于任何服务器（格式为 命名空间{SEPARATOR}工具名）")
+        if server.tools and tool_name not in server.tools:
+            raise KeyError(f"服务器 {namespace} 没有工具 {tool_name}")
+        return server, tool_name
+
+    # ==================== 调用工具 ====================
+    async def call_tool(self, name: str, arguments: dict = None, timeout: float = None) -> CallToolResult:
+        """
+        调用工具（按命名空间路由）
+
+        参数:
+            name: 带命名空间的工具名
+            arguments: 工具参数
+            timeout: 超时秒数，默认 call_timeout
+
+        异常:
+            KeyError: 工具不存在
+            RuntimeError: 服务器不可用（启动中、启动失败、已退出或熔断中）
+            TimeoutError: 调用超时
+        """
+        server, tool_name = self.resolve(name)
+        state = server.state
+        if state != "ready":
+            raise RuntimeError(f"服务器 {server.namespace} 当前不可用（{state}）")
+        session = server.connection.session
+        server.calls += 1
+        server.in_flight += 1
+        try:
+            result = await asyncio.wait_for(
+                self._call(server, session, tool_name, arguments or {}),
+                timeout or self.call_timeout
+            )
+        except asyncio.TimeoutError:
+            server.timeouts += 1
+            self._record_failure(server)
+            raise TimeoutError(f"调用 {name} 超时（{timeout or self.call_timeout} 秒）")
+        except Exception:
+            self._record_failure(server)
+            raise
+        finally:
+            server.in_flight -= 1
+        server.consecutive_failures = 0
+        return result
+
+    @staticmethod
+    async def _call(server: FederatedServer, session, tool_name: str, arguments: dict):
+        async with server.slots:
+            return await session.call_tool(tool_name, arguments)
+
+    async def call_many(self, calls: list, timeout: float = None) -> list:
+        """
+        并发调用多个工具
+
+        参数:
+            calls: [(带命名空间的工具名, 参数), ...]
+            timeout: 每个调用的超时秒数
+
+        返回:
+            与 calls 顺序一致的结果列表，失败的调用对应位置是异常对象
+        """
+        return await asyncio.gather(
+            *(self.call_tool(name, arguments, timeout) for name, arguments in calls),
+            return_exceptions=True
+        )
+
+    def _record_failure(self, server: FederatedServer):
+        server.failures += 1
+        server.consecutive_failures += 1
+        if server.consecutive_failures >= self.failure_threshold:
+            server.open_until = time.monotonic() + self.cooldown
+            server.consecutive_failures = 0
+            print(f"[MCPFederation] 服务器 {server.namespace} 连续失败 {self.failure_threshold} 次，熔断 {self.cooldown} 秒")
+
+    # ==================== 状态 ====================
+    def status(self) -> dict:
+        """{命名空间: 状态}，状态包括 state（starting / ready / open / failed / lost / stopped）、工具数、启动耗时、调用统计"""
+        return {namespace: server.snapshot() for namespace, server in self.servers.items()}
@@ -0,0 +1,136 @@
+import time
+import asyncio
+from contextlib import AsyncExitStack
+import anyio
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from .InProcessTransport import InProcessSession
+
+
+class ServerConnection:
+    """
+    一个服务器连接（stdio：一个服务器子进程及其会话；inprocess：一个进程内会话）
+
+    连接由自己的 asyncio 任务持有：stdio_client / ClientSession 内部的 anyio 任务组要求在同一个任务中进入和退出，
+    所以备用连接可以在后台启动、握手并准备好工具列表，之后其他任务直接用 session 调用工具。
+
+    stdio 传输时在服务器输出流和会话之间转发消息：服务器进程退出（输出流结束）时先标记 lost，
+    会话随后才收到连接关闭（进行中的调用以 MCPError 结束），调用方据此区分服务器崩溃和普通的调用错误。
+    """
+    def __init__(
+        self,
+        name: str,
+        transport: str = "stdio",
+        server_params: StdioServerParameters = None,
+        server_factory=None,
+        workers: int = 8,
+        prepare=None,
+        on_ready=None,
+        on_lost=None
+    ):
+        """
+        参数:
+            name: 连接名（日志用）
+            transport: "stdio" 或 "inprocess"
+            server_params: stdio 传输的服务器启动参数
+            server_factory: inprocess 传输的服务器工厂
+            workers: inprocess 传输执行工具的线程数
+            prepare: 握手后、标记就绪前执行的协程函数 prepare(session)（获取或登记工具列表）
+            on_ready: 就绪时的回调 on_ready(connection)
+            on_lost: 服务器意外退出（包括启动失败）时的回调 on_lost(connection)
+        """
+        self.name = name
+        self.transport = transport
+        self.server_params = server_params
+        self.server_factory = server_factory
+        self.workers = workers
+        self.prepare = prepare
+        self.on_ready = on_ready
+        self.on_lost = on_lost
+
+        self.session = None # 会话（就绪后可用）
+        self.ready = asyncio.Event() # 就绪或启动失败时置位
+        self.lost = False # 服务器意外退出
+        self.closing = False # 正在主动关闭
+        self.error = None # 启动或运行期间的异常
+        self.started_at = time.monotonic() # 开始启动的时间
+        self.ready_at = None # 就绪的时间
+        self.lost_at = None # 发现服务器退出的时间
+        self._stop = asyncio.Event() # 置位后持有任务关闭连接
+        self._task = None
+
+    @property
+    def usable(self) -> bool:
+        """是否可以调用工具"""
+        return self.session is not None and self.ready.is_set() and not self.lost and not self.closing
+
+    # ==================== 生命周期 ====================
+    def start(self) -> "ServerConnection":
+        """在当前事件循环中创建持有连接的任务"""
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def close(self):
+        """关闭连接并等待服务器进程退出"""
+        self.closing = True
+        self._stop.set()
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self):
+        try:
+            async with AsyncExitStack() as stack:
+                if self.transport == "inprocess":
+                    session = await stack.enter_async_context(InProcessSession(self.server_factory, workers=self.workers))
+                else:
+                    read, write = await stack.enter_async_context(stdio_client(self.server_params))
+                    # 转发服务器消息：输出流结束时立即发现服务器退出
+                    sink, source = anyio.create_memory_object_stream(0)
+                    pump = asyncio.create_task(self._pump(read, sink))
+                    stack.push_async_callback(self._stop_pump, pump)
+                    session = await stack.enter_async_context(ClientSession(source, write))
+                await session.initialize()
+                if self.prepare is not None:
+                    await self.prepare(session)
+                if not self.lost:
+                    self.session = session
+                    self.ready_at = time.monotonic()
+                    self.ready.set()
+                    if self.on_ready is not None:
+                        self.on_ready(self)
+                await self._stop.wait()
+        except Exception as e:
+            self.error = e
+            if not self.closing:
+                print(f"[ServerConnection] {self.name} 异常退出: {type(e).__name__}: {e}")
+        finally:
+            if not self.closing:
+                # 启动失败或服务器退出
+                self._mark_lost()
+            self.ready.set()
+
+    async def _pump(self, read, sink):
+        async with sink:
+            try:
+                async for message in read:
+                    await sink.send(message)
+            except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+                pass
+            finally:
+                # 先标记再关闭 sink，会话里的调用失败时 lost 已经为 True
+                if not self.closing:
+                    self._mark_lost()
+
+    @staticmethod
+    async def _stop_pump(pump: asyncio.Task):
+        pump.cancel()
+        await asyncio.gather(pump, return_exceptions=True)
+
+    def _mark_lost(self):
+        if self.lost:
+            return
+        self.lost = True
+        self.lost_at = time.monotonic()
+        self._stop.set()
+        if self.on_lost is not None:
+            self.on_lost(self)
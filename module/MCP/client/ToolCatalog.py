@@ -0,0 +1,112 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+from importlib import metadata
+from mcp.types import Tool
+
+
+DEFAULT_CATALOG_PATH = os.path.join(
+    os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..")),
+    "Data", "mcp", "tool_catalog.json"
+)
+MAX_CATALOGS = 8 # 文件中最多保留的目录个数（按保存时间丢弃最早的）
+
+
+def _package_version(name: str) -> str:
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return ""
+
+
+def _hash_tree(digest, path: str):
+    """把 path（文件，或 .py 文件所在目录下的所有 .py 文件）的相对路径和内容计入 digest"""
+    if path.endswith(".py"):
+        root = os.path.dirname(path)
+        files = []
+        for current, dirs, names in os.walk(root):
+            dirs[:] = sorted(d for d in dirs if d != "__pycache__" and not d.startswith("."))
+            files.extend(os.path.join(current, name) for name in sorted(names) if name.endswith(".py"))
+    else:
+        root, files = os.path.dirname(path), [path]
+    for file in files:
+        digest.update(os.path.relpath(file, root).encode("utf-8"))
+        with open(file, "rb") as f:
+            digest.update(f.read())
+
+
+def server_fingerprint(command: str, args: list, transport: str = "stdio") -> str:
+    """
+    服务器指纹：启动命令、参数、参数中的服务器脚本及其目录下所有 .py 文件的内容、mcp / fastmcp 版本
+
+    服务器代码或依赖版本变化时指纹随之变化，缓存的工具目录不再使用
+    """
+    digest = hashlib.sha256()
+    identity = [transport, command, *args, _package_version("mcp"), _package_version("fastmcp"), sys.version]
+    digest.update(json.dumps(identity, ensure_ascii=False).encode("utf-8"))
+    for arg in args:
+        if os.path.isfile(arg):
+            _hash_tree(digest, os.path.abspath(arg))
+    return digest.hexdigest()
+
+
+class ToolCatalogCache:
+    """
+    工具目录缓存文件：{服务器指纹: {"tools": MCP 工具定义, "openai": 转换后的 OpenAI 工具, "saved_at": 时间戳}}
+
+    客户端启动时先按指纹读取，命中则不必等待服务器返回 list_tools；写入使用临时文件 + os.replace。
+    """
+    def __init__(self, path: str = None):
+        self.path = path or DEFAULT_CATALOG_PATH
+        self._lock = threading.Lock()
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"[ToolCatalog] 读取工具目录缓存失败: {e}")
+            return {}
+
+    def load(self, fingerprint: str):
+        """
+        读取指定指纹的工具目录
+
+        返回:
+            (MCP 工具列表, OpenAI 工具列表)；不存在或无法解析时返回 None
+        """
+        with self._lock:
+            entry = self._read().get(fingerprint)
+        if not entry:
+            return None
+        try:
+            return [Tool.model_validate(tool) for tool in entry["tools"]], entry["openai"]
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"[ToolCatalog] 工具目录缓存格式错误: {e}")
+            return None
+
+    def save(self, fingerprint: str, tools: list, openai_tools: list):
+        """保存工具目录（与文件中其他服务器的目录合并，只保留最近的 MAX_CATALOGS 个）"""
+        with self._lock:
+            data = self._read()
+            data[fingerprint] = {
+                "tools": [tool.model_dump(mode="json", by_alias=True, exclude_none=True) for tool in tools],
+                "openai": openai_tools,
+                "saved_at": time.time(),
+            }
+            for stale in sorted(data, key=lambda key: data[key].get("saved_at", 0))[:-MAX_CATALOGS]:
+                del data[stale]
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                temp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+                os.replace(temp_path, self.path)
+            except OSError as e:
+                print(f"[ToolCatalog] 保存工具目录缓存失败: {e}")
@@ -0,0 +1,254 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+
+REGISTRY_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "constants", "tool_registry"
+)
+CACHE_POLICIES = ("pure", "read_only", "none")
+PATH_KINDS = ("file", "db", "tree")
+
+
+def load_tool_registry(directory: str = None) -> dict:
+    """
+    合并 tool_registry 目录下所有 JSON 文件：
+    {工具名: {"cache": 缓存策略, "paths": {参数名: 路径类型}, "sequential": 是否依次执行, "idempotent": 是否幂等,
+             "timeout": 期限秒数}}
+
+    缓存策略:
+        pure      - 结果只取决于参数，一直有效
+        read_only - 只读磁盘，paths 中的文件 / 数据库变化后失效
+        none      - 不缓存；调用成功后让 paths 涉及的缓存失效（写操作）
+    路径类型:
+        file / db - 单个文件 / 数据库文件：按修改时间校验，文件事件也会让缓存失效
+        tree      - 目录树：修改时间看不到子目录内的变化，只在 AllEventsHandler 监控该目录时缓存
+    sequential 为 true 的工具（读-改-写）按 paths 参数加锁，涉及同一路径的调用在同一个客户端上不并发执行，见 AsyncMCPClient
+    idempotent 为 true 的工具重复执行结果相同，服务器退出时可以重放；pure / read_only 工具默认幂等，见 is_idempotent
+    timeout 为工具的默认期限：MCPServer 超时终止工具，客户端超时取消调用（见 tool_timeouts）
+    """
+    directory = directory or REGISTRY_DIR
+    registry = {}
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".json"):
+            continue
+        with open(os.path.join(directory, filename), "r", encoding="utf-8") as f:
+            content = f.read().strip()
+        for name, entry in (json.loads(content) if content else {}).items():
+            if entry.get("cache") not in CACHE_POLICIES:
+                raise ValueError(f"{filename} 中工具 {name} 的缓存策略必须是 {CACHE_POLICIES} 之一")
+            if any(kind not in PATH_KINDS for kind in entry.get("paths", {}).values()):
+                raise ValueError(f"{filename} 中工具 {name} 的路径类型必须是 {PATH_KINDS} 之一")
+            for flag in ("sequential", "idempotent"):
+                if not isinstance(entry.get(flag, False), bool):
+                    raise ValueError(f"{filename} 中工具 {name} 的 {flag} 必须是布尔值")
+            timeout = entry.get("timeout")
+            if timeout is not None and (isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0):
+                raise ValueError(f"{filename} 中工具 {name} 的 timeout 必须是大于0的秒数")
+            registry[name] = entry
+    return registry
+
+
+def tool_timeouts(registry: dict) -> dict:
+    """登记表中声明了期限的工具：{工具名: 秒数}"""
+    return {name: entry["timeout"] for name, entry in registry.items() if entry.get("timeout") is not None}
+
+
+def is_idempotent(entry: dict) -> bool:
+    """登记项对应的工具是否幂等（没有声明 idempotent 时，可缓存的工具视为幂等）"""
+    return entry.get("idempotent", entry.get("cache") in ("pure", "read_only"))
+
+
+class ToolResultCache:
+    """
+    工具结果缓存
+
+    key 为 (工具名, 规范化的参数 JSON)。是否缓存、参数中哪些是路径由 tool_registry 声明；
+    没有登记的工具不缓存。read_only 结果在以下情况失效：
+        - 涉及的文件 / 数据库文件修改时间变化（命中时 stat 校验，比重新读取便宜得多）
+        - attach 的 AllEventsHandler 报告了相关路径的文件事件
+        - 通过同一个缓存执行的写工具调用成功
+    命中时直接返回缓存的结果对象（不经过服务器）；线程安全，可以被多个客户端共享。
+    """
+    def __init__(self, registry: dict = None, max_entries: int = 1024, ttl: float = None):
+        """
+        参数:
+            registry: 工具登记表，默认读取 constants/tool_registry
+            max_entries: 最多缓存的结果数（超出时丢弃最久未使用的）
+            ttl: 结果最长保留秒数，None 表示只按失效规则丢弃
+        """
+        if not isinstance(max_entries, int) or max_entries <= 0:
+            raise ValueError("max_entries 必须是大于0的整数")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl 必须大于0")
+        self.registry = load_tool_registry() if registry is None else registry
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict() # key -> 缓存项（按最近使用排序）
+        self._lock = threading.Lock()
+        self._monitors = [] # attach 的 AllEventsHandler
+        self._generation = 0 # 每收到一个文件事件加一（目录树结果在调用期间有事件时不缓存）
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    # ==================== 登记表 ====================
+    def policy(self, name: str) -> str:
+        return self.registry.get(name, {}).get("cache", "none")
+
+    def _paths(self, name: str, arguments: dict) -> dict:
+        """参数中的路径 -> 路径类型（真实绝对路径；相对路径按当前目录解析，与服务器子进程一致）"""
+        paths = {}
+        for arg, kind in self.registry.get(name, {}).get("paths", {}).items():
+            value = arguments.get(arg)
+            if isinstance(value, str) and value:
+                paths[os.path.realpath(value)] = kind
+        return paths
+
+    @staticmethod
+    def make_key(name: str, arguments: dict) -> tuple:
+        return name, json.dumps(arguments, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+
+    @staticmethod
+    def _mtime(path: str):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    # ==================== 查询 / 写入 ====================
+    def get(self, name: str, arguments: dict):
+        """
+        查询缓存
+
+        返回:
+            (是否命中, 结果)
+        """
+        if self.policy(name) == "none":
+            return False, None
+        key = self.make_key(name, arguments)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._valid(entry):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry["result"]
+            if entry is not None:
+                del self._entries[key]
+                self.invalidations += 1
+            self.misses += 1
+        return False, None
+
+    def prepare(self, name: str, arguments: dict):
+        """
+        调用工具之前记录文件状态；不可缓存时返回 None
+
+        调用前取修改时间：调用期间文件被修改时，下次查询会发现修改时间不一致
+        """
+        policy = self.policy(name)
+        if policy == "none":
+            return None
+        paths = self._paths(name, arguments)
+        if any(kind == "tree" and not self._watched(path) for path, kind in paths.items()):
+            return None
+        return {
+            "key": self.make_key(name, arguments),
+            "mtimes": {path: self._mtime(path) for path, kind in paths.items() if kind != "tree"},
+            "paths": list(paths),
+            "tree": any(kind == "tree" for kind in paths.values()),
+            "generation": self._generation,
+        }
+
+    def put(self, token: dict, result):
+        """保存 prepare 之后得到的结果"""
+        if token is None:
+            return
+        with self._lock:
+            if token["tree"] and token["generation"] != self._generation:
+                return
+            self._entries[token["key"]] = {
+                "result": result,
+                "mtimes": token["mtimes"],
+                "paths": token["paths"],
+                "stored_at": time.monotonic(),
+            }
+            self._entries.move_to_end(token["key"])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def after_call(self, name: str, arguments: dict):
+        """写工具调用成功后，让涉及相同路径的缓存失效"""
+        if self.policy(name) != "none":
+            return
+        for path in self._paths(name, arguments):
+            self.invalidate_path(path)
+
+    def _valid(self, entry: dict) -> bool:
+        """缓存项是否仍然有效（持有 _lock 时调用）"""
+        if self.ttl is not None and time.monotonic() - entry["stored_at"] > self.ttl:
+            return False
+        return all(self._mtime(path) == mtime for path, mtime in entry["mtimes"].items())
+
+    # ==================== 失效 ====================
+    def attach(self, monitor):
+        """订阅 AllEventsHandler 的文件事件（目录树类结果只在其监控路径内缓存）"""
+        monitor.add_listener(self._on_event)
+        self._monitors.append(monitor)
+
+    def detach(self, monitor):
+        monitor.remove_listener(self._on_event)
+        if monitor in self._monitors:
+            self._monitors.remove(monitor)
+
+    def _watched(self, path: str) -> bool:
+        """path 是否在某个正在运行的监控器的监控路径之内"""
+        return any(
+            monitor.is_running and monitor.watch_path and
+            (path + os.sep).startswith(monitor.watch_path.rstrip(os.sep) + os.sep)
+            for monitor in self._monitors
+        )
+
+    def _on_event(self, event: dict):
+        with self._lock:
+            self._generation += 1
+        self.invalidate_path(event["src_path"])
+        if event.get("dest_path"):
+            self.invalidate_path(event["dest_path"])
+
+    def invalidate_path(self, path: str) -> int:
+        """让涉及 path 的缓存失效（path 本身、其上级目录树、其下的文件），返回失效的条数"""
+        path = os.path.realpath(path)
+        with self._lock:
+            stale = [key for key, entry in self._entries.items()
+                     if any(self._related(path, other) for other in entry["paths"])]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    @staticmethod
+    def _related(a: str, b: str) -> bool:
+        """两个路径相同，或一个在另一个之下"""
+        a, b = a.rstrip(os.sep), b.rstrip(os.sep)
+        return a == b or a.startswith(b + os.sep) or b.startswith(a + os.sep)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # ==================== 统计 ====================
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+            }
@@ -2,6 +2,7 @@ from fastmcp import FastMCP
 from fastmcp.tools import Tool
 import os
 import json
+import inspect
 
 from Tools.DatabaseEditor import DatabaseEditor
 from Tools.DataInquire import DataInquire
@@ -9,6 +10,7 @@ from Tools.FileEditor import FileEditor
 from Tools.WorkspaceManager import WorkspaceManager
 from Tools.TaskManager import TaskManager
 from Tools.mathematics import mathematics
+from ToolDeadline import DeadlineExecutor, load_tool_timeouts
 
 class MCPServer:
     def __init__(self):
@@ -21,6 +23,8 @@ class MCPServer:
         self.workspace_manager = WorkspaceManager()
         self.task_manager = TaskManager()
         self.mathematics = mathematics()
+        self.timeouts = load_tool_timeouts() # tool_registry 中声明的工具期限
+        self.deadlines = DeadlineExecutor() # 在工作进程中执行有期限的同步工具
         self.add_tool()
 
     # ==================== 启动服务器 ====================
@@ -32,6 +36,7 @@ class MCPServer:
     def stop(self):
         """停止服务器"""
         self.mcp.close()
+        self.deadlines.shutdown()
 
     # ==================== 重启服务器 ====================
     def restart(self):
@@ -39,68 +44,79 @@ class MCPServer:
         self.stop()
         self.start()
 
+    # ==================== 注册工具 ====================
+    def register(self, func):
+        """注册一个工具；tool_registry 中声明了 timeout 的同步工具在工作进程中执行，超过期限时终止"""
+        timeout = self.timeouts.get(func.__name__)
+        if timeout is None:
+            self.mcp.add_tool(Tool.from_function(func))
+        elif inspect.iscoroutinefunction(func):
+            self.mcp.add_tool(Tool.from_function(func, timeout=timeout)) # 异步工具可以直接取消
+        else:
+            self.mcp.add_tool(Tool.from_function(self.deadlines.wrap(func, timeout)))
+
     # ==================== 添加工具 ====================
     def add_tool(self):
         """注册所有工具到MCP服务器"""
         # DatabaseEditor 工具 —— 数据库操作工具
-        # self.mcp.add_tool(Tool.from_function(self.database_editor.connect))
-        # self.mcp.add_tool(Tool.from_function(self.database_editor.delete))
-        # self.mcp.add_tool(Tool.from_function(self.database_editor.insert_data))
-        # self.mcp.add_tool(Tool.from_function(self.database_editor.update_data))
-        # self.mcp.add_tool(Tool.from_function(self.database_editor.delete_data))
-        # self.mcp.add_tool(Tool.from_function(self.database_editor.create_table))
-        # self.mcp.add_tool(Tool.from_function(self.database_editor.delete_table))
-        # self.mcp.add_tool(Tool.from_function(self.database_editor.write))
-        # self.mcp.add_tool(Tool.from_function(self.database_editor.read))
-        # self.mcp.add_tool(Tool.from_function(self.database_editor.list_tables))
-        # self.mcp.add_tool(Tool.from_function(self.database_editor.list_all_data))
-        # self.mcp.add_tool(Tool.from_function(self.database_editor.count_records))
-        # self.mcp.add_tool(Tool.from_function(self.database_editor.data_exists))
+        # self.register(self.database_editor.connect)
+        # self.register(self.database_editor.delete)
+        # self.register(self.database_editor.insert_data)
+        # self.register(self.database_editor.update_data)
+        # self.register(self.database_editor.delete_data)
+        # self.register(self.database_editor.create_table)
+        # self.register(self.database_editor.delete_table)
+        # self.register(self.database_editor.write)
+        # self.register(self.database_editor.read)
+        # self.register(self.database_editor.list_tables)
+        # self.register(self.database_editor.list_all_data)
+        # self.register(self.database_editor.count_records)
+        # self.register(self.database_editor.data_exists)
 
         # # DataInquire 工具 —— 文件操作工具
-        # self.mcp.add_tool(Tool.from_function(self.data_inquire.file_directory))
-        # self.mcp.add_tool(Tool.from_function(self.data_inquire.file_content))
-        # self.mcp.add_tool(Tool.from_function(self.data_inquire.file_line_count))
-        # self.mcp.add_tool(Tool.from_function(self.data_inquire.file_content_fuzzy))
-        # self.mcp.add_tool(Tool.from_function(self.data_inquire.database_all_table))
-        # self.mcp.add_tool(Tool.from_function(self.data_inquire.database_table_content))
-        # self.mcp.add_tool(Tool.from_function(self.data_inquire.database_table_data_exists))
-        # self.mcp.add_tool(Tool.from_function(self.data_inquire.database_content_fuzzy))
-        # self.mcp.add_tool(Tool.from_function(self.data_inquire.database_table_data_count))
-        # self.mcp.add_tool(Tool.from_function(self.data_inquire.database_table_data_batch))
-        # self.mcp.add_tool(Tool.from_function(self.data_inquire.database_table_data_filter))
+        # self.register(self.data_inquire.file_directory)
+        # self.register(self.data_inquire.file_content)
+        # self.register(self.data_inquire.file_line_count)
+        # self.register(self.data_inquire.file_content_fuzzy)
+        # self.register(self.data_inquire.database_all_table)
+        # self.register(self.data_inquire.database_table_content)
+        # self.register(self.data_inquire.database_table_data_exists)
+        # self.register(self.data_inquire.database_content_fuzzy)
+        # self.register(self.data_inquire.database_table_data_count)
+        # self.register(self.data_inquire.database_table_data_batch)
+        # self.register(self.data_inquire.database_table_data_filter)
 
         # # FileEditor 工具 —— 文件操作工具
-        # self.mcp.add_tool(Tool.from_function(self.file_editor.read_line))
-        # self.mcp.add_tool(Tool.from_function(self.file_editor.read_all))
-        # self.mcp.add_tool(Tool.from_function(self.file_editor.update_line))
-        # self.mcp.add_tool(Tool.from_function(self.file_editor.delete_line))
-        # self.mcp.add_tool(Tool.from_function(self.file_editor.insert_line))
-        # self.mcp.add_tool(Tool.from_function(self.file_editor.append_line))
-        # self.mcp.add_tool(Tool.from_function(self.file_editor.clear_file))
-        # self.mcp.add_tool(Tool.from_function(self.file_editor.read_JSON))
-        # self.mcp.add_tool(Tool.from_function(self.file_editor.write_JSON))
-        # self.mcp.add_tool(Tool.from_function(self.file_editor.append_JSON))
+        # self.register(self.file_editor.read_line)
+        # self.register(self.file_editor.read_all)
+        # self.register(self.file_editor.update_line)
+        # self.register(self.file_editor.delete_line)
+        # self.register(self.file_editor.insert_line)
+        # self.register(self.file_editor.append_line)
+        # self.register(self.file_editor.clear_file)
+        # self.register(self.file_editor.read_JSON)
+        # self.register(self.file_editor.write_JSON)
+        # self.register(self.file_editor.append_JSON)
 
         # WorkspaceManager 工具 —— 工作空间管理工具
-        # self.mcp.add_tool(Tool.from_function(self.workspace_manager.scan_workspace))
-        # self.mcp.add_tool(Tool.from_function(self.workspace_manager.search_files))
-        # self.mcp.add_tool(Tool.from_function(self.workspace_manager.get_file_metadata))
-        # self.mcp.add_tool(Tool.from_function(self.workspace_manager.list_files_simple))
+        # self.register(self.workspace_manager.scan_workspace)
+        # self.register(self.workspace_manager.search_files)
+        # self.register(self.workspace_manager.get_file_metadata)
+        # self.register(self.workspace_manager.list_files_simple)
 
         # # TaskManager 工具
-        self.mcp.add_tool(Tool.from_function(self.task_manager.exit_task)) #退出任务
-        self.mcp.add_tool(Tool.from_function(self.task_manager.plan_task)) #规划任务
-        self.mcp.add_tool(Tool.from_function(self.task_manager.generate_todo_list)) #生成TODO列表
+        self.register(self.task_manager.exit_task) #退出任务
+        self.register(self.task_manager.plan_task) #规划任务
+        self.register(self.task_manager.generate_todo_list) #生成TODO列表
 
 
         # Mathematics 工具 —— 数学工具
-        self.mcp.add_tool(Tool.from_function(self.mathematics.add))
-        self.mcp.add_tool(Tool.from_function(self.mathematics.subtract))
-        self.mcp.add_tool(Tool.from_function(self.mathematics.multiply))
-        self.mcp.add_tool(Tool.from_function(self.mathematics.divide))
-        self.mcp.add_tool(Tool.from_function(self.mathematics.power))
-        self.mcp.add_tool(Tool.from_function(self.mathematics.sqrt))
+        self.register(self.mathematics.add)
+        self.register(self.mathematics.subtract)
+        self.register(self.mathematics.multiply)
+        self.register(self.mathematics.divide)
+        self.register(self.mathematics.power)
+        self.register(self.mathematics.sqrt)
 if __name__ == "__main__":
     _MCPServer = MCPServer()
     _MCPServer.start()
\ No newline at end of file
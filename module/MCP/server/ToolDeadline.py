@@ -0,0 +1,161 @@
+import os
+import json
+import asyncio
+import functools
+import threading
+import multiprocessing
+
+
+REGISTRY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "constants", "tool_registry")
+
+
+def load_tool_timeouts(directory: str = None) -> dict:
+    """读取 tool_registry 中声明的工具期限：{工具名: 秒数}（没有声明 timeout 的工具不限时）"""
+    directory = directory or REGISTRY_DIR
+    timeouts = {}
+    if not os.path.isdir(directory):
+        return timeouts
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".json"):
+            continue
+        with open(os.path.join(directory, filename), "r", encoding="utf-8") as f:
+            content = f.read().strip()
+        for name, entry in (json.loads(content) if content else {}).items():
+            if entry.get("timeout") is not None:
+                timeouts[name] = entry["timeout"]
+    return timeouts
+
+
+def _worker_main(conn, parent_conn):
+    """工作进程：启动完成后发送 ("ready", None)，然后依次执行收到的 (函数, 参数)，把 ("ok", 结果) 或 ("error", 异常说明) 发回"""
+    parent_conn.close() # 父进程退出后 recv 才会收到 EOF，工作进程随之退出
+    conn.send(("ready", None))
+    while True:
+        try:
+            func, kwargs = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            reply = ("ok", func(**kwargs))
+        except Exception as e:
+            reply = ("error", f"{type(e).__name__}: {e}")
+        try:
+            conn.send(reply)
+        except Exception as e:
+            # 结果无法序列化
+            conn.send(("error", f"工具结果无法返回: {type(e).__name__}: {e}"))
+
+
+class DeadlineWorker:
+    """执行工具的工作进程（一次只执行一个调用）"""
+    START_TIMEOUT = 60.0 # 等待工作进程启动的秒数
+
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, self.conn), daemon=True)
+        self.process.start()
+        child_conn.close()
+        # 等待启动完成（子进程导入 __main__ 可能需要几百毫秒），工具期限只计算执行时间
+        try:
+            if not self.conn.poll(self.START_TIMEOUT):
+                raise TimeoutError(f"{self.START_TIMEOUT} 秒内没有启动")
+            self.conn.recv()
+        except (EOFError, OSError, TimeoutError) as e:
+            self.kill()
+            raise RuntimeError(f"工具工作进程启动失败: {e}") from None
+
+    def kill(self):
+        """结束工作进程（正在执行的工具随之停止，不再占用CPU）"""
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+
+class DeadlineExecutor:
+    """
+    在工作进程中执行声明了期限的同步工具
+
+    线程中的同步工具无法被打断：超时后调用方虽然不再等待，工具仍然会一直占用CPU
+    （例如超大指数的幂运算、遍历整个磁盘的文件搜索）。这里把工具放到可复用的工作进程中执行，
+    超过期限或调用被取消（客户端超时后发送 notifications/cancelled）时直接结束该进程，
+    下一个调用使用新的工作进程。工具参数和结果需要可以序列化（pickle）；
+    工作进程启动时会重新导入 __main__，服务器入口的启动代码需要放在 if __name__ == "__main__" 下。
+    """
+    def __init__(self, max_idle: int = 2):
+        """
+        参数:
+            max_idle: 保留的空闲工作进程数
+        """
+        if not isinstance(max_idle, int) or max_idle < 0:
+            raise ValueError("max_idle 必须是非负整数")
+        self.max_idle = max_idle
+        # 不直接 fork 当前进程：进程内传输时服务器运行在多线程的应用进程中，fork 出的子进程可能继承其他线程持有的锁。
+        # forkserver 从单线程的服务进程 fork 工作进程，没有 forkserver 的平台使用 spawn
+        methods = multiprocessing.get_all_start_methods()
+        self.context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self._idle = [] # 空闲的工作进程
+        self._lock = threading.Lock() # 保护 _idle（进程内传输时工具在多个线程的事件循环中执行）
+        self.killed = 0 # 因超时或取消被结束的工作进程数
+
+    def wrap(self, func, timeout: float):
+        """
+        包装同步工具：返回参数签名相同的异步函数（用于注册到 FastMCP）
+
+        超时时抛出 TimeoutError，FastMCP 把它作为 is_error 结果返回给客户端
+        """
+        if timeout <= 0:
+            raise ValueError("timeout 必须大于0")
+
+        @functools.wraps(func)
+        async def run(**kwargs):
+            return await self.run(func, kwargs, timeout)
+        return run
+
+    async def run(self, func, kwargs: dict, timeout: float):
+        """在工作进程中执行 func(**kwargs)，超过 timeout 秒或被取消时结束工作进程"""
+        loop = asyncio.get_running_loop()
+        worker = await loop.run_in_executor(None, self._acquire) # 启动新工作进程需要等待服务进程，不阻塞事件循环
+        try:
+            worker.conn.send((func, kwargs))
+            # 结束工作进程后 recv 立即以 EOFError 返回，等待线程随之退出
+            status, value = await asyncio.wait_for(loop.run_in_executor(None, worker.conn.recv), timeout)
+        except asyncio.TimeoutError:
+            self._kill(worker)
+            raise TimeoutError(f"工具 {func.__name__} 超过 {timeout} 秒未完成，已终止") from None
+        except BaseException:
+            # 取消（客户端放弃了调用）或管道异常：工作进程的状态未知，直接结束
+            self._kill(worker)
+            raise
+        self._release(worker)
+        if status == "error":
+            raise RuntimeError(value)
+        return value
+
+    def _acquire(self) -> DeadlineWorker:
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive():
+                    return worker
+                worker.kill()
+        return DeadlineWorker(self.context)
+
+    def _release(self, worker: DeadlineWorker):
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(worker)
+                return
+        worker.kill()
+
+    def _kill(self, worker: DeadlineWorker):
+        with self._lock:
+            self.killed += 1
+        worker.kill()
+
+    def shutdown(self):
+        """结束所有空闲的工作进程"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.kill()
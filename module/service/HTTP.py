@@ -5,6 +5,8 @@ HTTP 服务端模块
 基于 FastAPI 的纯 HTTP 服务端封装，提供 REST API 能力
 通过回调函数机制让外部注入业务逻辑
 """
+import inspect
+from typing import Callable
 from fastapi import FastAPI
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -21,6 +23,62 @@ class HTTPServer:
       # 创建FastAPI实例
       self.app = FastAPI()
 
+      # 就绪状态回调：返回包含 "ready" 键的字典（如 AIFactory.readiness），未设置时视为就绪
+      self._ready_callback = None
+
+      # 注册探针路由：/health 存活探针，/ready 就绪探针（未就绪返回503，滚动发布时不接收流量）
+      self.app.add_api_route("/health", self._health, methods=["GET"])
+      self.app.add_api_route("/ready", self._ready, methods=["GET"])
+
+    # ==================== 回调注册 ====================
+    def set_ready_callback(self, callback: Callable):
+      """
+      设置就绪状态回调
+
+      参数:
+          callback: 无参函数（可以是协程函数），返回包含 "ready" 键的字典
+      """
+      if not callable(callback):
+        raise TypeError("callback 必须是可调用对象")
+      self._ready_callback = callback
+
+    def add_startup_callback(self, callback: Callable):
+      """
+      添加启动回调（在服务的事件循环中执行，如 AIFactory.startup 开始配置监控和预热）
+
+      参数:
+          callback: 无参函数（可以是协程函数）
+      """
+      if not callable(callback):
+        raise TypeError("callback 必须是可调用对象")
+      self.app.router.add_event_handler("startup", callback)
+
+    def add_shutdown_callback(self, callback: Callable):
+      """
+      添加关闭回调（服务退出前在事件循环中执行，如 AIFactory.shutdown 停止配置监控）
+
+      参数:
+          callback: 无参函数（可以是协程函数）
+      """
+      if not callable(callback):
+        raise TypeError("callback 必须是可调用对象")
+      self.app.router.add_event_handler("shutdown", callback)
+
+    # ==================== 探针 ====================
+    async def _health(self):
+      return {"status": "ok"}
+
+    async def _ready(self):
+      if self._ready_callback is None:
+        return JSONResponse({"ready": True})
+      try:
+        status = self._ready_callback()
+        if inspect.isawaitable(status):
+          status = await status
+      except Exception as e:
+        status = {"ready": False, "error": str(e)}
+      return JSONResponse(status, status_code=200 if status.get("ready") else 503)
+
     # ==================== 启动服务器 ====================
     def start(self):
       # 启动服务器
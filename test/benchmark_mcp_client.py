@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+MCPClient 基准测试：空闲时的 CPU 占用、工具调用往返延迟（stdio 传输启动本地 MCP 服务器进程，
+inprocess 传输在本进程中直接调用工具）
+
+运行：
+    python test/benchmark_mcp_client.py [--idle 3] [--calls 200] [--transport stdio inprocess]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+# 添加父目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from module.MCP.client.MCPClient import MCPClient
+from local_mcp import wait_initialized
+
+
+def measure_idle_cpu(client: MCPClient, seconds: float) -> float:
+    """空闲 seconds 秒内客户端进程（不含服务器子进程）消耗的 CPU 时间占比"""
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    time.sleep(seconds)
+    return (time.process_time() - cpu_start) / (time.perf_counter() - wall_start)
+
+
+def measure_round_trip(client: MCPClient, calls: int) -> list:
+    """顺序调用 add 工具 calls 次，返回每次往返的毫秒数"""
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        task_id = client.add({"function": {"name": "add", "arguments": {"a": i, "b": 1}}})
+        client.get_result(task_id, timeout=10)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCPClient 基准测试")
+    parser.add_argument("--idle", type=float, default=3.0, help="空闲测量秒数")
+    parser.add_argument("--calls", type=int, default=200, help="往返延迟测量次数")
+    parser.add_argument("--transport", nargs="+", choices=["stdio", "inprocess"], default=["stdio"],
+                        help="传输方式（可以同时指定两种进行对比）")
+    args = parser.parse_args()
+
+    for transport in args.transport:
+        client = MCPClient(transport=transport)
+        client.start()
+        try:
+            wait_initialized(client)
+            measure_round_trip(client, 10)  # 预热
+
+            idle = measure_idle_cpu(client, args.idle)
+            latencies = measure_round_trip(client, args.calls)
+
+            print("=" * 60)
+            print(f"传输方式: {transport}")
+            print(f"空闲 CPU 占用: {idle * 100:.1f}%（{args.idle:.0f} 秒）")
+            print(f"往返延迟（{args.calls} 次）: 平均 {statistics.mean(latencies):.2f} ms，"
+                  f"p50 {percentile(latencies, 50):.2f} ms，p95 {percentile(latencies, 95):.2f} ms，"
+                  f"p99 {percentile(latencies, 99):.2f} ms")
+            print("=" * 60)
+        finally:
+            client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+MCPManager 基准测试：工具调用吞吐量随客户端池大小的变化（启动本地 MCP 服务器进程）
+
+两种工具：
+    burn - 服务器进程内做固定量的 CPU 计算（单个服务器进程受 GIL 限制，多进程才能用满多核；单核机器上不会变快）
+    nap  - 服务器进程内同步阻塞指定毫秒（模拟阻塞 IO，单核机器上也能看到扩展）
+
+运行：
+    python test/benchmark_mcp_manager.py [--pools 1 2 4] [--calls 200] [--ms 20] [--work 200000]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+from mcp import StdioServerParameters
+
+# 添加父目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from module.MCP.client.MCPClient import MCPClient
+from module.MCP.MCPManager import MCPManager, is_error
+
+
+BENCH_SERVER = """
+import time
+from fastmcp import FastMCP
+
+mcp = FastMCP("bench")
+
+
+@mcp.tool
+def burn(n: int) -> int:
+    total = 0
+    for i in range(n):
+        total += i * i
+    return total
+
+
+@mcp.tool
+def nap(ms: float) -> float:
+    time.sleep(ms / 1000)
+    return ms
+
+
+mcp.run(show_banner=False)
+"""
+
+
+def bench_client_factory():
+    path = os.path.join(tempfile.mkdtemp(), "bench_server.py")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(BENCH_SERVER)
+    params = StdioServerParameters(command=sys.executable, args=[path])
+    return lambda: MCPClient(server_params=params)
+
+
+def measure(manager: MCPManager, tool: str, calls: int, arguments: dict) -> float:
+    """提交 calls 个调用并等待全部完成，返回每秒完成的调用数"""
+    start = time.perf_counter()
+    ids = [manager.submit(tool, arguments) for _ in range(calls)]
+    for task_id in ids:
+        result = manager.get_result(task_id, timeout=300)
+        if is_error(result):
+            raise RuntimeError(f"工具调用失败: {result}")
+    return calls / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCPManager 吞吐量基准测试")
+    parser.add_argument("--pools", type=int, nargs="+", default=[1, 2, 4], help="客户端池大小")
+    parser.add_argument("--calls", type=int, default=200, help="每轮调用次数")
+    parser.add_argument("--ms", type=float, default=20.0, help="nap 每次调用阻塞的毫秒数")
+    parser.add_argument("--work", type=int, default=200000, help="burn 每次调用的循环次数")
+    args = parser.parse_args()
+
+    factory = bench_client_factory()
+    rows = []
+    for size in args.pools:
+        # 固定池大小：不扩缩容，每个客户端同时只跑 1 个调用（服务器内同步工具本来就串行执行）
+        manager = MCPManager(min_active=size, max_active=size, standby_count=0, max_load=1,
+                             client_factory=factory)
+        manager.start()
+        try:
+            measure(manager, "nap", size * 2, {"ms": 1})  # 预热
+            burn = measure(manager, "burn", args.calls, {"n": args.work})
+            nap = measure(manager, "nap", args.calls, {"ms": args.ms})
+            rows.append((size, burn, nap))
+        finally:
+            manager.stop()
+
+    base_burn, base_nap = rows[0][1], rows[0][2]
+    print("=" * 60)
+    print(f"CPU 核数: {os.cpu_count()}，每轮 {args.calls} 次调用（burn {args.work} 次循环，nap {args.ms:.0f} ms）")
+    print(f"{'池大小':<8}{'burn 调用/秒':>14}{'加速比':>8}{'nap 调用/秒':>14}{'加速比':>8}")
+    for size, burn, nap in rows:
+        print(f"{size:<10}{burn:>14.1f}{burn / base_burn:>10.2f}{nap:>14.1f}{nap / base_nap:>10.2f}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+AICore 测试共用的伪造 OpenAI 组件：测试模型、流式响应、异步客户端、配置目录和 AIFactory（不访问网络）
+"""
+import os
+import sys
+import json
+import asyncio
+import tempfile
+from types import SimpleNamespace
+
+# 添加父目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from module.AICore.Tool.ConfigStore import ConfigStore
+from module.AICore.Client.OPEN_AI import OPEN_AI
+from module.AICore.Model.base_model import BaseModel
+from module.AICore.AIManager import AIFactory
+
+
+class FakeModel(BaseModel):
+    """1个字符 = 1个token 的测试模型"""
+    vendor = "fake"
+
+    def token_callback(self, content: str) -> int:
+        return len(content) if content else 0
+
+
+class FakeChunk:
+    def __init__(self, data: dict):
+        self._data = data
+
+    def model_dump(self):
+        return self._data
+
+
+def delta_chunk(**delta) -> FakeChunk:
+    return FakeChunk({"choices": [{"delta": delta}], "usage": None})
+
+
+def usage_chunk(**usage) -> FakeChunk:
+    return FakeChunk({"choices": [], "usage": usage})
+
+
+def text_chunks(text: str, prompt_tokens: int = None) -> list:
+    """逐字输出 text；给出 prompt_tokens 时最后返回 usage"""
+    chunks = [delta_chunk(content=char) for char in text]
+    if prompt_tokens is not None:
+        chunks.append(usage_chunk(prompt_tokens=prompt_tokens, completion_tokens=len(text), total_tokens=prompt_tokens + len(text)))
+    return chunks
+
+
+class FakeStream:
+    """模拟 openai.AsyncStream：等待 latency 秒后开始输出，每个chunk之前等待 delay 秒，记录已经读取的chunk数"""
+
+    def __init__(self, chunks, delay: float = 0.0, latency: float = 0.0):
+        self._chunks = chunks
+        self._delay = delay
+        self._latency = latency
+        self.read = 0
+        self.closed = False
+
+    async def __aiter__(self):
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        for chunk in self._chunks:
+            await asyncio.sleep(self._delay)
+            self.read += 1
+            yield chunk
+
+    async def close(self):
+        self.closed = True
+
+
+def fake_async_client(create=None, list_models=None) -> SimpleNamespace:
+    """伪造 AsyncOpenAI：chat.completions.create / models.list"""
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)),
+                           models=SimpleNamespace(list=list_models))
+
+
+def make_model(model: str = "fake-model", key: str = "sk-test", **params) -> FakeModel:
+    config = {"base_url": "http://127.0.0.1:1", "model": model, "max_tokens": 1000}
+    config.update(params)
+    return FakeModel({"key": key, "params": config})
+
+
+def make_client(create, model: FakeModel = None, system_prompt: str = "测试系统提示", **kwargs) -> OPEN_AI:
+    """使用伪造异步客户端的 OPEN_AI，create 接收请求参数并返回流式响应"""
+    return OPEN_AI(model=model or make_model(), system_prompt=system_prompt,
+                   async_client=fake_async_client(create), client=object(), **kwargs)
+
+
+def model_config(name: str, **extra) -> dict:
+    return dict({"base_url": "http://127.0.0.1:1", "model": name, "max_tokens": 1000}, **extra)
+
+
+def make_store(config: dict, secret_keys: dict = None) -> ConfigStore:
+    """把 config.json / secret_key.json 写入临时目录（默认每个供应商的密钥都是 sk-test）"""
+    role_dir = tempfile.mkdtemp()
+    with open(os.path.join(role_dir, "config.json"), "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    with open(os.path.join(role_dir, "secret_key.json"), "w", encoding="utf-8") as f:
+        json.dump(secret_keys or {vendor: "sk-test" for vendor in config}, f)
+    return ConfigStore(role_dir)
+
+
+class FakeFactory(AIFactory):
+    """
+    用测试模型代替真实模型（不加载tokenizer），created 记录创建过的模型
+
+    子类实现 create(vendor, params) 或 list_models(vendor, model_name) 时，
+    实例池中实例的异步客户端替换为调用它们的伪造客户端（每个实例替换一次，会话之间仍共享客户端）
+    """
+    model_class = FakeModel
+    create = None
+    list_models = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.created = []
+
+    def call_model(self, vendor, message):
+        self.created.append(message["params"]["model"])
+        return self.model_class(message)
+
+    def _acquire(self, vendor, model_name, hold=False):
+        entry = super()._acquire(vendor, model_name, hold)
+        if (self.create or self.list_models) and not isinstance(entry.async_client, SimpleNamespace):
+            async def create(**params):
+                return await self.create(vendor, params)
+
+            async def list_models():
+                return await self.list_models(vendor, model_name)
+
+            entry.async_client = fake_async_client(create, list_models)
+        return entry
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+MCP 测试共用的本地服务器脚本与客户端辅助函数（服务器脚本写入临时目录，以 stdio 传输启动）
+"""
+import os
+import sys
+import time
+import tempfile
+
+from mcp import StdioServerParameters
+
+# 添加父目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from module.MCP.client.AsyncMCPClient import AsyncMCPClient
+from module.MCP.client.MCPClient import MCPClient
+
+
+# slow 工具：异步等待指定秒数，返回等待时间和服务器进程号（故障切换测试据此判断由哪个服务器执行）
+SLOW_TOOL = """
+@mcp.tool
+async def slow(seconds: float) -> dict:
+    \"\"\"等待一段时间后返回等待时间和服务器进程号\"\"\"
+    await asyncio.sleep(seconds)
+    return {"seconds": seconds, "pid": os.getpid()}
+"""
+
+ADD_TOOL = """
+@mcp.tool
+def add(a: int, b: int) -> int:
+    return a + b
+"""
+
+
+def server_source(name: str, *tools: str) -> str:
+    """由工具定义拼出 FastMCP 服务器脚本（已导入 os / asyncio）"""
+    header = f"import os\nimport asyncio\nfrom fastmcp import FastMCP\n\nmcp = FastMCP({name!r})\n\n"
+    return header + "\n".join(tools) + "\n\nmcp.run(show_banner=False)\n"
+
+
+SLOW_SERVER = server_source("slow", SLOW_TOOL, ADD_TOOL)
+
+
+def server_params(source: str, workdir: str = None, filename: str = "server.py") -> StdioServerParameters:
+    """把服务器脚本写入 workdir（默认新建临时目录），返回启动参数"""
+    path = os.path.join(workdir or tempfile.mkdtemp(), filename)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(source)
+    return StdioServerParameters(command=sys.executable, args=[path])
+
+
+def slow_seconds(result) -> float:
+    return result.structured_content["seconds"]
+
+
+def async_client(params: StdioServerParameters, workdir: str, **kwargs) -> AsyncMCPClient:
+    """工具目录保存在 workdir 中、不按路径串行的异步客户端"""
+    return AsyncMCPClient(
+        server_params=params,
+        catalog_path=os.path.join(workdir, "catalog.json"),
+        sequential_tools=set(),
+        **kwargs
+    )
+
+
+def wait_initialized(client: MCPClient, timeout: float = 60.0) -> None:
+    deadline = time.time() + timeout
+    while not client.get_initialized():
+        if time.time() > deadline:
+            raise TimeoutError("MCP客户端初始化超时")
+        time.sleep(0.02)
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+自适应限速测试：429 乘性减小 / 成功加性增长、按响应头学习上限、状态持久化、客户端 429 重试（不访问网络）
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+from types import SimpleNamespace
+
+import httpx
+from openai import RateLimitError
+
+# 添加父目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from module.AICore.Tool.AdaptiveRate import AIMDController, AdaptiveStateFile, parse_rate_limit_headers, parse_duration
+from module.AICore.Tool.RateLimiter import AsyncRateLimiter, RateLimiterRegistry, rate_limiters
+from module.AICore.Client.OPEN_AI import OPEN_AI
+from fake_openai import FakeStream, delta_chunk, usage_chunk, make_model
+
+
+def test_parse_headers():
+    """测试解析限速响应头"""
+    print("=== test_parse_headers ===")
+    assert parse_duration("6m0s") == 360 and parse_duration("20ms") == 0.02 and parse_duration("1.5") == 1.5
+    assert parse_duration("soon") is None
+    info = parse_rate_limit_headers(httpx.Headers({
+        "X-RateLimit-Limit-Requests": "500", "x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "1s",
+        "x-ratelimit-limit-tokens": "30000", "x-ratelimit-reset-tokens": "120ms", "retry-after-ms": "250",
+    }))
+    print(f"解析结果: {info}")
+    assert info == {"limit_requests": 500, "remaining_requests": 0, "reset_requests": 1.0,
+                    "limit_tokens": 30000, "reset_tokens": 0.12, "retry_after": 0.25}
+    assert parse_rate_limit_headers({"Retry-After": "2"}) == {"retry_after": 2.0}
+    print("PASS\n")
+
+
+def test_aimd_decrease_and_recover():
+    """测试 429 后速率减半并按 Retry-After 暂停，之后的成功响应逐步恢复速率"""
+    print("=== test_aimd_decrease_and_recover ===")
+
+    async def run():
+        limiter = AsyncRateLimiter(rpm=600, name="aimd", adaptive=AIMDController(increase=0.25))
+        pause = limiter.on_throttled({"retry-after": "0.2"})
+        after_throttle = limiter.snapshot()
+        start = time.perf_counter()
+        (await limiter.acquire()).release()
+        waited = time.perf_counter() - start
+        limiter.on_throttled({})
+        lowest = limiter.factor
+        factors = []
+        for _ in range(4):
+            limiter.on_response({})
+            factors.append(limiter.factor)
+        return pause, after_throttle, waited, lowest, factors, limiter.snapshot()
+
+    pause, after_throttle, waited, lowest, factors, snapshot = asyncio.run(run())
+    print(f"暂停 {pause} 秒，实际等待 {waited:.2f} 秒，系数 {after_throttle['factor']} -> {lowest} -> {factors}")
+    assert pause == 0.2 and 0.15 < waited < 0.5
+    assert after_throttle["factor"] == 0.5 and after_throttle["effective_rpm"] == 300
+    assert lowest == 0.25
+    assert factors == [0.5, 0.75, 1.0, 1.0]
+    assert snapshot["effective_rpm"] == 600 and snapshot["throttle_events"] == 2
+    print("PASS\n")
+
+
+def test_learn_limits_from_headers():
+    """测试响应头中的真实上限覆盖配置值，额度耗尽时暂停到重置时间；未配置 RPM 时按实际速率学习"""
+    print("=== test_learn_limits_from_headers ===")
+
+    async def run():
+        limiter = AsyncRateLimiter(rpm=3, tpm=32000, name="learn", adaptive=AIMDController())
+        limiter.on_response({"x-ratelimit-limit-requests": "200", "x-ratelimit-limit-tokens": "128000",
+                             "x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "150ms"})
+        learned = (limiter.rpm, limiter.tpm, limiter.configured["rpm"])
+        start = time.perf_counter()
+        (await limiter.acquire()).release()
+        waited = time.perf_counter() - start
+
+        # 没有配置 RPM：429 时把最近一分钟放行的请求数作为上限
+        unknown = AsyncRateLimiter(name="unknown", adaptive=AIMDController())
+        for _ in range(20):
+            (await unknown.acquire()).release()
+        unknown.on_throttled({"retry-after": "0"})
+        return learned, waited, unknown.snapshot()
+
+    learned, waited, unknown = asyncio.run(run())
+    print(f"学到的上限: {learned}，重置等待 {waited:.2f} 秒，未配置 RPM 时学到: {unknown['rpm']}，生效 {unknown['effective_rpm']}")
+    assert learned == (200, 128000, 3)
+    assert 0.1 < waited < 0.4
+    assert unknown["rpm"] == 20 and unknown["effective_rpm"] == 10
+    print("PASS\n")
+
+
+def test_state_persists():
+    """测试学到的上限和系数保存到文件，重启（新注册表）后恢复；配置变化不会覆盖学到的上限"""
+    print("=== test_state_persists ===")
+    path = os.path.join(tempfile.mkdtemp(), "adaptive_state.json")
+
+    first = RateLimiterRegistry(state_path=path).get("kimi:Tier1:abc", rpm=200)
+    first.on_response({"x-ratelimit-limit-requests": "100"})
+    first.on_throttled({"retry-after": "0"})
+    first.on_throttled({"retry-after": "0"})
+
+    registry = RateLimiterRegistry(state_path=path)
+    restored = registry.get("kimi:Tier1:abc", rpm=200)
+    print(f"恢复后: {restored.snapshot()['factor']} × {restored.rpm}，文件: {AdaptiveStateFile(path).load('kimi:Tier1:abc')}")
+    assert restored.factor == 0.25 and restored.rpm == 100 and restored.snapshot()["effective_rpm"] == 25
+    assert registry.get("kimi:Tier1:abc", rpm=300) is restored and restored.rpm == 100
+    assert restored.configured["rpm"] == 300
+
+    disabled = RateLimiterRegistry(adaptive=False).get("kimi:Tier1:abc", rpm=200)
+    disabled.on_throttled({"retry-after": "0"})
+    assert disabled.factor == 1.0 and disabled.throttle_events == 1
+    print("PASS\n")
+
+
+class SlowStateFile(AdaptiveStateFile):
+    """写入较慢的状态文件（模拟慢磁盘），记录每次写入的状态"""
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.saved = []
+
+    def save(self, name, state):
+        time.sleep(0.1)
+        self.saved.append(state["throttles"])
+        super().save(name, state)
+
+
+def test_save_off_loop():
+    """测试事件循环中的保存在线程池中执行：on_response / on_throttled 不等待磁盘，连续保存只写最新状态"""
+    print("=== test_save_off_loop ===")
+    registry = RateLimiterRegistry()
+    state_file = SlowStateFile(os.path.join(tempfile.mkdtemp(), "adaptive_state.json"))
+    limiter = registry.get("kimi:Tier1:slow", rpm=200)
+    registry.state_file = limiter.state_file = state_file
+
+    async def run():
+        start = time.perf_counter()
+        for _ in range(4):
+            limiter.on_throttled({"retry-after": "0"})
+        blocked = time.perf_counter() - start
+        while limiter._saving is not None and not limiter._saving.done() or limiter._unsaved is not None:
+            await asyncio.sleep(0.01)
+        return blocked
+
+    blocked = asyncio.run(run())
+    print(f"4 次限流事件耗时 {blocked * 1000:.1f} ms，写入的状态: {state_file.saved}")
+    assert blocked < 0.05
+    assert state_file.saved == [1, 4] and state_file.load("kimi:Tier1:slow")["throttles"] == 4
+
+    # use_state_file 切换已创建的限速器的状态文件，None 表示不保存
+    path = os.path.join(tempfile.mkdtemp(), "runtime", "adaptive_state.json")
+    assert registry.use_state_file(path) is limiter.state_file and limiter.state_file.path == path
+    limiter.on_throttled({"retry-after": "0"})
+    assert AdaptiveStateFile(path).load("kimi:Tier1:slow")["throttles"] == 5
+    assert registry.use_state_file(None) is None and limiter.state_file is None
+    print("PASS\n")
+
+
+def test_client_retries_after_429():
+    """测试客户端收到 429 后通知限速器、按 Retry-After 等待并重试，成功响应的响应头交给限速器"""
+    print("=== test_client_retries_after_429 ===")
+    rate_limiters.clear()
+    default_state = rate_limiters.state_file
+    rate_limiters.use_state_file(os.path.join(tempfile.mkdtemp(), "adaptive_state.json"))
+    model = make_model("fake-chat", key="sk-adaptive", rate_limit={"rpm": 600})
+    chunks = [delta_chunk(content="回答"), usage_chunk(prompt_tokens=1, completion_tokens=1, total_tokens=10)]
+    calls = []
+
+    async def create(**params):
+        calls.append(time.perf_counter())
+        if len(calls) == 1:
+            response = httpx.Response(429, headers={"retry-after": "0.2"}, request=httpx.Request("POST", "http://x"))
+            raise RateLimitError("rate limited", response=response, body=None)
+        return SimpleNamespace(headers={"x-ratelimit-limit-requests": "1200"}, parse=lambda: FakeStream(chunks))
+
+    completions = SimpleNamespace(create=None, with_raw_response=SimpleNamespace(create=create))
+    client = OPEN_AI(model=model, system_prompt="你是助手", async_client=SimpleNamespace(chat=SimpleNamespace(completions=completions)), client=object())
+
+    async def ask():
+        return [frame async for frame in client.send_stream("你好")]
+
+    frames = asyncio.run(ask())
+    snapshot = model.get_rate_limiter().snapshot()
+    print(f"请求 {len(calls)} 次，间隔 {calls[1] - calls[0]:.2f} 秒，限速器: 系数 {snapshot['factor']}，上限 {snapshot['rpm']}")
+    assert len(calls) == 2 and calls[1] - calls[0] >= 0.18
+    assert any(frame.get("content") == "回答" for frame in frames if isinstance(frame, dict))
+    assert snapshot["throttle_events"] == 1 and snapshot["rpm"] == 1200
+    assert snapshot["in_flight"] == 0 and snapshot["factor"] > 0.5
+    rate_limiters.clear()
+    rate_limiters.state_file = default_state
+    print("PASS\n")
+
+
+if __name__ == "__main__":
+    test_parse_headers()
+    test_aimd_decrease_and_recover()
+    test_learn_limits_from_headers()
+    test_state_persists()
+    test_save_off_loop()
+    test_client_retries_after_429()
+    print("所有测试通过!")
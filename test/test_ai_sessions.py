@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+多会话 AIFactory 测试：共享模型资源、按会话路由、会话内串行、会话内存统计（不访问网络）
+"""
+import os
+import sys
+import asyncio
+
+# 添加父目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from module.AICore.AIManager import DEFAULT_SESSION
+from fake_openai import FakeModel, FakeStream, text_chunks, make_store, model_config
+import fake_openai
+
+
+class SharedModel(FakeModel):
+    """持有共享重资源的测试模型"""
+
+    def __init__(self, message: dict):
+        super().__init__(message)
+        self.tokenizer = object()  # 模拟共享的重资源
+
+
+class FakeFactory(fake_openai.FakeFactory):
+    """伪造客户端回显问题，记录同时进行的请求数"""
+    model_class = SharedModel
+
+    def __init__(self, delay: float = 0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+
+    async def create(self, vendor, params):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+        return FakeStream(text_chunks("回" + params["messages"][-1]["content"]), self.delay)
+
+
+def make_factory(**kwargs) -> FakeFactory:
+    factory = FakeFactory(config_store=make_store({"deepseek": {"deepseek-chat": model_config("deepseek-chat")}}), **kwargs)
+    factory.connect("deepseek", "deepseek-chat")
+    return factory
+
+
+async def ask(factory: FakeFactory, session_id: str, problem: str) -> str:
+    return "".join([chunk["content"] async for chunk in factory.callback(session_id, problem)])
+
+
+def test_sessions_share_resources():
+    """测试大量会话共享同一个模型实例和连接，参数互不影响"""
+    print("=== test_sessions_share_resources ===")
+    factory = make_factory()
+    for i in range(2000):
+        factory.open_session(f"user-{i}")
+
+    a, b = factory.get_session("user-0"), factory.get_session("user-1")
+    assert len(factory.created) == 1
+    assert a._model is not b._model and a._model.tokenizer is b._model.tokenizer
+    assert a._async_client is b._async_client
+
+    a.set_params({"temperature": 0.2})
+    assert b.get_params()["temperature"] == 1.0
+
+    stats = factory.stats()
+    print(f"会话数: {stats['sessions']}，平均每会话独占内存: {stats['session_memory_avg']:.0f} 字节")
+    assert stats["sessions"] == 2001
+    assert stats["session_memory_avg"] < 20 * 1024
+
+    try:
+        factory.open_session("user-0")
+        assert False, "重复的会话ID应抛出异常"
+    except ValueError:
+        pass
+    print("PASS\n")
+
+
+def test_callback_routing():
+    """测试按会话路由：历史互不干扰，未知会话自动创建"""
+    print("=== test_callback_routing ===")
+    factory = make_factory(delay=0.005)
+
+    async def run():
+        return await asyncio.gather(ask(factory, "alice", "你好"), ask(factory, "bob", "再见"))
+
+    answers = asyncio.run(run())
+    assert answers == ["回你好", "回再见"]
+    assert factory.max_active == 2  # 不同会话并发
+    assert [m["content"] for m in factory.get_session("alice")._history.read()] == ["你好", "回你好"]
+    assert [m["content"] for m in factory.get_session("bob")._history.read()] == ["再见", "回再见"]
+
+    stats = factory.session_stats("alice")
+    print(f"alice: {stats}")
+    assert stats["messages"] == 2 and stats["memory_bytes"] > 0
+    print("PASS\n")
+
+
+def test_same_session_serialized():
+    """测试同一会话的并发请求串行执行"""
+    print("=== test_same_session_serialized ===")
+    factory = make_factory(delay=0.005)
+
+    async def run():
+        return await asyncio.gather(ask(factory, "alice", "一"), ask(factory, "alice", "二"))
+
+    answers = asyncio.run(run())
+    assert sorted(answers) == ["回一", "回二"]
+    assert factory.max_active == 1
+    contents = [m["content"] for m in factory.get_session("alice")._history.read()]
+    assert contents in (["一", "回一", "二", "回二"], ["二", "回二", "一", "回一"])
+    print("PASS\n")
+
+
+def test_close_and_tools():
+    """测试关闭会话、空闲清理和全局工具列表"""
+    print("=== test_close_and_tools ===")
+    factory = make_factory()
+    factory.open_session("alice")
+    tools = [{"type": "function", "function": {"name": "add", "parameters": {"type": "object", "properties": {}}}}]
+    factory.add_tools(tools)
+    factory.open_session("bob")
+    assert factory.get_session("alice").get_params()["tools"] == tools
+    assert factory.get_session("bob").get_params()["tools"] == tools
+
+    assert factory.close_session("alice")
+    assert not factory.close_session("alice")
+    assert factory.close_idle_sessions(0) == 2  # bob 和默认会话
+    assert factory.session_count == 0 and factory.ai_client is None
+
+    factory.disconnect()
+    try:
+        factory.open_session("carol")
+        assert False, "未连接时应抛出异常"
+    except RuntimeError:
+        pass
+    print("PASS\n")
+
+
+def test_default_session_compat():
+    """测试单会话接口仍然可用"""
+    print("=== test_default_session_compat ===")
+    factory = make_factory()
+    assert factory.ai_client is factory.get_session(DEFAULT_SESSION)
+    assert factory.ai.model == "deepseek-chat"
+    assert asyncio.run(ask(factory, DEFAULT_SESSION, "你好")) == "回你好"
+    print("PASS\n")
+
+
+if __name__ == "__main__":
+    test_sessions_share_resources()
+    test_callback_routing()
+    test_same_session_serialized()
+    test_close_and_tools()
+    test_default_session_compat()
+    print("所有测试通过!")
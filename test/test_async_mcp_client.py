@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+异步 MCP 客户端测试：在调用方的事件循环中并发调用、超时和取消（取消同时通知服务器），
+同步包装 MCPClient 与异步客户端结果一致（启动本地 MCP 服务器进程）
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import threading
+
+# 添加父目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from module.MCP.client.AsyncMCPClient import AsyncMCPClient
+from module.MCP.client.MCPClient import MCPClient
+from local_mcp import server_params, async_client
+
+
+SERVER = """
+import asyncio
+from fastmcp import FastMCP
+
+mcp = FastMCP("async")
+
+
+@mcp.tool
+def echo(text: str) -> dict:
+    \"\"\"返回文本\"\"\"
+    return {"text": text}
+
+
+@mcp.tool
+async def mark(path: str, seconds: float) -> dict:
+    \"\"\"等待一段时间后写入标记文件\"\"\"
+    await asyncio.sleep(seconds)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("done")
+    return {"path": path}
+
+
+mcp.run(show_banner=False)
+"""
+
+
+def make_client(workdir: str, **kwargs) -> AsyncMCPClient:
+    return async_client(server_params(SERVER, workdir), workdir, **kwargs)
+
+
+def test_concurrent_calls_on_caller_loop():
+    """测试在调用方的事件循环中并发调用：不创建线程，慢调用之间重叠，结果按调用分别返回"""
+    print("=== test_concurrent_calls_on_caller_loop ===")
+    workdir = tempfile.mkdtemp()
+
+    async def scenario():
+        threads = set(threading.enumerate())
+        async with make_client(workdir) as client:
+            # 除 asyncio 监视子进程退出的线程外不创建线程（MCPClient 会启动一个工作线程）
+            started_threads = [t.name for t in set(threading.enumerate()) - threads if not t.name.startswith("asyncio-")]
+            tools = sorted(tool["function"]["name"] for tool in client.list_tools())
+            start = time.perf_counter()
+            slow = [client.call("mark", {"path": os.path.join(workdir, f"{i}.txt"), "seconds": 0.3}) for i in range(8)]
+            results = await asyncio.gather(*slow, client.call("echo", {"text": "hi"}))
+            elapsed = time.perf_counter() - start
+            batch = await client.call_many([("echo", {"text": "a"}), {"function": {"name": "echo", "arguments": '{"text": "b"}'}}])
+        return threads, started_threads, tools, results, elapsed, batch
+
+    threads, started_threads, tools, results, elapsed, batch = asyncio.run(scenario())
+    print(f"工具: {tools}，8 个 0.3 秒的调用并发耗时 {elapsed * 1000:.1f} ms，新建线程 {started_threads}")
+    assert started_threads == [] and tools == ["echo", "mark"]
+    assert [r.structured_content["path"] for r in results[:8]] == [os.path.join(workdir, f"{i}.txt") for i in range(8)]
+    assert results[8].structured_content == {"text": "hi"}
+    assert elapsed < 8 * 0.3 / 2
+    assert [r.structured_content["text"] for r in batch] == ["a", "b"]
+    print("PASS\n")
+
+
+def test_timeout_and_cancellation():
+    """测试超时和取消：调用方立即返回，服务器上的请求被取消（标记文件不会写入），会话继续可用"""
+    print("=== test_timeout_and_cancellation ===")
+    workdir = tempfile.mkdtemp()
+    timed_out = os.path.join(workdir, "timeout.txt")
+    cancelled = os.path.join(workdir, "cancel.txt")
+
+    async def scenario():
+        async with make_client(workdir, call_timeout=10) as client:
+            start = time.perf_counter()
+            try:
+                await client.call("mark", {"path": timed_out, "seconds": 1.0}, timeout=0.2)
+                raise AssertionError("调用应超时")
+            except TimeoutError as e:
+                timeout_elapsed = time.perf_counter() - start
+                timeout_error = str(e)
+
+            task = asyncio.create_task(client.call("mark", {"path": cancelled, "seconds": 1.0}))
+            await asyncio.sleep(0.2)
+            task.cancel()
+            try:
+                await task
+                raise AssertionError("调用应被取消")
+            except asyncio.CancelledError:
+                pass
+            after = await client.call("echo", {"text": "still alive"})
+            await asyncio.sleep(1.5)  # 超过工具的等待时间：没有被取消的话标记文件已经写入
+            return timeout_elapsed, timeout_error, after, client.is_alive()
+
+    timeout_elapsed, timeout_error, after, alive = asyncio.run(scenario())
+    print(f"超时 {timeout_elapsed * 1000:.1f} ms 后返回: {timeout_error}")
+    assert timeout_elapsed < 0.5 and "超时" in timeout_error
+    assert not os.path.exists(timed_out) and not os.path.exists(cancelled)
+    assert after.structured_content == {"text": "still alive"} and alive
+    print("PASS\n")
+
+
+def test_sync_wrapper_matches():
+    """测试同步包装 MCPClient 与异步客户端共用同一套调用逻辑，未启动时调用报错"""
+    print("=== test_sync_wrapper_matches ===")
+    workdir = tempfile.mkdtemp()
+
+    async def not_started():
+        try:
+            await make_client(workdir).call("echo", {"text": "x"})
+        except ValueError as e:
+            return str(e)
+
+    error = asyncio.run(not_started())
+    client = MCPClient(server_params=server_params(SERVER, workdir), catalog_path=os.path.join(workdir, "catalog.json"))
+    client.start()
+    try:
+        result = client.get_result(client.add({"function": {"name": "echo", "arguments": {"text": "sync"}}}), timeout=30)
+        tools = sorted(tool.name for tool in client.tools)
+    finally:
+        client.close()
+    print(f"未启动: {error}，同步结果: {result.structured_content}")
+    assert "未启动" in error
+    assert result.structured_content == {"text": "sync"} and tools == ["echo", "mark"]
+    assert client.catalog_source in ("server", "cache")
+    print("PASS\n")
+
+
+if __name__ == "__main__":
+    test_concurrent_calls_on_caller_loop()
+    test_timeout_and_cancellation()
+    test_sync_wrapper_matches()
+    print("所有测试通过!")
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+配置存储测试：缓存查询、热更新、错误配置不影响运行（使用临时目录，不访问网络）
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import functools
+
+from fastapi.testclient import TestClient
+
+# 添加父目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from module.AICore.Tool.ConfigStore import ConfigStore
+from module.AICore.AIManager import AIFactory
+from module.service.HTTP import HTTPServer
+
+
+CONFIG = {
+    "deepseek": {
+        "deepseek-chat": {"base_url": "https://api.deepseek.com/v1", "model": "deepseek-chat", "max_tokens": 128000}
+    }
+}
+SECRET_KEY = {"deepseek": "sk-test"}
+
+
+def write_json(path: str, data, bump: float = 0.0) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        if isinstance(data, str):
+            f.write(data)
+        else:
+            json.dump(data, f)
+    # 部分文件系统的 mtime 精度较低，手动推进保证检测到变化
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + int(bump * 1e9)))
+
+
+def make_role_dir() -> str:
+    role_dir = tempfile.mkdtemp()
+    write_json(os.path.join(role_dir, "config.json"), CONFIG)
+    write_json(os.path.join(role_dir, "secret_key.json"), SECRET_KEY)
+    return role_dir
+
+
+def test_lookup_without_file_io():
+    """测试加载后查询不再读取磁盘"""
+    print("=== test_lookup_without_file_io ===")
+    role_dir = make_role_dir()
+    store = ConfigStore(role_dir)
+    assert store.get_model_params("deepseek", "deepseek-chat")["max_tokens"] == 128000
+
+    # 删除文件后查询仍然可用
+    os.remove(os.path.join(role_dir, "config.json"))
+    os.remove(os.path.join(role_dir, "secret_key.json"))
+    params = store.get_model_params("deepseek", "deepseek-chat")
+    assert store.get_key("deepseek") == "sk-test"
+
+    # 返回副本，修改不影响快照
+    params["max_tokens"] = 1
+    assert store.get_model_params("deepseek", "deepseek-chat")["max_tokens"] == 128000
+
+    try:
+        store.get_model_params("deepseek", "unknown")
+        assert False, "未知模型应抛出异常"
+    except ValueError:
+        pass
+    print("PASS\n")
+
+
+def test_reload_and_broken_edit():
+    """测试修改后重新加载，错误的修改保留旧快照"""
+    print("=== test_reload_and_broken_edit ===")
+    role_dir = make_role_dir()
+    config_path = os.path.join(role_dir, "config.json")
+    store = ConfigStore(role_dir)
+    assert store.version == 1
+    assert not store.reload()  # 文件未变化
+
+    new_config = json.loads(json.dumps(CONFIG))
+    new_config["deepseek"]["deepseek-chat"]["max_tokens"] = 64000
+    write_json(config_path, new_config, bump=1)
+    assert store.reload()
+    assert store.version == 2
+    assert store.get_model_params("deepseek", "deepseek-chat")["max_tokens"] == 64000
+
+    # JSON 语法错误
+    write_json(config_path, "{ broken", bump=2)
+    assert not store.reload()
+    assert store.version == 2 and "JSON" in store.last_error
+
+    # 校验失败（缺少必需字段）
+    write_json(config_path, {"deepseek": {"deepseek-chat": {"model": "deepseek-chat"}}}, bump=3)
+    assert not store.reload()
+    assert store.get_model_params("deepseek", "deepseek-chat")["max_tokens"] == 64000
+    assert "base_url" in store.last_error
+    print("PASS\n")
+
+
+def test_watcher_swaps_snapshot():
+    """测试后台轮询线程检测到修改后替换快照并通知监听者"""
+    print("=== test_watcher_swaps_snapshot ===")
+    role_dir = make_role_dir()
+    store = ConfigStore(role_dir, poll_interval=0.02)
+    versions = []
+    store.add_listener(lambda snapshot: versions.append(snapshot.version))
+    store.start_watching()
+    try:
+        write_json(os.path.join(role_dir, "secret_key.json"), {"deepseek": "sk-new"}, bump=1)
+        deadline = time.time() + 2
+        while store.get_key("deepseek") != "sk-new" and time.time() < deadline:
+            time.sleep(0.01)
+        assert store.get_key("deepseek") == "sk-new"
+        assert versions == [2]
+    finally:
+        store.stop_watching()
+    print("PASS\n")
+
+
+def test_factory_reads_from_store():
+    """测试 AIFactory 通过配置存储提取参数"""
+    print("=== test_factory_reads_from_store ===")
+    store = ConfigStore(make_role_dir())
+    factory = AIFactory(config_store=store)
+    message = factory._compose_params(factory._extract_key("deepseek"), factory._extract_params("deepseek", "deepseek-chat"))
+    assert message == {"key": "sk-test", "params": CONFIG["deepseek"]["deepseek-chat"]}
+    print("PASS\n")
+
+
+def test_factory_watches_while_serving():
+    """测试 HTTP 服务启动时 AIFactory 开始监控配置（修改后立即生效），不预热时立即就绪，服务关闭时停止监控"""
+    print("=== test_factory_watches_while_serving ===")
+    role_dir = make_role_dir()
+    store = ConfigStore(role_dir, poll_interval=0.02)
+    factory = AIFactory(config_store=store)
+    server = HTTPServer()
+    server.add_startup_callback(functools.partial(factory.startup, warm_up=False))
+    server.add_shutdown_callback(factory.shutdown)
+    server.set_ready_callback(factory.readiness)
+
+    with TestClient(server.app) as client:
+        ready = client.get("/ready")  # 不预热时立即就绪
+        watching = store._watch_thread is not None and store._watch_thread.is_alive()
+        write_json(os.path.join(role_dir, "secret_key.json"), {"deepseek": "sk-new"}, bump=1)
+        deadline = time.time() + 2
+        while factory._extract_key("deepseek") != "sk-new" and time.time() < deadline:
+            time.sleep(0.01)
+        key = factory._extract_key("deepseek")
+    print(f"服务运行时监控线程: {watching}，修改后的密钥: {key}，关闭后监控线程: {store._watch_thread}")
+    assert ready.status_code == 200 and ready.json()["state"] == "skipped"
+    assert watching and key == "sk-new" and store.version == 2
+    assert store._watch_thread is None
+    print("PASS\n")
+
+
+def test_invalid_initial_config():
+    """测试首次加载无效配置时直接抛出异常"""
+    print("=== test_invalid_initial_config ===")
+    role_dir = make_role_dir()
+    write_json(os.path.join(role_dir, "secret_key.json"), {})
+    store = ConfigStore(role_dir)
+    try:
+        store.snapshot
+        assert False, "无效配置应抛出异常"
+    except ValueError as e:
+        print(f"异常信息: {e}")
+    print("PASS\n")
+
+
+if __name__ == "__main__":
+    test_lookup_without_file_io()
+    test_reload_and_broken_edit()
+    test_watcher_swaps_snapshot()
+    test_factory_reads_from_store()
+    test_factory_watches_while_serving()
+    test_invalid_initial_config()
+    print("所有测试通过!")
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+多供应商并发请求测试：先到先得、打分择优、取消落败请求、合并用量、胜出率（不访问网络）
+"""
+import os
+import sys
+import asyncio
+
+# 添加父目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from fake_openai import FakeStream, text_chunks, make_store, model_config
+import fake_openai
+
+
+# 供应商 -> (回答, 每个字符的间隔, 是否失败)
+BEHAVIOUR = {
+    "deepseek": ("深度求索的回答", 0.002, False),
+    "qwen": ("通义千问给出的一个更长的回答", 0.01, False),
+    "kimi": ("", 0.0, True),
+}
+
+
+class FakeFactory(fake_openai.FakeFactory):
+    """每个供应商使用不同表现的伪造客户端，streams 记录每个供应商最近一次的流式响应"""
+
+    def __init__(self, behaviour: dict, **kwargs):
+        super().__init__(**kwargs)
+        self.behaviour = behaviour
+        self.streams = {}
+
+    async def create(self, vendor, params):
+        text, delay, fail = self.behaviour[vendor]
+        if fail:
+            raise ConnectionError("连接被拒绝")
+        # 按固定间隔逐字输出，最后返回 usage
+        self.streams[vendor] = FakeStream(text_chunks(text, prompt_tokens=10), delay)
+        return self.streams[vendor]
+
+
+def make_factory(behaviour: dict = None) -> FakeFactory:
+    behaviour = behaviour or BEHAVIOUR
+    config = {vendor: {f"{vendor}-chat": model_config(f"{vendor}-chat")} for vendor in behaviour}
+    factory = FakeFactory(behaviour, config_store=make_store(config))
+    factory.connect("deepseek", "deepseek-chat")
+    return factory
+
+
+TARGETS = [("deepseek", "deepseek-chat"), ("qwen", "qwen-chat"), ("kimi", "kimi-chat")]
+
+
+def test_first_wins_and_cancels():
+    """测试先到先得：最快的回答胜出，其余请求被取消，只记录胜者"""
+    print("=== test_first_wins_and_cancels ===")
+    factory = make_factory()
+    result = asyncio.run(factory.fan_out("alice", "你好", TARGETS, mode="first"))
+
+    statuses = {c["vendor"]: c["status"] for c in result["candidates"]}
+    print(f"结果: {result['vendor']} {result['content']}，候选状态: {statuses}")
+    assert result["vendor"] == "deepseek" and result["content"] == BEHAVIOUR["deepseek"][0]
+    assert statuses == {"deepseek": "won", "qwen": "cancelled", "kimi": "error"}
+    assert factory.streams["qwen"].read < len(BEHAVIOUR["qwen"][0])  # 落败请求没有读完
+    assert factory.streams["qwen"].closed
+
+    history = [m["content"] for m in factory.get_session("alice")._history.read()]
+    assert history == ["你好", BEHAVIOUR["deepseek"][0]]
+    assert result["usage"]["completion_tokens"] == len(BEHAVIOUR["deepseek"][0])
+    print("PASS\n")
+
+
+def test_best_of_n_with_scorer():
+    """测试打分择优：等待全部完成，按 scorer 选择，合并用量"""
+    print("=== test_best_of_n_with_scorer ===")
+    factory = make_factory()
+    result = asyncio.run(factory.fan_out("alice", "你好", TARGETS, mode="best", scorer=lambda c: len(c["content"])))
+
+    assert result["vendor"] == "qwen"
+    assert result["score"] == len(BEHAVIOUR["qwen"][0])
+    expected = len(BEHAVIOUR["deepseek"][0]) + len(BEHAVIOUR["qwen"][0])
+    assert result["usage"] == {"prompt_tokens": 20, "completion_tokens": expected, "total_tokens": 20 + expected}
+    assert [m["content"] for m in factory.get_session("alice")._history.read()] == ["你好", BEHAVIOUR["qwen"][0]]
+    print("PASS\n")
+
+
+def test_win_rates():
+    """测试各模型的胜出率统计"""
+    print("=== test_win_rates ===")
+    factory = make_factory()
+
+    async def run():
+        for _ in range(3):
+            await factory.fan_out("alice", "你好", TARGETS, mode="first")
+
+    asyncio.run(run())
+    stats = factory.fan_out_stats()
+    print(f"胜出统计: {stats}")
+    assert stats["deepseek/deepseek-chat"]["win_rate"] == 1.0
+    assert stats["qwen/qwen-chat"] == {"runs": 3, "wins": 0, "errors": 0, "win_rate": 0.0}
+    assert stats["kimi/kimi-chat"]["errors"] == 3
+    assert len(factory.get_session("alice")._history.read()) == 6
+    print("PASS\n")
+
+
+def test_all_failed_or_timeout():
+    """测试全部失败、超时和参数校验"""
+    print("=== test_all_failed_or_timeout ===")
+    factory = make_factory()
+    for kwargs in ({"targets": [("kimi", "kimi-chat")]}, {"targets": [("qwen", "qwen-chat")], "timeout": 0.01}):
+        try:
+            asyncio.run(factory.fan_out("alice", "你好", **kwargs))
+            assert False, "没有可用回答时应抛出异常"
+        except RuntimeError as e:
+            print(f"异常信息: {e}")
+    assert factory.get_session("alice")._history.read() == []
+
+    for kwargs in ({"targets": TARGETS, "mode": "best"}, {"targets": TARGETS, "mode": "unknown"}, {"targets": []}):
+        try:
+            asyncio.run(factory.fan_out("alice", "你好", **kwargs))
+            assert False, "无效参数应抛出异常"
+        except ValueError:
+            pass
+    print("PASS\n")
+
+
+if __name__ == "__main__":
+    test_first_wins_and_cancels()
+    test_best_of_n_with_scorer()
+    test_win_rates()
+    test_all_failed_or_timeout()
+    print("所有测试通过!")
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""
+MCPClient 工作线程测试：空闲不占用 CPU、启动前添加的任务、暂停 / 恢复、关闭时唤醒等待者、
+并发工具调用、结果过期与数量上限（启动本地 MCP 服务器进程）、进程内传输、批量调用
+"""
+import os
+import sys
+import time
+import json
+import asyncio
+import tempfile
+import threading
+import concurrent.futures
+
+# 添加父目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from module.MCP.client.MCPClient import MCPClient
+from local_mcp import SLOW_SERVER, ADD_TOOL, server_source, server_params, slow_seconds, wait_initialized
+
+
+# 测试用服务器：读-改-写文件的工具（读和写之间等待，并发执行时会丢失更新），工具名与 tool_registry 一致
+FILE_TOOLS = """
+async def rewrite(filepath: str, edit) -> dict:
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        lines = []
+    await asyncio.sleep(0.1)
+    edit(lines)
+    with open(filepath, "w", encoding="utf-8") as f:
+        f.write("\\n".join(lines) + "\\n")
+    return {"lines": len(lines)}
+
+
+@mcp.tool
+async def append_line(filepath: str, content: str) -> dict:
+    return await rewrite(filepath, lambda lines: lines.append(content))
+
+
+@mcp.tool
+async def insert_line(filepath: str, line_num: int, content: str) -> dict:
+    return await rewrite(filepath, lambda lines: lines.insert(line_num - 1, content))
+"""
+
+FILE_SERVER = server_source("file", FILE_TOOLS, ADD_TOOL)
+
+
+def add_call(a, b):
+    return {"function": {"name": "add", "arguments": {"a": a, "b": b}}}
+
+
+def test_idle_and_round_trip():
+    """测试启动前添加的任务在就绪后执行，空闲时工作线程不占用 CPU"""
+    print("=== test_idle_and_round_trip ===")
+    client = MCPClient(catalog_path=None)
+    client.start()
+    try:
+        task_id = client.add(add_call(1, 2))  # 事件循环就绪前添加
+        assert client.get_result(task_id, timeout=60).structured_content["message"] == 3
+        wait_initialized(client)
+
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        time.sleep(1.0)
+        idle = (time.process_time() - cpu_start) / (time.perf_counter() - wall_start)
+
+        start = time.perf_counter()
+        for i in range(20):
+            assert client.get_result(client.add(add_call(i, 1)), timeout=5).structured_content["message"] == i + 1
+        latency = (time.perf_counter() - start) / 20
+        print(f"空闲 CPU 占用: {idle * 100:.1f}%，平均往返延迟: {latency * 1000:.2f} ms")
+        assert idle < 0.05
+        assert latency < 0.05
+    finally:
+        client.close()
+    print("PASS\n")
+
+
+def test_pause_resume_and_close():
+    """测试暂停期间任务不执行、恢复后执行；关闭时唤醒等待结果的线程"""
+    print("=== test_pause_resume_and_close ===")
+    client = MCPClient(catalog_path=None)
+    client.start()
+    wait_initialized(client)
+    try:
+        client.pause()
+        task_id = client.add(add_call(2, 2))
+        try:
+            client.get_result(task_id, timeout=0.3)
+            raise AssertionError("暂停期间不应执行任务")
+        except TimeoutError:
+            pass
+        client.resume()
+        assert client.get_result(task_id, timeout=5).structured_content["message"] == 4
+
+        # 关闭时阻塞在 get_result 的线程被唤醒
+        client.pause()
+        pending = client.add(add_call(3, 3))
+        errors = []
+        waiter = threading.Thread(target=lambda: errors.append(_get_error(client, pending)))
+        waiter.start()
+        time.sleep(0.1)
+    finally:
+        start = time.perf_counter()
+        client.close()
+        closed_in = time.perf_counter() - start
+    waiter.join(timeout=5)
+    print(f"关闭耗时 {closed_in:.2f} 秒，等待者收到: {errors}")
+    assert not waiter.is_alive() and errors == ["ValueError"]
+    assert closed_in < 5
+    print("PASS\n")
+
+
+def test_concurrent_calls():
+    """测试慢工具不阻塞后面的快工具，并发数受 max_in_flight 限制"""
+    print("=== test_concurrent_calls ===")
+    client = MCPClient(max_in_flight=2, server_params=server_params(SLOW_SERVER), catalog_path=None)
+    client.start()
+    wait_initialized(client)
+    try:
+        start = time.perf_counter()
+        slow_id = client.add({"function": {"name": "slow", "arguments": {"seconds": 1.0}}})
+        fast_id = client.add(add_call(1, 2))
+        fast = client.get_result(fast_id, timeout=5)
+        fast_elapsed = time.perf_counter() - start
+        client.get_result(slow_id, timeout=5)
+
+        # 4 个 0.3 秒的调用，并发上限 2：约 0.6 秒
+        start = time.perf_counter()
+        ids = [client.add({"function": {"name": "slow", "arguments": {"seconds": 0.3}}}) for _ in range(4)]
+        results = [slow_seconds(client.get_result(task_id, timeout=5)) for task_id in ids]
+        batch_elapsed = time.perf_counter() - start
+    finally:
+        client.close()
+    print(f"快工具在慢工具之后 {fast_elapsed:.3f} 秒返回，4 个慢调用耗时 {batch_elapsed:.2f} 秒")
+    assert fast.structured_content["result"] == 3 and fast_elapsed < 0.5
+    assert results == [0.3] * 4
+    assert 0.55 < batch_elapsed < 1.1
+    print("PASS\n")
+
+
+def test_result_store_bounded():
+    """测试没有被取走的结果按数量上限和过期时间丢弃，异步代码可以等待任务的 Future"""
+    print("=== test_result_store_bounded ===")
+    client = MCPClient(result_ttl=0.5, max_results=3, catalog_path=None)
+    client.start()
+    wait_initialized(client)
+    try:
+        ids = [client.add(add_call(i, 0)) for i in range(5)]
+        futures = [client.get_future(task_id) for task_id in ids]
+        concurrent.futures.wait(futures, timeout=5)
+        retained = [task_id for task_id in ids if task_id in client._futures]
+        try:
+            client.get_result(ids[0], block=False)
+            raise AssertionError("超出上限的结果应被丢弃")
+        except KeyError:
+            pass
+        kept = client.get_result(retained[-1], timeout=1).structured_content["message"]
+
+        time.sleep(0.6)
+        try:
+            client.get_result(retained[0])
+            raise AssertionError("过期的结果应被丢弃")
+        except KeyError:
+            pass
+
+        async def wait_async():
+            return await asyncio.wrap_future(client.get_future(client.add(add_call(20, 22))))
+
+        async_result = asyncio.run(wait_async()).structured_content["message"]
+    finally:
+        client.close()
+    print(f"保留 {len(retained)} 个结果，丢弃 {client.evicted} 个，异步等待结果: {async_result}")
+    assert len(retained) == 3 and kept == 4
+    assert client.evicted == 4 and async_result == 42
+    print("PASS\n")
+
+
+def test_inprocess_transport():
+    """测试进程内传输与 stdio 传输返回相同形式的结果（包括错误），且往返延迟更低"""
+    print("=== test_inprocess_transport ===")
+    calls = [
+        add_call(1, 2),
+        {"function": {"name": "divide", "arguments": {"a": 1, "b": 0}}},
+        {"function": {"name": "add", "arguments": {"a": "x"}}},
+        {"function": {"name": "no_such_tool", "arguments": {}}},
+    ]
+    results, latency = {}, {}
+    for transport in ("stdio", "inprocess"):
+        client = MCPClient(transport=transport, catalog_path=None)
+        client.start()
+        wait_initialized(client)
+        try:
+            tool_names = sorted(tool.name for tool in client.tools)
+            results[transport] = [client.get_result(client.add(call), timeout=5) for call in calls]
+            start = time.perf_counter()
+            for i in range(50):
+                client.get_result(client.add(add_call(i, 1)), timeout=5)
+            latency[transport] = (time.perf_counter() - start) / 50
+        finally:
+            client.close()
+        print(f"{transport}: {len(tool_names)} 个工具，平均往返延迟 {latency[transport] * 1000:.3f} ms")
+
+    stdio, inprocess = results["stdio"], results["inprocess"]
+    assert inprocess[0].structured_content == stdio[0].structured_content == {"task_type": "add", "message": 3}
+    assert inprocess[0].content[0].text == stdio[0].content[0].text
+    assert [r.is_error for r in inprocess] == [r.is_error for r in stdio] == [False, True, True, True]
+    assert inprocess[1].content[0].text == stdio[1].content[0].text
+    assert inprocess[3].content[0].text == stdio[3].content[0].text == "Unknown tool: 'no_such_tool'"
+    assert latency["inprocess"] < latency["stdio"]
+    print("PASS\n")
+
+
+def test_add_many():
+    """测试批量调用按顺序返回结果和单个调用的错误，整批耗时约等于最慢的调用；sequential 工具依次执行"""
+    print("=== test_add_many ===")
+    slow = lambda seconds: {"function": {"name": "slow", "arguments": {"seconds": seconds}}}
+    client = MCPClient(server_params=server_params(SLOW_SERVER), sequential_tools=set(), catalog_path=None)
+    client.start()
+    wait_initialized(client)
+    try:
+        start = time.perf_counter()
+        results = client.add_many([
+            slow(0.5), slow(0.3), add_call(1, 2),
+            {"function": {"name": "no_such_tool", "arguments": {}}},
+            {"function": {"name": "add", "arguments": "{bad json"}},
+            slow(0.2),
+        ], timeout=5)
+        batch_elapsed = time.perf_counter() - start
+        partial = client.add_many([slow(1.0), add_call(2, 2)], timeout=0.3)
+    finally:
+        client.close()
+
+    sequential = MCPClient(server_params=server_params(SLOW_SERVER), sequential_tools={"slow"}, catalog_path=None)
+    sequential.start()
+    wait_initialized(sequential)
+    try:
+        start = time.perf_counter()
+        ordered = sequential.add_many([slow(0.2), slow(0.2), add_call(3, 4), slow(0.2)], timeout=5)
+        sequential_elapsed = time.perf_counter() - start
+    finally:
+        sequential.close()
+
+    print(f"批量 6 个调用耗时 {batch_elapsed:.2f} 秒，sequential 批量耗时 {sequential_elapsed:.2f} 秒")
+    assert [slow_seconds(r) for r in (results[0], results[1], results[5])] == [0.5, 0.3, 0.2]
+    assert results[2].structured_content["result"] == 3
+    assert results[3].is_error and isinstance(results[4], json.JSONDecodeError)
+    assert 0.45 < batch_elapsed < 0.8
+    assert isinstance(partial[0], TimeoutError) and partial[1].structured_content["result"] == 4
+    assert [slow_seconds(r) for r in (ordered[0], ordered[1], ordered[3])] == [0.2, 0.2, 0.2]
+    assert ordered[2].structured_content["result"] == 7
+    assert 0.55 < sequential_elapsed < 1.0
+    print("PASS\n")
+
+
+def test_sequential_tools_lock_by_path():
+    """测试不同的 sequential 工具修改同一个文件时依次执行（不丢失更新），不同文件并发执行，等锁的调用不占用并发名额"""
+    print("=== test_sequential_tools_lock_by_path ===")
+    workdir = tempfile.mkdtemp()
+    first, second = os.path.join(workdir, "a.txt"), os.path.join(workdir, "b.txt")
+    append = lambda path, text: {"function": {"name": "append_line", "arguments": {"filepath": path, "content": text}}}
+    insert = lambda path, text: {"function": {"name": "insert_line", "arguments": {"filepath": path, "line_num": 1, "content": text}}}
+
+    client = MCPClient(
+        max_in_flight=3,
+        server_params=server_params(FILE_SERVER, workdir),
+        catalog_path=None,
+        sequential_tools={"append_line", "insert_line"}
+    )
+    client.start()
+    wait_initialized(client)
+    try:
+        client.get_result(client.add(add_call(0, 0)), timeout=10)
+        start = time.perf_counter()
+        edits = [client.add(call) for call in (
+            append(first, "a1"), insert(first, "i1"), append(first, "a2"), insert(first, "i2"),
+            append(second, "b1"), insert(second, "j1"), append(second, "b2"), insert(second, "j2"),
+        )]
+        quick_start = time.perf_counter()
+        quick = client.get_result(client.add(add_call(2, 3)), timeout=10)
+        quick_elapsed = time.perf_counter() - quick_start
+        for task_id in edits:
+            client.get_result(task_id, timeout=10)
+        elapsed = time.perf_counter() - start
+    finally:
+        client.close()
+    with open(first, encoding="utf-8") as f:
+        first_lines = f.read().splitlines()
+    with open(second, encoding="utf-8") as f:
+        second_lines = f.read().splitlines()
+    print(f"两个文件各 4 次读-改-写耗时 {elapsed:.2f} 秒，排队期间其他工具调用耗时 {quick_elapsed * 1000:.1f} ms")
+    assert first_lines == ["i2", "i1", "a1", "a2"] and second_lines == ["j2", "j1", "b1", "b2"]
+    assert 0.4 <= elapsed < 0.7
+    assert quick.structured_content["result"] == 5 and quick_elapsed < 0.08
+    print("PASS\n")
+
+
+def _get_error(client: MCPClient, task_id: str) -> str:
+    try:
+        client.get_result(task_id)
+    except Exception as e:
+        return type(e).__name__
+    return "no error"
+
+
+if __name__ == "__main__":
+    test_idle_and_round_trip()
+    test_pause_resume_and_close()
+    test_concurrent_calls()
+    test_result_store_bounded()
+    test_inprocess_transport()
+    test_add_many()
+    test_sequential_tools_lock_by_path()
+    print("所有测试通过!")
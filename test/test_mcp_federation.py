@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+MCP 服务器联邦测试：并行发现、命名空间合并、按工具名路由，
+慢服务器 / 启动失败的服务器不影响其他服务器（启动本地 MCP 服务器进程）
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+# 添加父目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from module.MCP.client.MCPFederation import MCPFederation
+
+
+SERVER = """
+import sys
+import time
+import asyncio
+from fastmcp import FastMCP
+
+name = sys.argv[1]
+time.sleep(float(sys.argv[2]))  # 模拟启动耗时
+mcp = FastMCP(name)
+
+
+@mcp.tool
+def echo(text: str) -> dict:
+    \"\"\"返回服务器名和文本\"\"\"
+    return {"server": name, "text": text}
+
+
+@mcp.tool
+async def sleep(seconds: float) -> dict:
+    \"\"\"等待一段时间\"\"\"
+    await asyncio.sleep(seconds)
+    return {"server": name}
+
+
+mcp.run(show_banner=False)
+"""
+
+BROKEN = "raise SystemExit('启动失败')\n"
+
+
+def write_script(content: str) -> str:
+    path = os.path.join(tempfile.mkdtemp(), "server.py")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return path
+
+
+def server(script: str, name: str, boot_delay: float = 0.0) -> dict:
+    return {"command": sys.executable, "args": [script, name, str(boot_delay)]}
+
+
+def test_namespaced_routing():
+    """测试同名工具按命名空间区分，调用路由到对应服务器"""
+    print("=== test_namespaced_routing ===")
+    script = write_script(SERVER)
+
+    async def scenario():
+        async with MCPFederation({"alpha": server(script, "alpha"), "beta": server(script, "beta")}) as federation:
+            names = sorted(tool["function"]["name"] for tool in federation.list_tools())
+            results = await federation.call_many([("alpha__echo", {"text": "a"}), ("beta__echo", {"text": "b"})])
+            try:
+                await federation.call_tool("gamma__echo", {"text": "c"})
+                raise AssertionError("不存在的命名空间应抛出 KeyError")
+            except KeyError:
+                pass
+            try:
+                federation.resolve("alpha__missing")
+                raise AssertionError("不存在的工具应抛出 KeyError")
+            except KeyError:
+                pass
+            return names, [result.structured_content for result in results]
+
+    names, results = asyncio.run(scenario())
+    print(f"工具: {names}，结果: {results}")
+    assert names == ["alpha__echo", "alpha__sleep", "beta__echo", "beta__sleep"]
+    assert results == [{"server": "alpha", "text": "a"}, {"server": "beta", "text": "b"}]
+    print("PASS\n")
+
+
+def test_parallel_discovery():
+    """测试多个服务器并行启动和发现：总耗时明显小于逐个启动的耗时之和"""
+    print("=== test_parallel_discovery ===")
+    script = write_script(SERVER)
+
+    async def scenario(count: int):
+        federation = MCPFederation({f"s{i}": server(script, f"s{i}", boot_delay=1.0) for i in range(count)})
+        try:
+            status = await federation.start()
+            return federation.startup_ms, status, len(federation.list_tools())
+        finally:
+            await federation.close()
+
+    single_ms, _, _ = asyncio.run(scenario(1))
+    startup_ms, status, tool_count = asyncio.run(scenario(3))
+    # 服务器启动的 CPU 部分（导入 fastmcp 等）在单核机器上无法重叠，只比较等待部分能否重叠
+    print(f"单个服务器（启动时等待 1 秒）就绪耗时 {single_ms} ms，3 个并行就绪耗时 {startup_ms} ms")
+    assert all(s["state"] == "ready" for s in status.values()) and tool_count == 6
+    assert startup_ms < 3 * single_ms * 0.8
+    print("PASS\n")
+
+
+def test_slow_and_failing_servers_isolated():
+    """测试启动失败、启动慢、调用慢的服务器不影响正常服务器，连续超时后熔断"""
+    print("=== test_slow_and_failing_servers_isolated ===")
+    script = write_script(SERVER)
+    servers = {
+        "fast": server(script, "fast"),
+        "slow": server(script, "slow"),
+        "late": server(script, "late", boot_delay=8.0),
+        "broken": {"command": sys.executable, "args": [write_script(BROKEN)]},
+    }
+
+    async def scenario():
+        federation = MCPFederation(servers, start_timeout=6.0, failure_threshold=2, cooldown=5.0)
+        try:
+            status = await federation.start()
+            listed = {tool["function"]["name"].split("__")[0] for tool in federation.list_tools()}
+
+            # 慢服务器的调用超时期间，快服务器的调用照常完成
+            slow_calls = [asyncio.create_task(federation.call_tool("slow__sleep", {"seconds": 5}, timeout=0.5))
+                          for _ in range(2)]
+            start = time.perf_counter()
+            fast = await federation.call_many([("fast__echo", {"text": str(i)}) for i in range(20)])
+            fast_elapsed = time.perf_counter() - start
+            slow = await asyncio.gather(*slow_calls, return_exceptions=True)
+            try:
+                await federation.call_tool("slow__echo", {"text": "x"})
+                raise AssertionError("熔断中的服务器应立即失败")
+            except RuntimeError as e:
+                open_error = str(e)
+
+            # 启动慢的服务器就绪后加入工具列表
+            deadline = time.monotonic() + 30
+            while federation.status()["late"]["state"] != "ready":
+                assert time.monotonic() < deadline, "late 服务器启动超时"
+                await asyncio.sleep(0.05)
+            late = await federation.call_tool("late__echo", {"text": "ok"})
+            listed_after = {tool["function"]["name"].split("__")[0] for tool in federation.list_tools()}
+            return status, listed, fast, fast_elapsed, slow, open_error, late, listed_after, federation.status()
+        finally:
+            await federation.close()
+
+    status, listed, fast, fast_elapsed, slow, open_error, late, listed_after, final = asyncio.run(scenario())
+    print(f"start 返回时: { {k: v['state'] for k, v in status.items()} }，"
+          f"慢服务器超时期间 20 个快调用耗时 {fast_elapsed * 1000:.1f} ms，最终: { {k: v['state'] for k, v in final.items()} }")
+    assert status["fast"]["state"] == status["slow"]["state"] == "ready"
+    assert status["late"]["state"] == "starting" and status["broken"]["state"] == "failed"
+    assert listed == {"fast", "slow"} and listed_after == {"fast", "late"}
+    assert [r.structured_content["text"] for r in fast] == [str(i) for i in range(20)]
+    assert fast_elapsed < 0.5 and all(isinstance(r, TimeoutError) for r in slow)
+    assert "open" in open_error and final["slow"]["timeouts"] == 2
+    assert late.structured_content == {"server": "late", "text": "ok"}
+    print("PASS\n")
+
+
+if __name__ == "__main__":
+    test_namespaced_routing()
+    test_parallel_discovery()
+    test_slow_and_failing_servers_isolated()
+    print("所有测试通过!")
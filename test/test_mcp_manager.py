@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+MCPManager 客户端池测试：最小负载调度、错误码、扩容 / 缩容 / 回收备用客户端、
+客户端失效时任务重新入队、VIP 池（启动本地 MCP 服务器进程）
+"""
+import os
+import sys
+import time
+
+# 添加父目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from module.MCP.client.MCPClient import MCPClient
+from module.MCP.MCPManager import MCPManager, ErrorCode, load_factors
+from local_mcp import SLOW_SERVER, server_params, slow_seconds
+
+
+def slow_client_factory(**kwargs):
+    params = server_params(SLOW_SERVER)
+    return lambda: MCPClient(server_params=params, catalog_path=None, **kwargs)
+
+
+def wait_until(condition, timeout: float) -> bool:
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def test_least_load_and_error_codes():
+    """测试任务按负载因子分散到负载最小的客户端，以及 get_result 的错误码"""
+    print("=== test_least_load_and_error_codes ===")
+    factors = load_factors()
+    assert factors["add"] == 1 and factors["database_content_fuzzy"] == 8
+
+    manager = MCPManager(min_active=2, max_active=2, standby_count=0, client_factory=slow_client_factory())
+    manager.start()
+    try:
+        start = time.perf_counter()
+        ids = [manager.submit("slow", {"seconds": 0.5}, factor=40) for _ in range(4)]
+        assert wait_until(lambda: manager.get_stats()["avg_load"] == 80, 2)
+        loads = [c["load"] for c in manager.get_stats()["clients"]]
+        results = [slow_seconds(manager.get_result(task_id, timeout=5)) for task_id in ids]
+        elapsed = time.perf_counter() - start
+
+        missing = manager.get_result("no-such-task")
+        pending = manager.submit("slow", {"seconds": 0.5})
+        not_ready = manager.get_result(pending, block=False)
+        timeout = manager.get_result(pending, timeout=0.05)
+        later = slow_seconds(manager.get_result(pending, timeout=5))
+        failed = manager.get_result(manager.submit("no_such_tool"), timeout=5)
+        stats = manager.get_stats()
+    finally:
+        manager.stop()
+    print(f"客户端负载: {loads}，4 个任务耗时 {elapsed:.2f} 秒，统计: {stats}")
+    assert loads == [80, 80] and results == [0.5] * 4 and elapsed < 1.0
+    assert missing["error"] == ErrorCode.NOT_FOUND and not_ready["error"] == ErrorCode.NOT_READY
+    assert timeout["error"] == ErrorCode.TIMEOUT and later == 0.5
+    assert failed["error"] == ErrorCode.TASK_FAILED
+    assert stats["completed"] == 5 and stats["failed"] == 1 and stats["timeouts"] == 1
+    print("PASS\n")
+
+
+def test_scale_up_down_and_reclaim():
+    """测试负载满时激活备用客户端，空闲后退回备用池，多余的备用客户端被关闭回收"""
+    print("=== test_scale_up_down_and_reclaim ===")
+    manager = MCPManager(min_active=1, max_active=3, standby_count=1, max_load=10, idle_timeout=0.5,
+                         check_interval=0.2, client_factory=slow_client_factory())
+    manager.start()
+    try:
+        ids = [manager.submit("slow", {"seconds": 1.0}, factor=5) for _ in range(6)]
+        assert wait_until(lambda: manager.get_stats()["active_count"] == 3, 10)
+        peak = manager.get_stats()
+        assert [manager.get_result(task_id, timeout=30) for task_id in ids]
+        assert wait_until(lambda: manager.get_stats()["active_count"] == 1, 10)
+        assert wait_until(lambda: manager.get_stats()["standby_count"] == 1, 10)
+        stats = manager.get_stats()
+    finally:
+        manager.stop()
+    print(f"峰值活跃 {peak['active_count']}（平均负载 {peak['avg_load']}），回落后统计: {stats}")
+    assert stats["scale_ups"] >= 2 and stats["scale_downs"] >= 2 and stats["reclaimed"] >= 1
+    assert stats["completed"] == 6
+    print("PASS\n")
+
+
+def test_dead_client_requeue():
+    """测试客户端失效时，其未完成的幂等任务重新入队并在其他客户端上完成"""
+    print("=== test_dead_client_requeue ===")
+    manager = MCPManager(min_active=2, max_active=2, standby_count=1, check_interval=0.2,
+                         client_factory=slow_client_factory(idempotent_tools={"slow"}))
+    manager.start()
+    try:
+        ids = [manager.submit("slow", {"seconds": 0.5}) for _ in range(4)]
+        assert wait_until(lambda: all(c["tasks"] for c in manager.get_stats()["clients"]), 2)
+        victim = manager.active_pool[0]
+        victim.client.close()  # 模拟客户端线程退出
+        results = [slow_seconds(manager.get_result(task_id, timeout=30)) for task_id in ids]
+        assert wait_until(lambda: manager.get_stats()["active_count"] == 2, 10)
+        stats = manager.get_stats()
+    finally:
+        manager.stop()
+    print(f"结果: {results}，统计: {stats}")
+    assert results == [0.5] * 4
+    assert stats["dead_clients"] == 1 and stats["requeued"] >= 1 and stats["failed"] == 0
+    assert victim not in manager.active_pool
+    print("PASS\n")
+
+
+def test_dead_client_not_idempotent():
+    """测试客户端失效时，已交给它的非幂等任务以 CLIENT_DEAD 结束（不重复执行），其他客户端上的任务照常完成"""
+    print("=== test_dead_client_not_idempotent ===")
+    manager = MCPManager(min_active=2, max_active=2, standby_count=1, check_interval=0.2,
+                         client_factory=slow_client_factory(idempotent_tools=set()))
+    manager.start()
+    try:
+        ids = [manager.submit("slow", {"seconds": 0.5}) for _ in range(4)]
+        assert wait_until(lambda: all(c["tasks"] for c in manager.get_stats()["clients"]), 2)
+        victim = manager.active_pool[0]
+        lost = set(victim.pending)
+        victim.client.close()  # 模拟客户端线程退出
+        results = {task_id: manager.get_result(task_id, timeout=30) for task_id in ids}
+        stats = manager.get_stats()
+    finally:
+        manager.stop()
+    dead = {task_id for task_id, result in results.items()
+            if isinstance(result, dict) and result.get("error") == ErrorCode.CLIENT_DEAD}
+    print(f"失效客户端上的任务 {len(lost)} 个，以 CLIENT_DEAD 结束 {len(dead)} 个，统计: {stats}")
+    assert lost and dead == lost
+    assert all(slow_seconds(results[task_id]) == 0.5 for task_id in set(ids) - lost)
+    assert stats["requeued"] == 0 and stats["failed"] == len(lost)
+    print("PASS\n")
+
+
+def test_vip_pool():
+    """测试普通池占满时 priority 任务走 VIP 池，不用排队"""
+    print("=== test_vip_pool ===")
+    manager = MCPManager(min_active=1, max_active=1, standby_count=0, vip_count=1, max_load=1,
+                         client_factory=slow_client_factory())
+    manager.start()
+    try:
+        busy = [manager.submit("slow", {"seconds": 1.0}) for _ in range(2)]
+        time.sleep(0.1)
+        start = time.perf_counter()
+        vip = slow_seconds(manager.get_result(manager.submit("slow", {"seconds": 0.1}, priority=True), timeout=5))
+        vip_elapsed = time.perf_counter() - start
+        assert [manager.get_result(task_id, timeout=10) for task_id in busy]
+        stats = manager.get_stats()
+    finally:
+        manager.stop()
+    print(f"VIP 任务耗时 {vip_elapsed:.2f} 秒，VIP 客户端: {stats['vip_clients']}")
+    assert vip == 0.1 and vip_elapsed < 0.5
+    assert stats["vip_clients"][0]["completed"] == 1
+    print("PASS\n")
+
+
+if __name__ == "__main__":
+    test_least_load_and_error_codes()
+    test_scale_up_down_and_reclaim()
+    test_dead_client_requeue()
+    test_dead_client_not_idempotent()
+    test_vip_pool()
+    print("所有测试通过!")
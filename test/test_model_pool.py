@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+模型实例池测试：LRU 淘汰、配置更新后重建、淘汰的实例关闭客户端、切换模型时复用实例并携带历史（不访问网络）
+"""
+import os
+import sys
+import time
+import asyncio
+
+# 添加父目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from module.AICore.Tool.ModelPool import ModelPool
+from module.AICore.Historyfile.HistoryManager import HistHistoryManager
+from fake_openai import FakeModel, make_model, make_store, model_config
+import fake_openai
+
+
+class HalfModel(FakeModel):
+    """2个字符 = 1个token 的测试模型（模拟另一种tokenizer）"""
+
+    def token_callback(self, content: str) -> int:
+        return (len(content) + 1) // 2 if content else 0
+
+
+CONFIG = {"deepseek": {"deepseek-chat": model_config("deepseek-chat"), "deepseek-reasoner": model_config("deepseek-reasoner")}}
+
+
+class FakeFactory(fake_openai.FakeFactory):
+    """deepseek-reasoner 使用另一种tokenizer，保留真实的客户端（检查关闭）"""
+
+    def call_model(self, vendor, message):
+        if message["params"]["model"] != "deepseek-reasoner":
+            return super().call_model(vendor, message)
+        self.created.append(message["params"]["model"])
+        return HalfModel(message)
+
+
+def test_lru_eviction():
+    """测试容量满时淘汰最久未使用的实例"""
+    print("=== test_lru_eviction ===")
+    pool = ModelPool(capacity=2)
+    a = pool.acquire("v", "a", create=lambda: make_model("a"))
+    pool.acquire("v", "b", create=lambda: make_model("b"))
+    assert pool.acquire("v", "a", create=lambda: make_model("a")) is a  # a 变为最近使用
+    pool.acquire("v", "c", create=lambda: make_model("c"))  # 淘汰 b
+    assert pool.keys() == [("v", "a"), ("v", "c")]
+    snapshot = pool.snapshot()
+    print(f"统计: {snapshot}")
+    assert (snapshot["hits"], snapshot["misses"], snapshot["evictions"]) == (1, 3, 1)
+    try:
+        ModelPool(capacity=0)
+        assert False, "无效容量应抛出异常"
+    except ValueError:
+        pass
+    print("PASS\n")
+
+
+def test_version_change_rebuilds():
+    """测试配置版本变化后重建实例"""
+    print("=== test_version_change_rebuilds ===")
+    pool = ModelPool()
+    first = pool.acquire("v", "a", create=lambda: make_model("a"), version=1)
+    assert pool.acquire("v", "a", create=lambda: make_model("a"), version=1) is first
+    second = pool.acquire("v", "a", create=lambda: make_model("a"), version=2)
+    assert second is not first and second.config_version == 2
+    print("PASS\n")
+
+
+def closed(entry) -> bool:
+    return entry.client.is_closed() and entry.async_client.is_closed()
+
+
+def test_retired_clients_closed():
+    """测试被淘汰 / 替换 / 移除的实例关闭客户端，被持有的实例在释放后才关闭"""
+    print("=== test_retired_clients_closed ===")
+    pool = ModelPool(capacity=1)
+    a = pool.acquire("v", "a", create=lambda: make_model("a"))
+    b = pool.acquire("v", "b", create=lambda: make_model("b"), hold=True)  # 淘汰 a
+    assert closed(a) and not closed(b)
+
+    c = pool.acquire("v", "c", create=lambda: make_model("c"))  # 淘汰 b，b 仍被持有
+    assert b.retired and not closed(b)
+    pool.release(b)
+    assert closed(b) and not closed(c)
+    try:
+        pool.release(b)
+        assert False, "重复释放应抛出异常"
+    except ValueError:
+        pass
+
+    # 配置版本变化后替换的旧实例、discard / clear 移除的实例同样关闭
+    old = pool.acquire("v", "c", create=lambda: make_model("c"), version=1)
+    assert closed(c) and not closed(old)
+    new = pool.acquire("v", "c", create=lambda: make_model("c"), version=2)
+    assert closed(old) and pool.discard("v", "c") and closed(new)
+    d = pool.acquire("v", "d", create=lambda: make_model("d"))
+    pool.clear()
+    assert closed(d)
+    print("PASS\n")
+
+
+def test_evicted_in_thread_closed_on_loop():
+    """测试在线程池中淘汰的实例，其异步客户端在使用它的事件循环中关闭（而不是在淘汰线程中新建循环）"""
+    print("=== test_evicted_in_thread_closed_on_loop ===")
+    pool = ModelPool(capacity=1)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        closed_on = []
+
+        def record_close(entry):
+            async def close(original=entry.async_client.close):
+                closed_on.append(asyncio.get_running_loop())
+                await original()
+            entry.async_client.close = close
+            return entry
+
+        used = record_close(pool.acquire("v", "used", create=lambda: make_model("used")))  # 在事件循环中创建
+        # 线程中创建（预热）并淘汰 used，之后绑定到服务的事件循环
+        warmed = record_close(await asyncio.to_thread(pool.acquire, "v", "warmed", lambda: make_model("warmed")))
+        warmed.bind_loop(loop)
+        await asyncio.to_thread(pool.acquire, "v", "next", lambda: make_model("next"))  # 在线程中淘汰 warmed
+        for _ in range(100):
+            if used.async_client.is_closed() and warmed.async_client.is_closed():
+                break
+            await asyncio.sleep(0.01)
+        return loop, used, warmed, closed_on
+
+    loop, used, warmed, closed_on = asyncio.run(scenario())
+    print(f"关闭异步客户端的事件循环: {closed_on}")
+    assert used.loop is loop and warmed.loop is loop
+    assert closed(used) and closed(warmed)
+    assert closed_on == [loop, loop]
+    print("PASS\n")
+
+
+def test_session_holds_evicted_instance():
+    """测试会话使用的实例被淘汰后客户端仍可用，会话关闭后客户端关闭"""
+    print("=== test_session_holds_evicted_instance ===")
+    factory = FakeFactory(config_store=make_store(CONFIG), pool_size=1)
+    factory.connect("deepseek", "deepseek-chat")
+    chat = factory._sessions["default"].resources
+    factory.open_session("other", "deepseek", "deepseek-reasoner")  # 淘汰 deepseek-chat
+    reasoner = factory._sessions["other"].resources
+    assert factory.model_pool.keys() == [("deepseek", "deepseek-reasoner")]
+    assert chat.retired and not closed(chat)
+
+    factory.switch_model("deepseek", "deepseek-reasoner")  # 默认会话不再使用 deepseek-chat
+    assert closed(chat) and reasoner.users == 2
+    factory.close_session("other")
+    assert not closed(reasoner)
+    factory.disconnect()
+    print(f"实例池: {factory.model_pool.snapshot()}")
+    assert closed(reasoner) and reasoner.users == 0
+    print("PASS\n")
+
+
+def test_switch_reuses_instances():
+    """测试来回切换模型不会重复创建模型和客户端"""
+    print("=== test_switch_reuses_instances ===")
+    factory = FakeFactory(config_store=make_store(CONFIG))
+    factory.connect("deepseek", "deepseek-chat")
+    chat_model, chat_client = factory._sessions["default"].resources.model, factory.ai_client._async_client
+    session = factory.ai_client
+
+    factory.switch_model("deepseek", "deepseek-reasoner")
+    start = time.perf_counter()
+    factory.switch_model("deepseek", "deepseek-chat")
+    elapsed = time.perf_counter() - start
+    print(f"切换回已加载模型耗时: {elapsed * 1000:.3f} ms")
+
+    assert factory.created == ["deepseek-chat", "deepseek-reasoner"]
+    assert factory._sessions["default"].resources.model is chat_model
+    assert factory.ai.model == "deepseek-chat"
+    assert factory.ai_client is session  # 会话对象不变，只替换模型和连接
+    assert factory.ai_client._async_client is chat_client
+    print("PASS\n")
+
+
+def test_switch_keep_history():
+    """测试切换时携带历史并按新tokenizer重新计数"""
+    print("=== test_switch_keep_history ===")
+    factory = FakeFactory(config_store=make_store(CONFIG))
+    factory.connect("deepseek", "deepseek-chat")
+
+    async def fill():
+        await factory.ai_client._history.write("user", "a" * 10)
+        await factory.ai_client._history.write("assistant", "b" * 10)
+
+    asyncio.run(fill())
+    factory.switch_model("deepseek", "deepseek-reasoner", keep_history=True)
+    history = factory.ai_client._history
+    assert [m["content"] for m in history.read()] == ["a" * 10, "b" * 10]
+    assert history.token_counts[1:] == [5, 5]  # HalfModel 计数
+    assert history.total_tokens == sum(history.token_counts)
+
+    factory.switch_model("deepseek", "deepseek-chat")
+    assert factory.ai_client._history.read() == []
+    print("PASS\n")
+
+
+def test_history_rebind_trims():
+    """测试新模型上限更小时裁剪历史，思考计数保持对齐"""
+    print("=== test_history_rebind_trims ===")
+
+    async def run():
+        history = HistHistoryManager(messages=[], system_prompt="s", token_callback=len, maxtoken=100)
+        await history.write("user", "u" * 20)
+        await history.write("user", "v" * 20)
+        await history.write("assistant", "a" * 20, think_content="t" * 10)
+        return history
+
+    history = asyncio.run(run())
+    history.rebind(len, 60)  # 1 + 20 + 20 + 30 = 71 > 60，裁剪第一条
+    assert history.total_tokens == 51
+    assert history.total_tokens == sum(history.token_counts)
+    assert len(history.token_counts) == len(history.messages) + 1
+    assert history.messages[0]["content"] == "v" * 20
+    assert history.think_token_counts == [10]
+
+    try:
+        history.rebind(len, 0)
+        assert False, "无效上限应抛出异常"
+    except ValueError:
+        pass
+    print("PASS\n")
+
+
+if __name__ == "__main__":
+    test_lru_eviction()
+    test_version_change_rebuilds()
+    test_retired_clients_closed()
+    test_evicted_in_thread_closed_on_loop()
+    test_session_holds_evicted_instance()
+    test_switch_reuses_instances()
+    test_switch_keep_history()
+    test_history_rebind_trims()
+    print("所有测试通过!")
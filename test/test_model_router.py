@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+模型路由测试：按策略选择模型、熔断降级、决策审计、AIFactory.route 自动降级（不访问网络）
+"""
+import os
+import sys
+import json
+import asyncio
+
+# 添加父目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from module.AICore.Tool.ConfigValidator import ConfigValidator
+from module.AICore.Tool.ModelRouter import ModelRouter, RoutePolicy
+from fake_openai import FakeStream, text_chunks, make_store, model_config
+import fake_openai
+
+
+# 价格（元 / 百万token）
+PRICING = {
+    "deepseek": {"input": 2.0, "output": 8.0},
+    "qwen": {"input": 4.0, "output": 12.0},
+    "kimi": {"input": 12.0, "output": 12.0},
+}
+
+CONFIG = {vendor: {f"{vendor}-chat": model_config(f"{vendor}-chat", pricing=price)} for vendor, price in PRICING.items()}
+
+TARGETS = [("deepseek", "deepseek-chat"), ("qwen", "qwen-chat"), ("kimi", "kimi-chat")]
+
+
+def feed(router: ModelRouter, vendor: str, ttft: float, times: int = 5):
+    for _ in range(times):
+        router.record_success(vendor, f"{vendor}-chat", {"ttft_content": ttft, "tokens_per_second": 50.0},
+                              {"prompt_tokens": 1000, "completion_tokens": 200})
+
+
+def test_policies():
+    """测试 p95 首token延迟约束下最便宜、预算内最快"""
+    print("=== test_policies ===")
+    router = ModelRouter(make_store(CONFIG))
+    feed(router, "deepseek", 3.0)  # 最便宜但慢
+    feed(router, "qwen", 1.0)
+    feed(router, "kimi", 0.3)  # 最快但最贵
+
+    decision = router.decide(TARGETS, RoutePolicy.cheapest(max_p95_ttft=2.0), prompt_tokens=1000, output_tokens=200)
+    print(f"cheapest 排序: {decision['ranking']}")
+    assert decision["chosen"] == "qwen/qwen-chat" and not decision["relaxed"]
+    assert decision["ranking"][2] == ("deepseek", "deepseek-chat")  # 违反约束的排在最后作为备选
+    assert [c["status"] for c in decision["candidates"]] == ["ok", "ok", "slow"]
+
+    # 1000 输入 + 200 输出：deepseek 0.0036，qwen 0.0064，kimi 0.0144
+    assert router.choose(TARGETS, RoutePolicy.fastest(max_cost=0.01), prompt_tokens=1000, output_tokens=200) == ("qwen", "qwen-chat")
+    assert router.choose(TARGETS, RoutePolicy.fastest(), prompt_tokens=1000, output_tokens=200) == ("kimi", "kimi-chat")
+    assert abs(router.stats()["kimi/kimi-chat"]["cost_total"] - 5 * 0.0144) < 1e-9
+
+    # 没有满足约束的模型时放宽
+    decision = router.decide(TARGETS, RoutePolicy.cheapest(max_p95_ttft=0.1))
+    assert decision["relaxed"] and decision["chosen"] == "deepseek/deepseek-chat"
+    print("PASS\n")
+
+
+def test_degrade_and_recover():
+    """测试错误率过高、连续失败熔断和恢复"""
+    print("=== test_degrade_and_recover ===")
+    router = ModelRouter(make_store(CONFIG), failure_threshold=3, cooldown=60.0)
+    feed(router, "deepseek", 0.5)
+    feed(router, "qwen", 0.5)
+
+    for _ in range(3):
+        router.record_failure("deepseek", "deepseek-chat", ConnectionError("连接被拒绝"))
+    decision = router.decide(TARGETS[:2])
+    assert decision["ranking"] == [("qwen", "qwen-chat"), ("deepseek", "deepseek-chat")]
+    assert decision["candidates"][1]["status"] == "cooldown"
+    assert decision["candidates"][1]["stats"]["last_error"] == "连接被拒绝"
+
+    # 冷却结束后仍按错误率判断；成功后解除熔断
+    router._stats[("deepseek", "deepseek-chat")].cooldown_until = 0.0
+    assert router.decide(TARGETS[:2], RoutePolicy.cheapest(max_error_rate=0.3))["candidates"][1]["status"] == "unhealthy"
+    feed(router, "deepseek", 0.5, times=10)
+    assert router.choose(TARGETS[:2]) == ("deepseek", "deepseek-chat")
+    print("PASS\n")
+
+
+def test_decision_audit_and_validation():
+    """测试决策记录包含驱动决策的统计，以及价格配置校验"""
+    print("=== test_decision_audit_and_validation ===")
+    router = ModelRouter(make_store(CONFIG))
+    feed(router, "qwen", 1.0)
+    router.decide(TARGETS, RoutePolicy.cheapest(max_p95_ttft=2.0), prompt_tokens=10)
+
+    record = router.decisions(limit=1)[0]
+    print(f"决策记录: {json.dumps(record, ensure_ascii=False, default=str)[:200]}...")
+    assert record["policy"]["name"] == "cheapest(p95_ttft<2.0s)"
+    qwen = next(c for c in record["candidates"] if c["model"] == "qwen/qwen-chat")
+    assert qwen["stats"]["p95_ttft"] == 1.0 and qwen["stats"]["samples"] == 5
+    assert qwen["expected_output_tokens"] == 200  # 使用历史输出token数
+    assert json.dumps(record, default=str)
+
+    errors = ConfigValidator().check_config_data(
+        {"deepseek": {"deepseek-chat": {"base_url": "x", "model": "x", "max_tokens": 1, "pricing": {"input": -1, "cache": 1}}}}
+    )
+    assert len(errors) == 2, errors
+    for kwargs in ({"objective": "unknown"}, {"max_error_rate": 2}):
+        try:
+            RoutePolicy(**kwargs)
+            assert False, "无效参数应抛出异常"
+        except ValueError:
+            pass
+    print("PASS\n")
+
+
+class FakeFactory(fake_openai.FakeFactory):
+    """failing 中的供应商建立连接失败，其余正常返回"""
+
+    def __init__(self, failing=(), **kwargs):
+        super().__init__(**kwargs)
+        self.failing = failing
+        self.requests = []
+
+    async def create(self, vendor, params):
+        self.requests.append(vendor)
+        if vendor in self.failing:
+            raise ConnectionError("连接被拒绝")
+        return FakeStream(text_chunks(f"{vendor}的回答", prompt_tokens=100), 0.001)
+
+
+def test_factory_route_fallback():
+    """测试 AIFactory.route 首选模型失败时降级，历史中只有成功的一轮"""
+    print("=== test_factory_route_fallback ===")
+    factory = FakeFactory(failing=("deepseek",), config_store=make_store(CONFIG))
+    factory.connect("qwen", "qwen-chat")
+
+    async def ask():
+        return [frame["content"] async for frame in factory.route("alice", "你好") if "content" in frame]
+
+    content = "".join(asyncio.run(ask()))
+    decision = factory.router.decisions(limit=1)[0]
+    print(f"回答: {content}，尝试: {decision['attempts']}")
+    assert factory.requests == ["deepseek", "qwen"]  # 最便宜的 deepseek 失败后降级
+    assert content == "qwen的回答"
+    assert [a["status"] for a in decision["attempts"]] == ["error", "ok"]
+    assert [m["content"] for m in factory.get_session("alice")._history.read()] == ["你好", "qwen的回答"]
+
+    stats = factory.router.stats()
+    assert stats["deepseek/deepseek-chat"]["error_rate"] == 1.0
+    assert stats["qwen/qwen-chat"]["samples"] == 1 and stats["qwen/qwen-chat"]["p95_ttft"] is not None
+
+    # 全部失败
+    factory.failing = ("deepseek", "qwen", "kimi")
+    try:
+        asyncio.run(ask())
+        assert False, "全部失败时应抛出异常"
+    except RuntimeError as e:
+        print(f"异常信息: {e}")
+    assert len(factory.get_session("alice")._history.read()) == 2
+    print("PASS\n")
+
+
+if __name__ == "__main__":
+    test_policies()
+    test_degrade_and_recover()
+    test_decision_audit_and_validation()
+    test_factory_route_fallback()
+    print("所有测试通过!")
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+前缀缓存友好的请求布局与缓存命中统计测试（不访问网络）
+"""
+import os
+import sys
+import json
+import asyncio
+
+# 添加父目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from module.AICore.Tool.PromptCache import canonicalize_tools, PromptCacheStats
+from module.AICore.Model.deepseek import DeepSeek
+from module.AICore.Historyfile.HistoryManager import HistHistoryManager
+from fake_openai import FakeStream, delta_chunk, usage_chunk, make_model, make_client
+
+
+TOOL_A = {"type": "function", "function": {"name": "add", "description": "加法",
+          "parameters": {"type": "object", "properties": {"b": {"type": "integer"}, "a": {"type": "integer"}}}}}
+TOOL_B = {"function": {"parameters": {"properties": {}, "type": "object"}, "name": "exit_task", "description": "退出"}, "type": "function"}
+
+
+def test_canonical_tools_are_byte_stable():
+    """测试工具列表与顺序、键顺序无关"""
+    print("=== test_canonical_tools_are_byte_stable ===")
+    first = json.dumps(canonicalize_tools([TOOL_A, TOOL_B]), ensure_ascii=False)
+    second = json.dumps(canonicalize_tools([TOOL_B, TOOL_A]), ensure_ascii=False)
+    assert first == second
+    assert canonicalize_tools(None) is None
+    print("PASS\n")
+
+
+def test_cached_request_layout():
+    """测试前缀缓存模式下的键顺序和消息副本"""
+    print("=== test_cached_request_layout ===")
+    model = make_model(prompt_cache=True, temperature=0.5)
+    model.set_tools([TOOL_B, TOOL_A])
+    messages = [{"content": "你好", "role": "user"}]
+    request = model.gen_request(messages)
+    assert list(request.keys()) == ["model", "tools", "temperature", "messages"]
+    assert [t["function"]["name"] for t in request["tools"]] == ["add", "exit_task"]
+    assert list(request["messages"][0].keys()) == ["role", "content"]
+
+    # 修改历史记录不影响已生成的请求
+    messages[0]["content"] = "被修改"
+    assert request["messages"][0]["content"] == "你好"
+
+    # 关闭后保持原有行为
+    model.set_prompt_cache(False)
+    assert model.gen_request(messages)["messages"] is messages
+    print("PASS\n")
+
+
+def test_cache_usage_parsing():
+    """测试不同供应商 usage 中缓存字段的解析"""
+    print("=== test_cache_usage_parsing ===")
+    model = make_model()
+    assert model.extract_cache_usage({"prompt_tokens": 100, "prompt_tokens_details": {"cached_tokens": 64}}) == \
+        {"prompt_tokens": 100, "cached_tokens": 64}
+    assert model.extract_cache_usage({"prompt_tokens": 100, "cached_tokens": 32}) == \
+        {"prompt_tokens": 100, "cached_tokens": 32}
+    assert model.extract_cache_usage(None) == {"prompt_tokens": 0, "cached_tokens": 0}
+
+    deepseek = DeepSeek.__new__(DeepSeek)  # 跳过tokenizer加载
+    assert deepseek.extract_cache_usage({"prompt_tokens": 90, "prompt_cache_hit_tokens": 64, "prompt_cache_miss_tokens": 26}) == \
+        {"prompt_tokens": 90, "cached_tokens": 64}
+    print("PASS\n")
+
+
+def test_prefix_break_detection():
+    """测试前缀被改动时计数"""
+    print("=== test_prefix_break_detection ===")
+    stats = PromptCacheStats()
+    m1 = {"role": "user", "content": "1"}
+    m2 = {"role": "assistant", "content": "2"}
+    assert stats.observe_request({"messages": [m1]})
+    assert stats.observe_request({"messages": [m1, m2]})
+    assert not stats.observe_request({"messages": [m2]})  # 开头的消息被裁剪
+    assert not stats.observe_request({"messages": [m2], "tools": [TOOL_A]})  # 工具变化
+    assert stats.prefix_breaks == 2
+    print("PASS\n")
+
+
+def test_trim_watermark():
+    """测试水位线裁剪：一次裁剪较多，之后多轮不再改动开头的消息"""
+    print("=== test_trim_watermark ===")
+
+    async def run():
+        history = HistHistoryManager(messages=[], system_prompt="s", token_callback=len, maxtoken=100)
+        history.set_trim_watermark(0.5)
+        for i in range(9):
+            await history.write("user", f"{i}" * 10)  # 1 + 90 tokens
+        await history.write("user", "x" * 10)  # 超出，裁剪到 50 以下
+        after_trim = list(history.messages)
+        assert history.total_tokens <= 50
+        for i in range(4):
+            await history.write("user", "y" * 10)  # 不再触发裁剪
+        assert history.messages[:len(after_trim)] == after_trim
+        assert history.total_tokens == sum(history.token_counts)
+
+    asyncio.run(run())
+    print("PASS\n")
+
+
+def test_send_stream_hit_rate():
+    """测试 send_stream 按会话累计命中率"""
+    print("=== test_send_stream_hit_rate ===")
+    model = make_model(prompt_cache=True)
+    usages = iter([
+        {"prompt_tokens": 100, "completion_tokens": 2, "prompt_tokens_details": {"cached_tokens": 0}},
+        {"prompt_tokens": 200, "completion_tokens": 2, "prompt_tokens_details": {"cached_tokens": 150}},
+    ])
+
+    async def create(**params):
+        return FakeStream([delta_chunk(content="好"), usage_chunk(**next(usages))])
+
+    client = make_client(create, model)
+
+    async def run():
+        for question in ("你好", "再见"):
+            async for _ in client.send_stream(question):
+                pass
+
+    asyncio.run(run())
+    snapshot = client.prompt_cache_stats.snapshot()
+    print(f"缓存统计: {snapshot}")
+    assert snapshot["requests"] == 2
+    assert abs(snapshot["hit_rate"] - 0.5) < 1e-9
+    assert snapshot["prefix_breaks"] == 0
+    assert client.get_params()["prompt_cache"] is True
+    print("PASS\n")
+
+
+if __name__ == "__main__":
+    test_canonical_tools_are_byte_stable()
+    test_cached_request_layout()
+    test_cache_usage_parsing()
+    test_prefix_break_detection()
+    test_trim_watermark()
+    test_send_stream_hit_rate()
+    print("所有测试通过!")
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+异步速率限制测试：RPM / TPM / 并发、先到先得、用量校正、不阻塞事件循环（不访问网络）
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+# 添加父目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from module.AICore.Tool.RateLimiter import AsyncRateLimiter, rate_limiters
+from module.AICore.Tool.ConfigValidator import ConfigValidator
+from module.AICore.Model.base_model import BaseModel
+from module.AICore.Model.Kimi import Kimi
+from fake_openai import FakeStream, delta_chunk, usage_chunk, make_model, make_client
+
+
+async def ticker(stop: asyncio.Event, ticks: list):
+    """事件循环没有被阻塞时每 20ms 计数一次"""
+    while not stop.is_set():
+        ticks.append(time.perf_counter())
+        await asyncio.sleep(0.02)
+
+
+def test_rpm_and_tpm_without_blocking():
+    """测试 RPM / TPM 额度用完后异步等待，期间其他协程照常运行"""
+    print("=== test_rpm_and_tpm_without_blocking ===")
+
+    async def run():
+        stop, ticks = asyncio.Event(), []
+        tick_task = asyncio.create_task(ticker(stop, ticks))
+
+        # RPM=120：突发 120 个请求后每 0.5 秒补充一个
+        limiter = AsyncRateLimiter(rpm=120, name="rpm")
+        for _ in range(120):
+            (await limiter.acquire()).release()
+        start = time.perf_counter()
+        (await limiter.acquire()).release()
+        rpm_wait = time.perf_counter() - start
+
+        # TPM=6000：用完后每秒补充 100 个token
+        limiter = AsyncRateLimiter(tpm=6000, name="tpm")
+        (await limiter.acquire(tokens=6000)).release()
+        start = time.perf_counter()
+        (await limiter.acquire(tokens=50)).release()
+        tpm_wait = time.perf_counter() - start
+
+        stop.set()
+        await tick_task
+        return rpm_wait, tpm_wait, len(ticks), limiter.snapshot()
+
+    rpm_wait, tpm_wait, ticks, snapshot = asyncio.run(run())
+    print(f"RPM 等待: {rpm_wait:.2f} 秒，TPM 等待: {tpm_wait:.2f} 秒，期间其他协程运行: {ticks} 次")
+    assert 0.4 < rpm_wait < 0.8
+    assert 0.4 < tpm_wait < 0.8
+    assert ticks >= 30  # 等待期间事件循环没有被阻塞
+    assert snapshot["throttled"] == 1 and snapshot["requests"] == 2
+    print("PASS\n")
+
+
+def test_concurrency_fifo():
+    """测试并发上限和先到先得：额度不足时后到的小请求不能插队"""
+    print("=== test_concurrency_fifo ===")
+
+    async def run():
+        limiter = AsyncRateLimiter(concurrency=2, name="concurrency")
+        state = {"in_flight": 0, "peak": 0}
+        order = []
+
+        async def request(i):
+            permit = await limiter.acquire()
+            order.append(i)
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+            await asyncio.sleep(0.02)
+            state["in_flight"] -= 1
+            permit.release()
+
+        await asyncio.gather(*(request(i) for i in range(6)))
+        concurrency_result = (state["peak"], order)
+
+        # TPM 用完后，先到的大请求排在后到的小请求前面
+        limiter = AsyncRateLimiter(tpm=6000, name="fifo")
+        (await limiter.acquire(tokens=6000)).release()
+        order = []
+
+        async def tpm_request(name, tokens):
+            (await limiter.acquire(tokens=tokens)).release()
+            order.append(name)
+
+        big = asyncio.create_task(tpm_request("big", 30))
+        await asyncio.sleep(0)
+        small = asyncio.create_task(tpm_request("small", 1))
+        await asyncio.gather(big, small)
+        return concurrency_result, order
+
+    (peak, concurrency_order), tpm_order = asyncio.run(run())
+    print(f"最大并发: {peak}，获取顺序: {concurrency_order}，TPM 排队顺序: {tpm_order}")
+    assert peak == 2
+    assert concurrency_order == list(range(6))
+    assert tpm_order == ["big", "small"]
+    print("PASS\n")
+
+
+def test_reconcile_with_usage():
+    """测试按实际用量校正 TPM：多扣的退还，少扣的记为欠额"""
+    print("=== test_reconcile_with_usage ===")
+
+    async def run():
+        limiter = AsyncRateLimiter(tpm=6000, name="reconcile")
+        permit = await limiter.acquire(tokens=1000)
+        permit.release(actual_tokens=200)
+        after_refund = limiter.snapshot()["tpm_available"]
+
+        permit = await limiter.acquire(tokens=100)
+        permit.release(actual_tokens=9000)
+        after_debt = limiter.snapshot()["tpm_available"]
+        return after_refund, after_debt, limiter.snapshot()
+
+    after_refund, after_debt, snapshot = asyncio.run(run())
+    print(f"退还后余量: {after_refund:.0f}，欠额后余量: {after_debt:.0f}")
+    assert 5790 < after_refund <= 6000
+    assert after_debt < -3000
+    assert snapshot["tokens_estimated"] == 1100 and snapshot["tokens_actual"] == 9200
+    print("PASS\n")
+
+
+def rate_limited_client(rate_limit: dict, key: str = "sk-rate"):
+    spans = []
+
+    async def create(**params):
+        spans.append(["start", time.perf_counter()])
+        # 等待 0.05 秒后输出回答和 usage
+        return FakeStream([delta_chunk(content="回答"), usage_chunk(prompt_tokens=1, completion_tokens=1, total_tokens=40)], latency=0.05)
+
+    model = make_model("fake-chat", key=key, rate_limit=rate_limit)
+    return make_client(create, model, system_prompt="你是助手"), spans
+
+
+def test_model_config_integration():
+    """测试模型通过 rate_limit 配置限速，同一账户的会话共享额度"""
+    print("=== test_model_config_integration ===")
+    rate_limiters.clear()
+    rate_limiters.use_state_file(os.path.join(tempfile.mkdtemp(), "adaptive_state.json"))
+    first, spans = rate_limited_client({"concurrency": 1, "tpm": 60000})
+    second, _ = rate_limited_client({"concurrency": 1, "tpm": 60000})
+    second._async_client = first._async_client  # 共用计时记录
+    assert first._model.get_rate_limiter() is second._model.get_rate_limiter()
+
+    async def ask(client):
+        return [frame async for frame in client.send_stream("你好")]
+
+    async def run():
+        start = time.perf_counter()
+        await asyncio.gather(ask(first), ask(second))
+        return time.perf_counter() - start
+
+    elapsed = asyncio.run(run())
+    snapshot = first._model.get_rate_limiter().snapshot()
+    print(f"两个会话共用并发=1 的账户，耗时 {elapsed:.2f} 秒，统计: {snapshot}")
+    assert elapsed >= 0.1  # 串行执行
+    assert spans[1][1] - spans[0][1] >= 0.045
+    assert snapshot["in_flight"] == 0 and snapshot["tokens_actual"] == 80
+
+    # 没有配置额度时不限速
+    unlimited, _ = rate_limited_client(None, key="sk-other")
+    assert unlimited._model.get_rate_limiter() is None
+
+    # Kimi 按账户等级提供默认额度，rate_limit 覆盖单项
+    kimi = Kimi.__new__(Kimi)
+    BaseModel.__init__(kimi, {"key": "sk-kimi", "params": {"base_url": "x", "model": "moonshot-v1-8k", "rate_limit": {"rpm": 10}}})
+    kimi.tier = "Tier1"
+    limiter = kimi.get_rate_limiter()
+    assert (limiter.rpm, limiter.tpm, limiter.concurrency) == (10, 128000, 50)
+    assert "Tier1" in limiter.name
+    assert Kimi.TIER_RPM_LIMITS["Tier1"] == Kimi.TIER_LIMITS["Tier1"]["rpm"] == 200  # 旧名称仍可用
+
+    errors = ConfigValidator().check_config_data(
+        {"kimi": {"moonshot-v1-8k": {"base_url": "x", "model": "x", "max_tokens": 1, "rate_limit": {"rpm": 0, "rps": 1}}}}
+    )
+    assert len(errors) == 2, errors
+    print("PASS\n")
+
+
+if __name__ == "__main__":
+    test_rpm_and_tpm_without_blocking()
+    test_concurrency_fifo()
+    test_reconcile_with_usage()
+    test_model_config_integration()
+    print("所有测试通过!")
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+请求调度测试：优先级、租户加权公平排队、截止时间丢弃、抢占批处理请求、客户端集成（不访问网络）
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+# 添加父目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from module.AICore.Tool.RequestScheduler import RequestScheduler, RequestDropped, RequestPreempted, request_schedulers
+from module.AICore.Tool.RateLimiter import rate_limiters
+from fake_openai import FakeStream, delta_chunk, make_model, make_client
+
+
+def test_priority_and_fair_queuing():
+    """测试高优先级先放行，同一优先级内按租户权重轮流放行"""
+    print("=== test_priority_and_fair_queuing ===")
+
+    async def run():
+        scheduler = RequestScheduler(slots=1, name="wfq")
+        scheduler.set_weight("vip", 2)
+        holder = await scheduler.acquire()
+        order = []
+
+        async def request(label, priority, tenant):
+            async with await scheduler.acquire(priority=priority, tenant=tenant):
+                order.append(label)
+                await asyncio.sleep(0)
+
+        tasks = [asyncio.create_task(request(f"bulk{i}", "default", "bulk")) for i in range(4)]
+        tasks += [asyncio.create_task(request(f"vip{i}", "default", "vip")) for i in range(4)]
+        tasks += [asyncio.create_task(request(f"small{i}", "default", "small")) for i in range(2)]
+        tasks.append(asyncio.create_task(request("chat", "interactive", "user-1")))
+        await asyncio.sleep(0.01)
+        depth = scheduler.snapshot()["classes"]
+        holder.release()
+        await asyncio.gather(*tasks)
+        return order, depth, scheduler.snapshot()
+
+    order, depth, snapshot = asyncio.run(run())
+    print(f"放行顺序: {order}")
+    assert depth["default"]["queued"] == 10 and depth["interactive"]["queued"] == 1
+    assert order[0] == "chat"
+    # vip 权重 2：前 8 个放行中 vip 占 4 个，bulk / small 各 2 个
+    first = order[1:9]
+    assert sum(label.startswith("vip") for label in first) == 4, first
+    assert sum(label.startswith("bulk") for label in first) == 2, first
+    assert snapshot["classes"]["default"]["dispatched"] == 11 and snapshot["running"] == 0
+    assert snapshot["classes"]["default"]["wait_p95"] is not None
+    print("PASS\n")
+
+
+def test_deadline_drops_stale_requests():
+    """测试排队超过截止时间的请求被丢弃，不占用名额"""
+    print("=== test_deadline_drops_stale_requests ===")
+
+    async def run():
+        scheduler = RequestScheduler(slots=1, name="deadline")
+        holder = await scheduler.acquire()
+        start = time.perf_counter()
+        try:
+            await scheduler.acquire(deadline=0.05)
+            dropped = False
+        except RequestDropped:
+            dropped = True
+        elapsed = time.perf_counter() - start
+
+        # 出队时已过期：放行前一刻才检查
+        stale = asyncio.create_task(scheduler.acquire(tenant="stale", deadline=0.05))
+        await asyncio.sleep(0)
+        fresh = asyncio.create_task(scheduler.acquire(tenant="fresh"))
+        await asyncio.sleep(0.1)
+        holder.release()
+        results = await asyncio.gather(stale, fresh, return_exceptions=True)
+        return dropped, elapsed, results, scheduler.snapshot()
+
+    dropped, elapsed, results, snapshot = asyncio.run(run())
+    print(f"丢弃: {dropped}，等待 {elapsed:.2f} 秒，统计: {snapshot['classes']['default']}")
+    assert dropped and 0.04 < elapsed < 0.2
+    assert isinstance(results[0], RequestDropped) and results[1].tenant == "fresh"
+    assert snapshot["classes"]["default"]["dropped"] == 2
+    assert snapshot["classes"]["default"]["queued"] == 0 and snapshot["running"] == 1
+    print("PASS\n")
+
+
+def test_interactive_preempts_batch():
+    """测试名额已满时交互式请求抢占正在进行的批处理请求"""
+    print("=== test_interactive_preempts_batch ===")
+
+    async def run():
+        scheduler = RequestScheduler(slots=1, name="preempt")
+        events = []
+
+        async def batch():
+            try:
+                async with await scheduler.acquire(priority="batch", tenant="job") as ticket:
+                    ticket.mark_started()
+                    events.append("batch-start")
+                    await asyncio.sleep(1)
+                    events.append("batch-done")
+            except RequestPreempted:
+                events.append("batch-preempted")
+
+        batch_task = asyncio.create_task(batch())
+        await asyncio.sleep(0.01)
+        start = time.perf_counter()
+        async with await scheduler.acquire(priority="interactive", tenant="user-1"):
+            events.append("chat")
+        waited = time.perf_counter() - start
+        await batch_task
+        return events, waited, scheduler.snapshot()
+
+    events, waited, snapshot = asyncio.run(run())
+    print(f"事件: {events}，交互式请求等待 {waited:.3f} 秒")
+    assert events == ["batch-start", "batch-preempted", "chat"]
+    assert waited < 0.1
+    assert snapshot["classes"]["batch"]["preempted"] == 1 and snapshot["running"] == 0
+    print("PASS\n")
+
+
+def scheduled_client(priority: str, tenant: str, calls: list):
+    async def create(**params):
+        calls.append(tenant)
+        return FakeStream([delta_chunk(content=tenant)])
+
+    model = make_model("fake-chat", key="sk-scheduler", rate_limit={"rpm": 600})
+    client = make_client(create, model, system_prompt="你是助手")
+    client.set_schedule(priority=priority, tenant=tenant)
+    return client
+
+
+def test_set_schedule_keeps_unset_fields():
+    """测试 set_schedule 只修改传入的参数，preemptible 由 reset_preemptible 恢复默认"""
+    print("=== test_set_schedule_keeps_unset_fields ===")
+    client = scheduled_client("batch", "job", [])
+    client.set_schedule(preemptible=False, deadline=5)
+    client.set_schedule(tenant="other")
+    assert client._schedule == {"priority": "batch", "tenant": "other", "deadline": 5, "preemptible": False}
+    client.set_schedule(deadline=0)
+    client.reset_preemptible()
+    assert client._schedule == {"priority": "batch", "tenant": "other", "deadline": None, "preemptible": None}
+    print("PASS\n")
+
+
+def test_client_integration():
+    """测试 RPM 被批处理占满时，交互式请求不排在批处理请求后面；被抢占的批处理请求重新排队后完成"""
+    print("=== test_client_integration ===")
+    rate_limiters.clear()
+    rate_limiters.use_state_file(os.path.join(tempfile.mkdtemp(), "adaptive_state.json"))
+    request_schedulers.clear()
+    calls = []
+    batch_clients = [scheduled_client("batch", f"job{i}", calls) for i in range(8)]
+    chat = scheduled_client("interactive", "user-1", calls)
+    limiter = chat._model.get_rate_limiter()
+    limiter._rpm_bucket.consume(limiter._rpm_bucket.tokens)  # 额度用完，之后每 0.1 秒补充一个
+
+    async def ask(client):
+        return "".join([frame.get("content", "") async for frame in client.send_stream("你好")])
+
+    async def run():
+        batch_tasks = [asyncio.create_task(ask(client)) for client in batch_clients]
+        await asyncio.sleep(0.05)
+        start = time.perf_counter()
+        answer = await ask(chat)
+        chat_wait = time.perf_counter() - start
+        batch_answers = await asyncio.gather(*batch_tasks)
+        return answer, chat_wait, batch_answers
+
+    answer, chat_wait, batch_answers = asyncio.run(run())
+    snapshot = chat._model.get_scheduler().snapshot()
+    print(f"交互式请求等待 {chat_wait:.2f} 秒，发出顺序: {calls}")
+    print(f"调度统计: {snapshot['classes']}")
+    assert answer == "user-1"
+    assert calls.index("user-1") <= 1 and chat_wait < 0.35  # 不用等 8 个批处理请求（约 0.8 秒）
+    assert batch_answers == [f"job{i}" for i in range(8)]
+    assert snapshot["classes"]["batch"]["preempted"] >= 1 and snapshot["running"] == 0
+    rate_limiters.clear()
+    request_schedulers.clear()
+    print("PASS\n")
+
+
+if __name__ == "__main__":
+    test_priority_and_fair_queuing()
+    test_deadline_drops_stale_requests()
+    test_interactive_preempts_batch()
+    test_set_schedule_keeps_unset_fields()
+    test_client_integration()
+    print("所有测试通过!")
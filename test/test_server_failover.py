@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+服务器故障切换测试：负载下杀掉服务器进程，客户端切换到预先启动的备用服务器，
+进行中的幂等调用重放、非幂等调用报告结果未知，并测量恢复时间（启动本地 MCP 服务器进程）
+"""
+import os
+import sys
+import time
+import signal
+import tempfile
+
+# 添加父目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from module.MCP.client.MCPClient import MCPClient
+from local_mcp import SLOW_TOOL, server_source, server_params
+
+
+SERVER = server_source("chaos", SLOW_TOOL, """
+@mcp.tool
+def pid() -> dict:
+    \"\"\"服务器进程号\"\"\"
+    return {"pid": os.getpid()}
+
+
+@mcp.tool
+async def append(path: str, text: str, seconds: float = 0.0) -> dict:
+    \"\"\"等待一段时间后追加一行（非幂等）\"\"\"
+    await asyncio.sleep(seconds)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(text + "\\n")
+    return {"pid": os.getpid()}
+""")
+
+KILL = getattr(signal, "SIGKILL", signal.SIGTERM)
+
+
+def make_client(standby_count: int) -> MCPClient:
+    workdir = tempfile.mkdtemp()
+    client = MCPClient(
+        server_params=server_params(SERVER, workdir),
+        catalog_path=os.path.join(workdir, "catalog.json"),
+        standby_count=standby_count,
+        sequential_tools=set(),
+        idempotent_tools={"pid", "slow"}
+    )
+    client.start()
+    return client
+
+
+def wait_until(condition, timeout: float = 60.0, message: str = "等待超时") -> None:
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, message
+        time.sleep(0.01)
+
+
+def call(name: str, **arguments) -> dict:
+    return {"function": {"name": name, "arguments": arguments}}
+
+
+def server_pid(client: MCPClient) -> int:
+    return client.get_result(client.add(call("pid")), timeout=10).structured_content["pid"]
+
+
+def test_failover_replay():
+    """测试服务器被杀时切换到已就绪的备用服务器：幂等调用重放成功，非幂等调用以 RuntimeError 结束"""
+    print("=== test_failover_replay ===")
+    client = make_client(standby_count=1)
+    path = os.path.join(tempfile.mkdtemp(), "log.txt")
+    try:
+        wait_until(client.get_initialized, message="MCP客户端初始化超时")
+        wait_until(lambda: client.failover_stats()["standby_ready"] == 1, message="备用服务器启动超时")
+        victim = server_pid(client)
+        slow_ids = [client.add(call("slow", seconds=0.5)) for _ in range(4)]
+        append_id = client.add(call("append", path=path, text="追加", seconds=0.5))
+        time.sleep(0.2)
+
+        killed_at = time.perf_counter()
+        os.kill(victim, KILL)
+        survivor = server_pid(client)
+        recovery = time.perf_counter() - killed_at
+        replayed = [client.get_result(task_id, timeout=10).structured_content["pid"] for task_id in slow_ids]
+        try:
+            client.get_result(append_id, timeout=10)
+            raise AssertionError("非幂等调用不应重放")
+        except RuntimeError as e:
+            append_error = str(e)
+        wait_until(lambda: client.failover_stats()["standby_ready"] == 1, message="备用服务器没有补充")
+        stats = client.failover_stats()
+        alive = client.is_alive()
+    finally:
+        client.close()
+    print(f"杀掉 {victim} 后 {recovery * 1000:.1f} ms 由 {survivor} 返回结果，统计: {stats}")
+    assert survivor != victim and replayed == [survivor] * 4 and alive
+    assert "未重放" in append_error and not os.path.exists(path)
+    # 杀掉后立即发出的 pid 调用可能也发给了原服务器，同样会被重放
+    assert stats["failovers"] == 1 and stats["replayed"] >= 4 and stats["abandoned"] == 1
+    assert stats["failover_ms"][0] < 100 and recovery < 0.1
+    print("PASS\n")
+
+
+def test_chaos_under_load():
+    """测试持续负载下多次杀掉服务器：每次都在 100 ms 内切换，所有幂等调用都成功返回"""
+    print("=== test_chaos_under_load ===")
+    client = make_client(standby_count=1)
+    killed = []
+    try:
+        wait_until(client.get_initialized, message="MCP客户端初始化超时")
+        task_ids = []
+        for _ in range(3):
+            wait_until(lambda: client.failover_stats()["standby_ready"] == 1, message="备用服务器启动超时")
+            victim = server_pid(client)
+            task_ids += [client.add(call("slow", seconds=0.2)) for _ in range(8)]
+            task_ids += [client.add(call("pid")) for _ in range(8)]
+            time.sleep(0.05)
+            os.kill(victim, KILL)
+            killed.append(victim)
+            task_ids += [client.add(call("pid")) for _ in range(8)]
+            wait_until(lambda: client.failover_stats()["failovers"] == len(killed), 10, "没有切换服务器")
+        pids = [client.get_result(task_id, timeout=30).structured_content["pid"] for task_id in task_ids]
+        stats = client.failover_stats()
+    finally:
+        client.close()
+    print(f"杀掉 {killed}，{len(pids)} 个调用全部完成，统计: {stats}")
+    assert len(pids) == 72 and not set(pids[-8:]) & set(killed)
+    assert stats["failovers"] == 3 and stats["abandoned"] == 0
+    assert max(stats["failover_ms"]) < 100
+    print("PASS\n")
+
+
+def test_without_standby():
+    """测试没有备用服务器时，服务器退出后客户端停止，等待中的任务以异常结束"""
+    print("=== test_without_standby ===")
+    client = make_client(standby_count=0)
+    try:
+        wait_until(client.get_initialized, message="MCP客户端初始化超时")
+        task_id = client.add(call("slow", seconds=5))
+        future = client.get_future(task_id)
+        os.kill(server_pid(client), KILL)
+        wait_until(lambda: not client.is_alive(), 10, "客户端没有停止")
+        error = future.exception(timeout=10)
+    finally:
+        client.close()
+    print(f"客户端已停止，等待中的任务: {type(error).__name__}: {error}")
+    assert error is not None and client.failover_stats()["failovers"] == 0
+    print("PASS\n")
+
+
+if __name__ == "__main__":
+    test_failover_replay()
+    test_chaos_under_load()
+    test_without_standby()
+    print("所有测试通过!")
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+跨进程共享限速测试：多个进程共用一个 RPM 额度，合计速率不超过上限（不访问网络）
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import multiprocessing
+
+# 添加父目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from module.AICore.Tool.RateLimiter import AsyncRateLimiter, SQLiteBucketStore, RateLimiterRegistry
+
+
+RPM = 60  # 突发上限 60，之后每秒补充 1 个
+PROCESSES = 4
+ATTEMPTS = 30  # 每个进程尝试的请求数（合计 120，是额度的两倍）
+DURATION = 2.0
+
+
+def worker(db_path, ready, start, start_at, results):
+    """子进程：在 DURATION 秒内尽可能多地获取额度，返回获取成功的时间戳"""
+    async def run():
+        store = SQLiteBucketStore(db_path) if db_path else None
+        limiter = AsyncRateLimiter(rpm=RPM, name="kimi:Free:test", store=store)
+        ready.put(os.getpid())
+        start.wait()
+        await asyncio.sleep(max(0.0, start_at.value - time.time()))
+        deadline = start_at.value + DURATION
+        granted = []
+        for _ in range(ATTEMPTS):
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                permit = await asyncio.wait_for(limiter.acquire(), remaining)
+            except asyncio.TimeoutError:
+                break
+            granted.append(time.time())
+            permit.release()
+        return granted
+
+    results.put(asyncio.run(run()))
+
+
+def run_processes(db_path):
+    context = multiprocessing.get_context("spawn")
+    ready, results, start = context.Queue(), context.Queue(), context.Event()
+    start_at = context.Value("d", 0.0)
+    processes = [context.Process(target=worker, args=(db_path, ready, start, start_at, results)) for _ in range(PROCESSES)]
+    for process in processes:
+        process.start()
+
+    # 等所有进程完成导入后同时开始
+    for _ in processes:
+        ready.get(timeout=60)
+    start_at.value = time.time() + 0.2
+    start.set()
+
+    granted = sorted(t for _ in processes for t in results.get(timeout=30))
+    for process in processes:
+        process.join(timeout=10)
+    return granted
+
+
+def max_in_window(timestamps, window):
+    """任意 window 秒内的最大请求数"""
+    best, left = 0, 0
+    for right, t in enumerate(timestamps):
+        while t - timestamps[left] > window:
+            left += 1
+        best = max(best, right - left + 1)
+    return best
+
+
+def test_processes_share_budget():
+    """测试多个进程共享额度，合计速率不超过上限；不共享时会超出"""
+    print("=== test_processes_share_budget ===")
+    db_path = os.path.join(tempfile.mkdtemp(), "buckets.sqlite3")
+
+    shared = run_processes(db_path)
+    elapsed = shared[-1] - shared[0] if shared else 0.0
+    limit = RPM + elapsed * RPM / 60.0
+    print(f"共享额度: {PROCESSES} 个进程合计获取 {len(shared)} 次（{elapsed:.2f} 秒内上限 {limit:.1f}），"
+          f"任意 1 秒内最多 {max_in_window(shared, 1.0)} 次")
+    assert RPM <= len(shared) <= limit + 1
+    assert max_in_window(shared, 1.0) <= RPM + 1
+
+    isolated = run_processes(None)
+    print(f"各自限速: {PROCESSES} 个进程合计获取 {len(isolated)} 次")
+    assert len(isolated) == PROCESSES * ATTEMPTS > RPM
+    print("PASS\n")
+
+
+def test_shared_tpm_reconcile():
+    """测试按实际用量校正共享 TPM，以及注册表切换共享存储"""
+    print("=== test_shared_tpm_reconcile ===")
+    db_path = os.path.join(tempfile.mkdtemp(), "buckets.sqlite3")
+    store = SQLiteBucketStore(db_path)
+
+    async def run():
+        # 两个限速器模拟两个进程
+        first = AsyncRateLimiter(tpm=60000, name="qwen:default:abc", store=SQLiteBucketStore(db_path))
+        second = AsyncRateLimiter(tpm=60000, name="qwen:default:abc", store=SQLiteBucketStore(db_path))
+        permit = await first.acquire(tokens=30000)
+        after_first = store.level("qwen:default:abc", "tpm", 60000, 1000)
+        (await second.acquire(tokens=20000)).release(actual_tokens=20000)
+        permit.release(actual_tokens=1000)
+        await asyncio.sleep(0.1)  # 校正在线程池中执行
+        return after_first, store.level("qwen:default:abc", "tpm", 60000, 1000), first.snapshot()
+
+    after_first, after_reconcile, snapshot = asyncio.run(run())
+    print(f"预扣后余量: {after_first:.0f}，校正后余量: {after_reconcile:.0f}")
+    assert 30000 <= after_first < 30200
+    assert 39000 <= after_reconcile < 39500  # 60000 - 20000 - 1000
+    assert snapshot["shared"] and snapshot["store_calls"] == 1
+
+    registry = RateLimiterRegistry()
+    limiter = registry.get("kimi:Free:abc", rpm=3)
+    assert limiter.store is None
+    registry.use_shared_store(db_path)
+    assert limiter.store is not None and registry.get("kimi:Tier1:abc", rpm=200).store is limiter.store
+    registry.use_local_store()
+    assert limiter.store is None
+    print("PASS\n")
+
+
+if __name__ == "__main__":
+    test_processes_share_budget()
+    test_shared_tpm_reconcile()
+    print("所有测试通过!")
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+流式背压测试（不访问网络）
+验证 block / coalesce / drop 三种策略下每个流的内存占用有界
+"""
+import os
+import sys
+import asyncio
+
+# 添加父目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from module.AICore.Tool.StreamBuffer import StreamBuffer
+from fake_openai import FakeStream, delta_chunk, make_model, make_client
+
+
+def counting_stream(count: int) -> FakeStream:
+    """依次输出 "0,"、"1,"……，read 记录已经读取的chunk数"""
+    return FakeStream([delta_chunk(content=f"{i},") for i in range(count)])
+
+
+def stream_client(stream: FakeStream, **kwargs):
+    async def create(**params):
+        return stream
+
+    return make_client(create, make_model(max_tokens=100000), **kwargs)
+
+
+def test_block_policy_pauses_reader():
+    """block 策略：消费者不读时，上游读取停在缓冲区上限附近"""
+    print("=== test_block_policy_pauses_reader ===")
+    stream = counting_stream(1000)
+    client = stream_client(stream, stream_policy="block", stream_buffer_size=8)
+
+    async def run():
+        generator = client.send_stream("你好")
+        first = await generator.__anext__()
+        await asyncio.sleep(0.05)  # 消费者停顿
+        read_while_paused = stream.read
+        await generator.aclose()
+        return first, read_while_paused
+
+    first, read_while_paused = asyncio.run(run())
+    print(f"消费者停顿期间读取的chunk数: {read_while_paused}")
+    assert first == {"content": "0,"}
+    assert read_while_paused <= 8 + 3
+    assert stream.closed
+    print("PASS\n")
+
+
+def test_coalesce_policy_merges_frames():
+    """coalesce 策略：慢消费者收到合并后的帧，内容完整且顺序不变"""
+    print("=== test_coalesce_policy_merges_frames ===")
+    stream = counting_stream(500)
+    client = stream_client(stream, stream_policy="coalesce", stream_buffer_size=4)
+
+    async def run():
+        frames = []
+        async for frame in client.send_stream("你好"):
+            frames.append(frame)
+            await asyncio.sleep(0.001)  # 慢消费者
+        return frames
+
+    frames = asyncio.run(run())
+    text = "".join(frame["content"] for frame in frames)
+    print(f"收到 {len(frames)} 个帧（原始chunk 500 个）")
+    assert text == "".join(f"{i}," for i in range(500))
+    assert len(frames) < 500
+    print("PASS\n")
+
+
+def test_coalesce_frame_size_bounded():
+    """coalesce 策略：合并帧不超过 max_frame_chars，超过后阻塞写入"""
+    print("=== test_coalesce_frame_size_bounded ===")
+
+    async def run():
+        buffer = StreamBuffer(max_frames=2, policy="coalesce", max_frame_chars=10)
+        await buffer.put({"content": "a"})
+        await buffer.put({"content": "b"})
+        for _ in range(10):
+            await buffer.put({"content": "c"})  # 合并进积压帧，刚好10个字符
+        assert buffer.pending() == 3
+        blocked = asyncio.ensure_future(buffer.put({"content": "d"}))
+        await asyncio.sleep(0.01)
+        assert not blocked.done()  # 积压帧已满，写入被阻塞
+        assert await buffer.get() == {"content": "a"}
+        await asyncio.wait_for(blocked, 1)
+        closer = asyncio.ensure_future(buffer.close())  # 读取端结束写入
+        frames = []
+        while True:
+            frame = await buffer.get()
+            if frame is None:
+                break
+            frames.append(frame)
+        await closer
+        return frames
+
+    frames = asyncio.run(run())
+    assert frames == [{"content": "b"}, {"content": "c" * 10}, {"content": "d"}]
+    print("PASS\n")
+
+
+def test_drop_policy_drops_slow_consumer():
+    """drop 策略：消费者长时间不读时被丢弃，上游停止读取"""
+    print("=== test_drop_policy_drops_slow_consumer ===")
+    stream = counting_stream(1000)
+    client = stream_client(stream, stream_policy="drop", stream_buffer_size=4)
+    client.set_stream_policy("drop", buffer_size=4, drop_timeout=0.02)
+
+    async def run():
+        generator = client.send_stream("你好")
+        await generator.__anext__()
+        await asyncio.sleep(0.1)  # 超过 drop_timeout
+        try:
+            async for _ in generator:
+                pass
+        except RuntimeError as e:
+            return str(e)
+        return None
+
+    error = asyncio.run(run())
+    print(f"异常信息: {error}")
+    assert error is not None and "丢弃" in error
+    assert stream.read < 20
+    print("PASS\n")
+
+
+def test_invalid_policy():
+    """测试无效策略"""
+    print("=== test_invalid_policy ===")
+    try:
+        stream_client(counting_stream(1), stream_policy="unknown")
+        assert False, "无效策略应抛出异常"
+    except ValueError:
+        pass
+    print("PASS\n")
+
+
+if __name__ == "__main__":
+    test_block_policy_pauses_reader()
+    test_coalesce_policy_merges_frames()
+    test_coalesce_frame_size_bounded()
+    test_drop_policy_drops_slow_consumer()
+    test_invalid_policy()
+    print("所有测试通过!")
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+流式延迟统计测试（不访问网络，使用伪造的流式响应）
+"""
+import os
+import sys
+import asyncio
+
+# 添加父目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from module.AICore.Tool.StreamMetrics import LatencyHistogram, StreamMetrics, stream_metrics
+from fake_openai import FakeStream, delta_chunk, usage_chunk, make_client
+
+
+def test_histogram_percentile():
+    """测试直方图分位数精度"""
+    print("=== test_histogram_percentile ===")
+    histogram = LatencyHistogram()
+    for i in range(1, 1001):
+        histogram.record(i / 1000.0)  # 1ms - 1s 均匀分布
+    summary = histogram.summary()
+    print(f"摘要: {summary}")
+    assert summary["count"] == 1000
+    assert abs(summary["p50"] - 0.5) / 0.5 < 0.1
+    assert abs(summary["p99"] - 0.99) / 0.99 < 0.1
+    assert summary["min"] == 0.001 and summary["max"] == 1.0
+    assert LatencyHistogram().percentile(50) is None
+    print("PASS\n")
+
+
+def test_metrics_snapshot_filter():
+    """测试按供应商/模型过滤查询"""
+    print("=== test_metrics_snapshot_filter ===")
+    metrics = StreamMetrics()
+    metrics.record("deepseek", "deepseek-chat", "ttfb", 0.3)
+    metrics.record("qwen", "qwen-plus", "ttfb", 0.5)
+    snapshot = metrics.snapshot(vendor="deepseek")
+    assert list(snapshot.keys()) == ["deepseek"]
+    assert snapshot["deepseek"]["deepseek-chat"]["ttfb"]["count"] == 1
+    try:
+        metrics.record("deepseek", "deepseek-chat", "unknown", 1.0)
+        assert False, "未知指标应抛出异常"
+    except ValueError:
+        pass
+    print("PASS\n")
+
+
+def test_send_stream_records_metrics():
+    """测试 send_stream 记录首包、首token、间隔和输出速度"""
+    print("=== test_send_stream_records_metrics ===")
+    stream_metrics.reset()
+    chunks = [
+        delta_chunk(reasoning_content="想"),
+        delta_chunk(reasoning_content="一想"),
+        delta_chunk(content="你好"),
+        delta_chunk(content="世界"),
+        usage_chunk(prompt_tokens=5, completion_tokens=20, total_tokens=25),
+    ]
+
+    async def create(**params):
+        return FakeStream(chunks, delay=0.01)
+
+    client = make_client(create)
+
+    async def run():
+        return [chunk async for chunk in client.send_stream("你好")]
+
+    received = asyncio.run(run())
+    assert [list(c.keys())[0] for c in received] == ["thinking", "thinking", "content", "content"]
+
+    stats = client.last_stream_stats
+    print(f"本次请求: {stats}")
+    assert stats["output_tokens"] == 20  # 使用 usage 中的 completion_tokens
+    assert stats["ttfb"] <= stats["ttft_thinking"] <= stats["ttft_content"]
+    assert stats["tokens_per_second"] > 0
+
+    snapshot = stream_metrics.snapshot(vendor="fake", model="fake-model")["fake"]["fake-model"]
+    assert snapshot["chunk_gap"]["count"] == len(chunks) - 1
+    assert snapshot["chunk_gap"]["p50"] >= 0.005
+    for metric in ("ttfb", "ttft_content", "ttft_thinking", "tokens_per_second", "total_time"):
+        assert snapshot[metric]["count"] == 1, metric
+    print("PASS\n")
+
+
+if __name__ == "__main__":
+    test_histogram_percentile()
+    test_metrics_snapshot_filter()
+    test_send_stream_records_metrics()
+    print("所有测试通过!")
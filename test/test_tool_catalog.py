@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+工具目录缓存测试：首次启动发现并保存工具目录，指纹不变时服务器启动期间即可 list_tools，
+服务器代码变化时重新发现（启动本地 MCP 服务器进程）
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+
+from mcp import StdioServerParameters
+
+# 添加父目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from module.MCP.client.MCPClient import MCPClient
+from module.MCP.client.ToolCatalog import server_fingerprint
+from local_mcp import ADD_TOOL, server_source, server_params, wait_initialized
+
+
+EXTRA_TOOL = """
+@mcp.tool
+def negate(a: int) -> int:
+    \"\"\"取相反数\"\"\"
+    return -a
+"""
+
+
+def write_server(workdir: str, extra: str = "") -> StdioServerParameters:
+    return server_params(server_source("catalog", ADD_TOOL, extra), workdir)
+
+
+def test_catalog_cache():
+    """测试工具目录按服务器指纹缓存：命中时立即可用，服务器代码变化时重新发现"""
+    print("=== test_catalog_cache ===")
+    workdir = tempfile.mkdtemp()
+    catalog_path = os.path.join(workdir, "catalog.json")
+    params = write_server(workdir)
+
+    def run_client():
+        client = MCPClient(server_params=params, catalog_path=catalog_path)
+        start = time.perf_counter()
+        client.start()
+        try:
+            try:
+                early = client.list_tools()  # 服务器仍在启动
+                early_elapsed = time.perf_counter() - start
+            except ValueError:
+                early, early_elapsed = None, None
+            wait_initialized(client)
+            tools = client.list_tools()
+            result = client.get_result(client.add({"function": {"name": "add", "arguments": {"a": 1, "b": 2}}}), timeout=5)
+        finally:
+            client.close()
+        return client, early, early_elapsed, tools, result
+
+    first, first_early, _, first_tools, _ = run_client()
+    with open(catalog_path, "r", encoding="utf-8") as f:
+        saved = json.load(f)
+    second, second_early, early_elapsed, second_tools, result = run_client()
+
+    write_server(workdir, EXTRA_TOOL)
+    third, _, _, third_tools, _ = run_client()
+    with open(catalog_path, "r", encoding="utf-8") as f:
+        updated = json.load(f)
+
+    print(f"来源: {first.catalog_source} / {second.catalog_source} / {third.catalog_source}，"
+          f"缓存命中时 start 后 {early_elapsed * 1000:.2f} ms 即返回 {len(second_early)} 个工具")
+    assert first.catalog_source == "server" and first_early is None
+    assert list(saved) == [first.catalog_key] and saved[first.catalog_key]["openai"] == first_tools
+    assert second.catalog_source == "cache" and second_early == first_tools == second_tools
+    assert early_elapsed < 0.1 and result.structured_content["result"] == 3
+    assert first_tools[0]["function"]["parameters"]["required"] == ["a", "b"]
+    assert third.catalog_source == "server" and third.catalog_key != first.catalog_key
+    assert sorted(tool["function"]["name"] for tool in third_tools) == ["add", "negate"]
+    assert set(updated) == {first.catalog_key, third.catalog_key}
+    print("PASS\n")
+
+
+def test_fingerprint_inputs():
+    """测试指纹覆盖启动参数和服务器目录下的 .py 文件"""
+    print("=== test_fingerprint_inputs ===")
+    workdir = tempfile.mkdtemp()
+    server_path = write_server(workdir).args[0]
+    os.makedirs(os.path.join(workdir, "Tools"))
+    helper = os.path.join(workdir, "Tools", "helper.py")
+    with open(helper, "w", encoding="utf-8") as f:
+        f.write("VALUE = 1\n")
+
+    base = server_fingerprint(sys.executable, [server_path])
+    same = server_fingerprint(sys.executable, [server_path])
+    other_args = server_fingerprint(sys.executable, [server_path, "--debug"])
+    inprocess = server_fingerprint(sys.executable, [server_path], "inprocess")
+    with open(helper, "w", encoding="utf-8") as f:
+        f.write("VALUE = 2\n")
+    helper_changed = server_fingerprint(sys.executable, [server_path])
+    print(f"指纹: {base[:12]}… / 工具模块修改后 {helper_changed[:12]}…")
+    assert base == same
+    assert len({base, other_args, inprocess, helper_changed}) == 4
+    print("PASS\n")
+
+
+if __name__ == "__main__":
+    test_catalog_cache()
+    test_fingerprint_inputs()
+    print("所有测试通过!")
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+工具期限测试：tool_registry 声明期限，服务器在期限到达时终止工具进程，
+客户端超时 / 取消时向服务器发送取消通知，被放弃的工具不再占用CPU（启动本地 MCP 服务器进程）
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+
+from mcp import StdioServerParameters
+
+# 添加父目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from module.MCP.client.AsyncMCPClient import AsyncMCPClient
+from module.MCP.client.MCPClient import MCPClient
+from module.MCP.client.ToolResultCache import load_tool_registry, tool_timeouts
+from local_mcp import server_params, async_client
+
+
+SERVER = """
+import os
+import sys
+import time
+from fastmcp import FastMCP
+from fastmcp.tools import Tool
+
+sys.path.insert(0, {server_dir!r})
+from ToolDeadline import DeadlineExecutor
+
+mcp = FastMCP("deadline")
+executor = DeadlineExecutor()
+
+
+def spin(path: str, seconds: float) -> dict:
+    \"\"\"记录进程号后空转 seconds 秒（占满CPU）\"\"\"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(str(os.getpid()))
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+    return {{"pid": os.getpid()}}
+
+
+def guarded(path: str, seconds: float) -> dict:
+    \"\"\"同 spin（期限较长，用于测试客户端取消）\"\"\"
+    return spin(path, seconds)
+
+
+def square(x: int) -> dict:
+    \"\"\"平方\"\"\"
+    return {{"result": x * x}}
+
+
+if __name__ == "__main__":
+    # 工作进程由 forkserver / spawn 启动，会以 __mp_main__ 导入本文件
+    mcp.add_tool(Tool.from_function(executor.wrap(spin, {deadline})))
+    mcp.add_tool(Tool.from_function(executor.wrap(guarded, 60)))
+    mcp.add_tool(Tool.from_function(executor.wrap(square, 5)))
+    mcp.run(show_banner=False)
+"""
+
+
+def make_params(workdir: str, deadline: float = 0.5) -> StdioServerParameters:
+    server_dir = os.path.join(parent_dir, "module", "MCP", "server")
+    return server_params(SERVER.format(server_dir=server_dir, deadline=deadline), workdir)
+
+
+def make_client(workdir: str, **kwargs) -> AsyncMCPClient:
+    return async_client(make_params(workdir), workdir, **kwargs)
+
+
+def read_pid(path: str, timeout: float = 10.0) -> int:
+    deadline = time.time() + timeout
+    while not (os.path.exists(path) and open(path, encoding="utf-8").read()):
+        assert time.time() < deadline, "工具没有开始执行"
+        time.sleep(0.01)
+    return int(open(path, encoding="utf-8").read())
+
+
+def process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def wait_exited(pid: int, timeout: float = 5.0) -> float:
+    """等待进程退出，返回等待的秒数"""
+    start = time.perf_counter()
+    while process_alive(pid):
+        assert time.perf_counter() - start < timeout, f"工具进程 {pid} 没有被终止"
+        time.sleep(0.01)
+    return time.perf_counter() - start
+
+
+def test_registry_timeouts():
+    """测试 tool_registry 中的期限声明和校验"""
+    print("=== test_registry_timeouts ===")
+    timeouts = tool_timeouts(load_tool_registry())
+    assert timeouts["power"] == 5 and timeouts["search_files"] == 30 and "add" not in timeouts
+    for bad in (0, -1, True, "5"):
+        directory = tempfile.mkdtemp()
+        with open(os.path.join(directory, "bad.json"), "w", encoding="utf-8") as f:
+            json.dump({"spin": {"cache": "none", "timeout": bad}}, f)
+        try:
+            load_tool_registry(directory)
+            raise AssertionError(f"timeout={bad!r} 应被拒绝")
+        except ValueError:
+            pass
+    try:
+        AsyncMCPClient(tool_timeouts={"spin": 0})
+        raise AssertionError("非正期限应被拒绝")
+    except ValueError:
+        pass
+    print(f"声明的期限: {timeouts}")
+    print("PASS\n")
+
+
+def test_server_enforces_deadline():
+    """测试服务器在期限到达时终止工具进程并返回错误（客户端没有设置期限），之后的调用照常执行"""
+    print("=== test_server_enforces_deadline ===")
+    workdir = tempfile.mkdtemp()
+    marker = os.path.join(workdir, "spin.pid")
+
+    async def scenario():
+        async with make_client(workdir, tool_timeouts={}) as client:
+            start = time.perf_counter()
+            result = await client.call("spin", {"path": marker, "seconds": 30})
+            elapsed = time.perf_counter() - start
+            after = await client.call("square", {"x": 7})
+            return result, elapsed, after
+
+    result, elapsed, after = asyncio.run(scenario())
+    pid = read_pid(marker)
+    message = result.content[0].text if result.content else ""
+    print(f"期限 0.5 秒的工具在 {elapsed * 1000:.1f} ms 后返回: {message}")
+    assert result.is_error and "已终止" in message
+    assert 0.5 <= elapsed < 2.0 and not process_alive(pid)
+    assert after.structured_content == {"result": 49}
+    print("PASS\n")
+
+
+def test_client_cancellation_stops_server_work():
+    """测试客户端超时 / 取消后服务器终止正在执行的工具（取消通知），而不是让它继续占用CPU"""
+    print("=== test_client_cancellation_stops_server_work ===")
+    workdir = tempfile.mkdtemp()
+    timed_out = os.path.join(workdir, "timeout.pid")
+    cancelled = os.path.join(workdir, "cancel.pid")
+
+    async def scenario():
+        async with make_client(workdir, tool_timeouts={"guarded": 0.3}) as client:
+            # 工具期限 0.3 秒 + DEADLINE_GRACE 后客户端取消（服务器上的期限是 60 秒）
+            start = time.perf_counter()
+            try:
+                await client.call("guarded", {"path": timed_out, "seconds": 30})
+                raise AssertionError("调用应超时")
+            except TimeoutError as e:
+                timeout_elapsed, timeout_error = time.perf_counter() - start, str(e)
+            timeout_exit = wait_exited(read_pid(timed_out))
+
+            task = asyncio.create_task(client.call("guarded", {"path": cancelled, "seconds": 30}))
+            pid = await asyncio.to_thread(read_pid, cancelled)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            cancel_exit = await asyncio.to_thread(wait_exited, pid)
+            after = await client.call("square", {"x": 3})
+            return timeout_elapsed, timeout_error, timeout_exit, cancel_exit, after, client.timeouts
+
+    timeout_elapsed, timeout_error, timeout_exit, cancel_exit, after, timeouts = asyncio.run(scenario())
+    print(f"客户端 {timeout_elapsed * 1000:.1f} ms 后超时（{timeout_error}），工具进程 {timeout_exit * 1000:.1f} ms 后退出；"
+          f"取消后工具进程 {cancel_exit * 1000:.1f} ms 后退出")
+    assert 1.3 <= timeout_elapsed < 2.5 and "已取消" in timeout_error and timeouts == 1
+    assert timeout_exit < 1.0 and cancel_exit < 1.0
+    assert after.structured_content == {"result": 9}
+    print("PASS\n")
+
+
+def test_sync_client_cancel_on_timeout():
+    """测试同步客户端 get_result 超时时取消任务：服务器终止工具，结果不再保留"""
+    print("=== test_sync_client_cancel_on_timeout ===")
+    workdir = tempfile.mkdtemp()
+    marker = os.path.join(workdir, "sync.pid")
+    client = MCPClient(
+        server_params=make_params(workdir),
+        catalog_path=os.path.join(workdir, "catalog.json"),
+        sequential_tools=set(),
+        tool_timeouts={}
+    )
+    client.start()
+    try:
+        task_id = client.add({"function": {"name": "guarded", "arguments": {"path": marker, "seconds": 30}}})
+        pid = read_pid(marker, timeout=30)
+        try:
+            client.get_result(task_id, timeout=0.2, cancel_on_timeout=True)
+            raise AssertionError("应等待超时")
+        except TimeoutError as e:
+            error = str(e)
+        exited = wait_exited(pid)
+        try:
+            client.get_future(task_id)
+            raise AssertionError("取消的任务不应保留")
+        except KeyError:
+            pass
+        kept = client.add({"function": {"name": "square", "arguments": {"x": 5}}})
+        result = client.get_result(kept, timeout=10)
+        leftover = len(client._futures)
+    finally:
+        client.close()
+    print(f"{error}，工具进程 {exited * 1000:.1f} ms 后退出")
+    assert "已取消" in error and exited < 1.0
+    assert result.structured_content == {"result": 25} and leftover == 0
+    print("PASS\n")
+
+
+if __name__ == "__main__":
+    test_registry_timeouts()
+    test_server_enforces_deadline()
+    test_client_cancellation_stops_server_work()
+    test_sync_client_cancel_on_timeout()
+    print("所有测试通过!")
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+工具结果缓存测试：纯函数工具命中、文件 / 数据库修改时间失效、写工具调用后失效、
+AllEventsHandler 文件事件让目录树结果失效（进程内传输，不启动服务器子进程）
+"""
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+
+from fastmcp import FastMCP
+from fastmcp.tools import Tool
+
+# 添加父目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from module.MCP.client.MCPClient import MCPClient
+from module.MCP.client.ToolResultCache import ToolResultCache, load_tool_registry
+from PublicTools.AllEventsHandler import AllEventsHandler
+
+
+class CountingTools:
+    """与内置工具同名的测试工具，记录服务器端实际执行的次数"""
+
+    def __init__(self):
+        self.calls = {}
+
+    def _count(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def add(self, a: int, b: int) -> int:
+        self._count("add")
+        return a + b
+
+    def file_content(self, file_path: str) -> str:
+        self._count("file_content")
+        with open(file_path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def append_line(self, filepath: str, content: str) -> bool:
+        self._count("append_line")
+        with open(filepath, "a", encoding="utf-8") as f:
+            f.write(content + "\n")
+        return True
+
+    def database_table_content(self, db_name: str, table_name: str) -> dict:
+        self._count("database_table_content")
+        with sqlite3.connect(db_name) as conn:
+            return {"rows": [row[0] for row in conn.execute(f"SELECT content FROM {table_name} ORDER BY id")]}
+
+    def scan_workspace(self, directory: str) -> dict:
+        self._count("scan_workspace")
+        return {"files": sorted(os.path.relpath(os.path.join(root, name), directory)
+                      for root, _, files in os.walk(directory) for name in files)}
+
+
+def make_client(tools: CountingTools, cache: ToolResultCache) -> MCPClient:
+    def server_factory():
+        mcp = FastMCP("counting")
+        for name in ("add", "file_content", "append_line", "database_table_content", "scan_workspace"):
+            mcp.add_tool(Tool.from_function(getattr(tools, name)))
+        return mcp
+
+    client = MCPClient(transport="inprocess", server_factory=server_factory, cache=cache)
+    client.start()
+    deadline = time.time() + 30
+    while not client.get_initialized():
+        assert time.time() < deadline, "MCP客户端初始化超时"
+        time.sleep(0.01)
+    return client
+
+
+def call(client: MCPClient, name: str, **arguments):
+    result = client.get_result(client.add({"function": {"name": name, "arguments": arguments}}), timeout=5)
+    content = result.structured_content
+    return content.get("result", content)
+
+
+def touch(path: str, content: str):
+    """改写文件并把修改时间推后 1 秒（避免文件系统时间精度导致修改时间不变）"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_registry_and_pure_tools():
+    """测试登记表声明的缓存策略，纯函数工具的重复调用不经过服务器"""
+    print("=== test_registry_and_pure_tools ===")
+    registry = load_tool_registry()
+    assert registry["add"]["cache"] == "pure"
+    assert registry["database_table_content"] == {"cache": "read_only", "paths": {"db_name": "db"}}
+    assert registry["write"]["cache"] == "none" and registry["exit_task"]["cache"] == "none"
+
+    tools, cache = CountingTools(), ToolResultCache()
+    client = make_client(tools, cache)
+    try:
+        results = [call(client, "add", a=1, b=2), call(client, "add", b=2, a=1), call(client, "add", a=2, b=2)]
+        start = time.perf_counter()
+        for _ in range(200):
+            call(client, "add", a=1, b=2)
+        hit_latency = (time.perf_counter() - start) / 200
+    finally:
+        client.close()
+    stats = cache.stats()
+    print(f"结果: {results}，服务器执行 {tools.calls}，命中延迟 {hit_latency * 1e6:.1f} us，统计: {stats}")
+    assert results == [3, 3, 4] and tools.calls == {"add": 2}
+    assert stats["hits"] == 201 and stats["misses"] == 2 and stats["hit_rate"] == round(201 / 203, 4)
+    print("PASS\n")
+
+
+def test_file_and_database_invalidation():
+    """测试文件 / 数据库文件修改后缓存失效，通过客户端执行写工具后缓存失效"""
+    print("=== test_file_and_database_invalidation ===")
+    workdir = tempfile.mkdtemp()
+    path = os.path.join(workdir, "notes.txt")
+    db = os.path.join(workdir, "data.db")
+    touch(path, "第一行\n")
+    with sqlite3.connect(db) as conn:
+        conn.execute("CREATE TABLE users (id TEXT PRIMARY KEY, content TEXT)")
+        conn.execute("INSERT INTO users VALUES ('001', '张三')")
+
+    tools, cache = CountingTools(), ToolResultCache()
+    client = make_client(tools, cache)
+    try:
+        first = [call(client, "file_content", file_path=path) for _ in range(3)]
+        touch(path, "改写后\n")
+        changed = call(client, "file_content", file_path=path)
+        call(client, "append_line", filepath=path, content="追加")
+        appended = call(client, "file_content", file_path=path)
+
+        rows = [call(client, "database_table_content", db_name=db, table_name="users")["rows"] for _ in range(2)]
+        time.sleep(0.01)
+        with sqlite3.connect(db) as conn:
+            conn.execute("INSERT INTO users VALUES ('002', '李四')")
+        rows.append(call(client, "database_table_content", db_name=db, table_name="users")["rows"])
+    finally:
+        client.close()
+    print(f"服务器执行 {tools.calls}，统计: {cache.stats()}")
+    assert first == ["第一行\n"] * 3 and changed == "改写后\n" and appended == "改写后\n追加\n"
+    assert tools.calls["file_content"] == 3
+    assert rows == [["张三"], ["张三"], ["张三", "李四"]] and tools.calls["database_table_content"] == 2
+    assert cache.stats()["invalidations"] >= 3
+    print("PASS\n")
+
+
+def test_tree_results_follow_file_events():
+    """测试目录树结果只在被监控时缓存，监控到子目录内的文件事件后失效"""
+    print("=== test_tree_results_follow_file_events ===")
+    workdir = tempfile.mkdtemp()
+    os.makedirs(os.path.join(workdir, "sub"))
+    touch(os.path.join(workdir, "sub", "a.txt"), "a")
+
+    tools, cache = CountingTools(), ToolResultCache()
+    client = make_client(tools, cache)
+    monitor = AllEventsHandler()
+    try:
+        call(client, "scan_workspace", directory=workdir)
+        call(client, "scan_workspace", directory=workdir)
+        unwatched_calls = tools.calls["scan_workspace"]
+
+        monitor.start_monitoring(workdir)
+        cache.attach(monitor)
+        before = [call(client, "scan_workspace", directory=workdir)["files"] for _ in range(3)]
+        touch(os.path.join(workdir, "sub", "b.txt"), "b")
+        deadline = time.time() + 5
+        while cache.stats()["entries"] and time.time() < deadline:
+            time.sleep(0.02)
+        after = call(client, "scan_workspace", directory=workdir)["files"]
+    finally:
+        client.close()
+        cache.detach(monitor)
+        monitor.stop_monitoring()
+    print(f"未监控时执行 {unwatched_calls} 次，服务器共执行 {tools.calls}，结果: {before[-1]} -> {after}")
+    assert unwatched_calls == 2
+    assert before == [[os.path.join("sub", "a.txt")]] * 3
+    assert after == [os.path.join("sub", "a.txt"), os.path.join("sub", "b.txt")]
+    assert tools.calls["scan_workspace"] == 4
+    print("PASS\n")
+
+
+if __name__ == "__main__":
+    test_registry_and_pure_tools()
+    test_file_and_database_invalidation()
+    test_tree_results_follow_file_events()
+    print("所有测试通过!")
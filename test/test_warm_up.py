@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+启动预热测试：并行加载、建立连接、就绪状态与 HTTP 就绪探针（不访问网络）
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+
+# 添加父目录到路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from fastapi.testclient import TestClient
+
+from module.service.HTTP import HTTPServer
+from fake_openai import make_store, model_config
+import fake_openai
+
+
+LOAD_TIME = 0.3  # 模拟tokenizer加载耗时
+
+
+class FakeFactory(fake_openai.FakeFactory):
+    """模型加载耗时 LOAD_TIME 秒，模型列表接口按供应商成功或失败"""
+
+    def __init__(self, failing=(), **kwargs):
+        super().__init__(**kwargs)
+        self.failing = failing
+        self.connected = []
+
+    def call_model(self, vendor, message):
+        time.sleep(LOAD_TIME)
+        return super().call_model(vendor, message)
+
+    async def list_models(self, vendor, model_name):
+        if vendor in self.failing:
+            raise ConnectionError("无法解析域名")
+        self.connected.append(model_name)
+
+
+def make_factory(config: dict, failing=()) -> FakeFactory:
+    return FakeFactory(failing=failing, config_store=make_store(config))
+
+
+CONFIG = {
+    "deepseek": {"deepseek-chat": model_config("deepseek-chat"), "deepseek-reasoner": model_config("deepseek-reasoner")},
+    "qwen": {"qwen-plus": model_config("qwen-plus")},
+    "xinhuo": {"generalv3.5": model_config("generalv3.5")},  # 未实现的供应商不参与预热
+}
+
+
+def test_parallel_warm_up():
+    """测试按配置并行预热，预热后连接直接复用"""
+    print("=== test_parallel_warm_up ===")
+    factory = make_factory(CONFIG)
+    assert factory.readiness()["state"] == "cold" and not factory.readiness()["ready"]
+
+    start = time.perf_counter()
+    status = asyncio.run(factory.warm_up())
+    elapsed = time.perf_counter() - start
+    print(f"预热 3 个模型耗时: {elapsed:.3f} 秒，状态: {status['state']}")
+
+    assert status["ready"] and status["state"] == "ready"
+    assert sorted(status["models"]) == ["deepseek/deepseek-chat", "deepseek/deepseek-reasoner", "qwen/qwen-plus"]
+    assert all(m["tokenizer"] and m["connection"] for m in status["models"].values())
+    assert elapsed < LOAD_TIME * 2  # 并行加载（串行需要 3 倍）
+    assert sorted(factory.connected) == ["deepseek-chat", "deepseek-reasoner", "qwen-plus"]
+
+    factory.connect("deepseek", "deepseek-chat")
+    assert len(factory.created) == 3  # 使用预热好的实例
+    print("PASS\n")
+
+
+def test_marked_targets_and_degraded():
+    """测试只预热标记的模型，部分失败时为 degraded 但仍就绪"""
+    print("=== test_marked_targets_and_degraded ===")
+    config = json.loads(json.dumps(CONFIG))
+    config["deepseek"]["deepseek-chat"]["warm_up"] = True
+    config["qwen"]["qwen-plus"]["warm_up"] = True
+    factory = make_factory(config, failing=("qwen",))
+
+    status = asyncio.run(factory.warm_up())
+    print(f"状态: {status}")
+    assert sorted(status["models"]) == ["deepseek/deepseek-chat", "qwen/qwen-plus"]
+    assert status["state"] == "degraded" and status["ready"]
+    assert status["models"]["qwen/qwen-plus"]["tokenizer"] and not status["models"]["qwen/qwen-plus"]["connection"]
+
+    factory = make_factory(config, failing=("deepseek", "qwen"))
+    status = asyncio.run(factory.warm_up())
+    assert status["state"] == "failed" and not status["ready"]
+    print("PASS\n")
+
+
+def test_ready_probe():
+    """测试 HTTPServer 就绪探针随预热状态变化"""
+    print("=== test_ready_probe ===")
+    factory = make_factory(CONFIG)
+    server = HTTPServer()
+    server.set_ready_callback(factory.readiness)
+
+    client = TestClient(server.app)
+    assert client.get("/health").status_code == 200
+    response = client.get("/ready")
+    assert response.status_code == 503 and response.json()["state"] == "cold"
+
+    # 启动回调中开始后台预热
+    server.add_startup_callback(lambda: factory.start_warm_up())
+    with TestClient(server.app) as client:
+        states = [client.get("/ready").json()["state"]]
+        deadline = time.time() + 5
+        while client.get("/ready").status_code != 200 and time.time() < deadline:
+            time.sleep(0.02)
+        response = client.get("/ready")
+        states.append(response.json()["state"])
+    print(f"探针状态变化: {states}")
+    assert states[0] == "warming"
+    assert response.status_code == 200 and states[-1] == "ready"
+    print("PASS\n")
+
+
+if __name__ == "__main__":
+    test_parallel_warm_up()
+    test_marked_targets_and_degraded()
+    test_ready_probe()
+    print("所有测试通过!")